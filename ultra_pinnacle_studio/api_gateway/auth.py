@@ -16,6 +16,9 @@ from .database import RefreshToken, UserSession, get_db
 from sqlalchemy.orm import Session
 import secrets
 import hashlib
+import threading
+import time
+from cachetools import TTLCache
 # Import moved to avoid circular imports
 from passlib.context import CryptContext
 
@@ -27,6 +30,13 @@ REFRESH_TOKEN_EXPIRE_DAYS = config["security"].get("refresh_token_expire_days",
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# Verified access token claims keyed by token digest, and username -> user id
+# for tokens issued before the "uid" claim existed
+_token_cache_size = config["security"].get("token_cache_size", 4096)
+_verified_tokens = TTLCache(maxsize=_token_cache_size, ttl=config["security"].get("token_cache_ttl_seconds", 300))
+_user_ids = TTLCache(maxsize=_token_cache_size, ttl=300)
+_token_cache_lock = threading.Lock()
+
 class AuthUser(BaseModel):
     username: str
     email: Optional[str] = None
@@ -246,7 +256,7 @@ def refresh_access_token(db: Session, refresh_token_str: str) -> Optional[str]:
         return None
 
     # Create new access token
-    access_token = create_access_token(data={"sub": refresh_token.user.username})
+    access_token = create_access_token(data={"sub": refresh_token.user.username, "uid": refresh_token.user_id})
     return access_token
 
 def create_user_session(db: Session, user_id: int, device_info: Optional[dict] = None,
@@ -303,6 +313,55 @@ def invalidate_all_user_sessions(db: Session, user_id: int):
     db.commit()
     logger.info(f"All sessions invalidated for user {user_id}")
 
+def decode_access_token_cached(token: str) -> Optional[dict]:
+    """Verify a JWT locally and return its claims, or None if invalid or expired.
+
+    Verified claims are cached by token digest, so repeated requests with the
+    same token skip signature verification. Only for identification (e.g.
+    rate limiting); authorization still goes through get_current_user.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    with _token_cache_lock:
+        claims = _verified_tokens.get(digest)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        with _token_cache_lock:
+            _verified_tokens[digest] = claims
+    exp = claims.get("exp")
+    if exp is not None and exp <= time.time():
+        return None
+    return claims
+
+def get_user_id_from_token(token: str) -> Optional[int]:
+    """User id for a bearer token, touching the database only for tokens without a uid claim"""
+    claims = decode_access_token_cached(token)
+    if not claims:
+        return None
+    if claims.get("uid") is not None:
+        return claims["uid"]
+
+    username = claims.get("sub")
+    if not username:
+        return None
+    with _token_cache_lock:
+        user_id = _user_ids.get(username)
+    if user_id is None:
+        from .database import SessionLocal
+        db = SessionLocal()
+        try:
+            user = get_user(db, username)
+        finally:
+            db.close()
+        if user is None:
+            return None
+        user_id = user.id
+        with _token_cache_lock:
+            _user_ids[username] = user_id
+    return user_id
+
 async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security), db: Session = Depends(get_db)) -> User:
     if credentials is None:
         raise HTTPException(
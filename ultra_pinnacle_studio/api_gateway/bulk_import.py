@@ -0,0 +1,597 @@
+"""
+Bulk import engine for Ultra Pinnacle AI Studio
+Streams records out of an uploaded export file, validates them on a worker
+pool against DataValidationRule and inserts them with batched executemany
+statements, one transaction and checkpoint per batch
+"""
+import gzip
+import io
+import json
+import re
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+
+from .database import (
+    Conversation, ConversationParticipant, DataValidationRule, FileUpload,
+    ImportOperation, Message, User
+)
+from .db_engine import chunked
+from .logging_config import logger
+from .search_indexer import mark_changed
+
+READ_SIZE = 64 * 1024
+
+# Section name -> (DataValidationRule.data_type, required fields)
+SECTIONS = {
+    'conversations': ('conversation', ('id', 'title')),
+    'messages': ('message', ('id', 'conversation_id', 'role', 'content')),
+    'file_uploads': ('file', ('id', 'filename', 'original_filename', 'file_size')),
+    'users': ('user', ('username', 'email'))
+}
+
+# Sections each import type accepts; anything else in the file is skipped
+IMPORT_TYPES = {
+    'user_data': ('conversations', 'messages', 'file_uploads'),
+    'conversations': ('conversations', 'messages'),
+    'bulk_admin': ('users',)
+}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+def detect_source_format(filename: Optional[str]) -> str:
+    """'jsonl' for JSON Lines uploads (optionally gzipped), 'json' otherwise"""
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return 'jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'json'
+
+
+# Parsing
+
+class _JsonReader:
+    """Decodes one JSON document value by value from a text stream"""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.buf = ''
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        chunk = self.fp.read(READ_SIZE)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it ('' at EOF)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def take(self, expected: str) -> str:
+        char = self.peek()
+        if char not in expected:
+            raise ValueError(f"Invalid JSON in import file: expected {expected!r}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if not self._fill():
+                    raise ValueError(f"Invalid JSON in import file: {e}") from e
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_json_records(fp) -> Iterator[Tuple[Optional[str], Any]]:
+    """
+    Yield (section, record) for every element of the top-level arrays of an
+    export document such as ``{"conversations": [...], "messages": [...]}``.
+    Other top-level values (``export_metadata``, ``user_profile``) are skipped.
+    """
+    reader = _JsonReader(fp)
+    reader.take('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        section = reader.value()
+        reader.take(':')
+        if reader.peek() == '[':
+            reader.take('[')
+            if reader.peek() == ']':
+                reader.take(']')
+            else:
+                while True:
+                    yield section, reader.value()
+                    if reader.take(',]') == ']':
+                        break
+        else:
+            reader.value()
+
+        if reader.take(',}') == '}':
+            return
+
+
+def iter_jsonl_records(fp) -> Iterator[Tuple[Optional[str], Any]]:
+    """
+    Yield (section, record) from ``{"section": ..., "data": ...}`` lines.
+    Lines that do not parse are yielded as (None, line) so they can be
+    reported without failing the whole import.
+    """
+    for line in fp:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+            yield entry['section'], entry['data']
+        except (ValueError, KeyError, TypeError):
+            yield None, line
+
+
+READERS = {
+    'json': iter_json_records,
+    'jsonl': iter_jsonl_records
+}
+
+
+# Validation
+
+def _present(value) -> bool:
+    return value is not None and value != ''
+
+
+def _required_fields(record, fields):
+    return all(_present(record.get(field)) for field in fields)
+
+
+def _max_length(record, field, max_length):
+    value = record.get(field)
+    return value is None or len(str(value)) <= max_length
+
+
+def _allowed_values(record, field, values):
+    value = record.get(field)
+    return value is None or value in values
+
+
+def _pattern(record, field, pattern):
+    value = record.get(field)
+    return value is None or re.fullmatch(pattern, str(value)) is not None
+
+
+def _value_range(record, field, min=None, max=None):
+    value = record.get(field)
+    if value is None:
+        return True
+    value = float(value)
+    return (min is None or value >= min) and (max is None or value <= max)
+
+
+# DataValidationRule.validation_function -> check(record, **parameters)
+VALIDATORS = {
+    'required_fields': _required_fields,
+    'max_length': _max_length,
+    'allowed_values': _allowed_values,
+    'pattern': _pattern,
+    'range': _value_range
+}
+
+
+def validate_records(records: List[Any], rules: List[Dict[str, Any]]) -> List[List[Dict[str, str]]]:
+    """Rule violations for each record, in order"""
+    results = []
+    for record in records:
+        if not isinstance(record, dict):
+            results.append([{'rule': 'object', 'severity': 'error', 'message': 'Record is not a JSON object'}])
+            continue
+
+        issues = []
+        for rule in rules:
+            try:
+                passed = VALIDATORS[rule['function']](record, **rule['parameters'])
+            except (TypeError, ValueError):
+                passed = False
+            if not passed:
+                issues.append({'rule': rule['name'], 'severity': rule['severity'], 'message': rule['error_message']})
+        results.append(issues)
+    return results
+
+
+def _timestamp(value, default: datetime) -> datetime:
+    if not _present(value):
+        return default
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+class BulkImporter:
+    """
+    Runs one ImportOperation.
+
+    Records are parsed lazily from the source file and grouped into batches
+    of up to ``batch_size`` records from one section. Each batch is
+    validated on a thread pool while earlier batches are written, then
+    inserted with one executemany per table. A batch commits together with
+    the operation's counters and checkpoint, so a rerun after a crash skips
+    exactly the records already handled. Rejected records and warnings are
+    written to a JSON Lines error report next to the source file.
+    """
+
+    def __init__(self, session_factory: Callable, operation_id: str,
+                 batch_size: int = 1000, validation_workers: int = 4):
+        self.session_factory = session_factory
+        self.operation_id = operation_id
+        self.batch_size = max(1, int(batch_size))
+        self.validation_workers = max(1, int(validation_workers))
+
+    def run(self):
+        """Import the whole source file, resuming from the last checkpoint"""
+        try:
+            self._run()
+        except Exception as e:
+            logger.error(f"Error processing import {self.operation_id}: {e}")
+            with self.session_factory() as db:
+                operation = db.get(ImportOperation, self.operation_id)
+                if operation is not None:
+                    operation.status = "failed"
+                    operation.error_message = str(e)
+                    operation.completed_at = datetime.now(timezone.utc)
+                    db.commit()
+
+    def _run(self):
+        with self.session_factory() as db:
+            operation = db.get(ImportOperation, self.operation_id)
+            if operation is None:
+                logger.error(f"Import operation {self.operation_id} not found")
+                return
+
+            self.user_id = operation.user_id
+            self.import_type = operation.import_type
+            self.sections = IMPORT_TYPES.get(self.import_type)
+            if self.sections is None:
+                raise ValueError(f"Unsupported import type: {self.import_type}")
+            if self.import_type == "bulk_admin":
+                user = db.get(User, self.user_id)
+                if not user or not user.is_superuser:
+                    raise ValueError("Admin access required for bulk import")
+            if operation.source_format not in READERS:
+                raise ValueError(f"Unsupported import format: {operation.source_format}")
+
+            self.rules = self._load_rules(db, (operation.data_validation or {}).get('requested_rules'))
+            self.summary = dict(operation.import_summary or {})
+            self.checkpoint = self.summary.get('checkpoint', 0)
+            source_path = Path(operation.source_file_path)
+            source_format = operation.source_format
+
+            operation.status = "running"
+            operation.error_message = None
+            operation.started_at = operation.started_at or datetime.now(timezone.utc)
+            db.commit()
+
+        report_path = source_path.with_name(f"import_{self.operation_id}_errors.jsonl")
+        self.summary['error_report'] = str(report_path)
+        total_bytes = source_path.stat().st_size or 1
+
+        with open(report_path, 'ab') as self.report, open(source_path, 'rb') as raw, \
+                self._text_stream(raw) as text, ThreadPoolExecutor(max_workers=self.validation_workers) as pool:
+            # Drop report lines written after the last committed batch
+            self.report.truncate(self.summary.get('error_report_bytes', 0))
+            self.report.seek(0, io.SEEK_END)
+
+            records = READERS[source_format](text)
+            pending = deque()
+            for section, batch in self._batches(records):
+                future = None
+                if section in self.sections:
+                    future = pool.submit(validate_records, [record for _, record in batch],
+                                         self.rules[SECTIONS[section][0]])
+                pending.append((section, batch, future, raw.tell()))
+
+                # Keep the pool busy while this thread writes
+                if len(pending) > self.validation_workers:
+                    self._write_batch(*pending.popleft(), total_bytes)
+
+            while pending:
+                self._write_batch(*pending.popleft(), total_bytes)
+
+        with self.session_factory() as db:
+            operation = db.get(ImportOperation, self.operation_id)
+            operation.status = "completed"
+            operation.progress = 100.0
+            operation.completed_at = datetime.now(timezone.utc)
+            db.commit()
+
+        logger.info(f"Import operation {self.operation_id} completed successfully")
+
+    @staticmethod
+    def _text_stream(raw: BinaryIO) -> io.TextIOBase:
+        stream = raw
+        if raw.read(2) == b'\x1f\x8b':
+            stream = gzip.GzipFile(fileobj=raw)
+        raw.seek(0)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+
+    def _load_rules(self, db, requested: Optional[Dict[str, List[Dict[str, Any]]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Active import rules per data type, led by each section's required fields"""
+        rules = {
+            data_type: [{
+                'name': 'required_fields',
+                'function': 'required_fields',
+                'parameters': {'fields': list(required)},
+                'error_message': f"Missing required fields: {', '.join(required)}",
+                'severity': 'error'
+            }]
+            for data_type, required in SECTIONS.values()
+        }
+
+        configured = [
+            (rule.data_type, {
+                'name': rule.name,
+                'function': rule.validation_function,
+                'parameters': rule.parameters or {},
+                'error_message': rule.error_message,
+                'severity': rule.severity or 'error'
+            })
+            for rule in db.query(DataValidationRule).filter(
+                DataValidationRule.is_active == True,
+                DataValidationRule.rule_type.in_(("import", "both"))
+            )
+        ]
+        for data_type, extra in (requested or {}).items():
+            for rule in extra:
+                configured.append((data_type, {
+                    'name': rule.get('name', rule.get('validation_function')),
+                    'function': rule.get('validation_function'),
+                    'parameters': rule.get('parameters') or {},
+                    'error_message': rule.get('error_message', 'Validation failed'),
+                    'severity': rule.get('severity', 'error')
+                }))
+
+        for data_type, rule in configured:
+            if data_type not in rules:
+                continue
+            if rule['function'] not in VALIDATORS:
+                logger.warning(f"Skipping validation rule {rule['name']}: unknown function {rule['function']}")
+                continue
+            rules[data_type].append(rule)
+        return rules
+
+    def _batches(self, records: Iterable[Tuple[Optional[str], Any]]) -> Iterator[Tuple[Optional[str], List[Tuple[int, Any]]]]:
+        """Group (index, record) pairs by section, skipping checkpointed records"""
+        section = None
+        batch = []
+        for index, (record_section, record) in enumerate(records, start=1):
+            if index <= self.checkpoint:
+                continue
+            if batch and (record_section != section or len(batch) >= self.batch_size):
+                yield section, batch
+                batch = []
+            section = record_section
+            batch.append((index, record))
+        if batch:
+            yield section, batch
+
+    def _report(self, index: int, section: Optional[str], record: Any, issues: List[Dict[str, str]]):
+        entry = {
+            'index': index,
+            'section': section,
+            'id': record.get('id', record.get('username')) if isinstance(record, dict) else None,
+            'issues': issues
+        }
+        self.report.write((json.dumps(entry, default=str) + '\n').encode('utf-8'))
+
+    def _write_batch(self, section: Optional[str], batch: List[Tuple[int, Any]],
+                     future: Optional[Future], position: int, total_bytes: int):
+        issues = future.result() if future is not None else [[] for _ in batch]
+        successful = failed = skipped = 0
+
+        with self.session_factory() as db:
+            candidates = []
+            for (index, record), problems in zip(batch, issues):
+                if section is None:
+                    self._report(index, None, record, [{'rule': 'parse', 'severity': 'error',
+                                                        'message': 'Invalid JSON Lines entry'}])
+                    failed += 1
+                    continue
+                if section not in self.sections:
+                    skipped += 1
+                    continue
+                if problems:
+                    self._report(index, section, record, problems)
+                if any(problem['severity'] == 'error' for problem in problems):
+                    failed += 1
+                else:
+                    candidates.append((index, record))
+
+            if candidates:
+                now = datetime.now(timezone.utc)
+                inserted, rejected, duplicates = getattr(self, f"_insert_{section}")(db, candidates, now)
+                for index, record, message in rejected:
+                    self._report(index, section, record, [{'rule': 'integrity', 'severity': 'error',
+                                                           'message': message}])
+                successful += inserted
+                failed += len(rejected)
+                skipped += duplicates
+
+            operation = db.get(ImportOperation, self.operation_id)
+            operation.processed_records += len(batch)
+            operation.successful_records += successful
+            operation.failed_records += failed
+            operation.skipped_records += skipped
+            operation.total_records = max(operation.total_records or 0, batch[-1][0])
+            operation.progress = min(99.0, 100.0 * position / total_bytes)
+
+            self.report.flush()
+            self.summary['checkpoint'] = batch[-1][0]
+            self.summary['error_report_bytes'] = self.report.tell()
+            operation.import_summary = dict(self.summary)
+            db.commit()
+
+    # Per-section inserts: each returns (inserted, [(index, record, reason)], duplicates)
+
+    @staticmethod
+    def _lookup(db, columns: List[Any], key_column, keys: Iterable[Any]) -> List[Tuple]:
+        rows = []
+        for chunk in chunked(keys):
+            rows.extend(db.execute(select(*columns).where(key_column.in_(chunk))).all())
+        return rows
+
+    def _prepare(self, db, candidates, key_column, build_row, label: str):
+        """Build rows keyed by ``key_column``, dropping rows that already exist"""
+        rows = {}
+        rejected = []
+        duplicates = 0
+        for index, record in candidates:
+            try:
+                row = build_row(record)
+            except (KeyError, TypeError, ValueError) as e:
+                rejected.append((index, record, f"Invalid {label}: {e}"))
+                continue
+            key = row[key_column.key]
+            if key in rows:
+                duplicates += 1
+                continue
+            rows[key] = (index, record, row)
+
+        for (key,) in self._lookup(db, [key_column], key_column, rows):
+            del rows[key]
+            duplicates += 1
+        return rows, rejected, duplicates
+
+    def _insert_conversations(self, db, candidates, now):
+        def build_row(record):
+            created_by = self.user_id
+            if self.import_type != "user_data":
+                created_by = record.get("created_by") or self.user_id
+            return {
+                "id": str(record["id"]),
+                "title": record["title"],
+                "model": record.get("model", "gpt-4"),
+                "is_public": bool(record.get("is_public", False)),
+                "created_by": created_by,
+                "created_at": _timestamp(record.get("created_at"), now),
+                "updated_at": _timestamp(record.get("updated_at"), now)
+            }
+
+        rows, rejected, duplicates = self._prepare(db, candidates, Conversation.id, build_row, "conversation")
+        if rows:
+            db.execute(insert(Conversation), [row for _, _, row in rows.values()])
+            if self.import_type == "user_data":
+                db.execute(insert(ConversationParticipant), [
+                    {"conversation_id": key, "user_id": self.user_id, "permission_level": "owner"}
+                    for key in rows
+                ])
+            for key in rows:
+                mark_changed(db, "conversation", key)
+        return len(rows), rejected, duplicates
+
+    def _insert_messages(self, db, candidates, now):
+        def build_row(record):
+            user_id = record.get("user_id")
+            if self.import_type == "user_data" and user_id is not None:
+                user_id = self.user_id
+            return {
+                "id": int(record["id"]),
+                "conversation_id": str(record["conversation_id"]),
+                "user_id": user_id,
+                "role": record["role"],
+                "content": record["content"],
+                "model": record.get("model"),
+                "tokens_used": record.get("tokens_used") or 0,
+                "created_at": _timestamp(record.get("created_at"), now)
+            }
+
+        rows, rejected, duplicates = self._prepare(db, candidates, Message.id, build_row, "message")
+
+        # Messages must land in an existing conversation the importer may write to
+        owners = dict(self._lookup(db, [Conversation.id, Conversation.created_by], Conversation.id,
+                                   {row["conversation_id"] for _, _, row in rows.values()}))
+        for key, (index, record, row) in list(rows.items()):
+            owner = owners.get(row["conversation_id"])
+            if owner is None:
+                rejected.append((index, record, f"Unknown conversation {row['conversation_id']}"))
+            elif self.import_type == "user_data" and owner != self.user_id:
+                rejected.append((index, record, f"Conversation {row['conversation_id']} belongs to another user"))
+            else:
+                continue
+            del rows[key]
+
+        if rows:
+            db.execute(insert(Message), [row for _, _, row in rows.values()])
+            for conversation_id in {row["conversation_id"] for _, _, row in rows.values()}:
+                mark_changed(db, "conversation", conversation_id)
+        return len(rows), rejected, duplicates
+
+    def _insert_file_uploads(self, db, candidates, now):
+        def build_row(record):
+            return {
+                "id": int(record["id"]),
+                "user_id": self.user_id,
+                "filename": record["filename"],
+                "original_filename": record["original_filename"],
+                "file_path": record.get("file_path") or "",
+                "file_size": int(record["file_size"]),
+                "content_type": record.get("content_type"),
+                "uploaded_at": _timestamp(record.get("uploaded_at"), now)
+            }
+
+        rows, rejected, duplicates = self._prepare(db, candidates, FileUpload.id, build_row, "file upload")
+        if rows:
+            db.execute(insert(FileUpload), [row for _, _, row in rows.values()])
+        return len(rows), rejected, duplicates
+
+    def _insert_users(self, db, candidates, now):
+        def build_row(record):
+            return {
+                "username": record["username"],
+                "email": record["email"],
+                "full_name": record.get("full_name"),
+                "hashed_password": record.get("hashed_password") or "placeholder",
+                "is_active": bool(record.get("is_active", True)),
+                "is_superuser": bool(record.get("is_superuser", False)),
+                "created_at": _timestamp(record.get("created_at"), now),
+                "updated_at": _timestamp(record.get("updated_at"), now)
+            }
+
+        rows, rejected, duplicates = self._prepare(db, candidates, User.username, build_row, "user")
+
+        # Email is unique too
+        emails = {}
+        for key, (_, _, row) in list(rows.items()):
+            if row["email"] in emails:
+                del rows[key]
+                duplicates += 1
+            else:
+                emails[row["email"]] = key
+        for (email,) in self._lookup(db, [User.email], User.email, emails):
+            del rows[emails[email]]
+            duplicates += 1
+
+        if rows:
+            db.execute(insert(User), [row for _, _, row in rows.values()])
+            for (user_id,) in self._lookup(db, [User.id], User.username, rows):
+                mark_changed(db, "user", user_id)
+        return len(rows), rejected, duplicates
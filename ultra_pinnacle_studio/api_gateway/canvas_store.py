@@ -0,0 +1,189 @@
+"""
+Canvas project store for Ultra Pinnacle AI Studio
+Projects are indexed per user in canvas_projects, and each layer is kept as
+its own row in canvas_layers with a content hash. Listing reads only project
+metadata. Saving compares layer hashes and writes just the layers that
+changed, and a patch can send only the changed layers.
+"""
+import hashlib
+import json
+import shutil
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from .database import CanvasLayer, CanvasProject
+from .logging_config import logger
+
+
+@dataclass
+class SaveResult:
+    """What a save changed"""
+    project_id: str
+    layers_written: int
+    layers_deleted: int
+
+
+def serialize_layer(layer: Any) -> str:
+    """Canonical JSON for a layer, so equal layers hash equally"""
+    return json.dumps(layer, sort_keys=True, separators=(',', ':'))
+
+
+def layer_hash(data: str) -> str:
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def project_summary(project: CanvasProject) -> Dict[str, Any]:
+    return {
+        "id": project.id,
+        "name": project.name,
+        "layer_count": project.layer_count,
+        "size_bytes": project.size_bytes,
+        "created_at": project.created_at.isoformat(),
+        "updated_at": project.updated_at.isoformat()
+    }
+
+
+def list_projects(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    """A user's projects, most recently updated first, without reading layers"""
+    projects = db.execute(
+        select(CanvasProject).where(CanvasProject.user_id == user_id).order_by(CanvasProject.updated_at.desc())
+    ).scalars()
+    return [project_summary(project) for project in projects]
+
+
+def get_project(db: Session, project_id: str) -> Optional[CanvasProject]:
+    """Project metadata row, or None"""
+    return db.get(CanvasProject, project_id)
+
+
+def load_layers(db: Session, project_id: str) -> List[Any]:
+    """A project's layers in order"""
+    rows = db.execute(
+        select(CanvasLayer.data).where(CanvasLayer.project_id == project_id).order_by(CanvasLayer.position)
+    ).scalars()
+    return [json.loads(data) for data in rows]
+
+
+def _write_layers(db: Session, project: CanvasProject, layers: Dict[int, str], layer_count: int) -> SaveResult:
+    """
+    Write serialized ``layers`` (position -> JSON) whose hash differs from the
+    stored one and drop positions at or beyond ``layer_count``. Commits.
+    """
+    stored = {
+        position: (content_hash, size)
+        for position, content_hash, size in db.execute(
+            select(CanvasLayer.position, CanvasLayer.content_hash, CanvasLayer.size_bytes)
+            .where(CanvasLayer.project_id == project.id)
+        )
+    }
+    now = datetime.now(timezone.utc)
+    updates = []
+    inserts = []
+    sizes = {position: size for position, (_, size) in stored.items() if position < layer_count}
+    for position, data in layers.items():
+        content_hash = layer_hash(data)
+        size = len(data.encode('utf-8'))
+        sizes[position] = size
+        if position not in stored:
+            inserts.append({"project_id": project.id, "position": position, "content_hash": content_hash,
+                            "size_bytes": size, "data": data, "updated_at": now})
+        elif stored[position][0] != content_hash:
+            updates.append({"project_id": project.id, "position": position, "content_hash": content_hash,
+                            "size_bytes": size, "data": data, "updated_at": now})
+
+    # Bulk statements by primary key; unchanged layers are never read or rewritten
+    if updates:
+        db.execute(update(CanvasLayer), updates)
+    if inserts:
+        db.execute(insert(CanvasLayer), inserts)
+    deleted = [position for position in stored if position >= layer_count]
+    if deleted:
+        db.execute(delete(CanvasLayer).where(
+            CanvasLayer.project_id == project.id, CanvasLayer.position >= layer_count
+        ))
+
+    project.layer_count = layer_count
+    project.size_bytes = sum(sizes.values())
+    project.updated_at = now
+    db.commit()
+    return SaveResult(project.id, len(updates) + len(inserts), len(deleted))
+
+
+def save_project(db: Session, user_id: int, name: str, layers: Sequence[Any],
+                 project: Optional[CanvasProject] = None) -> SaveResult:
+    """Create a project, or replace an existing one's layers writing only those that changed"""
+    if project is None:
+        project = CanvasProject(id=str(uuid.uuid4()), user_id=user_id, name=name, layer_count=0, size_bytes=0)
+        db.add(project)
+        db.flush()
+    project.name = name
+    return _write_layers(db, project, {i: serialize_layer(layer) for i, layer in enumerate(layers)}, len(layers))
+
+
+def patch_project(db: Session, project: CanvasProject, layers: Dict[int, Any],
+                  layer_count: Optional[int] = None, name: Optional[str] = None) -> SaveResult:
+    """
+    Apply a delta save: ``layers`` maps positions to new layer data. With
+    ``layer_count`` the project is grown or truncated; new positions must
+    all be supplied.
+    """
+    layer_count = project.layer_count if layer_count is None else layer_count
+    if layer_count < 0:
+        raise ValueError("layer_count cannot be negative")
+    out_of_range = sorted(position for position in layers if not 0 <= position < layer_count)
+    if out_of_range:
+        raise ValueError(f"Layer positions out of range: {out_of_range}")
+    missing = sorted(set(range(project.layer_count, layer_count)) - set(layers))
+    if missing:
+        raise ValueError(f"New layer positions must be supplied: {missing}")
+
+    if name is not None:
+        project.name = name
+    return _write_layers(db, project, {position: serialize_layer(layer) for position, layer in layers.items()},
+                         layer_count)
+
+
+def delete_project(db: Session, project: CanvasProject):
+    db.execute(delete(CanvasLayer).where(CanvasLayer.project_id == project.id))
+    db.delete(project)
+    db.commit()
+
+
+def import_json_projects(db: Session, projects_dir: Path) -> int:
+    """
+    Move projects saved as uploads/projects/*.json by earlier versions into
+    the store. Imported files are moved to projects_dir/imported.
+    """
+    if not projects_dir.exists():
+        return 0
+    imported_dir = projects_dir / "imported"
+    imported = 0
+    for file_path in sorted(projects_dir.glob("*.json")):
+        try:
+            with open(file_path, 'r') as f:
+                data = json.load(f)
+            if get_project(db, data["id"]) is None:
+                project = CanvasProject(
+                    id=data["id"], user_id=data["user_id"], name=data["name"], layer_count=0, size_bytes=0,
+                    created_at=datetime.fromisoformat(data["created_at"])
+                )
+                db.add(project)
+                db.flush()
+                save_project(db, data["user_id"], data["name"], data.get("layers", []), project)
+                project.updated_at = datetime.fromisoformat(data["updated_at"])
+                db.commit()
+                imported += 1
+            imported_dir.mkdir(exist_ok=True)
+            shutil.move(str(file_path), str(imported_dir / file_path.name))
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Error importing canvas project {file_path}: {e}")
+    if imported:
+        logger.info(f"Imported {imported} canvas projects into the project store")
+    return imported
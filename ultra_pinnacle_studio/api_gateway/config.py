@@ -137,5 +137,14 @@ class Config:
         
         return True
 
+def resolve_data_path(config: Any, path: str, directory: str = "cache_dir") -> Path:
+    """
+    Resolve a data file named in config against one of the ``paths``
+    directories (``cache/`` when it is not configured). Absolute paths are
+    used as given.
+    """
+    paths = config.get("paths", {}) or {}
+    return Path(paths.get(directory) or "cache/") / path
+
 # Global configuration instance
 config = Config()
@@ -8,8 +8,9 @@ import csv
 import uuid
 import hashlib
 import asyncio
+import shutil
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Any, Optional, Tuple
+from typing import BinaryIO, Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import zipfile
 import tempfile
@@ -32,12 +33,16 @@ try:
 except ImportError:
     JINJA_AVAILABLE = False
 
+from sqlalchemy import func, select
+
 from .database import (
-    get_db, User, Conversation, Message, FileUpload, AuditLog,
+    get_db, SessionLocal, User, Conversation, Message, FileUpload, AuditLog,
     ExportOperation, ImportOperation, ExportSchedule, DataValidationRule
 )
 from .logging_config import logger
 from .config import config
+from .export_stream import ExportSection, STREAM_FORMATS, iter_keyset, open_export_writer
+from .bulk_import import BulkImporter, IMPORT_TYPES, READ_SIZE, detect_source_format
 
 class DataExportService:
     """Service for handling data export operations"""
@@ -48,6 +53,17 @@ class DataExportService:
         self.temp_dir = Path(config["paths"]["temp_dir"])
         self.temp_dir.mkdir(exist_ok=True)
 
+        export_config = config.get("data_export", {})
+        self.page_size = export_config.get("page_size", 1000)
+        self.compress_level = export_config.get("compress_level", 6)
+
+        import_config = config.get("data_import", {})
+        self.import_batch_size = import_config.get("batch_size", 1000)
+        self.validation_workers = import_config.get("validation_workers", 4)
+        self.imports_dir = self.temp_dir / "imports"
+        self.imports_dir.mkdir(exist_ok=True)
+        self._active_imports = set()
+
     async def create_export_operation(
         self,
         user_id: int,
@@ -303,100 +319,122 @@ class DataExportService:
 
     async def _export_all_users(self, operation: ExportOperation, db):
         """Export all user data"""
-        users = db.query(User).all()
-
-        data = {
-            "users": [],
-            "export_metadata": {
-                "exported_at": datetime.now(timezone.utc).isoformat(),
-                "user_count": len(users),
-                "export_type": "bulk_users",
-                "gdpr_compliant": True
-            }
+        conversation_count = select(func.count(Conversation.id)).where(
+            Conversation.created_by == User.id
+        ).scalar_subquery().label("conversation_count")
+        file_upload_count = select(func.count(FileUpload.id)).where(
+            FileUpload.user_id == User.id
+        ).scalar_subquery().label("file_upload_count")
+
+        sections = [
+            ExportSection("users", [
+                User.id, User.username, User.email, User.full_name, User.is_active,
+                User.is_superuser, User.created_at, User.updated_at,
+                conversation_count, file_upload_count
+            ], User.id, count_key="user_count")
+        ]
+        metadata = {
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+            "export_type": "bulk_users",
+            "gdpr_compliant": True
         }
 
-        for user in users:
-            user_data = {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-                "full_name": user.full_name,
-                "is_active": user.is_active,
-                "is_superuser": user.is_superuser,
-                "created_at": user.created_at.isoformat(),
-                "updated_at": user.updated_at.isoformat(),
-                "conversation_count": len(user.conversations_created),
-                "file_upload_count": len(user.file_uploads)
-            }
-            data["users"].append(user_data)
-
-        await self._generate_export_file(operation, data, db)
+        await self._stream_export(operation, db, sections, metadata)
 
     async def _export_all_conversations(self, operation: ExportOperation, db):
         """Export all conversations"""
-        conversations = db.query(Conversation).all()
-        messages = db.query(Message).order_by(Message.conversation_id, Message.created_at).all()
+        sections = [
+            ExportSection("conversations", [
+                Conversation.id, Conversation.title, Conversation.model, Conversation.is_public,
+                Conversation.created_by, Conversation.created_at, Conversation.updated_at
+            ], Conversation.id, count_key="conversation_count"),
+            ExportSection("messages", [
+                Message.id, Message.conversation_id, Message.user_id, Message.role,
+                Message.content, Message.model, Message.tokens_used, Message.created_at
+            ], Message.id, count_key="message_count")
+        ]
+        metadata = {
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+            "export_type": "bulk_conversations"
+        }
 
-        data = {
-            "conversations": [],
-            "messages": [],
-            "export_metadata": {
-                "exported_at": datetime.now(timezone.utc).isoformat(),
-                "conversation_count": len(conversations),
-                "message_count": len(messages),
-                "export_type": "bulk_conversations"
-            }
+        await self._stream_export(operation, db, sections, metadata)
+
+    async def _export_system_audit(self, operation: ExportOperation, db):
+        """Export system audit logs, newest first"""
+        sections = [
+            ExportSection("audit_logs", [
+                AuditLog.id, AuditLog.user_id, AuditLog.action, AuditLog.resource,
+                AuditLog.resource_id, AuditLog.details, AuditLog.ip_address,
+                AuditLog.user_agent, AuditLog.created_at
+            ], AuditLog.id, descending=True, count_key="audit_log_count")
+        ]
+        metadata = {
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+            "export_type": "system_audit"
         }
 
-        data["conversations"] = [{
-            "id": conv.id,
-            "title": conv.title,
-            "model": conv.model,
-            "is_public": conv.is_public,
-            "created_by": conv.created_by,
-            "created_at": conv.created_at.isoformat(),
-            "updated_at": conv.updated_at.isoformat()
-        } for conv in conversations]
+        await self._stream_export(operation, db, sections, metadata)
 
-        data["messages"] = [{
-            "id": msg.id,
-            "conversation_id": msg.conversation_id,
-            "user_id": msg.user_id,
-            "role": msg.role,
-            "content": msg.content,
-            "model": msg.model,
-            "tokens_used": msg.tokens_used,
-            "created_at": msg.created_at.isoformat()
-        } for msg in messages]
+    async def _stream_export(self, operation: ExportOperation, db,
+                             sections: List[ExportSection], metadata: Dict[str, Any]):
+        """Run the streaming export on a worker thread so paging and compression stay off the event loop"""
+        # The session moves to the worker thread while this coroutine waits for it
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_stream_export, operation, db, sections, metadata)
 
-        await self._generate_export_file(operation, data, db)
+    def _write_stream_export(self, operation: ExportOperation, db,
+                             sections: List[ExportSection], metadata: Dict[str, Any]):
+        """
+        Write ``sections`` to a compressed export file one keyset page at a
+        time, recording progress, size and checksum on the operation
+        """
+        format_type = operation.format.lower()
+        if format_type not in STREAM_FORMATS:
+            raise ValueError(f"Unsupported format for bulk export: {format_type}")
 
-    async def _export_system_audit(self, operation: ExportOperation, db):
-        """Export system audit logs"""
-        audit_logs = db.query(AuditLog).order_by(AuditLog.created_at.desc()).limit(50000).all()
+        operation.total_records = sum(
+            db.execute(select(func.count(section.key)).where(*section.criteria)).scalar() or 0
+            for section in sections
+        )
+        operation.processed_records = 0
+        db.commit()
 
-        data = {
-            "audit_logs": [],
-            "export_metadata": {
-                "exported_at": datetime.now(timezone.utc).isoformat(),
-                "audit_log_count": len(audit_logs),
-                "export_type": "system_audit"
-            }
-        }
+        filepath = self.exports_dir / f"export_{operation.id}{STREAM_FORMATS[format_type]}"
+        writer = open_export_writer(format_type, filepath, self.compress_level)
+        processed = 0
 
-        data["audit_logs"] = [{
-            "id": log.id,
-            "user_id": log.user_id,
-            "action": log.action,
-            "resource": log.resource,
-            "resource_id": log.resource_id,
-            "details": log.details,
-            "ip_address": log.ip_address,
-            "user_agent": log.user_agent,
-            "created_at": log.created_at.isoformat()
-        } for log in audit_logs]
+        try:
+            for section in sections:
+                written = 0
+                writer.begin_section(section.name, [(column.key, column.type) for column in section.columns])
+
+                for rows in iter_keyset(db, section.columns, section.key, *section.criteria,
+                                        page_size=self.page_size, descending=section.descending):
+                    writer.write_rows(rows)
+                    written += len(rows)
+                    processed += len(rows)
+
+                    # Rows added mid-export can push past the initial count
+                    operation.processed_records = processed
+                    if operation.total_records:
+                        operation.progress = min(99.0, 100.0 * processed / operation.total_records)
+                    db.commit()
+
+                writer.end_section()
+                if section.count_key:
+                    metadata[section.count_key] = written
+
+            metadata["export_format"] = format_type
+            writer.close(metadata)
+        except Exception:
+            writer.abort()
+            raise
 
-        await self._generate_export_file(operation, data, db)
+        operation.file_path = str(filepath)
+        operation.file_size = writer.size
+        operation.checksum = writer.checksum
+        db.commit()
 
     def _calculate_checksum(self, filepath: str) -> str:
         """Calculate SHA256 checksum of file"""
@@ -639,23 +677,41 @@ class DataExportService:
         self,
         user_id: int,
         import_type: str,
-        import_data: bytes,
+        import_data: Optional[bytes] = None,
+        import_file: Optional[BinaryIO] = None,
+        filename: Optional[str] = None,
         validation_rules: Optional[Dict[str, Any]] = None,
         requested_by_ip: Optional[str] = None,
         user_agent: Optional[str] = None
     ) -> str:
-        """Create a new import operation"""
+        """
+        Create a new import operation from raw bytes or an open upload.
+
+        The source is copied to disk in chunks and parsed incrementally by
+        the bulk importer; ``validation_rules`` maps data types to extra
+        rules in DataValidationRule form.
+        """
+        if import_type not in IMPORT_TYPES:
+            raise ValueError(f"Unsupported import type: {import_type}")
+
+        operation_id = str(uuid.uuid4())
+        source_format = detect_source_format(filename)
+        source_path = self.imports_dir / f"import_{operation_id}.{source_format}"
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._save_import_source, source_path, import_data, import_file)
+
         db = next(get_db())
 
         try:
-            operation_id = str(uuid.uuid4())
-
             operation = ImportOperation(
                 id=operation_id,
                 user_id=user_id,
                 import_type=import_type,
-                import_data=import_data,
-                validation_rules=validation_rules or {},
+                source_format=source_format,
+                source_file_path=str(source_path),
+                data_validation={"requested_rules": validation_rules or {}},
+                import_summary={},
                 requested_by_ip=requested_by_ip,
                 user_agent=user_agent
             )
@@ -672,274 +728,44 @@ class DataExportService:
         finally:
             db.close()
 
-    async def _process_import(self, operation_id: str):
-        """Process an import operation asynchronously"""
-        db = next(get_db())
-
-        try:
-            operation = db.query(ImportOperation).filter(ImportOperation.id == operation_id).first()
-            if not operation:
-                logger.error(f"Import operation {operation_id} not found")
-                return
-
-            operation.status = "running"
-            operation.started_at = datetime.now(timezone.utc)
-            db.commit()
-
-            # Process based on import type
-            if operation.import_type == "user_data":
-                await self._import_user_data(operation, db)
-            elif operation.import_type == "conversations":
-                await self._import_conversations(operation, db)
-            elif operation.import_type == "bulk_admin":
-                await self._import_bulk_admin(operation, db)
+    def _save_import_source(self, source_path: Path, import_data: Optional[bytes],
+                            import_file: Optional[BinaryIO]):
+        """Write the uploaded source to disk without holding it in memory"""
+        with open(source_path, 'wb') as f:
+            if import_file is not None:
+                shutil.copyfileobj(import_file, f, READ_SIZE)
             else:
-                raise ValueError(f"Unsupported import type: {operation.import_type}")
+                f.write(import_data or b"")
 
-            operation.status = "completed"
-            operation.completed_at = datetime.now(timezone.utc)
-            db.commit()
-
-            logger.info(f"Import operation {operation_id} completed successfully")
+    async def resume_import_operation(self, operation_id: str) -> bool:
+        """Restart a failed or interrupted import from its last checkpoint"""
+        if operation_id in self._active_imports:
+            return False
 
-        except Exception as e:
-            logger.error(f"Error processing import {operation_id}: {e}")
-            operation.status = "failed"
-            operation.error_message = str(e)
-            operation.completed_at = datetime.now(timezone.utc)
-            db.commit()
+        db = next(get_db())
+        try:
+            operation = db.query(ImportOperation).filter(ImportOperation.id == operation_id).first()
+            if not operation or operation.status not in ("failed", "running"):
+                return False
         finally:
             db.close()
 
-    async def _import_user_data(self, operation: ImportOperation, db):
-        """Import user data with validation"""
-        try:
-            import_data = json.loads(operation.import_data.decode('utf-8'))
-        except json.JSONDecodeError:
-            raise ValueError("Invalid JSON format in import data")
-
-        # Validate data structure
-        if "user_profile" not in import_data:
-            raise ValueError("Missing user_profile in import data")
-
-        user_profile = import_data["user_profile"]
-        user_id = operation.user_id
-
-        # Validate user ownership
-        existing_user = db.query(User).filter(User.id == user_id).first()
-        if not existing_user:
-            raise ValueError("User not found")
-
-        records_processed = 0
-        records_failed = 0
-        validation_errors = []
-
-        # Import conversations if present
-        if "conversations" in import_data:
-            for conv_data in import_data["conversations"]:
-                try:
-                    # Check if conversation already exists
-                    existing_conv = db.query(Conversation).filter(
-                        Conversation.id == conv_data["id"]
-                    ).first()
-
-                    if existing_conv:
-                        # Update existing conversation
-                        existing_conv.title = conv_data["title"]
-                        existing_conv.updated_at = datetime.now(timezone.utc)
-                    else:
-                        # Create new conversation
-                        conversation = Conversation(
-                            id=conv_data["id"],
-                            title=conv_data["title"],
-                            model=conv_data.get("model", "gpt-4"),
-                            created_by=user_id,
-                            is_public=conv_data.get("is_public", False)
-                        )
-                        db.add(conversation)
-
-                        # Add participant relationship
-                        participant = ConversationParticipant(
-                            conversation_id=conv_data["id"],
-                            user_id=user_id,
-                            permission_level="owner"
-                        )
-                        db.add(participant)
-
-                    records_processed += 1
-
-                except Exception as e:
-                    records_failed += 1
-                    validation_errors.append(f"Conversation {conv_data.get('id', 'unknown')}: {str(e)}")
-
-        # Import messages if present
-        if "messages" in import_data:
-            for msg_data in import_data["messages"]:
-                try:
-                    # Check if message already exists
-                    existing_msg = db.query(Message).filter(
-                        Message.id == msg_data["id"]
-                    ).first()
-
-                    if not existing_msg:
-                        message = Message(
-                            id=msg_data["id"],
-                            conversation_id=msg_data["conversation_id"],
-                            user_id=msg_data.get("user_id"),
-                            role=msg_data["role"],
-                            content=msg_data["content"],
-                            model=msg_data.get("model"),
-                            tokens_used=msg_data.get("tokens_used", 0)
-                        )
-                        db.add(message)
-                        records_processed += 1
-
-                except Exception as e:
-                    records_failed += 1
-                    validation_errors.append(f"Message {msg_data.get('id', 'unknown')}: {str(e)}")
-
-        # Import file uploads if present
-        if "file_uploads" in import_data:
-            for file_data in import_data["file_uploads"]:
-                try:
-                    # Check if file upload already exists
-                    existing_file = db.query(FileUpload).filter(
-                        FileUpload.id == file_data["id"]
-                    ).first()
-
-                    if not existing_file:
-                        file_upload = FileUpload(
-                            id=file_data["id"],
-                            user_id=user_id,
-                            filename=file_data["filename"],
-                            original_filename=file_data["original_filename"],
-                            file_size=file_data["file_size"],
-                            content_type=file_data.get("content_type"),
-                            uploaded_at=datetime.fromisoformat(file_data["uploaded_at"])
-                        )
-                        db.add(file_upload)
-                        records_processed += 1
-
-                except Exception as e:
-                    records_failed += 1
-                    validation_errors.append(f"File upload {file_data.get('id', 'unknown')}: {str(e)}")
-
-        operation.records_processed = records_processed
-        operation.records_failed = records_failed
-        operation.validation_errors = validation_errors
-
-        db.commit()
-
-    async def _import_conversations(self, operation: ImportOperation, db):
-        """Import conversations data"""
-        try:
-            import_data = json.loads(operation.import_data.decode('utf-8'))
-        except json.JSONDecodeError:
-            raise ValueError("Invalid JSON format in import data")
-
-        records_processed = 0
-        records_failed = 0
-        validation_errors = []
-
-        # Import conversations
-        if "conversations" in import_data:
-            for conv_data in import_data["conversations"]:
-                try:
-                    existing_conv = db.query(Conversation).filter(
-                        Conversation.id == conv_data["id"]
-                    ).first()
-
-                    if not existing_conv:
-                        conversation = Conversation(
-                            id=conv_data["id"],
-                            title=conv_data["title"],
-                            model=conv_data.get("model", "gpt-4"),
-                            created_by=conv_data.get("created_by", operation.user_id),
-                            is_public=conv_data.get("is_public", False)
-                        )
-                        db.add(conversation)
-                        records_processed += 1
-
-                except Exception as e:
-                    records_failed += 1
-                    validation_errors.append(f"Conversation {conv_data.get('id', 'unknown')}: {str(e)}")
-
-        # Import messages
-        if "messages" in import_data:
-            for msg_data in import_data["messages"]:
-                try:
-                    existing_msg = db.query(Message).filter(
-                        Message.id == msg_data["id"]
-                    ).first()
-
-                    if not existing_msg:
-                        message = Message(
-                            id=msg_data["id"],
-                            conversation_id=msg_data["conversation_id"],
-                            user_id=msg_data.get("user_id"),
-                            role=msg_data["role"],
-                            content=msg_data["content"],
-                            model=msg_data.get("model"),
-                            tokens_used=msg_data.get("tokens_used", 0)
-                        )
-                        db.add(message)
-                        records_processed += 1
-
-                except Exception as e:
-                    records_failed += 1
-                    validation_errors.append(f"Message {msg_data.get('id', 'unknown')}: {str(e)}")
-
-        operation.records_processed = records_processed
-        operation.records_failed = records_failed
-        operation.validation_errors = validation_errors
-
-        db.commit()
-
-    async def _import_bulk_admin(self, operation: ImportOperation, db):
-        """Import bulk data for administrators"""
-        # Only allow superusers
-        user = db.query(User).filter(User.id == operation.user_id).first()
-        if not user or not user.is_superuser:
-            raise ValueError("Admin access required for bulk import")
+        asyncio.create_task(self._process_import(operation_id))
+        return True
 
+    async def _process_import(self, operation_id: str):
+        """Run the bulk importer for an operation on a worker thread"""
+        self._active_imports.add(operation_id)
         try:
-            import_data = json.loads(operation.import_data.decode('utf-8'))
-        except json.JSONDecodeError:
-            raise ValueError("Invalid JSON format in import data")
-
-        records_processed = 0
-        records_failed = 0
-        validation_errors = []
-
-        # Import users if present
-        if "users" in import_data:
-            for user_data in import_data["users"]:
-                try:
-                    existing_user = db.query(User).filter(
-                        User.username == user_data["username"]
-                    ).first()
-
-                    if not existing_user:
-                        user = User(
-                            username=user_data["username"],
-                            email=user_data["email"],
-                            full_name=user_data.get("full_name"),
-                            hashed_password=user_data.get("hashed_password", "placeholder"),
-                            is_active=user_data.get("is_active", True),
-                            is_superuser=user_data.get("is_superuser", False)
-                        )
-                        db.add(user)
-                        records_processed += 1
-
-                except Exception as e:
-                    records_failed += 1
-                    validation_errors.append(f"User {user_data.get('username', 'unknown')}: {str(e)}")
-
-        operation.records_processed = records_processed
-        operation.records_failed = records_failed
-        operation.validation_errors = validation_errors
-
-        db.commit()
+            importer = BulkImporter(
+                SessionLocal, operation_id,
+                batch_size=self.import_batch_size,
+                validation_workers=self.validation_workers
+            )
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, importer.run)
+        finally:
+            self._active_imports.discard(operation_id)
 
 # Global export service instance
 export_service = DataExportService()
@@ -1,15 +1,16 @@
 """
 Database layer for Ultra Pinnacle AI Studio
 """
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Date, Boolean, ForeignKey, JSON, Float, Index, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Boolean, ForeignKey, JSON, Float, Index, UniqueConstraint
 # cspell:ignore sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from datetime import datetime, timezone
 import json
 import os
 from .logging_config import logger
+from .db_engine import create_db_engine, create_async_db_engine, create_missing_indexes
 
 # Load config
 config_path = os.path.join(os.path.dirname(__file__), '..', 'config.json')
@@ -19,18 +20,22 @@ with open(config_path, "r") as f:
 # Database configuration
 DATABASE_URL = config.get("database", {}).get("url", "sqlite:///./ultra_pinnacle.db")
 
-# Create engine
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-        echo=config.get("database", {}).get("echo", False)
-    )
-else:
-    engine = create_engine(DATABASE_URL, echo=config.get("database", {}).get("echo", False))
+# Create engine (pooled, WAL-mode SQLite or QueuePool for server databases)
+engine = create_db_engine(DATABASE_URL, config.get("database", {}))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# asyncio engine on the same database for handlers that must not block the event loop
+async_engine = create_async_db_engine(DATABASE_URL, config.get("database", {}))
+
+
+class AsyncSessionBackend(Session):
+    """Sync Session class behind AsyncSessionLocal; session event hooks attach here"""
+
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, sync_session_class=AsyncSessionBackend
+)
 Base = declarative_base()
 
 class User(Base):
@@ -121,6 +126,10 @@ class Message(Base):
     conversation = relationship("Conversation", back_populates="messages")
     user = relationship("User", foreign_keys=[user_id])
 
+    __table_args__ = (
+        Index('idx_message_conversation_created', 'conversation_id', 'created_at'),
+    )
+
 class ConversationParticipant(Base):
     """Many-to-many relationship between users and conversations with permissions"""
     __tablename__ = "conversation_participants"
@@ -137,6 +146,9 @@ class ConversationParticipant(Base):
     user = relationship("User", back_populates="conversation_participations")
 
     __table_args__ = (
+        Index('idx_participant_conversation_user', 'conversation_id', 'user_id'),
+        # Covers the conversation listing, which starts from the user
+        Index('idx_participant_user_conversation', 'user_id', 'conversation_id', 'permission_level'),
         {"sqlite_autoincrement": True},
     )
 
@@ -169,6 +181,10 @@ class ActivityLog(Base):
     conversation = relationship("Conversation", back_populates="activities")
     user = relationship("User", back_populates="activities")
 
+    __table_args__ = (
+        Index('idx_activity_conversation_created', 'conversation_id', 'created_at'),
+    )
+
 class CollaborativeDocument(Base):
     """Editable documents for collaborative editing"""
     __tablename__ = "collaborative_documents"
@@ -213,7 +229,7 @@ class Task(Base):
     id = Column(String, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     type = Column(String, nullable=False)
-    status = Column(String, default="pending")  # pending, running, completed, failed
+    status = Column(String, default="pending")  # pending, running, completed, failed, cancelled
     data = Column(JSON)
     result = Column(JSON)
     error = Column(Text)
@@ -240,6 +256,41 @@ class FileUpload(Base):
     # Relationships
     user = relationship("User", back_populates="file_uploads")
 
+class CanvasProject(Base):
+    """Drawing canvas project; layer data is kept in canvas_layers"""
+    __tablename__ = "canvas_projects"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    name = Column(String, nullable=False)
+    layer_count = Column(Integer, default=0)
+    size_bytes = Column(Integer, default=0)  # Total serialized layer size
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    # Relationships
+    user = relationship("User")
+    layers = relationship("CanvasLayer", back_populates="project", order_by="CanvasLayer.position")
+
+    # Project listing reads only this index and the metadata columns
+    __table_args__ = (
+        Index('idx_canvas_project_user_updated', 'user_id', 'updated_at'),
+    )
+
+class CanvasLayer(Base):
+    """One layer of a canvas project, stored as the JSON the client sent"""
+    __tablename__ = "canvas_layers"
+
+    project_id = Column(String, ForeignKey("canvas_projects.id"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False)  # SHA-256 of data, to skip unchanged layers
+    size_bytes = Column(Integer, nullable=False)
+    data = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    # Relationships
+    project = relationship("CanvasProject", back_populates="layers")
+
 class AuditLog(Base):
     """Audit log for security events"""
     __tablename__ = "audit_logs"
@@ -441,7 +492,10 @@ class RateLimitLog(Base):
     # Relationships
     user = relationship("User")
 
-    # Note: Indexes can be added later if needed for performance
+    __table_args__ = (
+        # Covers the windowed request and violation statistics
+        Index('idx_rate_limit_log_created', 'created_at', 'limit_exceeded', 'client_ip'),
+    )
 
 class SystemLoadMetrics(Base):
     """System load metrics for automatic rate limit adjustments"""
@@ -1166,6 +1220,7 @@ class Notification(Base):
     # Indexes
     __table_args__ = (
         Index('idx_notification_recipient', 'recipient_id', 'is_read', 'created_at'),
+        Index('idx_notification_recipient_created', 'recipient_id', 'created_at'),
         Index('idx_notification_category', 'category', 'created_at'),
         Index('idx_notification_expires', 'expires_at'),
     )
@@ -1289,10 +1344,17 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency to get an asyncio database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_database():
     """Initialize database and create tables"""
     try:
         Base.metadata.create_all(bind=engine)
+        # Indexes added to existing tables are not created by create_all
+        create_missing_indexes(engine, Base.metadata)
         logger.info("Database initialized successfully")
 
         # Create default data after tables are created
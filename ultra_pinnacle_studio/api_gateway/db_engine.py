@@ -0,0 +1,334 @@
+"""
+Database engine factory for Ultra Pinnacle AI Studio
+Builds the SQLAlchemy engines from per-backend profiles: pooled WAL-mode
+SQLite with a serialized writer, or QueuePool for server databases, plus
+an asyncio engine on the matching async driver, and keeps pool metrics
+for the monitoring endpoints
+"""
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Dict, Iterable, Iterator, List
+
+from sqlalchemy import Index, MetaData, create_engine, event, inspect
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+
+from .logging_config import logger
+
+DEFAULT_SQLITE_SETTINGS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # Durable across application crashes; WAL makes FULL unnecessary
+    'cache_size_kb': 65536,
+    'mmap_size_mb': 256,
+    'busy_timeout_ms': 5000,
+    'serialize_writes': True
+}
+
+# Keeps IN (...) lookups under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+# asyncio driver used for each backend's sync URL
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql'
+}
+
+# Statements that take SQLite's write lock
+_WRITE_STATEMENT = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.IGNORECASE)
+_HOLDS_WRITE_LOCK = 'holds_write_lock'
+
+_ENGINE_METRICS: "weakref.WeakKeyDictionary[Engine, PoolMetrics]" = weakref.WeakKeyDictionary()
+
+
+class PoolMetrics:
+    """Connection and writer-lock counters for one engine"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {
+            'connections_opened': 0,
+            'checkouts': 0,
+            'checkins': 0,
+            'invalidations': 0
+        }
+        self.writer = {
+            'acquisitions': 0,
+            'contended': 0,
+            'timeouts': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0
+        }
+
+    def count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def record_wait(self, waited: float, contended: bool, acquired: bool):
+        with self.lock:
+            if not acquired:
+                self.writer['timeouts'] += 1
+                return
+            self.writer['acquisitions'] += 1
+            if contended:
+                self.writer['contended'] += 1
+                self.writer['total_wait_seconds'] += waited
+                self.writer['max_wait_seconds'] = max(self.writer['max_wait_seconds'], waited)
+
+
+class SQLiteWriterLock:
+    """
+    Process-wide lock held from a connection's first write statement until
+    its transaction ends.
+
+    SQLite admits one writer at a time; queueing writers here instead of
+    in SQLite's busy handler keeps waits short and fair while readers keep
+    running against the WAL snapshot. A writer that cannot get the lock
+    within ``timeout`` fails the same way SQLite would ("database is locked").
+    """
+
+    def __init__(self, metrics: PoolMetrics, timeout: float):
+        self._lock = threading.Lock()
+        self.metrics = metrics
+        self.timeout = timeout
+
+    def acquire(self, info: Dict[str, Any]):
+        if info.get(_HOLDS_WRITE_LOCK):
+            return
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking=False)
+        contended = not acquired
+        if not acquired:
+            acquired = self._lock.acquire(timeout=self.timeout)
+        self.metrics.record_wait(time.perf_counter() - start, contended, acquired)
+        if not acquired:
+            raise sqlite3.OperationalError("database is locked (timed out waiting for the writer lock)")
+        info[_HOLDS_WRITE_LOCK] = True
+
+    def release(self, info: Dict[str, Any]):
+        if info.pop(_HOLDS_WRITE_LOCK, False):
+            self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+
+def _is_memory_database(url: str) -> bool:
+    return url in ('sqlite://', 'sqlite:///') or ':memory:' in url or 'mode=memory' in url
+
+
+def _install_pool_metrics(engine: Engine, metrics: PoolMetrics):
+    event.listen(engine, "connect", lambda dbapi_conn, record: metrics.count('connections_opened'))
+    event.listen(engine, "checkout", lambda dbapi_conn, record, proxy: metrics.count('checkouts'))
+    event.listen(engine, "checkin", lambda dbapi_conn, record: metrics.count('checkins'))
+    event.listen(engine, "invalidate", lambda dbapi_conn, record, exc: metrics.count('invalidations'))
+
+
+def _sqlite_pragmas(settings: Dict[str, Any]):
+    return (
+        f"PRAGMA journal_mode={settings['journal_mode']}",
+        f"PRAGMA synchronous={settings['synchronous']}",
+        f"PRAGMA cache_size=-{int(settings['cache_size_kb'])}",
+        f"PRAGMA mmap_size={int(settings['mmap_size_mb']) * 1024 * 1024}",
+        f"PRAGMA busy_timeout={int(settings['busy_timeout_ms'])}"
+    )
+
+
+def _install_pragmas(engine: Engine, pragmas):
+    @event.listens_for(engine, "connect")
+    def _configure_connection(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _create_sqlite_engine(url: str, db_config: Dict[str, Any], metrics: PoolMetrics) -> Engine:
+    settings = {**DEFAULT_SQLITE_SETTINGS, **db_config.get('sqlite', {})}
+    echo = db_config.get('echo', False)
+
+    if _is_memory_database(url):
+        # Every connection to :memory: is a separate database, so share one
+        return create_engine(url, connect_args={"check_same_thread": False},
+                             poolclass=StaticPool, echo=echo)
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": settings['busy_timeout_ms'] / 1000},
+        poolclass=QueuePool,
+        pool_size=db_config.get('pool_size', 10),
+        max_overflow=db_config.get('max_overflow', 20),
+        pool_timeout=db_config.get('pool_timeout', 30),
+        echo=echo
+    )
+    _install_pragmas(engine, _sqlite_pragmas(settings))
+
+    if settings['serialize_writes']:
+        writer = SQLiteWriterLock(metrics, settings['busy_timeout_ms'] / 1000)
+        engine.writer_lock = writer
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _take_writer_lock(conn, cursor, statement, parameters, context, executemany):
+            if _WRITE_STATEMENT.match(statement):
+                writer.acquire(conn.info)
+
+        # Transactions end in commit/rollback; checkin covers connections
+        # returned to the pool with work still open
+        event.listen(engine, "commit", lambda conn: writer.release(conn.info))
+        event.listen(engine, "rollback", lambda conn: writer.release(conn.info))
+        event.listen(engine, "checkin", lambda dbapi_conn, record: writer.release(record.info))
+
+    return engine
+
+
+def _create_server_engine(url: str, db_config: Dict[str, Any]) -> Engine:
+    return create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=db_config.get('pool_size', 10),
+        max_overflow=db_config.get('max_overflow', 20),
+        pool_timeout=db_config.get('pool_timeout', 30),
+        pool_recycle=db_config.get('pool_recycle', 1800),
+        pool_pre_ping=db_config.get('pool_pre_ping', True),
+        echo=db_config.get('echo', False)
+    )
+
+
+def create_db_engine(url: str, db_config: Dict[str, Any]) -> Engine:
+    """Engine for ``url`` configured from the ``database`` config section"""
+    metrics = PoolMetrics()
+    if url.startswith("sqlite"):
+        engine = _create_sqlite_engine(url, db_config, metrics)
+    else:
+        engine = _create_server_engine(url, db_config)
+
+    _install_pool_metrics(engine, metrics)
+    _ENGINE_METRICS[engine] = metrics
+    logger.info(f"Database engine ready ({engine.dialect.name}, {type(engine.pool).__name__})")
+    return engine
+
+
+def async_database_url(url: str) -> URL:
+    """``url`` with its driver switched to the backend's asyncio driver"""
+    parsed = make_url(url)
+    if parsed.drivername in ASYNC_DRIVERS.values():
+        return parsed
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No asyncio driver configured for {parsed.get_backend_name()}")
+    return parsed.set(drivername=driver)
+
+
+def create_async_db_engine(url: str, db_config: Dict[str, Any]) -> AsyncEngine:
+    """
+    asyncio engine for ``url`` with the same pool and SQLite profile as
+    :func:`create_db_engine`.
+
+    SQLite writers are not queued on a :class:`SQLiteWriterLock` here:
+    waiting on a thread lock would stall the event loop. They rely on
+    ``busy_timeout`` instead, which blocks in the driver's worker thread.
+    """
+    async_url = async_database_url(url)
+    echo = db_config.get('echo', False)
+    pool_args = {
+        'poolclass': AsyncAdaptedQueuePool,
+        'pool_size': db_config.get('pool_size', 10),
+        'max_overflow': db_config.get('max_overflow', 20),
+        'pool_timeout': db_config.get('pool_timeout', 30)
+    }
+
+    if async_url.get_backend_name() == 'sqlite':
+        settings = {**DEFAULT_SQLITE_SETTINGS, **db_config.get('sqlite', {})}
+        if _is_memory_database(url):
+            engine = create_async_engine(async_url, poolclass=StaticPool, echo=echo)
+        else:
+            engine = create_async_engine(async_url, connect_args={"timeout": settings['busy_timeout_ms'] / 1000},
+                                         echo=echo, **pool_args)
+            _install_pragmas(engine.sync_engine, _sqlite_pragmas(settings))
+    else:
+        engine = create_async_engine(
+            async_url,
+            pool_recycle=db_config.get('pool_recycle', 1800),
+            pool_pre_ping=db_config.get('pool_pre_ping', True),
+            echo=echo,
+            **pool_args
+        )
+
+    metrics = PoolMetrics()
+    _install_pool_metrics(engine.sync_engine, metrics)
+    _ENGINE_METRICS[engine.sync_engine] = metrics
+    logger.info(f"Async database engine ready ({engine.dialect.name}+{engine.dialect.driver}, "
+                f"{type(engine.pool).__name__})")
+    return engine
+
+
+def find_missing_indexes(engine: Engine, metadata: MetaData) -> List[Index]:
+    """Indexes declared on ``metadata`` for existing tables but absent from the database"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing.extend(sorted((index for index in table.indexes if index.name not in present),
+                              key=lambda index: index.name))
+    return missing
+
+
+def create_missing_indexes(engine: Engine, metadata: MetaData) -> List[str]:
+    """
+    Create indexes declared on ``metadata`` that an existing database lacks.
+
+    ``create_all`` only builds indexes together with their table, so
+    indexes added to models later never reach databases created before.
+    Returns the names of the indexes created.
+    """
+    created = []
+    for index in find_missing_indexes(engine, metadata):
+        index.create(bind=engine)
+        created.append(index.name)
+    if created:
+        logger.info(f"Created {len(created)} missing indexes: {', '.join(created)}")
+    return created
+
+
+def chunked(items: Iterable[Any], size: int = LOOKUP_CHUNK_SIZE) -> Iterator[List[Any]]:
+    """Split ``items`` into lists of at most ``size``, e.g. for the values of an IN (...) clause"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def get_pool_stats(engine: Engine) -> Dict[str, Any]:
+    """Pool occupancy and lifetime counters for an engine (or an AsyncEngine)"""
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+    pool = engine.pool
+    stats: Dict[str, Any] = {
+        'backend': engine.dialect.name,
+        'driver': engine.dialect.driver,
+        'pool_class': type(pool).__name__
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'pool_size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow()
+        })
+
+    metrics = _ENGINE_METRICS.get(engine)
+    if metrics is not None:
+        with metrics.lock:
+            stats.update(metrics.counters)
+            writer = getattr(engine, 'writer_lock', None)
+            if writer is not None:
+                stats['writer_lock'] = {**metrics.writer, 'held': writer.locked()}
+    return stats
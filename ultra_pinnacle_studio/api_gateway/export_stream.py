@@ -0,0 +1,312 @@
+"""
+Streaming export engine for Ultra Pinnacle AI Studio
+Pages tables with keyset pagination and writes each page straight to a
+compressed export file, hashing the bytes on their way to disk
+"""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import tempfile
+import zipfile
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, JSON, select
+
+# Columnar (Parquet) output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# File suffix written for each streaming format
+STREAM_FORMATS = {
+    'json': '.json.gz',
+    'jsonl': '.jsonl.gz',
+    'csv': '.zip',
+    'parquet': '.zip'
+}
+
+
+class ExportSection(NamedTuple):
+    """One table (or query) written as a named section of an export"""
+    name: str
+    columns: Sequence[Any]
+    key: Any  # Unique, selected column used for keyset pagination
+    criteria: Sequence[Any] = ()
+    descending: bool = False
+    count_key: Optional[str] = None  # Metadata field recording the rows written
+
+
+def iter_keyset(db, columns: Sequence, key, *criteria, page_size: int = 1000,
+                descending: bool = False) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield pages of row mappings ordered by ``key``.
+
+    Each page is fetched with ``key > last_seen`` (``<`` when descending)
+    rather than OFFSET, so late pages cost the same as early ones and only
+    one page is ever held in memory. ``key`` must be unique and selected.
+    """
+    last = None
+    while True:
+        stmt = select(*columns).where(*criteria)
+        if last is not None:
+            stmt = stmt.where(key < last if descending else key > last)
+        stmt = stmt.order_by(key.desc() if descending else key).limit(page_size)
+
+        rows = [dict(row) for row in db.execute(stmt).mappings()]
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1][key.key]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class HashingFile:
+    """Binary file wrapper that tracks SHA-256 and size of everything written"""
+
+    def __init__(self, path: Path):
+        self._file = open(path, 'wb')
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def tell(self) -> int:
+        return self.size
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def checksum(self) -> str:
+        return self._sha256.hexdigest()
+
+
+class ExportWriter(ABC):
+    """
+    Incremental writer for one export file.
+
+    Sections are written one after another: ``begin_section`` with the
+    section's columns, any number of ``write_rows`` calls, then
+    ``end_section``. ``close`` appends the export metadata and finalises the
+    file; ``size`` and ``checksum`` are then those of the bytes on disk.
+    """
+
+    def __init__(self, path: Path, compress_level: int = 6):
+        self.path = Path(path)
+        self.compress_level = compress_level
+        self._out = HashingFile(self.path)
+
+    @property
+    def size(self) -> int:
+        return self._out.size
+
+    @property
+    def checksum(self) -> str:
+        return self._out.checksum
+
+    @abstractmethod
+    def begin_section(self, name: str, columns: List[Tuple[str, Any]]):
+        """Start a section with ``(name, sql_type)`` columns"""
+
+    @abstractmethod
+    def write_rows(self, rows: List[Dict[str, Any]]):
+        """Append one page of rows to the current section"""
+
+    def end_section(self):
+        pass
+
+    def close(self, metadata: Dict[str, Any]):
+        self._out.close()
+
+    def abort(self):
+        """Close without finishing the file and remove it"""
+        try:
+            self._out.close()
+        finally:
+            self.path.unlink(missing_ok=True)
+
+
+class _GzipTextWriter(ExportWriter):
+    def __init__(self, path: Path, compress_level: int = 6):
+        super().__init__(path, compress_level)
+        self._gzip = gzip.GzipFile(fileobj=self._out, mode='wb', compresslevel=compress_level)
+        self._text = io.TextIOWrapper(self._gzip, encoding='utf-8')
+
+    def close(self, metadata: Dict[str, Any]):
+        self._text.close()  # Also finishes the gzip member
+        super().close(metadata)
+
+
+class JsonExportWriter(_GzipTextWriter):
+    """Gzipped JSON document of the same shape as the in-memory exports"""
+
+    def __init__(self, path: Path, compress_level: int = 6):
+        super().__init__(path, compress_level)
+        self._text.write('{')
+        self._sections = 0
+        self._rows = 0
+
+    def begin_section(self, name: str, columns: List[Tuple[str, Any]]):
+        self._text.write(',\n' if self._sections else '\n')
+        self._text.write(f'  {json.dumps(name)}: [')
+        self._sections += 1
+        self._rows = 0
+
+    def write_rows(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            self._text.write(',\n    ' if self._rows else '\n    ')
+            self._text.write(json.dumps(row, default=_json_default, ensure_ascii=False))
+            self._rows += 1
+
+    def end_section(self):
+        self._text.write('\n  ]' if self._rows else ']')
+
+    def close(self, metadata: Dict[str, Any]):
+        self._text.write(',\n' if self._sections else '\n')
+        self._text.write(f'  "export_metadata": {json.dumps(metadata, default=_json_default)}\n}}\n')
+        super().close(metadata)
+
+
+class JsonLinesExportWriter(_GzipTextWriter):
+    """Gzipped JSON Lines, one ``{"section": ..., "data": ...}`` object per record"""
+
+    def begin_section(self, name: str, columns: List[Tuple[str, Any]]):
+        self._section = name
+
+    def write_rows(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            self._text.write(json.dumps({'section': self._section, 'data': row},
+                                        default=_json_default, ensure_ascii=False))
+            self._text.write('\n')
+
+    def close(self, metadata: Dict[str, Any]):
+        self._text.write(json.dumps({'section': 'export_metadata', 'data': metadata}, default=_json_default))
+        self._text.write('\n')
+        super().close(metadata)
+
+
+class _ZipExportWriter(ExportWriter):
+    def __init__(self, path: Path, compress_level: int = 6):
+        super().__init__(path, compress_level)
+        # The hashing wrapper cannot seek, so entries are written with data descriptors
+        self._zip = zipfile.ZipFile(self._out, 'w', zipfile.ZIP_DEFLATED, compresslevel=compress_level)
+
+    def close(self, metadata: Dict[str, Any]):
+        self._zip.writestr('metadata.json', json.dumps(metadata, indent=2, default=_json_default))
+        self._zip.close()
+        super().close(metadata)
+
+
+class CsvExportWriter(_ZipExportWriter):
+    """Zip archive with one CSV file per section"""
+
+    def begin_section(self, name: str, columns: List[Tuple[str, Any]]):
+        self._entry = io.TextIOWrapper(
+            self._zip.open(f"{name}.csv", 'w', force_zip64=True), encoding='utf-8', newline=''
+        )
+        self._writer = csv.DictWriter(self._entry, fieldnames=[column for column, _ in columns])
+        self._writer.writeheader()
+
+    def write_rows(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows({k: self._value(v) for k, v in row.items()} for row in rows)
+
+    def end_section(self):
+        self._entry.close()
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, (list, dict)):
+            return json.dumps(value, default=_json_default)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+
+def _arrow_type(sql_type):
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp('us')
+    return pa.string()
+
+
+class ParquetExportWriter(_ZipExportWriter):
+    """
+    Zip archive with one Parquet file per section, one row group per page.
+
+    Parquet needs a seekable target, so each section is written to a temp
+    file and then stored (already compressed) in the archive.
+    """
+
+    def __init__(self, path: Path, compress_level: int = 6):
+        if not PARQUET_AVAILABLE:
+            raise ValueError("Parquet generation not available. Install pyarrow.")
+        super().__init__(path, compress_level)
+
+    def begin_section(self, name: str, columns: List[Tuple[str, Any]]):
+        self._section = name
+        self._json_columns = [column for column, sql_type in columns if isinstance(sql_type, JSON)]
+        self._schema = pa.schema([(column, _arrow_type(sql_type)) for column, sql_type in columns])
+        self._temp = tempfile.NamedTemporaryFile(suffix='.parquet', dir=self.path.parent, delete=False)
+        self._temp.close()
+        self._parquet = pq.ParquetWriter(self._temp.name, self._schema, compression='zstd')
+
+    def write_rows(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            for column in self._json_columns:
+                if row.get(column) is not None:
+                    row[column] = json.dumps(row[column], default=_json_default)
+        self._parquet.write_table(pa.Table.from_pylist(rows, schema=self._schema))
+
+    def end_section(self):
+        self._parquet.close()
+        try:
+            self._zip.write(self._temp.name, f"{self._section}.parquet", compress_type=zipfile.ZIP_STORED)
+        finally:
+            Path(self._temp.name).unlink(missing_ok=True)
+
+    def abort(self):
+        if getattr(self, '_temp', None) is not None:
+            Path(self._temp.name).unlink(missing_ok=True)
+        super().abort()
+
+
+EXPORT_WRITERS = {
+    'json': JsonExportWriter,
+    'jsonl': JsonLinesExportWriter,
+    'csv': CsvExportWriter,
+    'parquet': ParquetExportWriter
+}
+
+
+def open_export_writer(format: str, path: Path, compress_level: int = 6) -> ExportWriter:
+    """Writer for ``format``; raises ValueError for formats that cannot be streamed"""
+    writer_class = EXPORT_WRITERS.get(format)
+    if writer_class is None:
+        raise ValueError(f"Unsupported streaming export format: {format}")
+    return writer_class(path, compress_level)
@@ -0,0 +1,290 @@
+"""
+Git history service for Ultra Pinnacle AI Studio
+Reads commit history with a fixed number of git processes per request and
+caches parsed commits by object id. A page of commits costs one ``git log``
+listing ids and ref names, plus one ``git log --numstat`` pass over the
+commits not seen before; branches come from a single ``for-each-ref``.
+All git calls run on a thread pool so they never block the event loop.
+"""
+import asyncio
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .logging_config import logger
+
+# Field and record separators for --format output; neither can appear in
+# names, emails, dates or commit subjects
+FIELD_SEP = '\x1f'
+RECORD_SEP = '\x1e'
+
+COMMIT_FORMAT = RECORD_SEP + FIELD_SEP.join(['%H', '%P', '%an', '%ae', '%ci', '%s'])
+LISTING_FORMAT = FIELD_SEP.join(['%H', '%D'])
+BRANCH_FORMAT = '%1f'.join(['%(HEAD)', '%(refname:short)', '%(objectname)', '%(committerdate:iso)'])
+
+# stderr fragments git uses when a revision does not exist
+_UNKNOWN_REVISION = ('unknown revision', 'bad revision', 'bad object', 'ambiguous argument')
+
+
+class GitError(RuntimeError):
+    """A git command exited with a non-zero status"""
+
+    def __init__(self, command: Sequence[str], returncode: int, stderr: str):
+        self.command = list(command)
+        self.returncode = returncode
+        self.stderr = stderr.strip()
+        super().__init__(f"git {' '.join(self.command)} failed ({returncode}): {self.stderr}")
+
+    @property
+    def unknown_revision(self) -> bool:
+        return any(fragment in self.stderr for fragment in _UNKNOWN_REVISION)
+
+
+@dataclass(frozen=True)
+class CommitRecord:
+    """The immutable part of a commit: everything except the refs pointing at it"""
+    hash: str
+    parents: Tuple[str, ...]
+    author: str
+    author_email: str
+    date: str
+    message: str
+    files_changed: int
+    insertions: int
+    deletions: int
+
+
+def parse_refs(refs: str) -> Tuple[Optional[str], List[str]]:
+    """Branch name and tags from a ``%D`` ref list"""
+    branch = None
+    tags = []
+    for ref in (ref.strip() for ref in refs.split(',')):
+        if not ref:
+            continue
+        if ref.startswith('tag: '):
+            tags.append(ref[5:])
+        elif ref.startswith('HEAD -> '):
+            branch = ref[8:]
+        elif ref != 'HEAD' and not ref.startswith('origin/'):
+            branch = ref
+    return branch, tags
+
+
+def parse_commit_log(lines: Iterator[str]) -> Iterator[CommitRecord]:
+    """Parse ``git log --format=COMMIT_FORMAT --numstat`` output into records"""
+    header = None
+    files = insertions = deletions = 0
+    for line in lines:
+        line = line.rstrip('\n')
+        if line.startswith(RECORD_SEP):
+            if header:
+                yield CommitRecord(*header, files, insertions, deletions)
+            commit_hash, parents, author, email, date, message = line[1:].split(FIELD_SEP, 5)
+            header = (commit_hash, tuple(parents.split()), author, email, date, message)
+            files = insertions = deletions = 0
+        elif line and header:
+            added, deleted, _ = line.split('\t', 2)
+            files += 1
+            # Binary files report '-' for both counts
+            insertions += int(added) if added.isdigit() else 0
+            deletions += int(deleted) if deleted.isdigit() else 0
+    if header:
+        yield CommitRecord(*header, files, insertions, deletions)
+
+
+class GitHistory:
+    """Cached, non-blocking access to a repository's commit history"""
+
+    def __init__(self, repo_path: Optional[str] = None, settings: Optional[Dict[str, Any]] = None):
+        settings = settings or {}
+        self.repo_path = str(repo_path or settings.get('repo_path') or Path(__file__).parent.parent)
+        self.cache_size = settings.get('commit_cache_size', 50000)
+        self.executor = ThreadPoolExecutor(max_workers=settings.get('workers', 2),
+                                           thread_name_prefix='git-history')
+        self._commits: 'OrderedDict[str, CommitRecord]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Process helpers
+
+    def _stream(self, args: Sequence[str]) -> Iterator[str]:
+        """Yield stdout lines of a git command as they are produced"""
+        process = subprocess.Popen(
+            ['git', *args], cwd=self.repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding='utf-8', errors='replace'
+        )
+        exhausted = False
+        try:
+            yield from process.stdout
+            exhausted = True
+        finally:
+            if not exhausted:
+                # Consumer stopped early; don't wait for the rest of the history
+                process.kill()
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            returncode = process.wait()
+        if returncode != 0:
+            raise GitError(args, returncode, stderr)
+
+    def run(self, args: Sequence[str]) -> str:
+        """Run a git command and return its stripped output"""
+        result = subprocess.run(['git', *args], cwd=self.repo_path, capture_output=True,
+                                text=True, encoding='utf-8', errors='replace')
+        if result.returncode != 0:
+            raise GitError(args, result.returncode, result.stderr)
+        return result.stdout.strip()
+
+    async def _offload(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    # Commit cache
+
+    def _cached(self, commit_hash: str) -> Optional[CommitRecord]:
+        with self._lock:
+            record = self._commits.get(commit_hash)
+            if record is not None:
+                self._commits.move_to_end(commit_hash)
+            return record
+
+    def _store(self, record: CommitRecord):
+        with self._lock:
+            self._commits[record.hash] = record
+            self._commits.move_to_end(record.hash)
+            while len(self._commits) > self.cache_size:
+                self._commits.popitem(last=False)
+
+    def _load_commits(self, hashes: Sequence[str]) -> Dict[str, CommitRecord]:
+        """Records for ``hashes``, parsing the uncached ones in one numstat pass"""
+        records = {}
+        missing = []
+        for commit_hash in hashes:
+            record = self._cached(commit_hash)
+            if record is None:
+                missing.append(commit_hash)
+            else:
+                records[commit_hash] = record
+        self.hits += len(records)
+        self.misses += len(missing)
+
+        if missing:
+            # Merges get their stat against the first parent, as `git show --stat` reports it
+            for record in parse_commit_log(self._stream([
+                'log', '--no-walk=unsorted', '--numstat', '--diff-merges=first-parent',
+                f'--format={COMMIT_FORMAT}', *missing
+            ])):
+                self._store(record)
+                records[record.hash] = record
+        return records
+
+    # Queries
+
+    def _list_commits(self, revisions: Sequence[str], author: Optional[str] = None,
+                      since: Optional[str] = None, until: Optional[str] = None,
+                      limit: int = 50, skip: int = 0) -> List[Dict[str, Any]]:
+        command = ['log', f'--format={LISTING_FORMAT}', f'--max-count={limit}', f'--skip={skip}']
+        if author:
+            command.extend(['--author', author])
+        if since:
+            command.extend(['--since', since])
+        if until:
+            command.extend(['--until', until])
+        command.extend(revisions)
+
+        listing = []
+        for line in self._stream(command):
+            commit_hash, _, refs = line.rstrip('\n').partition(FIELD_SEP)
+            if commit_hash:
+                listing.append((commit_hash, refs))
+
+        records = self._load_commits([commit_hash for commit_hash, _ in listing])
+        commits = []
+        for commit_hash, refs in listing:
+            record = records[commit_hash]
+            branch, tags = parse_refs(refs)
+            commits.append({
+                'hash': record.hash,
+                'message': record.message,
+                'author': record.author,
+                'author_email': record.author_email,
+                'date': record.date,
+                'branch': branch,
+                'tags': tags,
+                'parents': list(record.parents),
+                'files_changed': record.files_changed,
+                'insertions': record.insertions,
+                'deletions': record.deletions
+            })
+        return commits
+
+    def _get_commit(self, revision: str) -> Optional[Dict[str, Any]]:
+        try:
+            commits = self._list_commits(['--end-of-options', revision], limit=1)
+        except GitError as e:
+            if e.unknown_revision:
+                return None
+            raise
+        return commits[0] if commits else None
+
+    def _list_branches(self) -> List[Dict[str, Any]]:
+        branches = []
+        for line in self._stream(['for-each-ref', f'--format={BRANCH_FORMAT}', 'refs/heads']):
+            head, name, object_id, date = line.rstrip('\n').split(FIELD_SEP)
+            branches.append({
+                'name': name,
+                'is_current': head == '*',
+                'is_remote': False,
+                'last_commit': object_id,
+                'last_commit_date': date
+            })
+        return branches
+
+    def _list_authors(self) -> List[str]:
+        authors = {line.rstrip('\n') for line in self._stream(['log', '--format=%an', '--all'])}
+        authors.discard('')
+        return sorted(authors)
+
+    async def get_commits(self, branch: Optional[str] = None, author: Optional[str] = None,
+                          since: Optional[str] = None, until: Optional[str] = None,
+                          limit: int = 50, skip: int = 0) -> List[Dict[str, Any]]:
+        """A page of commits, newest first, on ``branch`` or across all refs"""
+        revisions = ['--end-of-options', branch] if branch else ['--all']
+        return await self._offload(self._list_commits, revisions, author, since, until, limit, skip)
+
+    async def get_commit(self, revision: str) -> Optional[Dict[str, Any]]:
+        """One commit by (abbreviated) hash or ref name, or None if it does not exist"""
+        return await self._offload(self._get_commit, revision)
+
+    async def get_branches(self) -> List[Dict[str, Any]]:
+        """Local branches with their tip commit and date"""
+        return await self._offload(self._list_branches)
+
+    async def get_authors(self) -> List[str]:
+        """Sorted names of everyone who authored a commit on any ref"""
+        return await self._offload(self._list_authors)
+
+    async def run_command(self, args: Sequence[str]) -> str:
+        """Run an arbitrary git command off the event loop"""
+        return await self._offload(self.run, args)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = len(self._commits)
+        return {
+            'cached_commits': cached,
+            'cache_size': self.cache_size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        logger.info("Git history service shut down")
@@ -0,0 +1,287 @@
+"""
+Inference scheduler for Ultra Pinnacle AI Studio
+Per-model request queues whose requests are grouped and run on a dedicated executor
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Callable, Optional, Iterator, AsyncIterator
+
+from .logging_config import logger
+
+
+@dataclass
+class InferenceRequest:
+    """A single queued generation request"""
+    model_name: str
+    prompt: str
+    params: Dict[str, Any]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class InferenceScheduler:
+    """
+    Batching request scheduler for text generation.
+
+    Requests are queued per model. A batcher task per model slot takes the
+    first waiting request, then keeps collecting until either
+    ``max_batch_size`` requests are grouped or ``max_wait_ms`` has elapsed,
+    and hands the whole batch to ``batch_fn`` on a dedicated thread pool.
+    Each caller awaits its own future, so the event loop is never blocked
+    by model inference. Whether a batch is decoded together is up to
+    ``batch_fn``; the scheduler only groups requests and offloads them.
+
+    ``batch_fn(model_name, requests)`` receives a list of ``(prompt, params)``
+    tuples and must return one result per request, in order. A result that
+    is an ``Exception`` instance fails only that request's future.
+
+    Streaming generations share the same executor and per-model slots, so a
+    stream and a batch never drive one model concurrently beyond its limit.
+    """
+
+    def __init__(self, batch_fn: Callable[[str, List[tuple]], List[Any]], config: Dict[str, Any] = None):
+        settings = (config or {}).get("inference", {})
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(settings.get("max_batch_size", 8)))
+        self.max_wait_ms = max(0.0, float(settings.get("max_wait_ms", 10)))
+        self.max_queue_size = int(settings.get("max_queue_size", 1000))
+        self.executor_workers = max(1, int(settings.get("executor_workers", 4)))
+        self.model_concurrency = settings.get("model_concurrency", {})
+        self.default_concurrency = max(1, int(settings.get("default_concurrency", 1)))
+
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.batchers: Dict[str, List[asyncio.Task]] = {}
+        self.slots: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "batches": 0,
+            "batched_requests": 0,
+            "max_batch_seen": 0,
+            "total_queue_wait_ms": 0.0,
+            "total_batch_time_ms": 0.0,
+            "streams": 0,
+            "streamed_tokens": 0
+        }
+
+    def _concurrency_for(self, model_name: str) -> int:
+        """Number of batches a model may run at once (llama contexts are not re-entrant)"""
+        return max(1, int(self.model_concurrency.get(model_name, self.default_concurrency)))
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the executor and reset per-loop state when the running loop changes"""
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.executor_workers,
+                                               thread_name_prefix="inference")
+        if self._loop is not loop:
+            # A new event loop (e.g. a fresh test client) invalidates old queues
+            self._loop = loop
+            self.queues.clear()
+            self.batchers.clear()
+            self.slots.clear()
+        return loop
+
+    def _slot(self, model_name: str) -> asyncio.Semaphore:
+        """Per-model concurrency slot shared by batches and streams"""
+        slot = self.slots.get(model_name)
+        if slot is None:
+            slot = asyncio.Semaphore(self._concurrency_for(model_name))
+            self.slots[model_name] = slot
+        return slot
+
+    def _ensure_model_queue(self, model_name: str) -> asyncio.Queue:
+        """Create the queue and batcher tasks for a model on first use"""
+        loop = self._bind_loop()
+        queue = self.queues.get(model_name)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self.queues[model_name] = queue
+            self.batchers[model_name] = [
+                loop.create_task(self._batch_loop(model_name, queue))
+                for _ in range(self._concurrency_for(model_name))
+            ]
+            logger.debug(f"Started {len(self.batchers[model_name])} inference batcher(s) for {model_name}")
+        return queue
+
+    async def submit(self, model_name: str, prompt: str, **params) -> Any:
+        """Queue a generation request and wait for its result"""
+        queue = self._ensure_model_queue(model_name)
+        future = asyncio.get_running_loop().create_future()
+        request = InferenceRequest(model_name=model_name, prompt=prompt, params=params, future=future)
+
+        try:
+            queue.put_nowait(request)
+        except asyncio.QueueFull:
+            raise RuntimeError(f"Inference queue for model {model_name} is full")
+
+        self.stats["submitted"] += 1
+        return await future
+
+    async def _collect_batch(self, queue: asyncio.Queue, batch: List[InferenceRequest]):
+        """
+        Wait for one request, then gather more into ``batch`` until it is full
+        or the wait expires. Requests are appended as they are taken, so a
+        cancelled collection leaves them in ``batch`` for the caller to fail.
+        """
+        batch.append(await queue.get())
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _batch_loop(self, model_name: str, queue: asyncio.Queue):
+        """Batcher task: collect requests and run them on the executor"""
+        batch: List[InferenceRequest] = []
+        try:
+            while True:
+                await self._collect_batch(queue, batch)
+                async with self._slot(model_name):
+                    await self._run_batch(model_name, batch)
+                batch = []
+        except asyncio.CancelledError:
+            # Requests being collected or waiting on the executor would otherwise never resolve
+            self._fail_requests(batch)
+            raise
+
+    @staticmethod
+    def _fail_requests(requests: List[InferenceRequest]):
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("Inference scheduler is shut down"))
+
+    async def _run_batch(self, model_name: str, batch: List[InferenceRequest]):
+        """Execute one collected batch and resolve its futures"""
+        loop = asyncio.get_running_loop()
+
+        # Callers that went away (client disconnect, timeout) are dropped before inference
+        live = [r for r in batch if not r.future.done()]
+        self.stats["cancelled"] += len(batch) - len(live)
+        if not live:
+            return
+
+        started = time.monotonic()
+        for request in live:
+            self.stats["total_queue_wait_ms"] += (started - request.enqueued_at) * 1000
+
+        try:
+            results = await loop.run_in_executor(
+                self.executor,
+                self.batch_fn,
+                model_name,
+                [(r.prompt, r.params) for r in live]
+            )
+            if len(results) != len(live):
+                raise RuntimeError(f"Batch returned {len(results)} results for {len(live)} requests")
+        except Exception as e:
+            logger.error(f"Inference batch for {model_name} failed: {e}")
+            results = [e] * len(live)
+
+        self.stats["batches"] += 1
+        self.stats["batched_requests"] += len(live)
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(live))
+        self.stats["total_batch_time_ms"] += (time.monotonic() - started) * 1000
+
+        for request, result in zip(live, results):
+            if request.future.done():
+                self.stats["cancelled"] += 1
+            elif isinstance(result, Exception):
+                self.stats["failed"] += 1
+                request.future.set_exception(result)
+            else:
+                self.stats["completed"] += 1
+                request.future.set_result(result)
+
+    async def stream(self, model_name: str, token_fn: Callable[[], Iterator[str]]) -> AsyncIterator[str]:
+        """Run a blocking token iterator on the executor and yield tokens as they arrive.
+
+        The model's slot is held for the whole stream. If the consumer stops
+        early (client disconnect), the producer thread is told to stop at
+        the next token.
+        """
+        loop = self._bind_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for token in token_fn():
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(tokens.put_nowait, token)
+            except Exception as e:
+                loop.call_soon_threadsafe(tokens.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, done)
+
+        async with self._slot(model_name):
+            self.stats["streams"] += 1
+            producer = loop.run_in_executor(self.executor, produce)
+            try:
+                while True:
+                    item = await tokens.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    self.stats["streamed_tokens"] += 1
+                    yield item
+            finally:
+                stop.set()
+                await asyncio.shield(producer)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scheduler statistics"""
+        batches = self.stats["batches"]
+        batched = self.stats["batched_requests"]
+        return {
+            **self.stats,
+            "avg_batch_size": round(batched / batches, 2) if batches else 0,
+            "avg_queue_wait_ms": round(self.stats["total_queue_wait_ms"] / batched, 2) if batched else 0,
+            "avg_batch_time_ms": round(self.stats["total_batch_time_ms"] / batches, 2) if batches else 0,
+            "queue_depths": {name: q.qsize() for name, q in self.queues.items()},
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "executor_workers": self.executor_workers
+        }
+
+    async def shutdown(self):
+        """Stop batchers, fail pending requests and release the executor"""
+        tasks = [t for tasks in self.batchers.values() for t in tasks]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        for queue in self.queues.values():
+            while not queue.empty():
+                self._fail_requests([queue.get_nowait()])
+
+        self.queues.clear()
+        self.batchers.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        logger.info("Inference scheduler shutdown completed")
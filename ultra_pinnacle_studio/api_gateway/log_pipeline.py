@@ -0,0 +1,261 @@
+"""
+Log pipeline for Ultra Pinnacle AI Studio
+Bounded in-process queues drained in batches by background flusher threads
+"""
+
+import atexit
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("ultra_pinnacle")
+
+BACKPRESSURE_POLICIES = ("drop", "sample", "block")
+
+# Queued by close() to interrupt a flusher waiting for more items
+_WAKE = object()
+
+_registry: List["BatchingQueue"] = []
+_registry_lock = threading.Lock()
+
+
+class BatchingQueue:
+    """
+    Bounded queue whose items are written by a background thread in batches.
+
+    Producers call ``put`` and return immediately; the flusher thread hands
+    up to ``batch_size`` items at a time to ``flush_fn``, at least every
+    ``flush_interval`` seconds. When the queue is under pressure the
+    ``policy`` decides what producers do:
+
+    * ``drop``: discard the new item once the queue is full
+    * ``sample``: above half full, keep only ``sample_rate`` of new items;
+      discard once full
+    * ``block``: wait up to ``block_timeout`` seconds for room, then discard
+
+    ``close`` (also run at interpreter exit) drains everything still queued.
+    """
+
+    def __init__(self, name: str, flush_fn: Callable[[List[Any]], None], max_size: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 1.0, policy: str = "drop",
+                 sample_rate: float = 0.1, block_timeout: float = 0.05):
+        if policy not in BACKPRESSURE_POLICIES:
+            logger.warning(f"Unknown backpressure policy {policy!r} for {name}, using drop")
+            policy = "drop"
+        self.name = name
+        self.flush_fn = flush_fn
+        self.max_size = max(1, int(max_size))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.policy = policy
+        self.sample_rate = float(sample_rate)
+        self.block_timeout = float(block_timeout)
+
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.max_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._local = threading.local()
+        self.closed = False
+
+        self.stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "sampled_out": 0,
+            "flushed": 0,
+            "batches": 0,
+            "flush_errors": 0
+        }
+
+        with _registry_lock:
+            _registry.append(self)
+
+    def _ensure_started(self):
+        """Start the flusher thread on first use"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+                self._thread.start()
+
+    def put(self, item: Any) -> bool:
+        """Queue an item; returns False if backpressure discarded it"""
+        if self.closed:
+            # Late writes after shutdown go straight through
+            self._flush([item])
+            return True
+
+        self._ensure_started()
+        if self.policy == "sample" and self.queue.qsize() >= self.max_size // 2:
+            if random.random() >= self.sample_rate:
+                self.stats["sampled_out"] += 1
+                return False
+
+        try:
+            if self.policy == "block":
+                self.queue.put(item, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(item)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+        self.stats["enqueued"] += 1
+        return True
+
+    def _take_batch(self) -> List[Any]:
+        """Wait for one item, then collect until the batch is full or the interval passes"""
+        try:
+            item = self.queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        if item is _WAKE:
+            return []
+
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _WAKE:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[Any]):
+        if getattr(self._local, "flushing", False):
+            # Written from inside flush_fn (e.g. the error log below reaching
+            # this queue after close); taking the lock again would deadlock
+            self.stats["dropped"] += len(batch)
+            return
+
+        with self._flush_lock:
+            self._local.flushing = True
+            try:
+                self.flush_fn(batch)
+                self.stats["flushed"] += len(batch)
+                self.stats["batches"] += 1
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                logger.error(f"{self.name} flush of {len(batch)} items failed: {e}")
+            finally:
+                self._local.flushing = False
+
+    def drain(self):
+        """Synchronously write everything currently queued"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _WAKE:
+                    batch.append(item)
+            if not batch:
+                return
+            self._flush(batch)
+
+    def close(self, timeout: float = 5.0):
+        """Stop the flusher and write out anything still queued"""
+        if self.closed:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            # Wake the flusher if it is waiting to fill a batch
+            try:
+                self.queue.put_nowait(_WAKE)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+        self.closed = True
+        self.drain()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "queued": self.queue.qsize(),
+            "max_size": self.max_size,
+            "policy": self.policy
+        }
+
+
+class QueueingHandler(logging.Handler):
+    """Logging handler that defers the wrapped handlers to a BatchingQueue"""
+
+    def __init__(self, handlers: List[logging.Handler], name: str = "log-records", **queue_options):
+        super().__init__(level=min((h.level for h in handlers), default=logging.NOTSET))
+        self.handlers = handlers
+        self.queue = BatchingQueue(name, self._write, **queue_options)
+
+    def _write(self, records: List[logging.LogRecord]):
+        for record in records:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except (OSError, ValueError):
+                # Stream already closed, as logging.shutdown tolerates
+                pass
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            # Merge args now; they may be mutated after this call returns
+            record.msg = record.getMessage()
+            record.args = None
+            self.queue.put(record)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.queue.drain()
+
+    def close(self):
+        self.queue.close()
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+
+def get_pipeline_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every batching queue in the process"""
+    with _registry_lock:
+        return {q.name: q.get_stats() for q in _registry}
+
+
+def flush_pipelines():
+    """Write out everything queued, leaving the flushers running"""
+    with _registry_lock:
+        queues = list(_registry)
+    for q in sorted(queues, key=lambda q: q.name == "log-records"):
+        q.drain()
+
+
+def shutdown_pipelines(timeout: float = 5.0):
+    """Flush and stop every batching queue"""
+    with _registry_lock:
+        queues = list(_registry)
+    # Log records last, so messages from other flushes are written too
+    for q in sorted(queues, key=lambda q: q.name == "log-records"):
+        q.close(timeout)
+
+
+atexit.register(shutdown_pipelines)
@@ -231,6 +231,24 @@ class EnhancedLogger:
         error_handler.setFormatter(error_formatter)
         logger.addHandler(error_handler)
 
+        # Move file I/O off the request path onto a batching flusher thread;
+        # the console stays synchronous so it interleaves with other output
+        pipeline_config = config.get("log_pipeline", {})
+        if pipeline_config.get("enabled", True):
+            from .log_pipeline import QueueingHandler
+            handlers = [h for h in logger.handlers if isinstance(h, logging.FileHandler)]
+            for handler in handlers:
+                logger.removeHandler(handler)
+            logger.addHandler(QueueingHandler(
+                handlers,
+                max_size=pipeline_config.get("max_queue_size", 10000),
+                batch_size=pipeline_config.get("batch_size", 500),
+                flush_interval=pipeline_config.get("flush_interval_seconds", 1.0),
+                policy=pipeline_config.get("policy", "drop"),
+                sample_rate=pipeline_config.get("sample_rate", 0.1),
+                block_timeout=pipeline_config.get("block_timeout_seconds", 0.05)
+            ))
+
         # Initialize monitoring components
         self.logger = logger
         self.performance_monitor = PerformanceMonitor(logger)
@@ -1,17 +1,14 @@
 from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Query, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 import os
 import json
 import uuid
-import subprocess
-import re
 import asyncio
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 from contextlib import asynccontextmanager
-import aiofiles
 from jose import JWTError, jwt
 from .logging_config import logger
 from .auth import create_access_token, get_current_user, get_current_active_user, authenticate_user, SECRET_KEY, ALGORITHM, create_refresh_token, ACCESS_TOKEN_EXPIRE_MINUTES, create_user, revoke_refresh_token, refresh_access_token, verify_refresh_token, validate_password, revoke_all_user_refresh_tokens
@@ -25,10 +22,14 @@ from .database import (
     OnboardingFlow, OnboardingStep, UserOnboardingProgress,
     Tutorial, TutorialProgress, UserTutorialAnalytics,
     HelpCategory, HelpArticle, Tooltip, UserTooltipInteraction,
-    SupportChat, SupportMessage
-)
-from .database import get_db
-from sqlalchemy.orm import Session
+    SupportChat, SupportMessage,
+    ExportOperation, ImportOperation
+)
+from .database import Notification, NotificationDelivery
+from .database import get_db, get_async_db, SessionLocal, AsyncSessionLocal, AsyncSessionBackend
+from sqlalchemy import select, func, delete
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.ext.asyncio import AsyncSession
 from .models_safe import ModelManager
 from .workers import WorkerManager
 from .middleware import setup_middleware
@@ -39,7 +40,8 @@ from .cache_manager import get_cache_manager
 from .metrics import router as metrics_router
 from .validation import (
     ValidatedPromptRequest, ValidatedChatRequest, ValidatedCodeRequest,
-    ValidatedSearchRequest, ValidatedLoginRequest, validate_file_upload,
+    ValidatedSearchRequest, ValidatedLoginRequest, validate_upload_metadata,
+    UploadContentScanner, MAX_FILE_SIZE, ALLOWED_EXTENSIONS,
     ValidatedUserProfileUpdate, ValidatedPasswordChange, ValidatedModelSwitch,
     ValidatedConversationCreate, ValidatedImageGenerationRequest,
     ValidatedCodeCompletionRequest, ValidatedPromptEngineeringRequest,
@@ -51,8 +53,11 @@ from .woocommerce_endpoints import router as woocommerce_router
 from .plugins import PluginManager
 from .rate_limit_service import initialize_rate_limits, get_rate_limit_service
 from .data_export_import import export_service
-from .search_service import SearchService
+from .search_service import SearchService, EXPORT_FORMATS
 from .notification_service import get_notification_service
+from .git_history import GitHistory, GitError
+from .upload_store import UploadStore, UploadError, read_chunks
+from . import canvas_store
 from .oauth_service import get_oauth_service
 
 from .api_framework import initialize_framework, APIVersion
@@ -74,7 +79,11 @@ plugin_manager = PluginManager(config)
 translation_service = get_translation_service(model_manager)
 cache_manager = get_cache_manager()
 search_service = SearchService(config)
+search_service.indexer.install_hooks(SessionLocal)
+search_service.indexer.install_hooks(AsyncSessionBackend)
 notification_service = get_notification_service(config)
+git_history = GitHistory(settings=config.get("git", {}))
+upload_store = UploadStore(config["paths"]["uploads_dir"], config.get("uploads", {}))
 logger.debug("Managers initialized successfully")
 
 class PromptRequest(BaseModel):
@@ -190,6 +199,35 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error starting rate limit adjustment task: {e}")
 
+    # Resume background tasks left over from the previous run
+    try:
+        await worker_manager.start()
+    except Exception as e:
+        logger.error(f"Error starting background task queue: {e}")
+
+    # Move canvas projects saved as JSON files by earlier versions into the project store
+    try:
+        db = SessionLocal()
+        try:
+            canvas_store.import_json_projects(db, Path(config["paths"]["uploads_dir"]) / "projects")
+        finally:
+            db.close()
+    except Exception as e:
+        logger.error(f"Error importing canvas projects: {e}")
+
+    # Build the autocomplete index so typeahead never waits on the database
+    try:
+        search_service.load_suggestion_index()
+    except Exception as e:
+        logger.error(f"Error loading search suggestions: {e}")
+
+    # Resume an interrupted reindex, or build the index if it is empty
+    try:
+        if search_service.indexer.needs_reindex():
+            asyncio.create_task(search_service.reindex_all_content())
+    except Exception as e:
+        logger.error(f"Error checking search index: {e}")
+
     # Load and initialize plugins
     try:
         discovered_plugins = plugin_manager.discover_plugins()
@@ -236,12 +274,34 @@ async def lifespan(app: FastAPI):
             pass
         logger.info("Rate limit adjustment task stopped")
 
+    # Stop inference batching
+    try:
+        await model_manager.scheduler.shutdown()
+    except Exception as e:
+        logger.error(f"Error stopping inference scheduler: {e}")
+
+    # Stop background task dispatch
+    try:
+        await worker_manager.stop()
+    except Exception as e:
+        logger.error(f"Error stopping background task queue: {e}")
+
+    # Stop git history workers
+    git_history.close()
+
     # Shutdown plugins
     try:
         plugin_manager.shutdown_all()
     except Exception as e:
         logger.error(f"Error during plugin shutdown: {e}")
 
+    # Write out queued log records and rate limit events
+    try:
+        from .log_pipeline import flush_pipelines
+        flush_pipelines()
+    except Exception as e:
+        logger.error(f"Error flushing log pipeline: {e}")
+
 async def run_rate_limit_adjustments():
     """Background task for automatic rate limit adjustments based on system load"""
     while True:
@@ -375,19 +435,13 @@ async def get_user_notifications(
     unread_only: bool = Query(False, description="Return only unread notifications"),
     category: Optional[str] = Query(None, description="Filter by notification category"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get notifications for the current user"""
     try:
-        notifications = await notification_service.get_user_notifications(
-            current_user.id, limit, offset, unread_only, db
+        return await notification_service.get_user_notifications(
+            current_user.id, limit, offset, unread_only, db, category=category
         )
-
-        # Apply category filter if specified
-        if category:
-            notifications = [n for n in notifications if n.get('category') == category]
-
-        return notifications
     except Exception as e:
         logger.error(f"Error getting user notifications: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -401,7 +455,7 @@ async def get_user_notifications(
 )
 async def get_unread_notification_count(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get unread notification count"""
     try:
@@ -421,7 +475,7 @@ async def get_unread_notification_count(
 async def mark_notification_read(
     notification_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark notification as read"""
     try:
@@ -444,21 +498,11 @@ async def mark_notification_read(
 )
 async def mark_all_notifications_read(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark all notifications as read"""
     try:
-        # Get all unread notifications
-        notifications = await notification_service.get_user_notifications(
-            current_user.id, limit=1000, unread_only=True, db=db
-        )
-
-        marked_count = 0
-        for notification in notifications:
-            success = await notification_service.mark_as_read(notification['id'], current_user.id, db)
-            if success:
-                marked_count += 1
-
+        marked_count = await notification_service.mark_all_as_read(current_user.id, db)
         return {"message": f"Marked {marked_count} notifications as read"}
     except Exception as e:
         logger.error(f"Error marking all notifications as read: {e}")
@@ -474,15 +518,15 @@ async def mark_all_notifications_read(
 async def delete_notification(
     notification_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a notification"""
     try:
         # Check ownership
-        notification = db.query(Notification).filter(
+        notification = (await db.execute(select(Notification).where(
             Notification.id == notification_id,
             Notification.recipient_id == current_user.id
-        ).first()
+        ))).scalar_one_or_none()
 
         if not notification:
             raise HTTPException(status_code=404, detail="Notification not found")
@@ -491,19 +535,19 @@ async def delete_notification(
         await notification_service._archive_notification(notification, "deleted", db)
 
         # Delete notification and deliveries
-        db.query(NotificationDelivery).filter(
+        await db.execute(delete(NotificationDelivery).where(
             NotificationDelivery.notification_id == notification_id
-        ).delete()
+        ))
 
-        db.delete(notification)
-        db.commit()
+        await db.delete(notification)
+        await db.commit()
 
         return {"message": "Notification deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error deleting notification: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 # Notification preferences endpoints
@@ -843,7 +887,7 @@ async def login(
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     # Create tokens
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_access_token(data={"sub": user.username, "uid": user.id})
     refresh_token = create_refresh_token(db, user.id)
 
     logger.info(f"User {user.username} logged in")
@@ -885,7 +929,7 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Registration failed. User may already exist or password doesn't meet requirements.")
 
     # Create tokens
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_access_token(data={"sub": user.username, "uid": user.id})
     refresh_token = create_refresh_token(db, user.id)
 
     logger.info(f"User {user.username} registered successfully")
@@ -991,7 +1035,7 @@ async def oauth_callback(
         user = await oauth_service.authenticate_or_create_user(db, provider, user_info, token_data)
 
         # Create tokens
-        access_token = create_access_token(data={"sub": user.username})
+        access_token = create_access_token(data={"sub": user.username, "uid": user.id})
         refresh_token = create_refresh_token(db, user.id)
 
         logger.info(f"User {user.username} authenticated via {provider} OAuth")
@@ -1484,10 +1528,16 @@ async def get_model_status():
             "name": model_name,
             "status": status,
             "type": model_info.get("type", "unknown") if isinstance(model_info, dict) else "loaded",
-            "path": model_path
+            "path": model_path,
+            **model_manager.residency.model_status(model_name)
         }
 
-    return {"models": model_status, "default_model": config["models"]["default_model"]}
+    return {
+        "models": model_status,
+        "default_model": config["models"]["default_model"],
+        "residency": model_manager.residency.get_stats(),
+        "scheduler": model_manager.scheduler.get_stats()
+    }
 
 # Conversation history endpoints
 @app.post(
@@ -1500,7 +1550,7 @@ async def get_model_status():
 async def create_conversation(
     request: ValidatedConversationCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new conversation"""
     conversation_id = str(uuid.uuid4())
@@ -1520,10 +1570,6 @@ async def create_conversation(
         permission_level="owner"
     )
 
-    db.add(conversation)
-    db.add(participant)
-    db.commit()
-
     # Log activity
     activity = ActivityLog(
         conversation_id=conversation_id,
@@ -1531,8 +1577,9 @@ async def create_conversation(
         activity_type="created",
         details={"title": request.title}
     )
-    db.add(activity)
-    db.commit()
+
+    db.add_all([conversation, participant, activity])
+    await db.commit()
 
     logger.info(f"User {current_user.username} created conversation {conversation_id}")
     return {"conversation_id": conversation_id, "title": conversation.title}
@@ -1546,48 +1593,39 @@ async def create_conversation(
 )
 async def list_conversations(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """List user's conversations"""
-    # Get conversations where user is a participant
-    conversations = db.query(Conversation).join(
-        ConversationParticipant,
-        Conversation.id == ConversationParticipant.conversation_id
-    ).filter(
-        ConversationParticipant.user_id == current_user.id
-    ).order_by(Conversation.updated_at.desc()).all()
+    # Counts come from correlated subqueries so the listing is a single query
+    others = aliased(ConversationParticipant)
+    message_count = select(func.count(Message.id)).where(
+        Message.conversation_id == Conversation.id
+    ).correlate(Conversation).scalar_subquery()
+    participant_count = select(func.count(others.id)).where(
+        others.conversation_id == Conversation.id
+    ).correlate(Conversation).scalar_subquery()
 
-    result = []
-    for conv in conversations:
-        # Get message count
-        message_count = db.query(Message).filter(
-            Message.conversation_id == conv.id
-        ).count()
-
-        # Get participant info
-        participant = db.query(ConversationParticipant).filter(
-            ConversationParticipant.conversation_id == conv.id,
+    # Get conversations where user is a participant
+    rows = await db.execute(
+        select(Conversation, ConversationParticipant.permission_level, participant_count, message_count).join(
+            ConversationParticipant,
+            Conversation.id == ConversationParticipant.conversation_id
+        ).where(
             ConversationParticipant.user_id == current_user.id
-        ).first()
-
-        # Get participant count
-        participant_count = db.query(ConversationParticipant).filter(
-            ConversationParticipant.conversation_id == conv.id
-        ).count()
-
-        result.append({
-            "id": conv.id,
-            "title": conv.title,
-            "model": conv.model,
-            "is_public": conv.is_public,
-            "permission_level": participant.permission_level if participant else "viewer",
-            "participant_count": participant_count,
-            "message_count": message_count,
-            "created_at": conv.created_at.isoformat(),
-            "updated_at": conv.updated_at.isoformat()
-        })
+        ).order_by(Conversation.updated_at.desc())
+    )
 
-    return result
+    return [{
+        "id": conv.id,
+        "title": conv.title,
+        "model": conv.model,
+        "is_public": conv.is_public,
+        "permission_level": permission_level or "viewer",
+        "participant_count": participants,
+        "message_count": messages,
+        "created_at": conv.created_at.isoformat(),
+        "updated_at": conv.updated_at.isoformat()
+    } for conv, permission_level, participants, messages in rows]
 
 @app.get(
     "/conversations/{conversation_id}",
@@ -1599,57 +1637,51 @@ async def list_conversations(
 async def get_conversation(
     conversation_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific conversation with messages"""
     # Check if user has access to this conversation
-    participant = db.query(ConversationParticipant).filter(
+    participant = (await db.execute(select(ConversationParticipant).where(
         ConversationParticipant.conversation_id == conversation_id,
         ConversationParticipant.user_id == current_user.id
-    ).first()
+    ))).scalars().first()
 
     if not participant:
         raise HTTPException(status_code=404, detail="Conversation not found or access denied")
 
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id
-    ).first()
+    conversation = await db.get(Conversation, conversation_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    messages = db.query(Message).filter(
+    messages = (await db.execute(select(Message).where(
         Message.conversation_id == conversation_id
-    ).order_by(Message.created_at).all()
-
-    message_list = []
-    for msg in messages:
-        message_list.append({
-            "id": msg.id,
-            "role": msg.role,
-            "content": msg.content,
-            "model": msg.model,
-            "tokens_used": msg.tokens_used,
-            "user_id": msg.user_id,
-            "created_at": msg.created_at.isoformat()
-        })
-
-    # Get participants
-    participants = db.query(ConversationParticipant).filter(
-        ConversationParticipant.conversation_id == conversation_id
-    ).all()
+    ).order_by(Message.created_at))).scalars()
+
+    message_list = [{
+        "id": msg.id,
+        "role": msg.role,
+        "content": msg.content,
+        "model": msg.model,
+        "tokens_used": msg.tokens_used,
+        "user_id": msg.user_id,
+        "created_at": msg.created_at.isoformat()
+    } for msg in messages]
+
+    # Get participants with their usernames
+    participants = await db.execute(
+        select(ConversationParticipant, User.username).join(
+            User, User.id == ConversationParticipant.user_id
+        ).where(ConversationParticipant.conversation_id == conversation_id)
+    )
 
-    participant_list = []
-    for p in participants:
-        user = db.query(User).filter(User.id == p.user_id).first()
-        if user:
-            participant_list.append({
-                "user_id": p.user_id,
-                "username": user.username,
-                "permission_level": p.permission_level,
-                "joined_at": p.joined_at.isoformat(),
-                "last_active_at": p.last_active_at.isoformat()
-            })
+    participant_list = [{
+        "user_id": p.user_id,
+        "username": username,
+        "permission_level": p.permission_level,
+        "joined_at": p.joined_at.isoformat(),
+        "last_active_at": p.last_active_at.isoformat()
+    } for p, username in participants]
 
     return {
         "id": conversation.id,
@@ -2502,10 +2534,11 @@ async def health_check():
 
     # Worker manager health check
     try:
-        active_tasks = len([t for t in worker_manager.tasks.values() if t["status"] == "running"])
+        worker_stats = worker_manager.get_stats()
+        queued_tasks = sum(worker_stats["queue_depths"].values())
         health_status["checks"]["workers"] = {
             "status": "healthy",
-            "details": f"{active_tasks} active tasks"
+            "details": f"{worker_stats['running']} active tasks, {queued_tasks} queued"
         }
     except Exception as e:
         health_status["checks"]["workers"] = {"status": "unhealthy", "details": str(e)}
@@ -2586,11 +2619,12 @@ async def enhance_prompt(request: ValidatedPromptRequest, current_user: User = D
     """
     try:
         model_name = request.model or config["models"]["default_model"]
-        enhanced = model_manager.generate_text(
+        enhanced = await model_manager.generate_text_async(
             model_name,
             f"Enhance this prompt by providing additional context, clarification, or rephrasing: {request.prompt}",
             max_tokens=request.max_tokens,
-            temperature=request.temperature
+            temperature=request.temperature,
+            cache_sampled=True
         )
         logger.info(f"Enhanced prompt for user {current_user.username}")
         return {"enhanced_prompt": enhanced}
@@ -2629,7 +2663,7 @@ async def enhance_prompt(request: ValidatedPromptRequest, current_user: User = D
     response_description="AI response and conversation identifier",
     tags=["ai"]
 )
-async def chat(request: ValidatedChatRequest, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def chat(request: ValidatedChatRequest, current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_async_db)):
     """
     Send a message to an AI model and receive a response.
 
@@ -2645,9 +2679,33 @@ async def chat(request: ValidatedChatRequest, current_user: User = Depends(get_c
         if model_name not in available_models:
             raise HTTPException(status_code=400, detail=f"Model '{model_name}' not available")
 
-        # Get or create conversation
+        # Check access to an existing conversation
         conversation_id = request.conversation_id
-        if not conversation_id:
+        conversation = None
+        if conversation_id:
+            participant = (await db.execute(select(ConversationParticipant).where(
+                ConversationParticipant.conversation_id == conversation_id,
+                ConversationParticipant.user_id == current_user.id
+            ))).scalars().first()
+            if not participant:
+                raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+
+            conversation = await db.get(Conversation, conversation_id)
+            if not conversation:
+                raise HTTPException(status_code=404, detail="Conversation not found")
+
+        # End the read transaction so no pooled connection is held during inference
+        await db.commit()
+
+        # Generate AI response
+        response = await model_manager.generate_text_async(
+            model_name,
+            request.message,
+            max_tokens=256
+        )
+
+        # Create the conversation only once there is a reply to store in it
+        if conversation is None:
             conversation_id = str(uuid.uuid4())
             conversation = Conversation(
                 id=conversation_id,
@@ -2664,22 +2722,8 @@ async def chat(request: ValidatedChatRequest, current_user: User = Depends(get_c
             db.add(conversation)
             db.add(participant)
             logger.debug(f"Created new conversation {conversation_id} for user {current_user.username}")
-        else:
-            # Check if user has access to this conversation
-            participant = db.query(ConversationParticipant).filter(
-                ConversationParticipant.conversation_id == conversation_id,
-                ConversationParticipant.user_id == current_user.id
-            ).first()
-            if not participant:
-                raise HTTPException(status_code=404, detail="Conversation not found or access denied")
 
-            conversation = db.query(Conversation).filter(
-                Conversation.id == conversation_id
-            ).first()
-            if not conversation:
-                raise HTTPException(status_code=404, detail="Conversation not found")
-
-        # Save user message
+        # Save user message and AI response
         user_message = Message(
             conversation_id=conversation_id,
             user_id=current_user.id,
@@ -2689,14 +2733,6 @@ async def chat(request: ValidatedChatRequest, current_user: User = Depends(get_c
         )
         db.add(user_message)
 
-        # Generate AI response
-        response = model_manager.generate_text(
-            model_name,
-            request.message,
-            max_tokens=256
-        )
-
-        # Save AI response
         ai_message = Message(
             conversation_id=conversation_id,
             role="assistant",
@@ -2709,7 +2745,7 @@ async def chat(request: ValidatedChatRequest, current_user: User = Depends(get_c
         # Update conversation timestamp
         conversation.updated_at = datetime.now(timezone.utc)
 
-        db.commit()
+        await db.commit()
 
         logger.info(f"Chat response for user {current_user.username} in conversation {conversation_id}")
         return {
@@ -2720,10 +2756,144 @@ async def chat(request: ValidatedChatRequest, current_user: User = Depends(get_c
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error in chat: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format a Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+def _persist_chat_exchange(
+    db: Session,
+    conversation_id: str,
+    user_id: int,
+    model_name: str,
+    user_text: str,
+    response_text: str,
+    create_conversation: bool = False
+) -> Message:
+    """Write a user message and the assistant reply in a single commit"""
+    now = datetime.now(timezone.utc)
+    if create_conversation:
+        db.add(Conversation(
+            id=conversation_id,
+            title=f"Chat {now.strftime('%Y-%m-%d %H:%M')}",
+            model=model_name,
+            created_by=user_id
+        ))
+        db.add(ConversationParticipant(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            permission_level="owner"
+        ))
+    else:
+        db.query(Conversation).filter(Conversation.id == conversation_id).update(
+            {Conversation.updated_at: now}, synchronize_session=False
+        )
+
+    db.add(Message(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        role="user",
+        content=user_text,
+        model=model_name
+    ))
+    ai_message = Message(
+        conversation_id=conversation_id,
+        role="assistant",
+        content=response_text,
+        model=model_name,
+        tokens_used=len(response_text.split())  # Rough estimate
+    )
+    db.add(ai_message)
+    db.commit()
+    return ai_message
+
+@app.post(
+    "/chat/stream",
+    summary="Chat with AI (streaming)",
+    description="""
+    Server-Sent Events variant of `/chat`. Tokens are sent as they are generated
+    so the first words arrive before the full completion is ready.
+
+    Events:
+    - `start`: `{"conversation_id": ..., "model": ...}`
+    - (default event): `{"token": "..."}` for each generated token
+    - `done`: `{"conversation_id": ..., "message_id": ..., "response": ...}`
+    - `error`: `{"detail": ...}`
+
+    Both messages are persisted once, when the stream completes.
+    """,
+    response_description="text/event-stream of generated tokens",
+    tags=["ai"]
+)
+async def chat_stream(request: ValidatedChatRequest, current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_async_db)):
+    """Stream an AI response token by token"""
+    model_name = request.model or config["models"]["default_model"]
+
+    available_models = model_manager.list_models()
+    if model_name not in available_models:
+        raise HTTPException(status_code=400, detail=f"Model '{model_name}' not available")
+
+    conversation_id = request.conversation_id
+    create_conversation = not conversation_id
+    if create_conversation:
+        conversation_id = str(uuid.uuid4())
+    else:
+        participant = (await db.execute(select(ConversationParticipant).where(
+            ConversationParticipant.conversation_id == conversation_id,
+            ConversationParticipant.user_id == current_user.id
+        ))).scalars().first()
+        if not participant:
+            raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+
+    user_id = current_user.id
+    username = current_user.username
+
+    async def event_stream():
+        yield _sse_event({"conversation_id": conversation_id, "model": model_name}, event="start")
+
+        tokens = []
+        try:
+            async for token in model_manager.stream_text_async(model_name, request.message, max_tokens=256):
+                tokens.append(token)
+                yield _sse_event({"token": token})
+        except Exception as e:
+            logger.error(f"Error streaming chat for user {username}: {e}")
+            yield _sse_event({"detail": str(e)}, event="error")
+            return
+
+        response = "".join(tokens).strip()
+
+        # The request-scoped session may already be closed once streaming starts
+        async with AsyncSessionLocal() as stream_db:
+            try:
+                ai_message = await stream_db.run_sync(
+                    _persist_chat_exchange, conversation_id, user_id, model_name,
+                    request.message, response, create_conversation=create_conversation
+                )
+                message_id = str(ai_message.id)
+            except Exception as e:
+                await stream_db.rollback()
+                logger.error(f"Error saving streamed chat for user {username}: {e}")
+                yield _sse_event({"detail": "Failed to save conversation"}, event="error")
+                return
+
+        logger.info(f"Streamed chat response for user {username} in conversation {conversation_id}")
+        yield _sse_event({
+            "conversation_id": conversation_id,
+            "message_id": message_id,
+            "response": response
+        }, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # WebSocket connection manager for real-time chat
 class ConnectionManager:
     def __init__(self):
@@ -2771,8 +2941,7 @@ notification_service.set_notification_connections(notification_connections)
 @app.websocket("/ws/notifications")
 async def websocket_notifications(
     websocket: WebSocket,
-    token: str = Query(..., description="JWT access token"),
-    db: Session = Depends(get_db)
+    token: str = Query(..., description="JWT access token")
 ):
     """
     WebSocket endpoint for real-time notifications.
@@ -2790,8 +2959,9 @@ async def websocket_notifications(
         await websocket.close(code=1008, reason="Invalid token")
         return
 
-    # Get user
-    user = get_user(db, username=username)
+    # Get user (sessions are opened per message so none is held for the connection's lifetime)
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
     if not user:
         await websocket.close(code=1008, reason="User not found")
         return
@@ -2812,7 +2982,8 @@ async def websocket_notifications(
                 # Mark notification as read
                 notification_id = data.get("notification_id")
                 if notification_id:
-                    success = await notification_service.mark_as_read(notification_id, user.id, db)
+                    async with AsyncSessionLocal() as db:
+                        success = await notification_service.mark_as_read(notification_id, user.id, db)
                     if success:
                         await websocket.send_json({
                             "type": "notification_updated",
@@ -2821,15 +2992,8 @@ async def websocket_notifications(
 
             elif message_type == "mark_all_read":
                 # Mark all notifications as read
-                notifications = await notification_service.get_user_notifications(
-                    user.id, limit=1000, unread_only=True, db=db
-                )
-
-                marked_count = 0
-                for notification in notifications:
-                    success = await notification_service.mark_as_read(notification['id'], user.id, db)
-                    if success:
-                        marked_count += 1
+                async with AsyncSessionLocal() as db:
+                    marked_count = await notification_service.mark_all_as_read(user.id, db)
 
                 await websocket.send_json({
                     "type": "bulk_update",
@@ -2863,8 +3027,7 @@ async def websocket_notifications(
 async def websocket_chat(
     websocket: WebSocket,
     conversation_id: str,
-    token: str = Query(..., description="JWT access token"),
-    db: Session = Depends(get_db)
+    token: str = Query(..., description="JWT access token")
 ):
     """
     WebSocket endpoint for real-time chat in a conversation.
@@ -2883,23 +3046,26 @@ async def websocket_chat(
         await websocket.close(code=1008, reason="Invalid token")
         return
 
-    # Get user
-    user = get_user(db, username=username)
+    # Get user and verify conversation access (sessions are opened per message
+    # so none is held for the connection's lifetime)
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+        participant = None
+        if user:
+            participant = (await db.execute(select(ConversationParticipant).where(
+                ConversationParticipant.conversation_id == conversation_id,
+                ConversationParticipant.user_id == user.id
+            ))).scalars().first()
+        conversation = await db.get(Conversation, conversation_id) if participant else None
+
     if not user:
         await websocket.close(code=1008, reason="User not found")
         return
 
-    # Verify conversation access
-    participant = db.query(ConversationParticipant).filter(
-        ConversationParticipant.conversation_id == conversation_id,
-        ConversationParticipant.user_id == user.id
-    ).first()
-
     if not participant:
         await websocket.close(code=1008, reason="Conversation not found or access denied")
         return
 
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
     if not conversation:
         await websocket.close(code=1008, reason="Conversation not found")
         return
@@ -2929,32 +3095,42 @@ async def websocket_chat(
                     })
                     continue
 
-                # Save user message
-                user_msg = Message(
-                    conversation_id=conversation_id,
-                    user_id=user.id,
-                    role="user",
-                    content=user_message,
-                    model=model_name
-                )
-                db.add(user_msg)
-
-                # Generate AI response
-                response = model_manager.generate_text(model_name, user_message, max_tokens=256)
-
-                # Save AI response
-                ai_msg = Message(
-                    conversation_id=conversation_id,
-                    role="assistant",
-                    content=response,
-                    model=model_name,
-                    tokens_used=len(response.split())
-                )
-                db.add(ai_msg)
-
-                # Update conversation timestamp
-                conversation.updated_at = datetime.now(timezone.utc)
-                db.commit()
+                # Stream tokens to every client in the conversation as they are generated
+                await manager.broadcast_to_conversation(conversation_id, {
+                    "type": "ai_response_start",
+                    "content": {"conversation_id": conversation_id, "model": model_name}
+                })
+                tokens = []
+                try:
+                    async for token in model_manager.stream_text_async(model_name, user_message, max_tokens=256):
+                        tokens.append(token)
+                        await manager.broadcast_to_conversation(conversation_id, {
+                            "type": "ai_token",
+                            "content": {"conversation_id": conversation_id, "token": token}
+                        })
+                except Exception as e:
+                    logger.error(f"Error streaming chat response: {e}")
+                    await websocket.send_json({
+                        "type": "error",
+                        "content": {"message": "Failed to generate response"}
+                    })
+                    continue
+                response = "".join(tokens).strip()
+
+                # Persist both messages once the stream is complete
+                async with AsyncSessionLocal() as db:
+                    ai_msg = await db.run_sync(
+                        _persist_chat_exchange, conversation_id, user.id, model_name, user_message, response
+                    )
+
+                    # Log activity
+                    db.add(ActivityLog(
+                        conversation_id=conversation_id,
+                        user_id=user.id,
+                        activity_type="message",
+                        details={"message_type": "ai_response", "model": model_name}
+                    ))
+                    await db.commit()
 
                 # Broadcast AI response to all connected clients
                 response_data = {
@@ -2970,16 +3146,6 @@ async def websocket_chat(
                 }
                 await manager.broadcast_to_conversation(conversation_id, response_data)
 
-                # Log activity
-                activity = ActivityLog(
-                    conversation_id=conversation_id,
-                    user_id=user.id,
-                    activity_type="message",
-                    details={"message_type": "ai_response", "model": model_name}
-                )
-                db.add(activity)
-                db.commit()
-
                 logger.info(f"Real-time chat response for user {user.username} in conversation {conversation_id}")
 
             elif message_type == "ping":
@@ -2989,15 +3155,18 @@ async def websocket_chat(
             elif message_type == "user_presence":
                 # Update user presence
                 is_online = content.get("is_online", True)
-                presence = db.query(UserPresence).filter(UserPresence.user_id == user.id).first()
-                if not presence:
-                    presence = UserPresence(user_id=user.id)
-                    db.add(presence)
-
-                presence.is_online = is_online
-                presence.last_seen = datetime.now(timezone.utc)
-                presence.current_conversation_id = conversation_id if is_online else None
-                db.commit()
+                async with AsyncSessionLocal() as db:
+                    presence = (await db.execute(
+                        select(UserPresence).where(UserPresence.user_id == user.id)
+                    )).scalars().first()
+                    if not presence:
+                        presence = UserPresence(user_id=user.id)
+                        db.add(presence)
+
+                    presence.is_online = is_online
+                    presence.last_seen = datetime.now(timezone.utc)
+                    presence.current_conversation_id = conversation_id if is_online else None
+                    await db.commit()
 
                 # Broadcast presence update to all conversation participants
                 presence_data = {
@@ -3019,66 +3188,67 @@ async def websocket_chat(
                 position = content.get("position", 0)
                 new_content = content.get("content", "")
 
-                # Check permissions
-                participant = db.query(ConversationParticipant).filter(
-                    ConversationParticipant.conversation_id == conversation_id,
-                    ConversationParticipant.user_id == user.id
-                ).first()
-
-                if not participant or participant.permission_level == "viewer":
-                    await websocket.send_json({
-                        "type": "error",
-                        "content": {"message": "Insufficient permissions to edit documents"}
-                    })
-                    continue
-
-                # Get document
-                document = db.query(CollaborativeDocument).filter(
-                    CollaborativeDocument.id == document_id,
-                    CollaborativeDocument.conversation_id == conversation_id
-                ).first()
+                async with AsyncSessionLocal() as db:
+                    # Check permissions
+                    participant = (await db.execute(select(ConversationParticipant).where(
+                        ConversationParticipant.conversation_id == conversation_id,
+                        ConversationParticipant.user_id == user.id
+                    ))).scalars().first()
 
-                if not document:
-                    await websocket.send_json({
-                        "type": "error",
-                        "content": {"message": "Document not found"}
-                    })
-                    continue
+                    if not participant or participant.permission_level == "viewer":
+                        await websocket.send_json({
+                            "type": "error",
+                            "content": {"message": "Insufficient permissions to edit documents"}
+                        })
+                        continue
 
-                old_content = document.content
-
-                # Apply edit based on type
-                if edit_type == "replace":
-                    document.content = new_content
-                elif edit_type == "insert":
-                    document.content = document.content[:position] + new_content + document.content[position:]
-                elif edit_type == "delete":
-                    delete_length = len(new_content)  # new_content contains the deleted text
-                    document.content = document.content[:position] + document.content[position + delete_length:]
-
-                document.version += 1
-
-                # Log edit
-                edit = DocumentEdit(
-                    document_id=document_id,
-                    user_id=user.id,
-                    edit_type=edit_type,
-                    position=position,
-                    old_content=old_content,
-                    new_content=document.content
-                )
-                db.add(edit)
-
-                # Log activity
-                activity = ActivityLog(
-                    conversation_id=conversation_id,
-                    user_id=user.id,
-                    activity_type="document_edited",
-                    details={"document_id": document_id, "edit_type": edit_type, "version": document.version}
-                )
-                db.add(activity)
+                    # Get document
+                    document = (await db.execute(select(CollaborativeDocument).where(
+                        CollaborativeDocument.id == document_id,
+                        CollaborativeDocument.conversation_id == conversation_id
+                    ))).scalars().first()
 
-                db.commit()
+                    if not document:
+                        await websocket.send_json({
+                            "type": "error",
+                            "content": {"message": "Document not found"}
+                        })
+                        continue
+
+                    old_content = document.content
+
+                    # Apply edit based on type
+                    if edit_type == "replace":
+                        document.content = new_content
+                    elif edit_type == "insert":
+                        document.content = document.content[:position] + new_content + document.content[position:]
+                    elif edit_type == "delete":
+                        delete_length = len(new_content)  # new_content contains the deleted text
+                        document.content = document.content[:position] + document.content[position + delete_length:]
+
+                    document.version += 1
+
+                    # Log edit
+                    edit = DocumentEdit(
+                        document_id=document_id,
+                        user_id=user.id,
+                        edit_type=edit_type,
+                        position=position,
+                        old_content=old_content,
+                        new_content=document.content
+                    )
+                    db.add(edit)
+
+                    # Log activity
+                    activity = ActivityLog(
+                        conversation_id=conversation_id,
+                        user_id=user.id,
+                        activity_type="document_edited",
+                        details={"document_id": document_id, "edit_type": edit_type, "version": document.version}
+                    )
+                    db.add(activity)
+
+                    await db.commit()
 
                 # Broadcast document update
                 edit_data = {
@@ -3124,7 +3294,7 @@ async def code_task(task: str, request: ValidatedCodeRequest, current_user: User
             "code": request.code,
             "language": request.language,
             "task": task
-        })
+        }, user_id=current_user.id)
         return {"task_id": task_id, "status": "submitted"}
     except Exception as e:
         logger.error(f"Error submitting code task: {e}")
@@ -3219,7 +3389,7 @@ Code:
 
 Provide only the completion text, no explanations:"""
 
-        completion = model_manager.generate_text(
+        completion = await model_manager.generate_text_async(
             model_name,
             prompt,
             max_tokens=256,
@@ -3262,7 +3432,7 @@ Original: {request.base_prompt}
 
 Provide an enhanced version that is more effective and detailed:"""
 
-        enhanced_prompt = model_manager.generate_text(
+        enhanced_prompt = await model_manager.generate_text_async(
             model_name,
             enhancement_prompt,
             max_tokens=512,
@@ -3271,7 +3441,7 @@ Provide an enhanced version that is more effective and detailed:"""
 
         # Generate template suggestions
         template_prompt = f"Generate 3 alternative prompt templates for {request.task_type} tasks in {request.style} style:"
-        templates = model_manager.generate_text(
+        templates = await model_manager.generate_text_async(
             model_name,
             template_prompt,
             max_tokens=300,
@@ -3321,7 +3491,7 @@ async def multimodal_interaction(request: ValidatedMultiModalRequest, current_us
         combined_prompt = f"Task: {request.task}\n\n" + "\n\n".join(prompt_parts)
         combined_prompt += "\n\nProvide a comprehensive response combining all provided inputs:"
 
-        response = model_manager.generate_text(
+        response = await model_manager.generate_text_async(
             model_name,
             combined_prompt,
             max_tokens=1024,
@@ -3367,7 +3537,7 @@ async def refactor_code(request: ValidatedCodeRefactoringRequest, current_user:
 
 Provide the refactored version with explanations of changes:"""
 
-        refactored_code = model_manager.generate_text(
+        refactored_code = await model_manager.generate_text_async(
             model_name,
             refactor_prompt,
             max_tokens=2048,
@@ -3419,7 +3589,7 @@ async def convert_content(request: ValidatedConversionRequest, current_user: Use
         elif request.input_type == "image" and request.output_type == "text":
             # Image to text (captioning)
             caption_prompt = f"Describe this image in detail: [Image data would be processed here]"
-            caption = model_manager.generate_text(
+            caption = await model_manager.generate_text_async(
                 model_name,
                 caption_prompt,
                 max_tokens=256,
@@ -3468,11 +3638,12 @@ async def explain_code(request: ValidatedCodeExplanationRequest, current_user: U
 
 Provide a clear, comprehensive explanation:"""
 
-        explanation = model_manager.generate_text(
+        explanation = await model_manager.generate_text_async(
             model_name,
             explain_prompt,
             max_tokens=1024,
-            temperature=0.5
+            temperature=0.5,
+            cache_sampled=True
         )
 
         return {
@@ -3516,7 +3687,7 @@ Code:
 
 Analyze the code for bugs, provide fixes, and explain the issues:"""
 
-        analysis = model_manager.generate_text(
+        analysis = await model_manager.generate_text_async(
             model_name,
             debug_prompt,
             max_tokens=1024,
@@ -3773,17 +3944,18 @@ async def get_saved_searches(current_user: User = Depends(get_current_active_use
     "/api/search/export",
     response_model=Dict[str, str],
     summary="Export Search Results",
-    description="Export search results to file (JSON, CSV, or PDF)",
+    description="Export all search results to a file (JSON, CSV, JSONL or NDJSON), optionally gzip-compressed",
     tags=["search"]
 )
 async def export_search_results(
     query: str = Query(..., description="Search query"),
     filters: Dict[str, Any] = None,
-    format: str = Query("json", description="Export format: json, csv, pdf"),
+    format: str = Query("json", description="Export format: json, csv, jsonl, ndjson"),
+    compress: bool = Query(False, description="Gzip the export file"),
     current_user: User = Depends(get_current_active_user)
 ):
     """Export search results"""
-    if format not in ["json", "csv", "pdf"]:
+    if format not in EXPORT_FORMATS:
         raise HTTPException(status_code=400, detail="Invalid export format")
 
     try:
@@ -3791,7 +3963,8 @@ async def export_search_results(
             query=query,
             filters=filters or {},
             format=format,
-            user_id=current_user.id
+            user_id=current_user.id,
+            compress=compress
         )
 
         return {"export_id": export_id, "message": "Export started successfully"}
@@ -3800,6 +3973,29 @@ async def export_search_results(
         logger.error(f"Error exporting search results: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post(
+    "/api/search/export/stream",
+    summary="Stream Search Results",
+    description="Stream all search results straight into the response (JSON, CSV, JSONL or NDJSON)",
+    tags=["search"]
+)
+async def stream_search_results(
+    query: str = Query(..., description="Search query"),
+    filters: Dict[str, Any] = None,
+    format: str = Query("ndjson", description="Export format: json, csv, jsonl, ndjson"),
+    sort_by: str = Query("relevance", description="Sort order: relevance, date, title"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream search results without writing an export file"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid export format")
+
+    return StreamingResponse(
+        search_service.stream_search_results(query, filters or {}, format, sort_by),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="search_results.{format}"'}
+    )
+
 @app.get(
     "/api/search/export/{export_id}",
     summary="Download Search Export",
@@ -3834,7 +4030,8 @@ async def download_search_export(
 
     return FileResponse(
         path=export_record.file_path,
-        filename=f"search_export_{export_id}.{export_record.format}",
+        filename=f"search_export_{export_id}.{export_record.format}"
+                 + (".gz" if export_record.file_path.endswith(".gz") else ""),
         media_type="application/octet-stream"
     )
 
@@ -3859,9 +4056,9 @@ async def get_search_stats(current_user: User = Depends(get_current_active_user)
 
 @app.post(
     "/api/search/reindex",
-    response_model=Dict[str, str],
+    response_model=Dict[str, Any],
     summary="Reindex All Content",
-    description="Trigger full reindexing of all content (admin only)",
+    description="Trigger full reindexing of all content, resuming an interrupted run (admin only)",
     tags=["search"]
 )
 async def reindex_content(current_user: User = Depends(get_current_active_user)):
@@ -3870,35 +4067,171 @@ async def reindex_content(current_user: User = Depends(get_current_active_user))
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
+        if search_service.indexer.reindex_running:
+            return {"message": "Reindexing already in progress", "progress": search_service.get_reindex_progress()}
+
         # Run reindexing in background
         asyncio.create_task(search_service.reindex_all_content())
-        return {"message": "Reindexing started in background"}
+        return {"message": "Reindexing started in background", "progress": search_service.get_reindex_progress()}
     except Exception as e:
         logger.error(f"Error starting reindexing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get(
+    "/api/search/reindex",
+    response_model=Dict[str, Any],
+    summary="Reindex Progress",
+    description="Progress of the current or last full reindex and indexing lag (admin only)",
+    tags=["search"]
+)
+async def get_reindex_progress(current_user: User = Depends(get_current_active_user)):
+    """Get reindexing progress"""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return search_service.indexer.get_stats()
+
 # File upload/download
+# Large files (models, media) may also be sent through multipart uploads
+LARGE_UPLOAD_EXTENSIONS = ALLOWED_EXTENSIONS | set(config.get("uploads", {}).get("large_file_extensions", []))
+
+def stored_upload_response(stored, filename: str) -> Dict[str, Any]:
+    return {
+        "filename": filename,
+        "path": str(stored.path),
+        "sha256": stored.sha256,
+        "size": stored.size,
+        "deduplicated": stored.deduplicated
+    }
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...), current_user: User = Depends(get_current_active_user)):
     """Upload a file"""
     try:
-        # Validate file upload
-        validate_file_upload(file.file, file.filename, file.content_type)
-
-        upload_dir = Path(config["paths"]["uploads_dir"])
-        upload_dir.mkdir(exist_ok=True)
+        validate_upload_metadata(file.filename, file.content_type)
 
-        file_path = upload_dir / f"{uuid.uuid4()}_{file.filename}"
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        # Copied in chunks to content-addressed storage, checking size and content as it streams
+        stored = await upload_store.store(
+            read_chunks(file, upload_store.chunk_size), MAX_FILE_SIZE, UploadContentScanner().feed
+        )
 
-        logger.info(f"File uploaded by {current_user.username}: {file.filename}")
-        return {"filename": file.filename, "path": str(file_path)}
+        logger.info(f"File uploaded by {current_user.username}: {file.filename} ({stored.sha256})")
+        return stored_upload_response(stored, file.filename)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class MultipartUploadRequest(BaseModel):
+    filename: str = Field(..., description="Original file name")
+    content_type: Optional[str] = Field(None, description="MIME type of the file")
+    total_size: Optional[int] = Field(None, description="Size of the complete file in bytes", ge=0)
+
+def get_owned_upload_session(session_id: str, user: User) -> Dict[str, Any]:
+    """Look up a multipart upload session belonging to ``user``"""
+    try:
+        session = upload_store.get_session(session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if session["user_id"] != user.id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+@app.post(
+    "/uploads/multipart",
+    response_model=Dict[str, Any],
+    summary="Start Multipart Upload",
+    description="Start a resumable upload for a large file; send its parts with PUT, then complete it",
+    tags=["files"]
+)
+async def create_multipart_upload(request: MultipartUploadRequest, current_user: User = Depends(get_current_active_user)):
+    """Start a multipart upload session"""
+    validate_upload_metadata(request.filename, request.content_type, LARGE_UPLOAD_EXTENSIONS, check_content_type=False)
+    try:
+        return upload_store.create_session(current_user.id, request.filename, request.content_type, request.total_size)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.get(
+    "/uploads/multipart/{session_id}",
+    response_model=Dict[str, Any],
+    summary="Get Multipart Upload",
+    description="Parts received so far, for resuming an interrupted upload",
+    tags=["files"]
+)
+async def get_multipart_upload(session_id: str, current_user: User = Depends(get_current_active_user)):
+    """Get a multipart upload session"""
+    return get_owned_upload_session(session_id, current_user)
+
+@app.put(
+    "/uploads/multipart/{session_id}/parts/{part_number}",
+    response_model=Dict[str, Any],
+    summary="Upload Part",
+    description="Send one part as the raw request body; re-sending a part replaces it",
+    tags=["files"]
+)
+async def upload_multipart_part(
+    session_id: str,
+    part_number: int,
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream one part of a multipart upload to disk"""
+    get_owned_upload_session(session_id, current_user)
+
+    # Reject oversized parts before reading the body when the client declares a length
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > upload_store.max_part_size:
+        raise HTTPException(status_code=413, detail=f"Part exceeds the maximum size of {upload_store.max_part_size} bytes")
+
+    try:
+        return await upload_store.write_part(session_id, part_number, request.stream())
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.post(
+    "/uploads/multipart/{session_id}/complete",
+    response_model=Dict[str, Any],
+    summary="Complete Multipart Upload",
+    description="Join the uploaded parts into one stored file, optionally verifying its SHA-256",
+    tags=["files"]
+)
+async def complete_multipart_upload(
+    session_id: str,
+    expected_sha256: Optional[str] = Query(None, description="Hex SHA-256 the complete file must match"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Complete a multipart upload"""
+    session = get_owned_upload_session(session_id, current_user)
+
+    # Only text types are scanned; binary media can legitimately contain the markers
+    ext = os.path.splitext(session["filename"].lower())[1]
+    inspect = UploadContentScanner().feed if ext in ALLOWED_EXTENSIONS else None
+
+    try:
+        stored = await upload_store.complete(session_id, expected_sha256, inspect)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    logger.info(f"Multipart upload completed by {current_user.username}: {session['filename']} ({stored.sha256})")
+    return stored_upload_response(stored, session["filename"])
+
+@app.delete(
+    "/uploads/multipart/{session_id}",
+    response_model=Dict[str, str],
+    summary="Abort Multipart Upload",
+    description="Discard a multipart upload and the parts received so far",
+    tags=["files"]
+)
+async def abort_multipart_upload(session_id: str, current_user: User = Depends(get_current_active_user)):
+    """Abort a multipart upload"""
+    get_owned_upload_session(session_id, current_user)
+    upload_store.abort(session_id)
+    return {"message": "Upload aborted"}
+
 # Canvas project management
 class CanvasProject(BaseModel):
     id: Optional[str] = None
@@ -3910,79 +4243,93 @@ class CanvasProject(BaseModel):
 class CanvasSaveRequest(BaseModel):
     name: str
     layers: List[Dict[str, Any]]
+    project_id: Optional[str] = Field(None, description="Existing project to overwrite; only changed layers are written")
+
+class CanvasPatchRequest(BaseModel):
+    name: Optional[str] = None
+    layers: Dict[int, Dict[str, Any]] = Field(default_factory=dict, description="Changed layers by position")
+    layer_count: Optional[int] = Field(None, description="New number of layers, to add or remove layers", ge=0)
+
+# canvas_store is synchronous; AsyncSession.run_sync runs it on the session's
+# async connection so the event loop is not blocked on the database
+async def get_owned_canvas_project(db: AsyncSession, project_id: str, user: User):
+    """Look up a canvas project belonging to ``user``"""
+    project = await db.run_sync(canvas_store.get_project, project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return project
 
-@app.post("/canvas/save", response_model=Dict[str, str], tags=["canvas"])
-async def save_canvas_project(request: CanvasSaveRequest, current_user: User = Depends(get_current_active_user)):
+@app.post("/canvas/save", response_model=Dict[str, Any], tags=["canvas"])
+async def save_canvas_project(request: CanvasSaveRequest, current_user: User = Depends(get_current_active_user),
+                              db: AsyncSession = Depends(get_async_db)):
     """Save a canvas project"""
     try:
-        project_id = str(uuid.uuid4())
-        project_data = {
-            "id": project_id,
-            "name": request.name,
-            "layers": request.layers,
-            "user_id": current_user.id,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
-
-        # Save to file (in production, use database)
-        projects_dir = Path(config["paths"]["uploads_dir"]) / "projects"
-        projects_dir.mkdir(exist_ok=True)
-
-        project_file = projects_dir / f"{project_id}.json"
-        with open(project_file, 'w') as f:
-            json.dump(project_data, f, indent=2)
+        project = await get_owned_canvas_project(db, request.project_id, current_user) if request.project_id else None
+        result = await db.run_sync(canvas_store.save_project, current_user.id, request.name, request.layers, project)
 
-        logger.info(f"Canvas project saved by {current_user.username}: {request.name}")
-        return {"project_id": project_id, "message": "Project saved successfully"}
+        logger.info(f"Canvas project saved by {current_user.username}: {request.name} "
+                    f"({result.layers_written} layers written)")
+        return {
+            "project_id": result.project_id,
+            "layers_written": result.layers_written,
+            "layers_deleted": result.layers_deleted,
+            "message": "Project saved successfully"
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error saving canvas project: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.patch("/canvas/projects/{project_id}", response_model=Dict[str, Any], tags=["canvas"])
+async def patch_canvas_project(project_id: str, request: CanvasPatchRequest,
+                               current_user: User = Depends(get_current_active_user),
+                               db: AsyncSession = Depends(get_async_db)):
+    """Save only the layers that changed"""
+    try:
+        project = await get_owned_canvas_project(db, project_id, current_user)
+        result = await db.run_sync(canvas_store.patch_project, project, request.layers, request.layer_count,
+                                   request.name)
+        return {
+            "project_id": result.project_id,
+            "layers_written": result.layers_written,
+            "layers_deleted": result.layers_deleted,
+            "message": "Project saved successfully"
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error patching canvas project: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/canvas/projects", response_model=List[Dict[str, Any]], tags=["canvas"])
-async def list_canvas_projects(current_user: User = Depends(get_current_active_user)):
+async def list_canvas_projects(current_user: User = Depends(get_current_active_user),
+                               db: AsyncSession = Depends(get_async_db)):
     """List user's canvas projects"""
     try:
-        projects_dir = Path(config["paths"]["uploads_dir"]) / "projects"
-        projects_dir.mkdir(exist_ok=True)
-
-        projects = []
-        for file_path in projects_dir.glob("*.json"):
-            try:
-                with open(file_path, 'r') as f:
-                    project = json.load(f)
-                    if project.get("user_id") == current_user.id:
-                        projects.append({
-                            "id": project["id"],
-                            "name": project["name"],
-                            "created_at": project["created_at"],
-                            "updated_at": project["updated_at"]
-                        })
-            except Exception as e:
-                logger.warning(f"Error reading project file {file_path}: {e}")
-
-        return sorted(projects, key=lambda x: x["updated_at"], reverse=True)
+        return await db.run_sync(canvas_store.list_projects, current_user.id)
     except Exception as e:
         logger.error(f"Error listing canvas projects: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/canvas/projects/{project_id}", response_model=CanvasProject, tags=["canvas"])
-async def load_canvas_project(project_id: str, current_user: User = Depends(get_current_active_user)):
+async def load_canvas_project(project_id: str, current_user: User = Depends(get_current_active_user),
+                              db: AsyncSession = Depends(get_async_db)):
     """Load a canvas project"""
     try:
-        projects_dir = Path(config["paths"]["uploads_dir"]) / "projects"
-        project_file = projects_dir / f"{project_id}.json"
-
-        if not project_file.exists():
-            raise HTTPException(status_code=404, detail="Project not found")
-
-        with open(project_file, 'r') as f:
-            project = json.load(f)
-
-        if project.get("user_id") != current_user.id:
-            raise HTTPException(status_code=403, detail="Access denied")
-
-        return CanvasProject(**project)
+        project = await get_owned_canvas_project(db, project_id, current_user)
+        summary = canvas_store.project_summary(project)
+        return CanvasProject(
+            id=summary["id"],
+            name=summary["name"],
+            layers=await db.run_sync(canvas_store.load_layers, project_id),
+            created_at=summary["created_at"],
+            updated_at=summary["updated_at"]
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -3990,23 +4337,12 @@ async def load_canvas_project(project_id: str, current_user: User = Depends(get_
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/canvas/projects/{project_id}", response_model=Dict[str, str], tags=["canvas"])
-async def delete_canvas_project(project_id: str, current_user: User = Depends(get_current_active_user)):
+async def delete_canvas_project(project_id: str, current_user: User = Depends(get_current_active_user),
+                                db: AsyncSession = Depends(get_async_db)):
     """Delete a canvas project"""
     try:
-        projects_dir = Path(config["paths"]["uploads_dir"]) / "projects"
-        project_file = projects_dir / f"{project_id}.json"
-
-        if not project_file.exists():
-            raise HTTPException(status_code=404, detail="Project not found")
-
-        # Check ownership
-        with open(project_file, 'r') as f:
-            project = json.load(f)
-
-        if project.get("user_id") != current_user.id:
-            raise HTTPException(status_code=403, detail="Access denied")
-
-        project_file.unlink()
+        project = await get_owned_canvas_project(db, project_id, current_user)
+        await db.run_sync(canvas_store.delete_project, project)
         logger.info(f"Canvas project deleted by {current_user.username}: {project_id}")
         return {"message": "Project deleted successfully"}
     except HTTPException:
@@ -4027,162 +4363,23 @@ async def get_task_status(task_id: str, current_user: User = Depends(get_current
         logger.error(f"Error getting task status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Git utility functions
-def run_git_command(command: List[str], cwd: Optional[str] = None) -> str:
-    """Run a git command and return the output"""
-    try:
-        result = subprocess.run(
-            ["git"] + command,
-            cwd=cwd or str(Path(__file__).parent.parent),
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Git command failed: {' '.join(command)} - {e.stderr}")
-        raise HTTPException(status_code=500, detail=f"Git command failed: {e.stderr}")
-
-def get_git_branches() -> List[GitBranch]:
-    """Get all git branches"""
+@app.post("/tasks/{task_id}/cancel")
+async def cancel_task(task_id: str, current_user: User = Depends(get_current_active_user)):
+    """Cancel a pending or running background task"""
     try:
-        # Get current branch
-        current_branch = run_git_command(["rev-parse", "--abbrev-ref", "HEAD"])
-
-        # Get all branches
-        branches_output = run_git_command(["branch", "-a"])
-
-        branches = []
-        for line in branches_output.split('\n'):
-            if not line.strip():
-                continue
-
-            is_current = line.startswith('*')
-            branch_name = line.strip().lstrip('*').strip()
-
-            # Skip remote branches for now, focus on local
-            if 'remotes/' in branch_name:
-                continue
-
-            # Get last commit info
-            try:
-                last_commit = run_git_command(["rev-parse", branch_name])
-                last_commit_date = run_git_command(["log", "-1", "--format=%ci", branch_name])
-            except:
-                last_commit = None
-                last_commit_date = None
-
-            branches.append(GitBranch(
-                name=branch_name,
-                is_current=is_current,
-                is_remote=False,
-                last_commit=last_commit,
-                last_commit_date=last_commit_date
-            ))
-
-        return branches
-    except Exception as e:
-        logger.error(f"Error getting git branches: {e}")
-        return []
-
-def get_git_commits(
-    branch: Optional[str] = None,
-    author: Optional[str] = None,
-    since: Optional[str] = None,
-    until: Optional[str] = None,
-    limit: int = 50,
-    skip: int = 0
-) -> List[GitCommit]:
-    """Get git commits with optional filters"""
-    try:
-        command = ["log", "--pretty=format:%H|%s|%an|%ae|%ci|%D", f"--max-count={limit}", f"--skip={skip}"]
-
-        if branch:
-            command.append(branch)
-        else:
-            command.append("--all")
-
-        if author:
-            command.extend(["--author", author])
-
-        if since:
-            command.extend(["--since", since])
-
-        if until:
-            command.extend(["--until", until])
-
-        output = run_git_command(command)
-
-        commits = []
-        for line in output.split('\n'):
-            if not line.strip():
-                continue
-
-            parts = line.split('|', 5)
-            if len(parts) < 6:
-                continue
-
-            commit_hash, message, author_name, author_email, date, refs = parts
-
-            # Parse refs for tags and branch info
-            tags = []
-            branch_ref = None
-            if refs:
-                refs_list = [ref.strip() for ref in refs.split(',')]
-                for ref in refs_list:
-                    if ref.startswith('tag: '):
-                        tags.append(ref[5:])
-                    elif ref.startswith('HEAD -> '):
-                        branch_ref = ref[8:]
-                    elif not ref.startswith('origin/'):
-                        branch_ref = ref
-
-            # Get additional stats
-            try:
-                stats_output = run_git_command(["show", "--stat", "--format=", commit_hash])
-                files_changed = len([l for l in stats_output.split('\n') if '|' in l])
-                insertions = sum(int(match.group(1)) for match in re.finditer(r'(\d+) insertions', stats_output))
-                deletions = sum(int(match.group(1)) for match in re.finditer(r'(\d+) deletions', stats_output))
-            except:
-                files_changed = None
-                insertions = None
-                deletions = None
-
-            # Get parents
-            try:
-                parents_output = run_git_command(["rev-parse", f"{commit_hash}^@"])
-                parents = parents_output.split('\n') if parents_output else []
-            except:
-                parents = []
-
-            commits.append(GitCommit(
-                hash=commit_hash,
-                message=message,
-                author=author_name,
-                author_email=author_email,
-                date=date,
-                branch=branch_ref,
-                tags=tags,
-                parents=parents,
-                files_changed=files_changed,
-                insertions=insertions,
-                deletions=deletions
-            ))
-
-        return commits
-    except Exception as e:
-        logger.error(f"Error getting git commits: {e}")
-        return []
-
-def get_git_authors() -> List[str]:
-    """Get list of all commit authors"""
-    try:
-        output = run_git_command(["log", "--format=%an", "--all"])
-        authors = list(set(output.split('\n')))
-        return sorted([a for a in authors if a])
+        task = await worker_manager.get_task_status(task_id)
+        # Tasks without an owner can only be cancelled by superusers
+        if task.get("user_id") != current_user.id and not current_user.is_superuser:
+            raise HTTPException(status_code=403, detail="Not allowed to cancel this task")
+        cancelled = await worker_manager.cancel_task(task_id)
+        return {"task_id": task_id, "cancelled": cancelled}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting git authors: {e}")
-        return []
+        logger.error(f"Error cancelling task: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 # Git API endpoints
 @app.get(
@@ -4194,7 +4391,11 @@ def get_git_authors() -> List[str]:
 )
 async def get_branches():
     """Get all git branches"""
-    return get_git_branches()
+    try:
+        return [GitBranch(**branch) for branch in await git_history.get_branches()]
+    except GitError as e:
+        logger.error(f"Error getting git branches: {e}")
+        return []
 
 @app.get(
     "/git/authors",
@@ -4205,7 +4406,11 @@ async def get_branches():
 )
 async def get_authors():
     """Get all git commit authors"""
-    return get_git_authors()
+    try:
+        return await git_history.get_authors()
+    except GitError as e:
+        logger.error(f"Error getting git authors: {e}")
+        return []
 
 @app.get(
     "/git/commits",
@@ -4227,7 +4432,12 @@ async def get_commits(
     skip: int = Query(0, description="Number of commits to skip for pagination", ge=0)
 ):
     """Get git commits with optional filters"""
-    return get_git_commits(branch, author, since, until, limit, skip)
+    try:
+        commits = await git_history.get_commits(branch, author, since, until, limit, skip)
+    except GitError as e:
+        logger.error(f"Error getting git commits: {e}")
+        return []
+    return [GitCommit(**commit) for commit in commits]
 
 @app.get(
     "/git/commits/{commit_hash}",
@@ -4239,11 +4449,10 @@ async def get_commits(
 async def get_commit_details(commit_hash: str):
     """Get details of a specific commit"""
     try:
-        commits = get_git_commits(limit=1)
-        for commit in commits:
-            if commit.hash.startswith(commit_hash):
-                return commit
-        raise HTTPException(status_code=404, detail="Commit not found")
+        commit = await git_history.get_commit(commit_hash)
+        if commit is None:
+            raise HTTPException(status_code=404, detail="Commit not found")
+        return GitCommit(**commit)
     except HTTPException:
         raise
     except Exception as e:
@@ -4260,7 +4469,7 @@ async def get_commit_details(commit_hash: str):
 async def get_commit_diff(commit_hash: str):
     """Get the diff for a specific commit"""
     try:
-        diff_output = run_git_command(["show", "--no-merges", "--format=", commit_hash])
+        diff_output = await git_history.run_command(["show", "--no-merges", "--format=", "--end-of-options", commit_hash])
         return {
             "commit_hash": commit_hash,
             "diff": diff_output
@@ -4279,7 +4488,7 @@ async def get_commit_diff(commit_hash: str):
 async def get_commit_files(commit_hash: str):
     """Get files changed in a commit"""
     try:
-        files_output = run_git_command(["show", "--name-status", "--format=", commit_hash])
+        files_output = await git_history.run_command(["show", "--name-status", "--format=", "--end-of-options", commit_hash])
         files = []
         for line in files_output.split('\n'):
             if '\t' in line:
@@ -4831,10 +5040,10 @@ async def create_rate_limit_config(
     db.commit()
 
     # Reload rate limit configurations
-    from .rate_limit_service import initialize_rate_limits, get_rate_limit_service
+    from .rate_limit_service import reload_rate_limits
     import asyncio
     from concurrent.futures import ThreadPoolExecutor
-    initialize_rate_limits(db)
+    reload_rate_limits(db)
 
     logger.info(f"Admin {current_user.username} created rate limit config: {name}")
     return {"message": "Rate limit configuration created successfully"}
@@ -4894,8 +5103,8 @@ async def update_rate_limit_config(
     db.commit()
 
     # Reload rate limit configurations
-    from .rate_limit_service import initialize_rate_limits, get_rate_limit_service
-    initialize_rate_limits(db)
+    from .rate_limit_service import reload_rate_limits
+    reload_rate_limits(db)
 
     logger.info(f"Admin {current_user.username} updated rate limit config: {config.name}")
     return {"message": "Rate limit configuration updated successfully"}
@@ -4975,8 +5184,8 @@ async def create_endpoint_rate_limit(
     db.commit()
 
     # Reload rate limit configurations
-    from .rate_limit_service import initialize_rate_limits, get_rate_limit_service
-    initialize_rate_limits(db)
+    from .rate_limit_service import reload_rate_limits
+    reload_rate_limits(db)
 
     logger.info(f"Admin {current_user.username} created endpoint rate limit: {endpoint_pattern}")
     return {"message": "Endpoint rate limit created successfully"}
@@ -5075,8 +5284,8 @@ async def create_user_rate_limit_override(
     db.commit()
 
     # Reload rate limit configurations
-    from .rate_limit_service import initialize_rate_limits
-    initialize_rate_limits(db)
+    from .rate_limit_service import reload_rate_limits
+    reload_rate_limits(db)
 
     logger.info(f"Admin {current_user.username} created rate limit override for user {user_id}")
     return {"message": "User rate limit override created successfully"}
@@ -5119,8 +5328,7 @@ async def clear_rate_limit_cache(
     manager = get_rate_limit_manager()
 
     # Clear in-memory cache
-    if hasattr(manager.limiter, 'memory_storage'):
-        manager.limiter.memory_storage.clear()
+    manager.limiter.clear()
 
     # Note: Redis cache would need separate clearing if implemented
 
@@ -5819,7 +6027,9 @@ async def get_cache_stats(current_user: User = Depends(get_current_active_user))
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    return cache_manager.get_stats()
+    stats = cache_manager.get_stats()
+    stats["responses"] = model_manager.response_cache.get_stats()
+    return stats
 
 @app.post(
     "/api/cache/clear",
@@ -5836,7 +6046,13 @@ async def clear_cache(
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Admin access required")
 
+    if cache_type == "responses":
+        model_manager.response_cache.clear()
+        return {"message": "Successfully cleared responses cache"}
+
     success = await cache_manager.clear_cache(cache_type)
+    if cache_type is None:
+        model_manager.response_cache.clear()
     if success:
         cache_desc = f"{cache_type} cache" if cache_type else "all caches"
         return {"message": f"Successfully cleared {cache_desc}"}
@@ -6002,7 +6218,7 @@ async def download_export(
 
     return FileResponse(
         path=operation.file_path,
-        filename=f"export_{operation_id}.{operation.format}",
+        filename=f"export_{operation_id}{''.join(Path(operation.file_path).suffixes)}",
         media_type="application/octet-stream"
     )
 
@@ -7153,19 +7369,19 @@ async def create_import(
     if import_type == "bulk_admin" and not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Admin access required for bulk import")
 
-    try:
-        import_data = None
-        if file:
-            # Read uploaded file
-            import_data = await file.read()
-        elif source_url:
+    if not file:
+        if source_url:
             # Download from URL (placeholder - would need implementation)
             raise HTTPException(status_code=501, detail="URL import not implemented yet")
+        raise HTTPException(status_code=400, detail="An import file is required")
 
+    try:
+        # The upload is spooled to disk by Starlette and copied in chunks
         operation_id = await export_service.create_import_operation(
             user_id=current_user.id,
             import_type=import_type,
-            import_data=import_data,
+            import_file=file.file,
+            filename=file.filename,
             validation_rules=validation_rules,
             requested_by_ip=getattr(request.client, 'host', None) if request else None,
             user_agent=request.headers.get('user-agent') if request else None
@@ -7203,15 +7419,72 @@ async def get_import_status(
         "import_type": operation.import_type,
         "status": operation.status,
         "progress": operation.progress,
-        "records_processed": operation.records_processed,
-        "records_failed": operation.records_failed,
-        "validation_errors": operation.validation_errors,
+        "total_records": operation.total_records,
+        "processed_records": operation.processed_records,
+        "successful_records": operation.successful_records,
+        "failed_records": operation.failed_records,
+        "skipped_records": operation.skipped_records,
+        "has_error_report": os.path.exists((operation.import_summary or {}).get("error_report", "")),
         "error_message": operation.error_message,
         "created_at": operation.created_at.isoformat(),
         "started_at": operation.started_at.isoformat() if operation.started_at else None,
         "completed_at": operation.completed_at.isoformat() if operation.completed_at else None
     }
 
+@app.post(
+    "/api/imports/{operation_id}/resume",
+    response_model=Dict[str, str],
+    summary="Resume Import",
+    description="Restart a failed or interrupted import from its last checkpoint",
+    tags=["data-import"]
+)
+async def resume_import(
+    operation_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Resume an import operation"""
+    operation = db.query(ImportOperation).filter(ImportOperation.id == operation_id).first()
+    if not operation:
+        raise HTTPException(status_code=404, detail="Import operation not found")
+
+    if operation.user_id != current_user.id and not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if not await export_service.resume_import_operation(operation_id):
+        raise HTTPException(status_code=409, detail="Import is not resumable")
+
+    return {"operation_id": operation_id, "message": "Import resumed"}
+
+@app.get(
+    "/api/imports/{operation_id}/errors",
+    summary="Download Import Error Report",
+    description="Download the JSON Lines report of rejected records and validation warnings",
+    tags=["data-import"]
+)
+async def download_import_errors(
+    operation_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Download import error report"""
+    operation = db.query(ImportOperation).filter(ImportOperation.id == operation_id).first()
+    if not operation:
+        raise HTTPException(status_code=404, detail="Import operation not found")
+
+    if operation.user_id != current_user.id and not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    report_path = (operation.import_summary or {}).get("error_report")
+    if not report_path or not os.path.exists(report_path):
+        raise HTTPException(status_code=404, detail="No error report for this import")
+
+    return FileResponse(
+        path=report_path,
+        filename=f"import_{operation_id}_errors.jsonl",
+        media_type="application/x-ndjson"
+    )
+
 @app.get(
     "/api/imports",
     response_model=List[Dict[str, Any]],
@@ -7239,8 +7512,8 @@ async def list_imports(
         "import_type": op.import_type,
         "status": op.status,
         "progress": op.progress,
-        "records_processed": op.records_processed,
-        "records_failed": op.records_failed,
+        "processed_records": op.processed_records,
+        "failed_records": op.failed_records,
         "created_at": op.created_at.isoformat(),
         "completed_at": op.completed_at.isoformat() if op.completed_at else None
     } for op in operations]
@@ -7305,8 +7578,8 @@ async def list_all_imports(
         "import_type": op.import_type,
         "status": op.status,
         "progress": op.progress,
-        "records_processed": op.records_processed,
-        "records_failed": op.records_failed,
+        "processed_records": op.processed_records,
+        "failed_records": op.failed_records,
         "created_at": op.created_at.isoformat(),
         "completed_at": op.completed_at.isoformat() if op.completed_at else None,
         "error_message": op.error_message
@@ -7348,7 +7621,7 @@ async def get_import_stats(
 
     # Calculate total records processed
     total_processed_result = db.query(
-        db.func.sum(ImportOperation.records_processed)
+        db.func.sum(ImportOperation.processed_records)
     ).filter(
         ImportOperation.created_at >= cutoff_date,
         ImportOperation.status == "completed"
@@ -12,7 +12,8 @@ from datetime import datetime, timedelta
 from collections import defaultdict, deque
 import json
 
-from .database import get_db, User, Conversation, Message, Task
+from .database import engine, async_engine, get_db, User, Conversation, Message, Task
+from .db_engine import get_pool_stats
 from .auth import get_current_active_user, User as UserModel
 
 logger = logging.getLogger("ultra_pinnacle")
@@ -386,9 +387,15 @@ async def get_enhanced_dashboard_metrics(db: Session = Depends(get_db)):
         "performance": metrics_collector.get_performance_metrics(),
         "application": metrics_collector.get_application_metrics(db),
         "health": metrics_collector.get_health_score(),
+        "database": {**get_pool_stats(engine), "async": get_pool_stats(async_engine)},
         "timestamp": datetime.now().isoformat()
     }
 
+@router.get("/enhanced/database")
+async def get_database_pool_metrics():
+    """Get connection pool occupancy and writer lock contention"""
+    return {**get_pool_stats(engine), "async": get_pool_stats(async_engine)}
+
 @router.get("/enhanced/health")
 async def get_system_health():
     """Get system health score and status"""
@@ -203,21 +203,16 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         method = request.method
         user_agent = request.headers.get('user-agent', '')
 
-        # Try to get user ID from JWT token without failing
+        # Identify the user from a locally verified JWT without failing
         user_id = None
-        try:
-            from .auth import get_current_user
-            from fastapi import Depends
-            from .database import get_db
-            # Try to authenticate user (this will fail silently if no token)
-            user = await get_current_user(
-                credentials=getattr(request, 'auth_credentials', None),
-                db=next(get_db())
-            )
-            user_id = user.id if user else None
-        except Exception:
-            # Not authenticated, use None for user_id
-            pass
+        authorization = request.headers.get("authorization", "")
+        if authorization[:7].lower() == "bearer ":
+            try:
+                from .auth import get_user_id_from_token
+                user_id = get_user_id_from_token(authorization[7:].strip())
+            except Exception:
+                # Not authenticated, use None for user_id
+                pass
 
         # Check rate limit
         try:
@@ -0,0 +1,211 @@
+"""
+Model residency management for Ultra Pinnacle AI Studio
+Keeps loaded models within a RAM budget using priority-aware LRU eviction
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from .logging_config import logger
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Remote API models hold only a client object
+REMOTE_MODEL_TYPES = {"openai", "anthropic", "google"}
+
+
+class ModelResidencyManager:
+    """
+    Tracks which models are resident in memory and decides what to evict.
+
+    Each resident model carries an estimated size. When admitting a new model
+    would exceed the memory budget, unpinned models are evicted in order of
+    lowest ``priority`` first, then least recently used. The default model
+    and any model listed in ``pinned`` are never evicted.
+
+    The manager only does bookkeeping; the owner (ModelManager) performs the
+    actual load and unload and reports them back.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        settings = config.get("model_residency", {}) or {}
+        models_config = config.get("models", {}) or {}
+
+        self.overhead_factor = float(settings.get("overhead_factor", 1.2))
+        self.budget_bytes = self._resolve_budget(settings)
+
+        self.pinned = set(settings.get("pinned", []))
+        default_model = models_config.get("default_model")
+        if default_model and settings.get("pin_default_model", True):
+            self.pinned.add(default_model)
+
+        self.priorities = {
+            name: int(model_config.get("priority", 0))
+            for name, model_config in models_config.items()
+            if isinstance(model_config, dict)
+        }
+
+        self.resident: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.RLock()
+
+        self.stats = {
+            "loads": 0,
+            "unloads": 0,
+            "evictions": 0,
+            "hits": 0,
+            "over_budget_loads": 0,
+            "total_load_time_ms": 0.0
+        }
+
+    def _resolve_budget(self, settings: Dict[str, Any]) -> Optional[int]:
+        """Budget in bytes from config, or a fraction of system RAM, or None for unlimited"""
+        budget_mb = settings.get("memory_budget_mb")
+        if budget_mb:
+            return int(float(budget_mb) * 1024 * 1024)
+
+        fraction = float(settings.get("memory_budget_fraction", 0.6))
+        if PSUTIL_AVAILABLE and fraction > 0:
+            return int(psutil.virtual_memory().total * fraction)
+
+        logger.warning("No model memory budget configured and psutil unavailable; residency is unbounded")
+        return None
+
+    def estimate_size(self, name: str, model_config: Dict[str, Any]) -> int:
+        """Estimate resident memory for a model in bytes"""
+        if model_config.get("memory_mb"):
+            return int(float(model_config["memory_mb"]) * 1024 * 1024)
+
+        if model_config.get("type") in REMOTE_MODEL_TYPES:
+            return 0
+
+        model_path = model_config.get("path")
+        if model_path:
+            path = Path(model_path)
+            try:
+                if path.is_file():
+                    return int(path.stat().st_size * self.overhead_factor)
+                if path.is_dir():
+                    total = sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+                    return int(total * self.overhead_factor)
+            except OSError as e:
+                logger.warning(f"Could not size model {name} at {model_path}: {e}")
+
+        # Missing files load as mock models that hold no weights
+        return 0
+
+    def resident_bytes(self) -> int:
+        """Total estimated bytes of resident models"""
+        with self.lock:
+            return sum(entry["size_bytes"] for entry in self.resident.values())
+
+    def is_resident(self, name: str) -> bool:
+        with self.lock:
+            return name in self.resident
+
+    def touch(self, name: str):
+        """Mark a resident model as just used"""
+        with self.lock:
+            entry = self.resident.get(name)
+            if entry is None:
+                return
+            entry["last_used"] = time.time()
+            entry["uses"] += 1
+            self.resident.move_to_end(name)
+            self.stats["hits"] += 1
+
+    def plan_admission(self, name: str, size_bytes: int) -> List[str]:
+        """Return models to evict so that ``name`` fits within the budget"""
+        with self.lock:
+            if self.budget_bytes is None or name in self.resident:
+                return []
+
+            needed = self.resident_bytes() + size_bytes - self.budget_bytes
+            if needed <= 0:
+                return []
+
+            # Lowest priority first; OrderedDict order breaks ties by recency
+            candidates = [
+                (self.priorities.get(model, 0), index, model)
+                for index, model in enumerate(self.resident)
+                if model not in self.pinned and model != name
+            ]
+            candidates.sort()
+
+            victims = []
+            for _, _, model in candidates:
+                if needed <= 0:
+                    break
+                victims.append(model)
+                needed -= self.resident[model]["size_bytes"]
+
+            if needed > 0:
+                self.stats["over_budget_loads"] += 1
+                logger.warning(
+                    f"Model {name} ({size_bytes / 1024 / 1024:.0f} MB) exceeds the memory budget "
+                    f"even after evicting all unpinned models"
+                )
+            return victims
+
+    def record_load(self, name: str, size_bytes: int, load_time_ms: float):
+        """Register a freshly loaded model"""
+        with self.lock:
+            now = time.time()
+            self.resident[name] = {
+                "size_bytes": size_bytes,
+                "loaded_at": now,
+                "last_used": now,
+                "uses": 0,
+                "load_time_ms": round(load_time_ms, 2)
+            }
+            self.resident.move_to_end(name)
+            self.stats["loads"] += 1
+            self.stats["total_load_time_ms"] += load_time_ms
+
+    def record_unload(self, name: str, evicted: bool = False):
+        """Forget an unloaded model"""
+        with self.lock:
+            if self.resident.pop(name, None) is None:
+                return
+            self.stats["unloads"] += 1
+            if evicted:
+                self.stats["evictions"] += 1
+
+    def model_status(self, name: str) -> Dict[str, Any]:
+        """Residency details for a single model"""
+        with self.lock:
+            entry = self.resident.get(name)
+            status = {
+                "resident": entry is not None,
+                "pinned": name in self.pinned,
+                "priority": self.priorities.get(name, 0)
+            }
+            if entry:
+                status.update({
+                    "estimated_size_mb": round(entry["size_bytes"] / 1024 / 1024, 1),
+                    "loaded_at": entry["loaded_at"],
+                    "last_used": entry["last_used"],
+                    "uses": entry["uses"],
+                    "load_time_ms": entry["load_time_ms"]
+                })
+            return status
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get residency statistics"""
+        with self.lock:
+            resident_bytes = self.resident_bytes()
+            loads = self.stats["loads"]
+            return {
+                **self.stats,
+                "avg_load_time_ms": round(self.stats["total_load_time_ms"] / loads, 2) if loads else 0,
+                "resident_models": list(self.resident.keys()),
+                "resident_mb": round(resident_bytes / 1024 / 1024, 1),
+                "budget_mb": round(self.budget_bytes / 1024 / 1024, 1) if self.budget_bytes is not None else None,
+                "pinned": sorted(self.pinned)
+            }
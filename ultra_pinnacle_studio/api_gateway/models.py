@@ -1,8 +1,10 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple
 import json
 from pathlib import Path
-from functools import lru_cache
 from .logging_config import logger
+from .inference_scheduler import InferenceScheduler
+from .response_cache import ResponseCache
+from .cache_manager import get_cache_manager
 
 try:
     from llama_cpp import Llama
@@ -23,6 +25,13 @@ except Exception as e:
     DIFFUSION_AVAILABLE = False
     logger.warning(f"diffusers/torch not available: {e}")
 
+class GenerationFallback(Exception):
+    """A backend call failed; carries the placeholder text returned to the caller.
+
+    Raised instead of returned so fallback text is never stored in the response cache.
+    """
+
+
 class ModelManager:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
@@ -30,6 +39,12 @@ class ModelManager:
         self.model_configs = {}  # Store configs for lazy loading
         self._load_model_configs()
 
+        # Batches concurrent generate_text_async calls per model on a dedicated executor
+        self.scheduler = InferenceScheduler(self.generate_batch, config)
+
+        # Shared completion cache (memory / Redis / SQLite tiers)
+        self.response_cache = ResponseCache(config, cache_manager=get_cache_manager())
+
     def _load_model_configs(self):
         """Load model configurations for lazy loading"""
         for model_name, model_config in self.config.get("models", {}).items():
@@ -132,21 +147,52 @@ class ModelManager:
 
         return result
 
-    @lru_cache(maxsize=100)
-    def _cached_generate_text(self, model_name: str, prompt: str, max_tokens: int, temperature: float) -> str:
-        """Cached text generation"""
-        return self._generate_text_uncached(model_name, prompt, max_tokens=max_tokens, temperature=temperature)
-
     def generate_text(self, model_name: str, prompt: str, **kwargs) -> str:
-        """Generate text using specified model with caching"""
+        """Generate text using specified model, served from the response cache when possible.
+
+        Pass ``cache=False`` to bypass the cache for a single call. Only greedy
+        output is cached unless ``cache_sampled=True``, which callers whose
+        answers may be reused pass to cache sampled output as well.
+        """
+        use_cache = kwargs.pop("cache", True)
+        cache_sampled = kwargs.pop("cache_sampled", False)
         max_tokens = kwargs.get("max_tokens", 512)
         temperature = kwargs.get("temperature", 0.7)
+        use_cache = use_cache and self.response_cache.should_cache(temperature, sampled=cache_sampled)
+
+        if use_cache:
+            cached = self.response_cache.get(model_name, prompt, max_tokens, temperature)
+            if cached is not None:
+                return cached
+
+        try:
+            response = self._generate_text_uncached(model_name, prompt, **kwargs)
+        except GenerationFallback as fallback:
+            return str(fallback)
+
+        if use_cache:
+            self.response_cache.set(model_name, prompt, max_tokens, temperature, response)
+        return response
+
+    def generate_batch(self, model_name: str, requests: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Generate text for a batch of (prompt, kwargs) requests against one model.
+
+        Runs on the inference scheduler's executor. The prompts are generated
+        one after another, since no backend here decodes several prompts at
+        once. Failures are returned in place of the result so one bad prompt
+        does not fail the whole batch.
+        """
+        results = []
+        for prompt, params in requests:
+            try:
+                results.append(self.generate_text(model_name, prompt, **params))
+            except Exception as e:
+                results.append(e)
+        return results
 
-        # Use cache for deterministic requests (temperature = 0)
-        if temperature == 0.0:
-            return self._cached_generate_text(model_name, prompt, max_tokens, temperature)
-        else:
-            return self._generate_text_uncached(model_name, prompt, **kwargs)
+    async def generate_text_async(self, model_name: str, prompt: str, **kwargs) -> str:
+        """Generate text through the batching scheduler without blocking the event loop"""
+        return await self.scheduler.submit(model_name, prompt, **kwargs)
 
     def _generate_text_uncached(self, model_name: str, prompt: str, **kwargs) -> str:
         """Generate text using specified model"""
@@ -168,7 +214,7 @@ class ModelManager:
                     return response["choices"][0]["text"].strip()
             except Exception as e:
                 logger.error(f"Error generating text with Llama model: {e}")
-                return f"Llama model error: {prompt[:50]}..."
+                raise GenerationFallback(f"Llama model error: {prompt[:50]}...")
 
         # Handle mock models or fallback responses
         if isinstance(model, dict):
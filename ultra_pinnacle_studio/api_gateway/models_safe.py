@@ -1,12 +1,18 @@
 """
 Safe model management that avoids segmentation faults
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple, Iterator, AsyncIterator
 import json
 import os
+import gc
+import threading
+import time
 from pathlib import Path
-from functools import lru_cache
 from .logging_config import logger
+from .inference_scheduler import InferenceScheduler
+from .response_cache import ResponseCache
+from .cache_manager import get_cache_manager
+from .model_residency import ModelResidencyManager
 
 # Safe imports with error handling
 LLAMA_AVAILABLE = False
@@ -78,6 +84,13 @@ def _enable_torch_diffusion():
 
     return True
 
+class GenerationFallback(Exception):
+    """A backend call failed; carries the placeholder text returned to the caller.
+
+    Raised instead of returned so fallback text is never stored in the response cache.
+    """
+
+
 class ModelManager:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
@@ -86,6 +99,16 @@ class ModelManager:
         self.api_clients = {}  # Cache for API clients
         self._load_model_configs()
 
+        # Keeps resident models within the configured RAM budget
+        self.residency = ModelResidencyManager(config)
+        self._load_lock = threading.RLock()
+
+        # Batches concurrent generate_text_async calls per model on a dedicated executor
+        self.scheduler = InferenceScheduler(self.generate_batch, config)
+
+        # Shared completion cache (memory / Redis / SQLite tiers)
+        self.response_cache = ResponseCache(config, cache_manager=get_cache_manager())
+
     def _load_model_configs(self):
         """Load model configurations for lazy loading"""
         for model_name, model_config in self.config.get("models", {}).items():
@@ -191,21 +214,55 @@ class ModelManager:
             return
 
     def get_model(self, name: str):
-        """Get a loaded model, loading it lazily if needed"""
-        if name in self.models:
-            return self.models[name]
+        """Get a loaded model, loading it lazily (and evicting others) if needed"""
+        model = self.models.get(name)
+        if model is not None:
+            self.residency.touch(name)
+            return model
+
+        if name not in self.model_configs:
+            return None
+
+        with self._load_lock:
+            # Another thread may have loaded it while we waited
+            if name in self.models:
+                self.residency.touch(name)
+                return self.models[name]
+
+            model_config = self.model_configs[name]
+            size_bytes = self.residency.estimate_size(name, model_config)
+            for victim in self.residency.plan_admission(name, size_bytes):
+                logger.info(f"Evicting model {victim} to make room for {name}")
+                self.unload_model(victim, evicted=True)
 
-        # Lazy load the model
-        if name in self.model_configs:
             try:
-                self._load_model(name, self.model_configs[name])
+                started = time.monotonic()
+                self._load_model(name, model_config)
+                if name in self.models:
+                    self.residency.record_load(name, size_bytes, (time.monotonic() - started) * 1000)
                 logger.info(f"Lazy loaded model: {name}")
                 return self.models.get(name)
             except Exception as e:
                 logger.error(f"Failed to lazy load model {name}: {e}")
                 return None
 
-        return None
+    def unload_model(self, name: str, evicted: bool = False) -> bool:
+        """Drop a loaded model so its memory can be reclaimed.
+
+        Generations already running keep their own reference and finish
+        normally; the weights are freed once they complete.
+        """
+        with self._load_lock:
+            model = self.models.pop(name, None)
+            if model is None:
+                return False
+            self.residency.record_unload(name, evicted=evicted)
+
+        # Not closed explicitly: an in-flight generation may still hold it
+        del model
+        gc.collect()
+        logger.info(f"Unloaded model: {name}")
+        return True
 
     def list_models(self) -> Dict[str, Any]:
         """List available models (both loaded and registered)"""
@@ -228,21 +285,116 @@ class ModelManager:
 
         return result
 
-    @lru_cache(maxsize=100)
-    def _cached_generate_text(self, model_name: str, prompt: str, max_tokens: int, temperature: float) -> str:
-        """Cached text generation"""
-        return self._generate_text_uncached(model_name, prompt, max_tokens=max_tokens, temperature=temperature)
-
     def generate_text(self, model_name: str, prompt: str, **kwargs) -> str:
-        """Generate text using specified model with caching"""
+        """Generate text using specified model, served from the response cache when possible.
+
+        Pass ``cache=False`` to bypass the cache for a single call. Only greedy
+        output is cached unless ``cache_sampled=True``, which callers whose
+        answers may be reused pass to cache sampled output as well.
+        """
+        use_cache = kwargs.pop("cache", True)
+        cache_sampled = kwargs.pop("cache_sampled", False)
         max_tokens = kwargs.get("max_tokens", 512)
         temperature = kwargs.get("temperature", 0.7)
+        use_cache = use_cache and self.response_cache.should_cache(temperature, sampled=cache_sampled)
 
-        # Use cache for deterministic requests (temperature = 0)
-        if temperature == 0.0:
-            return self._cached_generate_text(model_name, prompt, max_tokens, temperature)
-        else:
-            return self._generate_text_uncached(model_name, prompt, **kwargs)
+        if use_cache:
+            cached = self.response_cache.get(model_name, prompt, max_tokens, temperature)
+            if cached is not None:
+                return cached
+
+        try:
+            response = self._generate_text_uncached(model_name, prompt, **kwargs)
+        except GenerationFallback as fallback:
+            return str(fallback)
+
+        if use_cache:
+            self.response_cache.set(model_name, prompt, max_tokens, temperature, response)
+        return response
+
+    def generate_batch(self, model_name: str, requests: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Generate text for a batch of (prompt, kwargs) requests against one model.
+
+        Runs on the inference scheduler's executor. The prompts are generated
+        one after another, since no backend here decodes several prompts at
+        once. Failures are returned in place of the result so one bad prompt
+        does not fail the whole batch.
+        """
+        results = []
+        for prompt, params in requests:
+            try:
+                results.append(self.generate_text(model_name, prompt, **params))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def generate_text_async(self, model_name: str, prompt: str, **kwargs) -> str:
+        """Generate text through the batching scheduler without blocking the event loop"""
+        return await self.scheduler.submit(model_name, prompt, **kwargs)
+
+    def stream_text(self, model_name: str, prompt: str, **kwargs) -> Iterator[str]:
+        """Generate text token by token (blocking iterator)"""
+        model = self.get_model(model_name)
+        if not model:
+            raise ValueError(f"Model {model_name} not loaded")
+
+        max_tokens = kwargs.get("max_tokens", 512)
+        temperature = kwargs.get("temperature", 0.7)
+
+        if LLAMA_AVAILABLE and isinstance(model, Llama):
+            for chunk in model(prompt, max_tokens=max_tokens, temperature=temperature, stream=True):
+                token = chunk["choices"][0].get("text", "")
+                if token:
+                    yield token
+            return
+
+        model_type = model.get("type", "") if isinstance(model, dict) else ""
+        client = model.get("client") if isinstance(model, dict) else None
+
+        if model_type == "openai" and OPENAI_AVAILABLE and client:
+            stream = client.chat.completions.create(
+                model=model["config"]["model"],
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+            for chunk in stream:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    yield token
+            return
+
+        if model_type == "anthropic" and ANTHROPIC_AVAILABLE and client:
+            with client.messages.stream(
+                model=model["config"]["model"],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                for token in stream.text_stream:
+                    yield token
+            return
+
+        if model_type == "google" and GOOGLE_AVAILABLE and client:
+            gemini_model = client.GenerativeModel(model["config"]["model"])
+            for chunk in gemini_model.generate_content(prompt, stream=True):
+                if chunk.text:
+                    yield chunk.text
+            return
+
+        # Mock and placeholder models: replay the full response word by word
+        text = self.generate_text(model_name, prompt, **kwargs)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+    async def stream_text_async(self, model_name: str, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream tokens without blocking the event loop"""
+        async for token in self.scheduler.stream(
+            model_name, lambda: self.stream_text(model_name, prompt, **kwargs)
+        ):
+            yield token
 
     def _generate_text_uncached(self, model_name: str, prompt: str, **kwargs) -> str:
         """Generate text using specified model"""
@@ -268,7 +420,7 @@ class ModelManager:
                     return response.choices[0].message.content.strip()
             except Exception as e:
                 logger.error(f"Error with OpenAI API: {e}")
-                return f"OpenAI API error: {prompt[:50]}..."
+                raise GenerationFallback(f"OpenAI API error: {prompt[:50]}...")
 
         elif model_type == "anthropic" and ANTHROPIC_AVAILABLE:
             try:
@@ -283,7 +435,7 @@ class ModelManager:
                     return response.content[0].text.strip()
             except Exception as e:
                 logger.error(f"Error with Anthropic API: {e}")
-                return f"Anthropic API error: {prompt[:50]}..."
+                raise GenerationFallback(f"Anthropic API error: {prompt[:50]}...")
 
         elif model_type == "google" and GOOGLE_AVAILABLE:
             try:
@@ -294,7 +446,7 @@ class ModelManager:
                     return response.text.strip()
             except Exception as e:
                 logger.error(f"Error with Google API: {e}")
-                return f"Google API error: {prompt[:50]}..."
+                raise GenerationFallback(f"Google API error: {prompt[:50]}...")
 
         # Handle mock API models
         elif model_type in ["mock_openai", "mock_anthropic", "mock_google"]:
@@ -315,7 +467,7 @@ class ModelManager:
                     return response["choices"][0]["text"].strip()
             except Exception as e:
                 logger.error(f"Error generating text with Llama model: {e}")
-                return f"Llama model error: {prompt[:50]}..."
+                raise GenerationFallback(f"Llama model error: {prompt[:50]}...")
 
         # Handle mock models or fallback responses
         if isinstance(model, dict):
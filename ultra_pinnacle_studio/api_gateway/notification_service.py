@@ -14,12 +14,13 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, func, select
 
 from .database import (
     Notification, NotificationTemplate, NotificationTemplateTranslation,
     NotificationDelivery, NotificationPreference, NotificationHistory,
-    NotificationAnalytics, User, get_db
+    NotificationAnalytics, User, get_db, AsyncSessionLocal
 )
 from .logging_config import logger
 
@@ -501,13 +502,13 @@ class NotificationService:
             logger.error(f"Error updating analytics: {e}")
             db.rollback()
 
-    async def mark_as_read(self, notification_id: str, user_id: int, db: Session) -> bool:
+    async def mark_as_read(self, notification_id: str, user_id: int, db: AsyncSession) -> bool:
         """Mark a notification as read"""
         try:
-            notification = db.query(Notification).filter(
+            notification = (await db.execute(select(Notification).where(
                 Notification.id == notification_id,
                 Notification.recipient_id == user_id
-            ).first()
+            ))).scalar_one_or_none()
 
             if not notification:
                 return False
@@ -515,7 +516,7 @@ class NotificationService:
             if not notification.is_read:
                 notification.is_read = True
                 notification.read_at = datetime.now(timezone.utc)
-                db.commit()
+                await db.commit()
 
                 # Archive to history
                 await self._archive_notification(notification, "read", db)
@@ -524,109 +525,144 @@ class NotificationService:
 
         except Exception as e:
             logger.error(f"Error marking notification as read: {e}")
-            db.rollback()
+            await db.rollback()
             return False
 
-    async def _archive_notification(self, notification: Notification, interaction: str, db: Session):
+    async def mark_all_as_read(self, user_id: int, db: AsyncSession) -> int:
+        """Mark every unread notification of a user as read in one transaction"""
+        try:
+            notifications = (await db.execute(
+                self._visible_notifications(user_id).where(Notification.is_read == False)
+            )).scalars().all()
+            if not notifications:
+                return 0
+
+            now = datetime.now(timezone.utc)
+            for notification in notifications:
+                notification.is_read = True
+                notification.read_at = now
+            await db.commit()
+
+            await self._archive_notifications(notifications, "read", db)
+            return len(notifications)
+
+        except Exception as e:
+            logger.error(f"Error marking notifications as read: {e}")
+            await db.rollback()
+            return 0
+
+    async def _archive_notification(self, notification: Notification, interaction: str, db: AsyncSession):
         """Archive notification to history"""
+        await self._archive_notifications([notification], interaction, db)
+
+    async def _archive_notifications(self, notifications: List[Notification], interaction: str, db: AsyncSession):
+        """Archive notifications to history, loading deliveries and templates in one query each"""
         try:
-            # Get delivery status
-            deliveries = db.query(NotificationDelivery).filter(
-                NotificationDelivery.notification_id == notification.id
-            ).all()
-
-            channels_sent = [d.channel for d in deliveries]
-            delivery_status = {d.channel: d.status for d in deliveries}
-
-            history = NotificationHistory(
-                notification_id=notification.id,
-                template_key=notification.template.template_key,
-                recipient_id=notification.recipient_id,
-                sender_id=notification.sender_id,
-                title=notification.title,
-                message=notification.message,
-                category=notification.category,
-                priority=notification.priority,
-                channels_sent=channels_sent,
-                delivery_status=delivery_status,
-                user_interaction=interaction,
-                interaction_timestamp=datetime.now(timezone.utc)
-            )
+            ids = [n.id for n in notifications]
+            deliveries = (await db.execute(select(NotificationDelivery).where(
+                NotificationDelivery.notification_id.in_(ids)
+            ))).scalars().all()
+            template_keys = dict((await db.execute(
+                select(NotificationTemplate.id, NotificationTemplate.template_key).where(
+                    NotificationTemplate.id.in_({n.template_id for n in notifications})
+                )
+            )).all())
 
-            db.add(history)
-            db.commit()
+            by_notification: Dict[str, List[NotificationDelivery]] = {}
+            for delivery in deliveries:
+                by_notification.setdefault(delivery.notification_id, []).append(delivery)
+
+            now = datetime.now(timezone.utc)
+            for notification in notifications:
+                sent = by_notification.get(notification.id, [])
+                db.add(NotificationHistory(
+                    notification_id=notification.id,
+                    template_key=template_keys.get(notification.template_id),
+                    recipient_id=notification.recipient_id,
+                    sender_id=notification.sender_id,
+                    title=notification.title,
+                    message=notification.message,
+                    category=notification.category,
+                    priority=notification.priority,
+                    channels_sent=[d.channel for d in sent],
+                    delivery_status={d.channel: d.status for d in sent},
+                    user_interaction=interaction,
+                    interaction_timestamp=now
+                ))
+
+            await db.commit()
 
         except Exception as e:
             logger.error(f"Error archiving notification: {e}")
-            db.rollback()
+            await db.rollback()
+
+    def _visible_notifications(self, user_id: int):
+        """SELECT of a user's notifications that have not expired"""
+        return select(Notification).where(
+            Notification.recipient_id == user_id,
+            or_(
+                Notification.expires_at.is_(None),
+                Notification.expires_at > datetime.now(timezone.utc)
+            )
+        )
 
     async def get_user_notifications(self, user_id: int, limit: int = 50, offset: int = 0,
-                                   unread_only: bool = False, db: Session = Optional[Session]) -> List[Dict[str, Any]]:
+                                   unread_only: bool = False, db: AsyncSession = None,
+                                   category: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get notifications for a user"""
         if db is None:
-            db = next(get_db())
+            async with AsyncSessionLocal() as db:
+                return await self.get_user_notifications(user_id, limit, offset, unread_only, db, category)
 
         try:
-            query = db.query(Notification).filter(
-                Notification.recipient_id == user_id,
-                or_(
-                    Notification.expires_at.is_(None),
-                    Notification.expires_at > datetime.now(timezone.utc)
-                )
-            )
-
+            query = self._visible_notifications(user_id)
             if unread_only:
-                query = query.filter(Notification.is_read == False)
-
-            notifications = query.order_by(Notification.created_at.desc()).offset(offset).limit(limit).all()
-
-            result = []
-            for notification in notifications:
-                result.append({
-                    "id": notification.id,
-                    "title": notification.title,
-                    "message": notification.message,
-                    "priority": notification.priority,
-                    "category": notification.category,
-                    "is_read": notification.is_read,
-                    "action_url": notification.action_url,
-                    "action_text": notification.action_text,
-                    "created_at": notification.created_at.isoformat(),
-                    "expires_at": notification.expires_at.isoformat() if notification.expires_at else None
-                })
-
-            return result
+                query = query.where(Notification.is_read == False)
+            if category:
+                query = query.where(Notification.category == category)
+
+            notifications = (await db.execute(
+                query.order_by(Notification.created_at.desc()).offset(offset).limit(limit)
+            )).scalars().all()
+
+            return [{
+                "id": notification.id,
+                "title": notification.title,
+                "message": notification.message,
+                "priority": notification.priority,
+                "category": notification.category,
+                "is_read": notification.is_read,
+                "action_url": notification.action_url,
+                "action_text": notification.action_text,
+                "created_at": notification.created_at.isoformat(),
+                "expires_at": notification.expires_at.isoformat() if notification.expires_at else None
+            } for notification in notifications]
 
         except Exception as e:
             logger.error(f"Error getting user notifications: {e}")
             return []
-        finally:
-            if db:
-                db.close()
 
-    async def get_unread_count(self, user_id: int, db: Session = None) -> int:
+    async def get_unread_count(self, user_id: int, db: AsyncSession = None) -> int:
         """Get count of unread notifications for a user"""
         if db is None:
-            db = next(get_db())
+            async with AsyncSessionLocal() as db:
+                return await self.get_unread_count(user_id, db)
 
         try:
-            count = db.query(func.count(Notification.id)).filter(
+            count = (await db.execute(select(func.count(Notification.id)).where(
                 Notification.recipient_id == user_id,
                 Notification.is_read == False,
                 or_(
                     Notification.expires_at.is_(None),
                     Notification.expires_at > datetime.now(timezone.utc)
                 )
-            ).scalar()
+            ))).scalar()
 
             return count or 0
 
         except Exception as e:
             logger.error(f"Error getting unread count: {e}")
             return 0
-        finally:
-            if db:
-                db.close()
 
     async def shutdown(self):
         """Shutdown the notification service"""
@@ -0,0 +1,239 @@
+"""
+Query plan audit for Ultra Pinnacle AI Studio
+Runs EXPLAIN QUERY PLAN over the statements the app issues on its hot
+paths (or statements captured from a running engine) and reports full
+table scans and temporary sorts, along with declared indexes that the
+live database is missing.
+
+    python -m api_gateway.query_audit [--database URL] [--apply]
+"""
+import argparse
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import MetaData, event, func, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import ClauseElement
+
+from .db_engine import create_db_engine, create_missing_indexes, find_missing_indexes
+
+# "SCAN messages" or "SCAN m" for an aliased table; index, virtual table
+# and subquery scans are reported differently by SQLite
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+# Sorts after a range scan or join are often unavoidable, so they are
+# reported but do not fail the audit
+_TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)')
+
+# Placeholder bind values for the catalogued statements; plans do not
+# depend on the values, only on which columns are constrained
+SAMPLE_USER_ID = 1
+SAMPLE_CONVERSATION_ID = "sample-conversation"
+SAMPLE_PROJECT_ID = "sample-project"
+
+
+@dataclass
+class PlanIssue:
+    """One problem found in a query plan"""
+    kind: str  # 'full_scan' or 'temp_sort'
+    detail: str
+    table: Optional[str] = None
+
+
+@dataclass
+class QueryReport:
+    """Plan and issues for one audited statement"""
+    name: str
+    sql: str
+    plan: List[str]
+    issues: List[PlanIssue] = field(default_factory=list)
+
+
+def hot_queries() -> Dict[str, ClauseElement]:
+    """Statements issued on the request paths that must stay index-backed"""
+    from .database import (
+        ActivityLog, CanvasLayer, CanvasProject, Conversation, ConversationParticipant, Message,
+        Notification, NotificationDelivery, RateLimitLog
+    )
+    from .search_models import SearchAnalytics, SearchQuery
+
+    now = datetime.now(timezone.utc)
+    others = aliased(ConversationParticipant)
+    message_count = select(func.count(Message.id)).where(
+        Message.conversation_id == Conversation.id
+    ).correlate(Conversation).scalar_subquery()
+    participant_count = select(func.count(others.id)).where(
+        others.conversation_id == Conversation.id
+    ).correlate(Conversation).scalar_subquery()
+    visible = or_(Notification.expires_at.is_(None), Notification.expires_at > now)
+    recent = now - timedelta(hours=24)
+
+    return {
+        'conversation_list': select(
+            Conversation, ConversationParticipant.permission_level, participant_count, message_count
+        ).join(
+            ConversationParticipant, Conversation.id == ConversationParticipant.conversation_id
+        ).where(
+            ConversationParticipant.user_id == SAMPLE_USER_ID
+        ).order_by(Conversation.updated_at.desc()),
+        'conversation_access': select(ConversationParticipant).where(
+            ConversationParticipant.conversation_id == SAMPLE_CONVERSATION_ID,
+            ConversationParticipant.user_id == SAMPLE_USER_ID
+        ),
+        'conversation_messages': select(Message).where(
+            Message.conversation_id == SAMPLE_CONVERSATION_ID
+        ).order_by(Message.created_at),
+        'conversation_activities': select(ActivityLog).where(
+            ActivityLog.conversation_id == SAMPLE_CONVERSATION_ID
+        ).order_by(ActivityLog.created_at.desc()).limit(50),
+        'notification_list': select(Notification).where(
+            Notification.recipient_id == SAMPLE_USER_ID, visible
+        ).order_by(Notification.created_at.desc()).limit(50),
+        'notification_unread_count': select(func.count(Notification.id)).where(
+            Notification.recipient_id == SAMPLE_USER_ID, Notification.is_read == False, visible
+        ),
+        'notification_deliveries': select(NotificationDelivery).where(
+            NotificationDelivery.notification_id.in_(["n1", "n2"])
+        ),
+        'rate_limit_requests': select(func.count(RateLimitLog.id)).where(
+            RateLimitLog.created_at >= recent
+        ),
+        'rate_limit_violations': select(RateLimitLog.client_ip, func.count(RateLimitLog.id)).where(
+            RateLimitLog.created_at >= recent, RateLimitLog.limit_exceeded == True
+        ).group_by(RateLimitLog.client_ip),
+        'canvas_project_list': select(CanvasProject).where(
+            CanvasProject.user_id == SAMPLE_USER_ID
+        ).order_by(CanvasProject.updated_at.desc()),
+        'canvas_layer_hashes': select(CanvasLayer.position, CanvasLayer.content_hash, CanvasLayer.size_bytes).where(
+            CanvasLayer.project_id == SAMPLE_PROJECT_ID
+        ),
+        'search_analytics_lookup': select(SearchAnalytics).where(
+            SearchAnalytics.query.in_(["install guide", "models"])
+        ),
+        'search_popular_queries': select(SearchAnalytics).order_by(
+            SearchAnalytics.popularity_score.desc()
+        ).limit(20),
+        'search_recent_queries': select(SearchQuery).order_by(
+            SearchQuery.created_at.desc()
+        ).limit(100)
+    }
+
+
+def _compile(engine: Engine, statement: Any, parameters: Any = None) -> Tuple[str, Any]:
+    """Driver-level SQL and parameters for a SQLAlchemy statement or raw SQL"""
+    if not isinstance(statement, ClauseElement):
+        return statement, parameters or ()
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    return str(compiled), tuple(compiled.params[name] for name in compiled.positiontup or ())
+
+
+def explain(engine: Engine, statement: Any, parameters: Any = None) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines for a SQLAlchemy statement or raw SQL"""
+    sql, parameters = _compile(engine, statement, parameters)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def plan_issues(plan: Iterable[str]) -> List[PlanIssue]:
+    """Full table scans and temporary sorts in an EXPLAIN QUERY PLAN"""
+    issues = []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match:
+            issues.append(PlanIssue('full_scan', detail, match.group(1)))
+        elif _TEMP_SORT.search(detail):
+            issues.append(PlanIssue('temp_sort', detail))
+    return issues
+
+
+def audit(engine: Engine, queries: Optional[Dict[str, Any]] = None) -> List[QueryReport]:
+    """Explain every query (the hot-path catalogue by default) and collect its issues"""
+    reports = []
+    for name, statement in (queries if queries is not None else hot_queries()).items():
+        parameters = None
+        if isinstance(statement, tuple):
+            statement, parameters = statement
+        sql, parameters = _compile(engine, statement, parameters)
+        plan = explain(engine, sql, parameters)
+        reports.append(QueryReport(name, ' '.join(sql.split()), plan, plan_issues(plan)))
+    return reports
+
+
+def missing_indexes(engine: Engine, metadata: MetaData) -> List[Tuple[str, str]]:
+    """(table, index) pairs declared on ``metadata`` but absent from the database"""
+    return [(index.table.name, index.name) for index in find_missing_indexes(engine, metadata)]
+
+
+class QueryRecorder:
+    """
+    Capture the distinct statements an engine executes, for auditing the
+    queries a workload actually issues:
+
+        with QueryRecorder(engine) as recorder:
+            ...exercise the app...
+        audit(engine, recorder.queries())
+    """
+
+    def __init__(self, engine: Engine, predicate: Callable[[str], bool] = None):
+        self.engine = engine
+        self.predicate = predicate or (lambda sql: sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')))
+        self.statements: Dict[str, Any] = {}
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and self.predicate(statement):
+            self.statements.setdefault(statement, parameters)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def queries(self) -> Dict[str, Tuple[str, Any]]:
+        return {f"captured_{i}": (sql, params) for i, (sql, params) in enumerate(self.statements.items(), 1)}
+
+
+def format_report(reports: Sequence[QueryReport], missing: Sequence[Tuple[str, str]]) -> str:
+    lines = []
+    flagged = [report for report in reports if report.issues]
+    lines.append(f"Audited {len(reports)} queries, {len(flagged)} with issues")
+    for report in flagged:
+        lines.append(f"\n[{report.name}] {report.sql}")
+        for issue in report.issues:
+            lines.append(f"  {issue.kind}: {issue.detail}")
+    if missing:
+        lines.append(f"\n{len(missing)} declared indexes missing from the database:")
+        lines.extend(f"  {table}.{index}" for table, index in missing)
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report full scans and missing indexes on hot queries")
+    parser.add_argument("--database", help="Database URL (defaults to the configured database)")
+    parser.add_argument("--apply", action="store_true", help="Create declared indexes the database is missing")
+    args = parser.parse_args(argv)
+
+    from .database import Base, engine as app_engine
+    from .search_models import Base as SearchBase
+
+    engine = create_db_engine(args.database, {}) if args.database else app_engine
+    metadatas = (Base.metadata, SearchBase.metadata)
+
+    if args.apply:
+        for metadata in metadatas:
+            create_missing_indexes(engine, metadata)
+
+    reports = audit(engine)
+    missing = [pair for metadata in metadatas for pair in missing_indexes(engine, metadata)]
+    print(format_report(reports, missing))
+    full_scans = any(issue.kind == 'full_scan' for report in reports for issue in report.issues)
+    return 1 if missing or full_scans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
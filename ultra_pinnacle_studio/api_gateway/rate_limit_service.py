@@ -3,12 +3,16 @@ Rate Limit Service - Loads and manages rate limit configurations from database
 """
 
 import logging
-from typing import Dict, Optional
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from .config import config
 from .database import (
-    get_db, UserType, RateLimitConfig, UserRateLimit,
+    get_db, SessionLocal, UserType, RateLimitConfig, UserRateLimit,
     EndpointRateLimit, RateLimitLog, SystemLoadMetrics
 )
+from .log_pipeline import BatchingQueue
 from .rate_limiter import get_rate_limit_manager, RateLimitConfig as LimiterConfig
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger("ultra_pinnacle")
@@ -20,6 +24,19 @@ class RateLimitService:
         self.manager = get_rate_limit_manager()
         self._initialized = False
 
+        # Rate limit events are inserted in batches by a background flusher
+        pipeline_config = config.get("log_pipeline", {})
+        self.event_queue = BatchingQueue(
+            "rate-limit-events",
+            self._write_events,
+            max_size=pipeline_config.get("max_queue_size", 10000),
+            batch_size=pipeline_config.get("batch_size", 500),
+            flush_interval=pipeline_config.get("flush_interval_seconds", 1.0),
+            policy=pipeline_config.get("policy", "drop"),
+            sample_rate=pipeline_config.get("sample_rate", 0.1),
+            block_timeout=pipeline_config.get("block_timeout_seconds", 0.05)
+        )
+
     def initialize_from_database(self, db: Session):
         """Load all rate limit configurations from database"""
         try:
@@ -31,13 +48,13 @@ class RateLimitService:
                     RateLimitConfig.is_active == True
                 ).all()
 
-                for config in configs:
+                for rate_config in configs:
                     limiter_config = LimiterConfig(
-                        requests_per_minute=config.requests_per_minute,
-                        requests_per_hour=config.requests_per_hour,
-                        requests_per_day=config.requests_per_day,
-                        burst_limit=config.burst_limit,
-                        window_seconds=config.window_seconds
+                        requests_per_minute=rate_config.requests_per_minute,
+                        requests_per_hour=rate_config.requests_per_hour,
+                        requests_per_day=rate_config.requests_per_day,
+                        burst_limit=rate_config.burst_limit,
+                        window_seconds=rate_config.window_seconds
                     )
 
                     # Load for all users of this type
@@ -52,6 +69,7 @@ class RateLimitService:
                 EndpointRateLimit.is_active == True
             ).all()
 
+            endpoint_rules = []
             for limit in endpoint_limits:
                 limiter_config = LimiterConfig(
                     requests_per_minute=limit.requests_per_minute,
@@ -61,9 +79,13 @@ class RateLimitService:
                     window_seconds=limit.window_seconds
                 )
 
-                self.manager.load_endpoint_config(limit.endpoint_pattern, limiter_config)
+                endpoint_rules.append((limit.endpoint_pattern, limit.method or "*",
+                                       limit.priority or 0, limiter_config))
                 logger.info(f"Loaded endpoint rate limit: {limit.endpoint_pattern}")
 
+            # Replace the whole rule set so removed or deactivated rows stop matching
+            self.manager.replace_endpoint_configs(endpoint_rules)
+
             # Load user-specific overrides
             user_overrides = db.query(UserRateLimit).filter(
                 UserRateLimit.is_active == True
@@ -105,28 +127,35 @@ class RateLimitService:
             logger.error(f"Error loading rate limit configurations: {e}")
             # Continue with default configurations
 
-    def log_rate_limit_event(self, db: Session, user_id: Optional[int], client_ip: str,
+    def log_rate_limit_event(self, db: Optional[Session], user_id: Optional[int], client_ip: str,
                            endpoint: str, method: str, limit_type: str,
                            limit_exceeded: bool, requests_remaining: int,
                            reset_time, response_time_ms: Optional[float]):
-        """Log a rate limit event to database"""
+        """Queue a rate limit event for a batched insert (``db`` is no longer used)"""
+        self.event_queue.put({
+            "user_id": user_id,
+            "client_ip": client_ip,
+            "endpoint": endpoint,
+            "method": method,
+            "limit_type": limit_type,
+            "limit_exceeded": limit_exceeded,
+            "requests_remaining": requests_remaining,
+            "reset_time": reset_time,
+            "response_time_ms": response_time_ms,
+            "created_at": datetime.now(timezone.utc)
+        })
+
+    def _write_events(self, events: List[Dict]):
+        """Insert a batch of rate limit events in one statement and commit"""
+        db = SessionLocal()
         try:
-            log_entry = RateLimitLog(
-                user_id=user_id,
-                client_ip=client_ip,
-                endpoint=endpoint,
-                method=method,
-                limit_type=limit_type,
-                limit_exceeded=limit_exceeded,
-                requests_remaining=requests_remaining,
-                reset_time=reset_time,
-                response_time_ms=response_time_ms
-            )
-            db.add(log_entry)
+            db.execute(insert(RateLimitLog), events)
             db.commit()
-        except Exception as e:
-            logger.error(f"Error logging rate limit event: {e}")
+        except Exception:
             db.rollback()
+            raise
+        finally:
+            db.close()
 
     def get_rate_limit_stats(self, db: Session, hours: int = 24) -> Dict:
         """Get rate limiting statistics"""
@@ -217,4 +246,8 @@ def initialize_rate_limits(db: Session):
     """Initialize rate limiting from database (called during app startup)"""
     service = get_rate_limit_service()
     if not service._initialized:
-        service.initialize_from_database(db)
\ No newline at end of file
+        service.initialize_from_database(db)
+
+def reload_rate_limits(db: Session):
+    """Reload rate limiting from database after configuration changes"""
+    get_rate_limit_service().initialize_from_database(db)
\ No newline at end of file
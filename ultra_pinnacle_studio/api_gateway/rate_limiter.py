@@ -3,6 +3,7 @@ Advanced Rate Limiting System for Ultra Pinnacle AI Studio
 Implements sliding window algorithm with Redis/in-memory fallback
 """
 
+import os
 import time
 import asyncio
 import threading
@@ -11,9 +12,11 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass
 import json
 import re
-from collections import defaultdict, deque
+from collections import deque
 import logging
 
+from .config import config
+
 logger = logging.getLogger("ultra_pinnacle")
 
 try:
@@ -41,113 +44,391 @@ class RateLimitConfig:
     burst_limit: int = 10
     window_seconds: int = 60
 
-class SlidingWindowLimiter:
-    """Sliding window rate limiter using Redis or in-memory storage"""
+# Evaluates every window of one client atomically with GCRA in a single
+# round trip. KEYS are the per-window keys; ARGV holds (limit, window
+# seconds) pairs in the same order. Returns (allowed, remaining, retry ms)
+# per window; the request is only recorded when every window admits it.
+GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+local results = {}
+local updates = {}
+local admitted = true
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i]) * 1000
+    local tat = tonumber(redis.call('GET', key) or now)
+    if tat < now then
+        tat = now
+    end
+    if limit <= 0 then
+        admitted = false
+        results[#results + 1] = 0
+        results[#results + 1] = 0
+        results[#results + 1] = window
+    else
+        local interval = window / limit
+        local new_tat = tat + interval
+        if new_tat - now <= window then
+            updates[i] = new_tat
+            results[#results + 1] = 1
+            results[#results + 1] = math.floor((now + window - new_tat) / interval + 1e-9)
+            results[#results + 1] = 0
+        else
+            admitted = false
+            results[#results + 1] = 0
+            results[#results + 1] = 0
+            results[#results + 1] = math.ceil(tat + interval - window - now)
+        end
+    end
+end
+if admitted then
+    for i, key in ipairs(KEYS) do
+        redis.call('SET', key, string.format('%.3f', updates[i]), 'PX', math.ceil(updates[i] - now) + 1)
+    end
+end
+return results
+"""
+
+
+class _Shard:
+    """A slice of the in-memory limiter state with its own lock"""
+    __slots__ = ("lock", "states", "next_sweep")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states: Dict[str, Any] = {}
+        self.next_sweep = 0.0
+
 
-    def __init__(self, redis_url: Optional[str] = None):
-        self.redis_client = None
-        if REDIS_AVAILABLE and redis_url:
+class SlidingWindowLimiter:
+    """Sliding window rate limiter using Redis or in-memory storage
+
+    In memory, ``algorithm`` selects how each window is tracked:
+
+    * ``gcra`` (default): generic cell rate algorithm; one float (the
+      theoretical arrival time) per key, exact for a steady rate with a
+      burst of ``limit`` requests.
+    * ``sliding_window_counter``: current and previous fixed-window counts,
+      weighted by overlap; three numbers per key.
+    * ``sliding_log``: the original timestamp log; exact but O(limit)
+      memory per key.
+
+    State is sharded by identifier so all windows of one client share a
+    lock, and idle keys are swept once their state has fully drained.
+    Rejected requests are not counted against any window.
+
+    With Redis, all windows of a request are evaluated by one GCRA Lua
+    script (one round trip, atomic across app servers). If Redis errors or
+    exceeds ``redis_timeout_ms``, checks fall back to the in-memory limiter
+    for ``redis_retry_seconds`` before Redis is tried again.
+    """
+
+    ALGORITHMS = ("gcra", "sliding_window_counter", "sliding_log")
+
+    def __init__(self, redis_url: Optional[str] = None, algorithm: str = "gcra",
+                 shards: int = 16, sweep_interval_seconds: float = 60.0,
+                 redis_max_connections: int = 50, redis_timeout_ms: float = 50,
+                 redis_retry_seconds: float = 5.0, redis_client=None):
+        self.redis_client = redis_client
+        if self.redis_client is None and REDIS_AVAILABLE and redis_url:
             try:
-                self.redis_client = redis.from_url(redis_url)
+                pool = redis.ConnectionPool.from_url(
+                    redis_url,
+                    max_connections=redis_max_connections,
+                    socket_timeout=redis_timeout_ms / 1000.0,
+                    socket_connect_timeout=max(redis_timeout_ms / 1000.0, 1.0)
+                )
+                self.redis_client = redis.Redis(connection_pool=pool)
                 self.redis_client.ping()
                 logger.info("Redis connection established for rate limiting")
             except Exception as e:
                 logger.warning(f"Redis connection failed: {e}, falling back to in-memory")
                 self.redis_client = None
 
+        self.redis_script = self.redis_client.register_script(GCRA_LUA) if self.redis_client else None
+        self.redis_retry_seconds = redis_retry_seconds
+        self._redis_down_until = 0.0
+        self.redis_errors = 0
+
+        if algorithm not in self.ALGORITHMS:
+            logger.warning(f"Unknown rate limit algorithm {algorithm!r}, using gcra")
+            algorithm = "gcra"
+        self.algorithm = algorithm
+        self.sweep_interval = sweep_interval_seconds
+
         # In-memory fallback storage
-        self.memory_storage: Dict[str, deque] = defaultdict(lambda: deque(maxlen=10000))
-        self.lock = threading.Lock()
+        self.shards = [_Shard() for _ in range(max(1, int(shards)))]
 
     def _get_key(self, identifier: str, limit_type: str, window: str) -> str:
-        """Generate Redis/in-memory key"""
+        """Generate in-memory key"""
         return f"rate_limit:{limit_type}:{identifier}:{window}"
 
-    def _cleanup_old_entries(self, entries: deque, window_seconds: int) -> deque:
-        """Remove entries older than the window"""
-        current_time = time.time()
-        cutoff_time = current_time - window_seconds
-
-        # Remove old entries from the left (oldest first)
-        while entries and entries[0] < cutoff_time:
+    def _get_redis_key(self, identifier: str, limit_type: str, window: str) -> str:
+        """Redis key; the hash tag keeps one client's windows in one cluster slot"""
+        return f"rate_limit:{{{identifier}}}:{limit_type}:{window}"
+
+    def _redis_available(self) -> bool:
+        return self.redis_script is not None and time.time() >= self._redis_down_until
+
+    def _redis_failed(self, error: Exception):
+        self.redis_errors += 1
+        self._redis_down_until = time.time() + self.redis_retry_seconds
+        logger.error(f"Redis rate limit check failed: {error}; using in-memory limits "
+                     f"for {self.redis_retry_seconds}s")
+
+    def _check_redis_limits(self, identifier: str,
+                            windows: List[Tuple[int, int, str]]) -> List[Tuple[bool, int, float]]:
+        """Evaluate all windows with one script call"""
+        keys = [self._get_redis_key(identifier, limit_type, f"{window_seconds}s")
+                for _, window_seconds, limit_type in windows]
+        args = [value for limit, window_seconds, _ in windows for value in (int(limit), int(window_seconds))]
+        flat = self.redis_script(keys=keys, args=args)
+        return [(bool(flat[i]), int(flat[i + 1]), int(flat[i + 2]) / 1000.0) for i in range(0, len(flat), 3)]
+
+    def _shard(self, identifier: str) -> _Shard:
+        return self.shards[hash(identifier) % len(self.shards)]
+
+    def _evaluate(self, state: Any, limit: int, window_seconds: int,
+                  now: float) -> Tuple[bool, int, float, Any]:
+        """Evaluate one window; only expired log entries are pruned.
+
+        Returns ``(allowed, remaining, retry_after, new_state)``; ``new_state``
+        is what to store if the request is admitted.
+        """
+        if limit <= 0:
+            return False, 0, float(window_seconds), state
+
+        if self.algorithm == "gcra":
+            interval = window_seconds / limit
+            tat = max(state if state is not None else now, now)
+            new_tat = tat + interval
+            if new_tat - now <= window_seconds + 1e-9:
+                return True, int((now + window_seconds - new_tat) / interval + 1e-9), 0.0, new_tat
+            return False, 0, tat + interval - window_seconds - now, state
+
+        if self.algorithm == "sliding_window_counter":
+            index = int(now // window_seconds)
+            previous = current = 0
+            if state is not None:
+                if state[0] == index:
+                    previous, current = state[1], state[2]
+                elif state[0] == index - 1:
+                    previous = state[2]
+            weight = 1.0 - (now - index * window_seconds) / window_seconds
+            estimate = previous * weight + current
+            if estimate + 1 <= limit:
+                return True, max(0, int(limit - estimate - 1)), 0.0, (index, previous, current + 1, window_seconds)
+            return False, 0, (index + 1) * window_seconds - now, state
+
+        # sliding_log
+        entries = state[1] if state is not None else deque()
+        cutoff = now - window_seconds
+        while entries and entries[0] <= cutoff:
             entries.popleft()
-
-        return entries
-
-    def _check_memory_limit(self, key: str, limit: int, window_seconds: int) -> Tuple[bool, int]:
-        """Check rate limit using in-memory storage"""
-        with self.lock:
-            entries = self.memory_storage[key]
-            entries = self._cleanup_old_entries(entries, window_seconds)
-
-            current_time = time.time()
-            entries.append(current_time)
-            self.memory_storage[key] = entries
-
-            request_count = len(entries)
-            return request_count <= limit, max(0, limit - request_count)
-
-    def _check_redis_limit(self, key: str, limit: int, window_seconds: int) -> Tuple[bool, int]:
-        """Check rate limit using Redis"""
-        try:
-            current_time = time.time()
-            window_start = current_time - window_seconds
-
-            # Remove old entries and count current ones
-            removed_count = self.redis_client.zremrangebyscore(key, 0, window_start)
-            current_count = self.redis_client.zcard(key)
-
-            # Add current request
-            self.redis_client.zadd(key, {str(current_time): current_time})
-            self.redis_client.expire(key, window_seconds * 2)  # Expire key after 2x window
-
-            new_count = current_count - removed_count + 1
-            return new_count <= limit, max(0, limit - new_count)
-        except Exception as e:
-            logger.error(f"Redis rate limit check failed: {e}")
-            return True, limit  # Allow on Redis failure
+        if len(entries) + 1 <= limit:
+            return True, limit - len(entries) - 1, 0.0, (window_seconds, entries)
+        return False, 0, entries[0] + window_seconds - now, state
+
+    def _commit(self, states: Dict[str, Any], key: str, new_state: Any, now: float):
+        if self.algorithm == "sliding_log":
+            new_state[1].append(now)
+        states[key] = new_state
+
+    @staticmethod
+    def _expired(state: Any, now: float) -> bool:
+        """Whether a stored state is indistinguishable from an absent one"""
+        if isinstance(state, float):
+            return state <= now
+        if len(state) == 4:
+            return (state[0] + 2) * state[3] <= now
+        return not state[1] or state[1][-1] + state[0] <= now
+
+    def _sweep(self, shard: _Shard, now: float):
+        """Drop idle keys from a shard (called with the shard lock held)"""
+        shard.next_sweep = now + self.sweep_interval
+        idle = [key for key, state in shard.states.items() if self._expired(state, now)]
+        for key in idle:
+            del shard.states[key]
+
+    def check_limits(self, identifier: str,
+                     windows: List[Tuple[int, int, str]]) -> List[Tuple[bool, int, float]]:
+        """Check several ``(limit, window_seconds, limit_type)`` windows for one identifier.
+
+        The request is counted in every window only if all of them admit it.
+        Returns ``(allowed, remaining, retry_after_seconds)`` per window.
+        """
+        if self._redis_available():
+            try:
+                return self._check_redis_limits(identifier, windows)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._check_memory_limits(identifier, windows)
+
+    def _check_memory_limits(self, identifier: str,
+                             windows: List[Tuple[int, int, str]]) -> List[Tuple[bool, int, float]]:
+        """Evaluate all windows against the in-memory shard of one identifier"""
+        now = time.time()
+        shard = self._shard(identifier)
+        with shard.lock:
+            if now >= shard.next_sweep:
+                self._sweep(shard, now)
+
+            evaluated = []
+            for limit, window_seconds, limit_type in windows:
+                key = self._get_key(identifier, limit_type, f"{window_seconds}s")
+                allowed, remaining, retry_after, new_state = self._evaluate(
+                    shard.states.get(key), limit, window_seconds, now
+                )
+                evaluated.append((key, allowed, remaining, retry_after, new_state))
+
+            if all(item[1] for item in evaluated):
+                for key, _, _, _, new_state in evaluated:
+                    self._commit(shard.states, key, new_state, now)
+
+            return [(allowed, remaining, max(0.0, retry_after))
+                    for _, allowed, remaining, retry_after, _ in evaluated]
 
     def check_limit(self, identifier: str, limit: int, window_seconds: int, limit_type: str = "general") -> Tuple[bool, int]:
         """Check if request is within rate limit"""
-        key = self._get_key(identifier, limit_type, f"{window_seconds}s")
-
-        if self.redis_client:
-            return self._check_redis_limit(key, limit, window_seconds)
-        else:
-            return self._check_memory_limit(key, limit, window_seconds)
+        allowed, remaining, _ = self.check_limits(identifier, [(limit, window_seconds, limit_type)])[0]
+        return allowed, remaining
 
     def get_remaining_time(self, identifier: str, limit_type: str, window_seconds: int) -> int:
-        """Get seconds until oldest request expires"""
+        """Get seconds until the window has fully drained"""
         key = self._get_key(identifier, limit_type, f"{window_seconds}s")
 
-        if self.redis_client:
+        if self._redis_available():
             try:
-                # Get the oldest timestamp in the window
-                oldest = self.redis_client.zrange(key, 0, 0, withscores=True)
-                if oldest:
-                    current_time = time.time()
-                    oldest_time = oldest[0][1]
-                    return max(0, int(window_seconds - (current_time - oldest_time)))
-                return 0
+                redis_key = self._get_redis_key(identifier, limit_type, f"{window_seconds}s")
+                return max(0, int(self.redis_client.pttl(redis_key) / 1000))
             except Exception as e:
-                logger.error(f"Redis get remaining time failed: {e}")
-                return 0
-        else:
-            with self.lock:
-                entries = self.memory_storage[key]
-                if entries:
-                    current_time = time.time()
-                    oldest_time = entries[0]
-                    return max(0, int(window_seconds - (current_time - oldest_time)))
+                self._redis_failed(e)
+
+        shard = self._shard(identifier)
+        with shard.lock:
+            state = shard.states.get(key)
+            if state is None:
                 return 0
+            current_time = time.time()
+            if isinstance(state, float):
+                return max(0, int(state - current_time))
+            if len(state) == 4:
+                return max(0, int((state[0] + 2) * state[3] - current_time))
+            if state[1]:
+                return max(0, int(window_seconds - (current_time - state[1][0])))
+            return 0
+
+    def clear(self):
+        """Forget all in-memory rate limit state"""
+        for shard in self.shards:
+            with shard.lock:
+                shard.states.clear()
+
+    def key_count(self) -> int:
+        """Number of keys currently tracked in memory"""
+        return sum(len(shard.states) for shard in self.shards)
+
+class EndpointMatcher:
+    """Compiled router from endpoint patterns to rate limit configs.
+
+    Patterns are literal paths where ``*`` matches any run of characters.
+    All rules applicable to a method are compiled into one alternation of
+    named groups, ordered by precedence, so a lookup is a single regex match
+    and the first matching alternative wins:
+
+    1. higher ``priority``
+    2. exact patterns before wildcard patterns
+    3. longer literal text (more specific) first
+    4. rules for a specific method before ``*`` rules
+    5. pattern, then method, alphabetically as a stable tie-break
+
+    Results are memoized per ``(method, endpoint)``.
+    """
+
+    def __init__(self, rules: Optional[List[Tuple[str, str, int, "RateLimitConfig"]]] = None,
+                 cache_size: int = 4096):
+        self.rules = sorted(rules or [], key=self._precedence)
+        self.cache_size = cache_size
+        self._compiled: Dict[str, Tuple[Optional["re.Pattern"], List["RateLimitConfig"]]] = {}
+        self._cache: Dict[Tuple[str, str], Optional["RateLimitConfig"]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _precedence(rule: Tuple[str, str, int, "RateLimitConfig"]):
+        pattern, method, priority, _ = rule
+        return (-priority, "*" in pattern, -len(pattern.replace("*", "")), method == "*", pattern, method)
+
+    @staticmethod
+    def pattern_to_regex(pattern: str) -> str:
+        return ".*".join(re.escape(part) for part in pattern.split("*"))
+
+    def _compile(self, method: str) -> Tuple[Optional["re.Pattern"], List["RateLimitConfig"]]:
+        applicable = [rule for rule in self.rules if method == "*" or rule[1] in ("*", method)]
+        if not applicable:
+            return None, []
+        combined = "|".join(
+            f"(?P<r{index}>{self.pattern_to_regex(pattern)})"
+            for index, (pattern, _, _, _) in enumerate(applicable)
+        )
+        return re.compile(f"(?:{combined})\\Z"), [rule[3] for rule in applicable]
+
+    def match(self, endpoint: str, method: str = "*") -> Optional["RateLimitConfig"]:
+        """Config of the highest-precedence rule matching the endpoint, or None"""
+        method = (method or "*").upper()
+        cache_key = (method, endpoint)
+        try:
+            return self._cache[cache_key]
+        except KeyError:
+            pass
+
+        compiled = self._compiled.get(method)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(method)
+                if compiled is None:
+                    compiled = self._compile(method)
+                    self._compiled[method] = compiled
+
+        regex, configs = compiled
+        result = None
+        if regex is not None:
+            found = regex.match(endpoint)
+            if found:
+                result = configs[int(found.lastgroup[1:])]
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[cache_key] = result
+        return result
+
+
+def _resolve_env(value: Optional[str]) -> Optional[str]:
+    """Expand a ``${VAR}`` placeholder from the environment"""
+    if value and value.startswith("${") and value.endswith("}"):
+        return os.environ.get(value[2:-1]) or None
+    return value
 
 class RateLimitManager:
     """Main rate limiting manager with user and endpoint specific limits"""
 
-    def __init__(self, redis_url: Optional[str] = None):
-        self.limiter = SlidingWindowLimiter(redis_url)
+    def __init__(self, redis_url: Optional[str] = None, settings: Optional[Dict[str, Any]] = None):
+        settings = settings or {}
+        memory_settings = settings.get("memory", {})
+        redis_settings = settings.get("redis", {})
+        self.limiter = SlidingWindowLimiter(
+            redis_url or _resolve_env(settings.get("redis_url")),
+            algorithm=memory_settings.get("algorithm", "gcra"),
+            shards=memory_settings.get("shards", 16),
+            sweep_interval_seconds=memory_settings.get("sweep_interval_seconds", 60.0),
+            redis_max_connections=redis_settings.get("max_connections", 50),
+            redis_timeout_ms=redis_settings.get("timeout_ms", 50),
+            redis_retry_seconds=redis_settings.get("retry_seconds", 5.0)
+        )
         self.user_configs: Dict[int, RateLimitConfig] = {}
-        self.endpoint_configs: Dict[str, RateLimitConfig] = {}
+        # (pattern, method) -> (priority, config); compiled lazily into endpoint_matcher
+        self.endpoint_rules: Dict[Tuple[str, str], Tuple[int, RateLimitConfig]] = {}
+        self.endpoint_matcher: Optional[EndpointMatcher] = EndpointMatcher()
         self.global_config = RateLimitConfig(
             requests_per_minute=1000,
             requests_per_hour=10000,
@@ -167,15 +448,29 @@ class RateLimitManager:
         """Load rate limit configuration for a user"""
         self.user_configs[user_id] = config
 
-    def load_endpoint_config(self, endpoint_pattern: str, config: RateLimitConfig):
+    def load_endpoint_config(self, endpoint_pattern: str, config: RateLimitConfig,
+                             method: str = "*", priority: int = 0):
         """Load rate limit configuration for an endpoint"""
-        self.endpoint_configs[endpoint_pattern] = config
-
-    def _match_endpoint_pattern(self, endpoint: str, pattern: str) -> bool:
-        """Check if endpoint matches a pattern (supports wildcards)"""
-        # Convert pattern to regex
-        regex_pattern = pattern.replace('*', '.*')
-        return bool(re.match(f"^{regex_pattern}$", endpoint))
+        self.endpoint_rules[(endpoint_pattern, (method or "*").upper())] = (priority, config)
+        self.endpoint_matcher = None
+
+    def replace_endpoint_configs(self, rules: List[Tuple[str, str, int, RateLimitConfig]]):
+        """Swap in a complete set of ``(pattern, method, priority, config)`` rules at once"""
+        self.endpoint_rules = {
+            (pattern, (method or "*").upper()): (priority, config)
+            for pattern, method, priority, config in rules
+        }
+        self.endpoint_matcher = None
+
+    def _get_endpoint_matcher(self) -> EndpointMatcher:
+        matcher = self.endpoint_matcher
+        if matcher is None:
+            matcher = EndpointMatcher([
+                (pattern, method, priority, config)
+                for (pattern, method), (priority, config) in self.endpoint_rules.items()
+            ])
+            self.endpoint_matcher = matcher
+        return matcher
 
     def _get_user_config(self, user_id: Optional[int]) -> RateLimitConfig:
         """Get rate limit config for user, fallback to global"""
@@ -183,12 +478,9 @@ class RateLimitManager:
             return self.user_configs[user_id]
         return self.global_config
 
-    def _get_endpoint_config(self, endpoint: str) -> Optional[RateLimitConfig]:
+    def _get_endpoint_config(self, endpoint: str, method: str = "*") -> Optional[RateLimitConfig]:
         """Get rate limit config for endpoint if it matches any pattern"""
-        for pattern, config in self.endpoint_configs.items():
-            if self._match_endpoint_pattern(endpoint, pattern):
-                return config
-        return None
+        return self._get_endpoint_matcher().match(endpoint, method)
 
     def _calculate_effective_limits(self, base_config: RateLimitConfig) -> RateLimitConfig:
         """Apply auto-adjustment based on system load"""
@@ -221,7 +513,7 @@ class RateLimitManager:
         """Check rate limit for a request"""
 
         # Determine which config to use (endpoint-specific takes precedence)
-        endpoint_config = self._get_endpoint_config(endpoint)
+        endpoint_config = self._get_endpoint_config(endpoint, method)
         user_config = self._get_user_config(user_id)
 
         # Use endpoint config if available, otherwise user config
@@ -230,91 +522,30 @@ class RateLimitManager:
 
         limit_type = "endpoint" if endpoint_config else "user"
 
-        # Check burst limit (very short window)
-        burst_allowed, burst_remaining = self.limiter.check_limit(
-            f"{user_id or client_ip}:{endpoint}",
-            config.burst_limit,
-            10,  # 10 second burst window
-            f"{limit_type}_burst"
-        )
-
-        if not burst_allowed:
-            reset_time = datetime.now() + timedelta(seconds=self.limiter.get_remaining_time(
-                f"{user_id or client_ip}:{endpoint}", f"{limit_type}_burst", 10
-            ))
-            return RateLimitResult(
-                allowed=False,
-                remaining_requests=burst_remaining,
-                reset_time=reset_time,
-                retry_after=10,
-                limit_type=f"{limit_type}_burst"
-            )
-
-        # Check per-minute limit
-        minute_allowed, minute_remaining = self.limiter.check_limit(
-            f"{user_id or client_ip}:{endpoint}",
-            config.requests_per_minute,
-            60,
-            f"{limit_type}_minute"
-        )
-
-        if not minute_allowed:
-            reset_time = datetime.now() + timedelta(seconds=self.limiter.get_remaining_time(
-                f"{user_id or client_ip}:{endpoint}", f"{limit_type}_minute", 60
-            ))
-            return RateLimitResult(
-                allowed=False,
-                remaining_requests=minute_remaining,
-                reset_time=reset_time,
-                retry_after=60,
-                limit_type=f"{limit_type}_minute"
-            )
-
-        # Check per-hour limit
-        hour_allowed, hour_remaining = self.limiter.check_limit(
-            f"{user_id or client_ip}:{endpoint}",
-            config.requests_per_hour,
-            3600,
-            f"{limit_type}_hour"
-        )
-
-        if not hour_allowed:
-            reset_time = datetime.now() + timedelta(seconds=self.limiter.get_remaining_time(
-                f"{user_id or client_ip}:{endpoint}", f"{limit_type}_hour", 3600
-            ))
-            return RateLimitResult(
-                allowed=False,
-                remaining_requests=hour_remaining,
-                reset_time=reset_time,
-                retry_after=3600,
-                limit_type=f"{limit_type}_hour"
-            )
-
-        # Check per-day limit
-        day_allowed, day_remaining = self.limiter.check_limit(
-            f"{user_id or client_ip}:{endpoint}",
-            config.requests_per_day,
-            86400,
-            f"{limit_type}_day"
-        )
-
-        if not day_allowed:
-            reset_time = datetime.now() + timedelta(seconds=self.limiter.get_remaining_time(
-                f"{user_id or client_ip}:{endpoint}", f"{limit_type}_day", 86400
-            ))
-            return RateLimitResult(
-                allowed=False,
-                remaining_requests=day_remaining,
-                reset_time=reset_time,
-                retry_after=86400,
-                limit_type=f"{limit_type}_day"
-            )
+        # Burst (10 second), minute, hour and day windows, checked together
+        windows = [
+            (config.burst_limit, 10, f"{limit_type}_burst"),
+            (config.requests_per_minute, 60, f"{limit_type}_minute"),
+            (config.requests_per_hour, 3600, f"{limit_type}_hour"),
+            (config.requests_per_day, 86400, f"{limit_type}_day"),
+        ]
+        results = self.limiter.check_limits(f"{user_id or client_ip}:{endpoint}", windows)
+
+        for (_, window_seconds, window_type), (allowed, remaining, retry_after) in zip(windows, results):
+            if not allowed:
+                return RateLimitResult(
+                    allowed=False,
+                    remaining_requests=remaining,
+                    reset_time=datetime.now() + timedelta(seconds=retry_after),
+                    retry_after=max(1, int(retry_after + 0.999)),
+                    limit_type=window_type
+                )
 
         # All checks passed
         reset_time = datetime.now() + timedelta(seconds=60)  # Default to 1 minute
         return RateLimitResult(
             allowed=True,
-            remaining_requests=min(burst_remaining, minute_remaining, hour_remaining, day_remaining),
+            remaining_requests=min(remaining for _, remaining, _ in results),
             reset_time=reset_time,
             limit_type=limit_type
         )
@@ -347,7 +578,7 @@ class RateLimitManager:
             return 50.0
 
 # Global rate limit manager instance
-rate_limit_manager = RateLimitManager()
+rate_limit_manager = RateLimitManager(settings=config.get("rate_limiting", {}))
 
 def get_rate_limit_manager() -> RateLimitManager:
     """Get the global rate limit manager instance"""
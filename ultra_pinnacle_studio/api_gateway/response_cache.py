@@ -0,0 +1,342 @@
+"""
+Prompt response cache for Ultra Pinnacle AI Studio
+Tiered (memory -> Redis -> SQLite) cache of model completions with optional
+near-duplicate prompt lookup
+"""
+
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, List, Tuple
+
+from cachetools import TTLCache
+
+from .config import resolve_data_path
+from .logging_config import logger
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry"""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def hashed_ngram_embedding(text: str, dimensions: int = 256, n: int = 3) -> List[float]:
+    """Cheap unit-length embedding from hashed character n-grams.
+
+    Good enough to catch near-duplicate prompts (punctuation, casing, small
+    edits) without a model; pass a real ``embed_fn`` for semantic matching.
+    """
+    text = f" {text.lower()} "
+    vector = [0.0] * dimensions
+    for i in range(max(1, len(text) - n + 1)):
+        digest = hashlib.blake2b(text[i:i + n].encode(), digest_size=4).digest()
+        vector[int.from_bytes(digest, "little") % dimensions] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class SQLiteResponseStore:
+    """On-disk cache tier with TTL and least-recently-accessed eviction"""
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._writes_since_prune = 0
+
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache(last_access)")
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self.conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            return row[0]
+
+    def set(self, key: str, model: str, response: str, ttl: int) -> int:
+        """Store a response; returns the number of entries evicted"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, model, response, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, now, now + ttl, now)
+            )
+            self._writes_since_prune += 1
+            evicted = 0
+            if self._writes_since_prune >= 100:
+                evicted = self._prune(now)
+                self._writes_since_prune = 0
+            self.conn.commit()
+            return evicted
+
+    def _prune(self, now: float) -> int:
+        """Drop expired rows, then the least recently accessed rows over the limit"""
+        evicted = self.conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,)).rowcount
+        count = self.conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        if count > self.max_entries:
+            evicted += self.conn.execute(
+                "DELETE FROM response_cache WHERE key IN "
+                "(SELECT key FROM response_cache ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,)
+            ).rowcount
+        return evicted
+
+    def delete_model(self, model: Optional[str] = None):
+        with self.lock:
+            if model:
+                self.conn.execute("DELETE FROM response_cache WHERE model = ?", (model,))
+            else:
+                self.conn.execute("DELETE FROM response_cache")
+            self.conn.commit()
+
+    def size(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class ResponseCache:
+    """
+    Cache of model completions keyed on (model, normalized prompt, params).
+
+    Lookups go memory -> Redis (when the shared CacheManager has it) -> SQLite,
+    promoting hits into the faster tiers. With ``semantic.enabled`` a miss
+    falls back to the most similar cached prompt for the same model and
+    params, if its similarity clears ``semantic.threshold``.
+    """
+
+    REDIS_PREFIX = "resp:"
+
+    def __init__(self, config: Dict[str, Any], cache_manager=None,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None):
+        settings = config.get("response_cache", {}) or {}
+        self.enabled = settings.get("enabled", True)
+        self.ttl = int(settings.get("ttl_seconds", 3600))
+        # Only greedy output is cached by default; callers whose answers may be
+        # reused opt in to caching sampled output up to sampled_max_temperature
+        self.max_temperature = float(settings.get("max_temperature", 0.0))
+        self.sampled_max_temperature = float(settings.get("sampled_max_temperature", 0.7))
+
+        # Memory tier is bounded by total cached characters, not entry count
+        self.memory = TTLCache(
+            maxsize=int(settings.get("memory_max_chars", 8 * 1024 * 1024)),
+            ttl=self.ttl,
+            getsizeof=len
+        )
+        self.lock = threading.Lock()
+
+        self.disk = None
+        disk_path = settings.get("disk_path", "response_cache.db")
+        if self.enabled and disk_path:
+            try:
+                self.disk = SQLiteResponseStore(str(resolve_data_path(config, disk_path)), int(settings.get("disk_max_entries", 50000)))
+            except Exception as e:
+                logger.warning(f"Response cache disk tier unavailable: {e}")
+
+        self.redis = None
+        if settings.get("use_redis", True) and cache_manager is not None:
+            self.redis = getattr(cache_manager, "redis_client", None)
+
+        semantic = settings.get("semantic", {}) or {}
+        self.semantic_enabled = bool(semantic.get("enabled", False))
+        self.semantic_threshold = float(semantic.get("threshold", 0.95))
+        self.semantic_max_entries = int(semantic.get("max_entries", 2000))
+        self.embed_fn = embed_fn or hashed_ngram_embedding
+        # (model, max_tokens, temperature) -> OrderedDict[key, embedding]
+        self.semantic_index: Dict[Tuple, "OrderedDict[str, List[float]]"] = {}
+
+        self.stats = {
+            "memory_hits": 0,
+            "redis_hits": 0,
+            "disk_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "disk_evictions": 0,
+            "errors": 0
+        }
+
+    def should_cache(self, temperature: float, sampled: bool = False) -> bool:
+        limit = self.sampled_max_temperature if sampled else self.max_temperature
+        return self.enabled and temperature <= limit
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        payload = json.dumps([model_name, normalize_prompt(prompt), int(max_tokens), round(float(temperature), 2)])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[str]:
+        """Look a key up through every tier, promoting hits"""
+        with self.lock:
+            value = self.memory.get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self.REDIS_PREFIX + key)
+                if raw is not None:
+                    value = raw.decode() if isinstance(raw, bytes) else raw
+                    self._remember(key, value)
+                    self.stats["redis_hits"] += 1
+                    return value
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Response cache Redis lookup failed: {e}")
+
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+                if value is not None:
+                    self._remember(key, value)
+                    self.stats["disk_hits"] += 1
+                    return value
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Response cache disk lookup failed: {e}")
+
+        return None
+
+    def _remember(self, key: str, value: str):
+        with self.lock:
+            try:
+                self.memory[key] = value
+            except ValueError:
+                pass  # Larger than the whole memory tier
+
+    def get(self, model_name: str, prompt: str, max_tokens: int, temperature: float) -> Optional[str]:
+        """Return a cached response, or None"""
+        key = self.make_key(model_name, prompt, max_tokens, temperature)
+        value = self._lookup(key)
+        if value is not None:
+            return value
+
+        if self.semantic_enabled:
+            match = self._nearest(model_name, prompt, max_tokens, temperature)
+            if match is not None:
+                value = self._lookup(match)
+                if value is not None:
+                    self.stats["semantic_hits"] += 1
+                    return value
+
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, model_name: str, prompt: str, max_tokens: int, temperature: float, response: str):
+        """Store a response in every tier"""
+        key = self.make_key(model_name, prompt, max_tokens, temperature)
+        self._remember(key, response)
+        self.stats["sets"] += 1
+
+        if self.redis is not None:
+            try:
+                self.redis.setex(self.REDIS_PREFIX + key, self.ttl, response)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Response cache Redis write failed: {e}")
+
+        if self.disk is not None:
+            try:
+                self.stats["disk_evictions"] += self.disk.set(key, model_name, response, self.ttl)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Response cache disk write failed: {e}")
+
+        if self.semantic_enabled:
+            self._index(key, model_name, prompt, max_tokens, temperature)
+
+    def _index(self, key: str, model_name: str, prompt: str, max_tokens: int, temperature: float):
+        bucket_key = (model_name, int(max_tokens), round(float(temperature), 2))
+        vector = self.embed_fn(normalize_prompt(prompt))
+        with self.lock:
+            bucket = self.semantic_index.setdefault(bucket_key, OrderedDict())
+            bucket[key] = vector
+            bucket.move_to_end(key)
+            while len(bucket) > self.semantic_max_entries:
+                bucket.popitem(last=False)
+
+    def _nearest(self, model_name: str, prompt: str, max_tokens: int, temperature: float) -> Optional[str]:
+        """Key of the most similar cached prompt above the threshold"""
+        bucket_key = (model_name, int(max_tokens), round(float(temperature), 2))
+        with self.lock:
+            bucket = list(self.semantic_index.get(bucket_key, {}).items())
+        if not bucket:
+            return None
+
+        query = self.embed_fn(normalize_prompt(prompt))
+        best_key, best_score = None, self.semantic_threshold
+        for key, vector in bucket:
+            score = sum(a * b for a, b in zip(query, vector))
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def clear(self, model_name: Optional[str] = None):
+        """Drop cached responses (all, or one model's on disk and in the semantic index)"""
+        with self.lock:
+            self.memory.clear()
+            if model_name:
+                for bucket_key in [k for k in self.semantic_index if k[0] == model_name]:
+                    del self.semantic_index[bucket_key]
+            else:
+                self.semantic_index.clear()
+        if self.disk is not None:
+            self.disk.delete_model(model_name)
+        if self.redis is not None and not model_name:
+            try:
+                keys = self.redis.keys(f"{self.REDIS_PREFIX}*")
+                if keys:
+                    self.redis.delete(*keys)
+            except Exception as e:
+                logger.warning(f"Response cache Redis clear failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = sum(self.stats[k] for k in ("memory_hits", "redis_hits", "disk_hits", "semantic_hits"))
+        total = hits + self.stats["misses"]
+        return {
+            "stats": self.stats.copy(),
+            "hit_rate": round(hits / total * 100, 2) if total else 0,
+            "memory_entries": len(self.memory),
+            "memory_chars": self.memory.currsize,
+            "disk_entries": self.disk.size() if self.disk is not None else None,
+            "redis_enabled": self.redis is not None,
+            "semantic_enabled": self.semantic_enabled,
+            "ttl_seconds": self.ttl
+        }
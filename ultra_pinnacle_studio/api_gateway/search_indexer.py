@@ -0,0 +1,561 @@
+"""
+Search indexer for Ultra Pinnacle AI Studio
+Captures committed writes to searchable models and applies them to the
+search_index FTS table in debounced batches; runs resumable full reindexes
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, event, inspect, text
+
+from .config import resolve_data_path
+from .database import Conversation, Message, CollaborativeDocument, HelpArticle, User
+from .db_engine import chunked
+from .log_pipeline import BatchingQueue
+from .logging_config import logger
+
+SEARCH_ID_PREFIXES = {
+    'conversation': 'conv',
+    'document': 'doc',
+    'help': 'help',
+    'encyclopedia': 'ency',
+    'user': 'user'
+}
+
+_CHANGES_KEY = "search_index_changes"
+
+_INSERT_SQL = text("""
+    INSERT INTO search_index (
+        id, content_type, content_id, title, content, summary,
+        tags, metadata, language_code, created_at, updated_at
+    ) VALUES (:id, :content_type, :content_id, :title, :content, :summary,
+             :tags, :metadata, :language_code, :created_at, :updated_at)
+""")
+_DELETE_SQL = text("DELETE FROM search_index WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+
+
+def search_id_for(content_type: str, content_id: Any) -> str:
+    """search_index row id for a piece of content"""
+    return f"{SEARCH_ID_PREFIXES.get(content_type, content_type[:4])}_{content_id}"
+
+
+def mark_changed(session, content_type: str, content_id: Any, deleted: bool = False):
+    """
+    Record a write made outside the unit of work (such as a bulk
+    ``insert()``) so a hooked session indexes it once it commits
+    """
+    changes = session.info.setdefault(_CHANGES_KEY, {})
+    changes[search_id_for(content_type, content_id)] = (content_type, content_id, deleted)
+
+
+def _iso(value: Optional[datetime]) -> str:
+    return (value or datetime.now()).isoformat()
+
+
+def _summary(content: str, length: int = 200) -> str:
+    return content[:length] + "..." if len(content) > length else content
+
+
+def build_document(content_type: str, content_id: Any, data: Dict[str, Any]) -> Dict[str, Any]:
+    """search_index row from free-form content data"""
+    content = data.get('content', '')
+    return {
+        "id": search_id_for(content_type, content_id),
+        "content_type": content_type,
+        "content_id": str(content_id),
+        "title": data.get('title', ''),
+        "content": content,
+        "summary": data.get('summary', _summary(content)),
+        "tags": json.dumps(data.get('tags', [])),
+        "metadata": json.dumps(data.get('metadata', {})),
+        "language_code": data.get('language_code', 'en'),
+        "created_at": data.get('created_at', datetime.now().isoformat()),
+        "updated_at": data.get('updated_at', datetime.now().isoformat())
+    }
+
+
+def _conversation_documents(db, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+    messages: Dict[Any, List[str]] = {}
+    rows = db.query(Message.conversation_id, Message.content).filter(
+        Message.conversation_id.in_(ids)
+    ).order_by(Message.id)
+    for conversation_id, content in rows:
+        messages.setdefault(conversation_id, []).append(content)
+
+    documents = {}
+    for conv in db.query(Conversation).filter(Conversation.id.in_(ids)):
+        parts = messages.get(conv.id, [])
+        documents[str(conv.id)] = build_document('conversation', conv.id, {
+            'title': conv.title or "Untitled Conversation",
+            'content': " ".join(parts),
+            'metadata': {
+                "user_id": conv.created_by,
+                "is_public": conv.is_public,
+                "model": conv.model,
+                "message_count": len(parts)
+            },
+            'created_at': _iso(conv.created_at),
+            'updated_at': _iso(conv.updated_at)
+        })
+    return documents
+
+
+def _collaborative_documents(db, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+    documents = {}
+    for doc in db.query(CollaborativeDocument).filter(CollaborativeDocument.id.in_(ids)):
+        documents[str(doc.id)] = build_document('document', doc.id, {
+            'title': doc.title,
+            'content': doc.content or "",
+            'metadata': {
+                "user_id": doc.created_by,
+                "document_type": doc.document_type,
+                "language": doc.language,
+                "version": doc.version
+            },
+            'language_code': doc.language or "en",
+            'created_at': _iso(doc.created_at),
+            'updated_at': _iso(doc.updated_at)
+        })
+    return documents
+
+
+def _help_documents(db, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+    documents = {}
+    for article in db.query(HelpArticle).filter(HelpArticle.id.in_(ids)):
+        documents[str(article.id)] = build_document('help', article.id, {
+            'title': article.title,
+            'content': f"{article.title} {article.summary or ''} {article.content}",
+            'summary': article.summary or article.content[:200] + "...",
+            'tags': article.tags or [],
+            'metadata': {
+                "category_id": article.category_id,
+                "difficulty_level": article.difficulty_level,
+                "view_count": article.view_count
+            },
+            'created_at': _iso(article.created_at),
+            'updated_at': _iso(article.updated_at)
+        })
+    return documents
+
+
+def _user_documents(db, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+    documents = {}
+    for user in db.query(User).filter(User.id.in_(ids)):
+        documents[str(user.id)] = build_document('user', user.id, {
+            'title': user.username,
+            'content': f"{user.username} {user.full_name or ''} {user.email}",
+            'summary': f"{user.username} ({user.full_name or 'No name'})",
+            'metadata': {
+                "user_type_id": user.user_type_id,
+                "is_active": user.is_active,
+                "is_superuser": user.is_superuser
+            },
+            'created_at': _iso(user.created_at),
+            'updated_at': _iso(user.updated_at)
+        })
+    return documents
+
+
+# content type -> (model, loader, attributes that feed the indexed row)
+SOURCES = {
+    'conversation': (Conversation, _conversation_documents,
+                     ('title', 'model', 'is_public', 'created_by')),
+    'document': (CollaborativeDocument, _collaborative_documents,
+                 ('title', 'content', 'document_type', 'language', 'version', 'created_by')),
+    'help': (HelpArticle, _help_documents,
+             ('title', 'content', 'summary', 'tags', 'category_id', 'difficulty_level')),
+    'user': (User, _user_documents,
+             ('username', 'full_name', 'email', 'user_type_id', 'is_active', 'is_superuser'))
+}
+MODEL_TYPES = {model: content_type for content_type, (model, _, _) in SOURCES.items()}
+
+REINDEX_ORDER = ('help', 'encyclopedia', 'document', 'conversation', 'user')
+
+
+class SearchIndexer:
+    """
+    Keeps ``search_index`` in step with the database.
+
+    Session hooks record which searchable rows a transaction touched and,
+    once it commits, queue them on a ``BatchingQueue``. The flusher waits up
+    to ``debounce_seconds`` to gather changes, collapses repeated edits to
+    the same row, loads the current rows in one query per content type and
+    replaces their index entries in a single transaction. Producers never
+    wait: changes the full queue turns away are kept in an overflow map and
+    folded into the next flush.
+
+    ``reindex`` rebuilds the whole index in keyset-paginated chunks without
+    clearing it first, saving a checkpoint after each chunk so an
+    interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, session_factory: Callable, config: Dict[str, Any]):
+        indexer_config = config.get('search', {}).get('indexer', {})
+        self.session_factory = session_factory
+        self.reindex_batch_size = max(1, int(indexer_config.get('reindex_batch_size', 500)))
+        self.state_path = resolve_data_path(config, indexer_config.get('state_path', 'search_reindex.json'))
+        self.encyclopedia_dir = Path(config.get('paths', {}).get('encyclopedia_dir', 'encyclopedia'))
+
+        self.queue = BatchingQueue(
+            "search-indexer",
+            self._apply_changes,
+            max_size=indexer_config.get('max_queue_size', 10000),
+            batch_size=indexer_config.get('batch_size', 200),
+            flush_interval=indexer_config.get('debounce_seconds', 2.0),
+            policy="drop"
+        )
+        # Changes the full queue rejected, by index id, until the next flush
+        self._overflow: Dict[str, tuple] = {}
+        self._overflow_lock = threading.Lock()
+
+        self.stats = {
+            "documents_indexed": 0,
+            "documents_removed": 0,
+            "batches": 0,
+            "overflowed": 0,
+            "last_flush_at": None,
+            "last_lag_seconds": 0.0,
+            "max_lag_seconds": 0.0
+        }
+        self._reindex_lock = threading.Lock()
+        self.progress = self._read_state() or {"status": "idle"}
+
+    # Change capture
+
+    def install_hooks(self, target):
+        """Capture searchable writes on a Session class or sessionmaker"""
+        event.listen(target, "after_flush", self._after_flush)
+        event.listen(target, "after_commit", self._after_commit)
+        event.listen(target, "after_rollback", self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        changes = session.info.setdefault(_CHANGES_KEY, {})
+        for obj in session.new:
+            self._capture(changes, obj, deleted=False, check_fields=False)
+        for obj in session.dirty:
+            self._capture(changes, obj, deleted=False, check_fields=True)
+        for obj in session.deleted:
+            self._capture(changes, obj, deleted=True, check_fields=False)
+
+    def _capture(self, changes: Dict, obj: Any, deleted: bool, check_fields: bool):
+        if isinstance(obj, Message):
+            # Messages are indexed as part of their conversation
+            search_id = search_id_for('conversation', obj.conversation_id)
+            changes.setdefault(search_id, ('conversation', obj.conversation_id, False))
+            return
+
+        content_type = MODEL_TYPES.get(type(obj))
+        if content_type is None:
+            return
+        if check_fields:
+            # Skip counters and login bookkeeping that do not reach the index
+            attrs = inspect(obj).attrs
+            if not any(attrs[name].history.has_changes() for name in SOURCES[content_type][2]):
+                return
+        changes[search_id_for(content_type, obj.id)] = (content_type, obj.id, deleted)
+
+    def _after_commit(self, session):
+        changes = session.info.pop(_CHANGES_KEY, None)
+        if changes:
+            for content_type, content_id, deleted in changes.values():
+                self.queue_change(content_type, content_id, deleted=deleted)
+
+    def _after_rollback(self, session):
+        session.info.pop(_CHANGES_KEY, None)
+
+    def queue_change(self, content_type: str, content_id: Any, deleted: bool = False):
+        """Queue a row to be re-read from the database (or removed) and indexed"""
+        self._put((search_id_for(content_type, content_id), content_type, content_id,
+                   None, deleted, time.time()))
+
+    def queue_document(self, content_type: str, content_id: Any, data: Dict[str, Any]):
+        """Queue prepared content for indexing"""
+        document = build_document(content_type, content_id, data)
+        self._put((document["id"], content_type, content_id, document, False, time.time()))
+
+    def _put(self, item: tuple):
+        # Runs on the committing thread, often the event loop, so never wait
+        if not self.queue.put(item):
+            with self._overflow_lock:
+                self._overflow[item[0]] = item
+                self.stats["overflowed"] += 1
+
+    def _take_overflow(self) -> List[tuple]:
+        with self._overflow_lock:
+            items = list(self._overflow.values())
+            self._overflow.clear()
+        return items
+
+    # Writing
+
+    def _write(self, db, removals: Iterable[str], documents: Iterable[Dict[str, Any]]):
+        """Replace index rows: delete old entries, then insert in one executemany"""
+        documents = list(documents)
+        ids = list(removals) + [document["id"] for document in documents]
+        for chunk in chunked(ids):
+            db.execute(_DELETE_SQL, {"ids": chunk})
+        if documents:
+            db.execute(_INSERT_SQL, documents)
+
+    def _apply_changes(self, items: List[tuple]):
+        items = sorted(items + self._take_overflow(), key=lambda item: item[5])
+        # Later changes to the same row replace earlier ones
+        latest = {item[0]: item for item in items}
+
+        removals = []
+        documents = {}
+        pending: Dict[str, Dict[str, Any]] = {}
+        for search_id, content_type, content_id, document, deleted, _ in latest.values():
+            if deleted:
+                removals.append(search_id)
+            elif document is not None:
+                documents[search_id] = document
+            elif content_type in SOURCES:
+                pending.setdefault(content_type, {})[search_id] = content_id
+            else:
+                logger.warning(f"Cannot reload {content_type} {content_id} for indexing")
+
+        db = self.session_factory()
+        try:
+            for content_type, wanted in pending.items():
+                loaded = SOURCES[content_type][1](db, list(wanted.values()))
+                for search_id, content_id in wanted.items():
+                    document = loaded.get(str(content_id))
+                    if document is None:
+                        # Deleted since the change was queued
+                        removals.append(search_id)
+                    else:
+                        documents[search_id] = document
+
+            self._write(db, removals, documents.values())
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        now = time.time()
+        lag = now - min(item[5] for item in items)
+        self.stats["documents_indexed"] += len(documents)
+        self.stats["documents_removed"] += len(removals)
+        self.stats["batches"] += 1
+        self.stats["last_flush_at"] = datetime.fromtimestamp(now, timezone.utc).isoformat()
+        self.stats["last_lag_seconds"] = lag
+        self.stats["max_lag_seconds"] = max(self.stats["max_lag_seconds"], lag)
+
+    # Full reindex
+
+    def _read_state(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self):
+        self.progress["updated_at"] = datetime.now(timezone.utc).isoformat()
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.progress, f, default=str)
+        tmp_path.replace(self.state_path)
+
+    def _encyclopedia_files(self) -> List[Path]:
+        if not self.encyclopedia_dir.exists():
+            return []
+        return sorted(self.encyclopedia_dir.rglob("*.md"), key=lambda p: str(p.relative_to(self.encyclopedia_dir)))
+
+    def _encyclopedia_id(self, md_file: Path) -> str:
+        """Relative path as the article id"""
+        return str(md_file.relative_to(self.encyclopedia_dir)).replace('.md', '').replace('/', '_')
+
+    def _encyclopedia_document(self, md_file: Path) -> Dict[str, Any]:
+        with open(md_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        # Extract title from first line
+        lines = content.split('\n')
+        title = "Untitled"
+        if lines and lines[0].startswith('#'):
+            title = lines[0].lstrip('#').strip()
+
+        rel_path = md_file.relative_to(self.encyclopedia_dir)
+        return build_document('encyclopedia', self._encyclopedia_id(md_file), {
+            'title': title,
+            'content': content,
+            'summary': _summary(content, 300),
+            'metadata': {
+                "file_path": str(rel_path),
+                "file_size": md_file.stat().st_size
+            }
+        })
+
+    def _count_all(self) -> int:
+        db = self.session_factory()
+        try:
+            total = sum(db.query(model).count() for model, _, _ in SOURCES.values())
+        finally:
+            db.close()
+        return total + len(self._encyclopedia_files())
+
+    def _reindex_model(self, content_type: str):
+        model, loader, _ = SOURCES[content_type]
+        while True:
+            db = self.session_factory()
+            try:
+                query = db.query(model.id).order_by(model.id)
+                if self.progress["last_id"] is not None:
+                    query = query.filter(model.id > self.progress["last_id"])
+                ids = [row[0] for row in query.limit(self.reindex_batch_size)]
+                if not ids:
+                    break
+                documents = loader(db, ids)
+                self._write(db, [], documents.values())
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            self.progress["last_id"] = ids[-1]
+            self.progress["indexed"] += len(documents)
+            self._save_state()
+
+        # Drop entries whose rows no longer exist
+        db = self.session_factory()
+        try:
+            db.execute(text(f"""
+                DELETE FROM search_index
+                WHERE content_type = :content_type
+                AND content_id NOT IN (SELECT CAST(id AS TEXT) FROM {model.__tablename__})
+            """), {"content_type": content_type})
+            db.commit()
+        finally:
+            db.close()
+
+    def _reindex_encyclopedia(self):
+        files = self._encyclopedia_files()
+        remaining = [
+            f for f in files
+            if self.progress["last_id"] is None or str(f.relative_to(self.encyclopedia_dir)) > self.progress["last_id"]
+        ]
+        for i in range(0, len(remaining), self.reindex_batch_size):
+            chunk = remaining[i:i + self.reindex_batch_size]
+            documents = []
+            for md_file in chunk:
+                try:
+                    documents.append(self._encyclopedia_document(md_file))
+                except Exception as e:
+                    logger.warning(f"Error indexing encyclopedia file {md_file}: {e}")
+
+            db = self.session_factory()
+            try:
+                self._write(db, [], documents)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            self.progress["last_id"] = str(chunk[-1].relative_to(self.encyclopedia_dir))
+            self.progress["indexed"] += len(documents)
+            self._save_state()
+
+        # Drop entries for deleted files
+        current = {search_id_for('encyclopedia', self._encyclopedia_id(f)) for f in files}
+        db = self.session_factory()
+        try:
+            indexed = [row[0] for row in db.execute(text(
+                "SELECT id FROM search_index WHERE content_type = 'encyclopedia'"
+            ))]
+            self._write(db, [search_id for search_id in indexed if search_id not in current], [])
+            db.commit()
+        finally:
+            db.close()
+
+    def reindex(self) -> Dict[str, Any]:
+        """Rebuild the index, resuming an interrupted run; blocks until done"""
+        if not self._reindex_lock.acquire(blocking=False):
+            return self.progress
+
+        try:
+            state = self._read_state()
+            if state and state.get("status") in ("running", "failed"):
+                self.progress = state
+                self.progress.update({"status": "running", "resumed_at": datetime.now(timezone.utc).isoformat()})
+                self.progress.pop("error", None)
+                logger.info(f"Resuming search reindex at {state.get('content_type')} after {state.get('last_id')}")
+            else:
+                self.progress = {
+                    "status": "running",
+                    "started_at": datetime.now(timezone.utc).isoformat(),
+                    "completed_types": [],
+                    "content_type": None,
+                    "last_id": None,
+                    "indexed": 0,
+                    "total": self._count_all()
+                }
+                logger.info("Starting full search reindex")
+            self._save_state()
+
+            for content_type in REINDEX_ORDER:
+                if content_type in self.progress["completed_types"]:
+                    continue
+                if self.progress["content_type"] != content_type:
+                    self.progress["content_type"] = content_type
+                    self.progress["last_id"] = None
+
+                if content_type == 'encyclopedia':
+                    self._reindex_encyclopedia()
+                else:
+                    self._reindex_model(content_type)
+
+                self.progress["completed_types"].append(content_type)
+                self.progress["last_id"] = None
+                self._save_state()
+
+            self.progress.update({
+                "status": "completed",
+                "content_type": None,
+                "finished_at": datetime.now(timezone.utc).isoformat()
+            })
+            logger.info(f"Search reindex completed: {self.progress['indexed']} documents")
+
+        except Exception as e:
+            self.progress.update({"status": "failed", "error": str(e)})
+            logger.error(f"Error during search reindex: {e}")
+        finally:
+            self._save_state()
+            self._reindex_lock.release()
+
+        return self.progress
+
+    @property
+    def reindex_running(self) -> bool:
+        return self._reindex_lock.locked()
+
+    def needs_reindex(self) -> bool:
+        """True if a reindex was interrupted or the index is empty"""
+        if self.progress.get("status") in ("running", "failed"):
+            return True
+        db = self.session_factory()
+        try:
+            return db.execute(text("SELECT 1 FROM search_index LIMIT 1")).first() is None
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "queued": self.queue.queue.qsize(),
+            "overflow": len(self._overflow),
+            "reindex": dict(self.progress)
+        }
@@ -4,6 +4,7 @@ Search models and indexing for Ultra Pinnacle AI Studio
 from sqlalchemy import Column, Integer, String, Text, DateTime, Float, JSON, UniqueConstraint, Index
 from sqlalchemy.orm import declarative_base
 from datetime import datetime, timezone
+from .db_engine import create_missing_indexes
 from .logging_config import logger
 
 Base = declarative_base()
@@ -28,6 +29,7 @@ class SearchQuery(Base):
     __table_args__ = (
         Index('idx_search_queries_user_time', 'user_id', 'created_at'),
         Index('idx_search_queries_query', 'query'),
+        Index('idx_search_queries_created', 'created_at'),
     )
 
 class SearchAnalytics(Base):
@@ -43,6 +45,10 @@ class SearchAnalytics(Base):
     last_searched = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     first_searched = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        Index('idx_search_analytics_popularity', 'popularity_score'),
+    )
+
 class SavedSearch(Base):
     """User-saved searches"""
     __tablename__ = "saved_searches"
@@ -119,8 +125,9 @@ class SearchExport(Base):
 def create_search_tables(engine):
     """Create search-related tables including FTS5 virtual table"""
     try:
-        # Create regular tables
+        # Create regular tables, and indexes added since they were created
         Base.metadata.create_all(bind=engine)
+        create_missing_indexes(engine, Base.metadata)
 
         # Create FTS5 virtual table manually using raw sqlite3
         import sqlite3
@@ -129,15 +136,10 @@ def create_search_tables(engine):
         db_path = engine.url.database
         if db_path and db_path != ":memory:":
             with sqlite3.connect(db_path) as conn:
-                # Drop existing FTS table if it exists
-                try:
-                    conn.execute("DROP TABLE IF EXISTS search_index")
-                except:
-                    pass  # Table might not exist
-
-                # Create FTS5 virtual table with proper configuration
+                # Create FTS5 virtual table with proper configuration; an
+                # existing index is kept and updated by the SearchIndexer
                 conn.execute("""
-                    CREATE VIRTUAL TABLE search_index USING fts5(
+                    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
                         id UNINDEXED,
                         content_type UNINDEXED,
                         content_id UNINDEXED,
@@ -1,24 +1,64 @@
 """
 Advanced search service for Ultra Pinnacle AI Studio
 """
+import csv
+import gzip
+import io
 import json
 import re
 import time
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from functools import lru_cache
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+from sqlalchemy import insert, text
+
 from .logging_config import logger
-from .database import get_db
+from .database import get_db, AsyncSessionLocal
+from .db_engine import chunked
+from .log_pipeline import BatchingQueue
+from .search_indexer import SearchIndexer
+from .suggestion_index import SuggestionIndex
 from .search_models import (
     SearchQuery, SearchAnalytics, SavedSearch, SearchSuggestion,
-    SearchFacet, SearchExport, create_search_tables, init_search_data
+    SearchFacet, SearchExport, create_search_tables
 )
 from .translation_service import get_translation_service
 
+# Column order of the search_index FTS5 table (see create_search_tables)
+SEARCH_INDEX_COLUMNS = (
+    'id', 'content_type', 'content_id', 'title', 'content', 'summary',
+    'tags', 'metadata', 'language_code', 'created_at', 'updated_at'
+)
+FTS_COLUMNS = ('title', 'content', 'summary')
+FTS_OPERATORS = ('AND', 'OR', 'NOT')
+
+DEFAULT_COLUMN_WEIGHTS = {'title': 10.0, 'content': 1.0, 'summary': 3.0}
+DEFAULT_CONTENT_TYPE_BOOSTS = {
+    'help': 1.2,  # Help articles are important
+    'encyclopedia': 1.1,  # Encyclopedia is valuable
+    'document': 1.0,  # Documents are standard
+    'conversation': 0.9,  # Conversations are common
+    'user': 0.8  # Users are least prioritized
+}
+
+SORT_ORDERS = {
+    'relevance': 'relevance_score DESC',
+    'date': 'created_at DESC',
+    'title': 'lower(title) ASC'
+}
+
+# Export formats and the media type each is served with
+EXPORT_FORMATS = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'ndjson': 'application/x-ndjson'
+}
+
 class SearchService:
     """Advanced search service with indexing, ranking, and analytics"""
 
@@ -26,6 +66,29 @@ class SearchService:
         self.config = config
         self.translation_service = get_translation_service(None)  # Will be initialized later
         self.executor = ThreadPoolExecutor(max_workers=4)
+
+        search_config = config.get('search', {})
+        self.column_weights = {**DEFAULT_COLUMN_WEIGHTS, **search_config.get('column_weights', {})}
+        self.content_type_boosts = {**DEFAULT_CONTENT_TYPE_BOOSTS, **search_config.get('content_type_boosts', {})}
+        self.facet_limit = search_config.get('facet_limit', 50)
+
+        export_config = search_config.get('export', {})
+        self.export_chunk_size = export_config.get('chunk_size', 500)
+        self.export_buffer_size = export_config.get('stream_buffer_bytes', 64 * 1024)
+
+        # Sessions are looked up per call so a replaced _get_db_session is honoured
+        self.indexer = SearchIndexer(lambda: self._get_db_session(), config)
+        self.suggestion_index = SuggestionIndex(search_config.get('suggestion_top_k', 20))
+
+        analytics_config = search_config.get('analytics', {})
+        self.analytics_queue = BatchingQueue(
+            "search-analytics",
+            self._write_search_events,
+            max_size=analytics_config.get('max_queue_size', 10000),
+            batch_size=analytics_config.get('batch_size', 500),
+            flush_interval=analytics_config.get('flush_interval_seconds', 5.0)
+        )
+
         self._init_search_tables()
 
     def _init_search_tables(self):
@@ -42,188 +105,189 @@ class SearchService:
         db = next(get_db())
         return db
 
+    def _get_async_session(self):
+        """Get an asyncio database session for request-path queries"""
+        return AsyncSessionLocal()
+
     async def index_content(self, content_type: str, content_id: Any, data: Dict[str, Any]):
-        """Index new or updated content"""
+        """Queue new or updated content for the next indexing batch"""
         try:
-            db = self._get_db_session()
-
-            # Prepare search document
-            search_id = f"{content_type[:4]}_{content_id}"
-            title = data.get('title', '')
-            content = data.get('content', '')
-            summary = data.get('summary', content[:200] + '...' if len(content) > 200 else content)
-            tags = data.get('tags', [])
-            metadata = data.get('metadata', {})
-            language_code = data.get('language_code', 'en')
-
-            # Remove existing entry
-            from sqlalchemy import text
-            db.execute(text("DELETE FROM search_index WHERE id = :search_id"), {"search_id": search_id})
-
-            # Insert new entry
-            db.execute(text("""
-                INSERT INTO search_index (
-                    id, content_type, content_id, title, content, summary,
-                    tags, metadata, language_code, created_at, updated_at
-                ) VALUES (:id, :content_type, :content_id, :title, :content, :summary,
-                         :tags, :metadata, :language_code, :created_at, :updated_at)
-            """), {
-                "id": search_id,
-                "content_type": content_type,
-                "content_id": str(content_id),
-                "title": title,
-                "content": content,
-                "summary": summary,
-                "tags": json.dumps(tags),
-                "metadata": json.dumps(metadata),
-                "language_code": language_code,
-                "created_at": data.get('created_at', datetime.now().isoformat()),
-                "updated_at": data.get('updated_at', datetime.now().isoformat())
-            })
-
-            db.commit()
-            logger.debug(f"Indexed {content_type} {content_id}")
-
+            self.indexer.queue_document(content_type, content_id, data)
         except Exception as e:
             logger.error(f"Error indexing content {content_type} {content_id}: {e}")
-        finally:
-            db.close()
 
     async def remove_from_index(self, content_type: str, content_id: Any):
-        """Remove content from search index"""
+        """Queue content for removal from the search index"""
         try:
-            db = self._get_db_session()
-            search_id = f"{content_type[:4]}_{content_id}"
-            db.execute("DELETE FROM search_index WHERE id = ?", (search_id,))
-            db.commit()
-            logger.debug(f"Removed {content_type} {content_id} from index")
+            self.indexer.queue_change(content_type, content_id, deleted=True)
         except Exception as e:
             logger.error(f"Error removing content from index: {e}")
-        finally:
-            db.close()
 
-    def _build_search_query(self, query: str, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    def _build_fts_query(self, query: str) -> Optional[str]:
+        """
+        Translate a user query into an FTS5 MATCH expression.
+
+        Terms are quoted so punctuation cannot break the FTS5 syntax.
+        Quoted phrases, AND/OR/NOT, ``title:``/``content:``/``summary:``
+        column filters and trailing ``*`` prefix searches are kept; ``NOT``
+        is only an operator when written in capitals.
+        """
+        parts = []
+        for field, phrase, term in re.findall(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))', query):
+            operator = term if term == 'NOT' else term.upper()
+            if not phrase and not field and operator in FTS_OPERATORS:
+                # Operators need a term on both sides
+                if parts and parts[-1] not in FTS_OPERATORS:
+                    parts.append(operator)
+                continue
+
+            if field and field.lower() not in FTS_COLUMNS:
+                # Not a column filter, e.g. "http://..."
+                term, field = f"{field}:{phrase or term}", ''
+                phrase = ''
+            words = re.findall(r'\w+', phrase or term)
+            if not words:
+                continue
+            expression = '"' + ' '.join(words) + '"'
+            if not phrase and term.endswith('*'):
+                expression += '*'
+            if field.lower() in FTS_COLUMNS:
+                expression = f'{field.lower()}:{expression}'
+            parts.append(expression)
+
+        while parts and parts[-1] in FTS_OPERATORS:
+            parts.pop()
+        return ' '.join(parts) or None
+
+    def _build_search_query(self, query: str, filters: Dict[str, Any]) -> Tuple[Optional[str], str, Dict[str, Any]]:
         """Build FTS5 search query with filters"""
-        fts_query_parts = []
-
-        # Handle different query types
-        if query.startswith('"') and query.endswith('"'):
-            # Exact phrase search
-            fts_query_parts.append(f'"{query[1:-1]}"')
-        elif ' OR ' in query.upper():
-            # OR search
-            terms = [term.strip() for term in query.upper().split(' OR ')]
-            fts_query_parts.append(' OR '.join(terms))
-        elif ' AND ' in query.upper():
-            # AND search
-            terms = [term.strip() for term in query.upper().split(' AND ')]
-            fts_query_parts.append(' AND '.join(terms))
-        else:
-            # Default AND search for multiple terms
-            terms = query.split()
-            if len(terms) > 1:
-                fts_query_parts.append(' AND '.join(terms))
-            else:
-                fts_query_parts.append(query)
-
-        # Add field-specific searches
-        if 'title:' in query.lower():
-            title_match = re.search(r'title:("([^"]+)"|(\S+))', query.lower())
-            if title_match:
-                title_term = title_match.group(2) or title_match.group(3)
-                fts_query_parts.append(f'title:{title_term}')
-
-        # Build the final FTS query
-        fts_query = ' AND '.join(fts_query_parts)
+        fts_query = self._build_fts_query(query)
 
         # Build WHERE conditions for filters
         where_conditions = []
-        params = []
+        params = {}
 
         # Content type filter
         if 'content_types' in filters and filters['content_types']:
-            placeholders = ','.join('?' * len(filters['content_types']))
-            where_conditions.append(f"content_type IN ({placeholders})")
-            params.extend(filters['content_types'])
+            names = []
+            for i, content_type in enumerate(filters['content_types']):
+                names.append(f":content_type_{i}")
+                params[f"content_type_{i}"] = content_type
+            where_conditions.append(f"content_type IN ({','.join(names)})")
 
         # Language filter
         if 'languages' in filters and filters['languages']:
-            placeholders = ','.join('?' * len(filters['languages']))
-            where_conditions.append(f"language_code IN ({placeholders})")
-            params.extend(filters['languages'])
+            names = []
+            for i, language in enumerate(filters['languages']):
+                names.append(f":language_{i}")
+                params[f"language_{i}"] = language
+            where_conditions.append(f"language_code IN ({','.join(names)})")
 
         # Date range filter
         if 'date_from' in filters:
-            where_conditions.append("datetime(created_at) >= datetime(?)")
-            params.append(filters['date_from'])
+            where_conditions.append("datetime(created_at) >= datetime(:date_from)")
+            params['date_from'] = filters['date_from']
         if 'date_to' in filters:
-            where_conditions.append("datetime(created_at) <= datetime(?)")
-            params.append(filters['date_to'])
+            where_conditions.append("datetime(created_at) <= datetime(:date_to)")
+            params['date_to'] = filters['date_to']
 
         # User filter
         if 'user_ids' in filters and filters['user_ids']:
             # This requires joining with metadata JSON
             user_conditions = []
-            for user_id in filters['user_ids']:
-                user_conditions.append("metadata LIKE ?")
-                params.append(f'%"user_id": {user_id}%')
-            if user_conditions:
-                where_conditions.append(f"({' OR '.join(user_conditions)})")
+            for i, user_id in enumerate(filters['user_ids']):
+                user_conditions.append(f"metadata LIKE :user_id_{i}")
+                params[f"user_id_{i}"] = f'%"user_id": {user_id}%'
+            where_conditions.append(f"({' OR '.join(user_conditions)})")
 
         # Tags filter
         if 'tags' in filters and filters['tags']:
             tag_conditions = []
-            for tag in filters['tags']:
-                tag_conditions.append("tags LIKE ?")
-                params.append(f'%"{tag}"%')
-            if tag_conditions:
-                where_conditions.append(f"({' OR '.join(tag_conditions)})")
+            for i, tag in enumerate(filters['tags']):
+                tag_conditions.append(f"tags LIKE :tag_{i}")
+                params[f"tag_{i}"] = f'%"{tag}"%'
+            where_conditions.append(f"({' OR '.join(tag_conditions)})")
 
         where_clause = " AND ".join(where_conditions) if where_conditions else ""
 
         return fts_query, where_clause, params
 
-    def _calculate_relevance_score(self, row: Dict[str, Any], query: str) -> float:
-        """Calculate relevance score for search results"""
-        score = 0.0
-
-        # Title matches are most important
-        if query.lower() in row['title'].lower():
-            score += 10.0
-
-        # Content matches
-        content_lower = row['content'].lower()
-        query_lower = query.lower()
-        if query_lower in content_lower:
-            score += 5.0
-
-        # Partial matches in title
-        title_words = set(row['title'].lower().split())
-        query_words = set(query_lower.split())
-        title_matches = len(title_words.intersection(query_words))
-        if title_matches > 0:
-            score += title_matches * 2.0
-
-        # Recency bonus (newer content gets slight boost)
-        try:
-            created_at = datetime.fromisoformat(row['created_at'])
-            days_old = (datetime.now(timezone.utc) - created_at).days
-            recency_bonus = max(0, 1.0 - (days_old / 365.0))  # 1 year decay
-            score += recency_bonus
-        except:
-            pass
-
-        # Content type weights
-        content_type_weights = {
-            'help': 1.2,  # Help articles are important
-            'encyclopedia': 1.1,  # Encyclopedia is valuable
-            'document': 1.0,  # Documents are standard
-            'conversation': 0.9,  # Conversations are common
-            'user': 0.8  # Users are least prioritized
+    def _rank_expression(self) -> Tuple[str, Dict[str, Any]]:
+        """
+        SQL expression for the relevance score of a matched row.
+
+        FTS5 ``bm25()`` takes one weight per column in declaration order
+        (lower is better), so it is negated and scaled by the content type
+        boost to give a score where higher is better.
+        """
+        params = {
+            f"weight_{column}": float(self.column_weights.get(column, 1.0))
+            for column in FTS_COLUMNS
         }
-        score *= content_type_weights.get(row['content_type'], 1.0)
-
-        return score
+        weights = ', '.join(
+            f":weight_{column}" if column in FTS_COLUMNS else '0'
+            for column in SEARCH_INDEX_COLUMNS
+        )
+
+        boost_cases = []
+        for i, (content_type, boost) in enumerate(self.content_type_boosts.items()):
+            boost_cases.append(f"WHEN :boost_type_{i} THEN :boost_{i}")
+            params[f"boost_type_{i}"] = content_type
+            params[f"boost_{i}"] = float(boost)
+        boost = f"CASE content_type {' '.join(boost_cases)} ELSE 1.0 END" if boost_cases else "1.0"
+
+        return f"-bm25(search_index, {weights}) * {boost}", params
+
+    async def _calculate_facets(self, db, match_sql: str, params: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """Aggregate facet counts over the full match set"""
+        facet_queries = {
+            'content_types': f"SELECT content_type, COUNT(*) {match_sql} GROUP BY content_type",
+            'languages': f"SELECT language_code, COUNT(*) {match_sql} GROUP BY language_code",
+            'date_ranges': f"SELECT substr(created_at, 1, 7), COUNT(*) {match_sql} GROUP BY 1",
+            'tags': f"""
+                SELECT tag.value, COUNT(*)
+                FROM (SELECT tags {match_sql}) AS matched, json_each(COALESCE(matched.tags, '[]')) AS tag
+                GROUP BY tag.value
+                ORDER BY COUNT(*) DESC
+                LIMIT :facet_limit
+            """
+        }
+        params = {**params, 'facet_limit': self.facet_limit}
+
+        facets = {}
+        for name, sql in facet_queries.items():
+            rows = (await db.execute(text(sql), params)).all()
+            facets[name] = {value: count for value, count in rows if value is not None}
+        return facets
+
+    def _match_sql(self, where_clause: str) -> str:
+        """FROM/WHERE clause selecting every row matching :fts_query"""
+        return f"""
+            FROM search_index
+            WHERE search_index MATCH :fts_query
+            {'AND ' + where_clause if where_clause else ''}
+        """
+
+    def _ranked_select(self, match_sql: str, sort_by: str) -> Tuple[str, Dict[str, Any]]:
+        """SELECT over ``match_sql`` with relevance scores, in ``sort_by`` order"""
+        rank_sql, rank_params = self._rank_expression()
+        order_by = SORT_ORDERS.get(sort_by, SORT_ORDERS['relevance'])
+        sql = f"""
+            SELECT id, content_type, content_id, title, content, summary,
+                   tags, metadata, language_code, created_at, updated_at,
+                   {rank_sql} AS relevance_score
+            {match_sql}
+            ORDER BY {order_by}
+        """
+        return sql, rank_params
+
+    @staticmethod
+    def _result_row(row) -> Dict[str, Any]:
+        """Result dict for a search_index row, with JSON fields parsed"""
+        row_dict = dict(row)
+        row_dict['tags'] = json.loads(row_dict['tags'] or '[]')
+        row_dict['metadata'] = json.loads(row_dict['metadata'] or '{}')
+        return row_dict
 
     async def search(self, query: str, filters: Dict[str, Any] = None,
                     user_id: Optional[int] = None, limit: int = 50,
@@ -234,85 +298,36 @@ class SearchService:
         filters = filters or {}
 
         try:
-            db = self._get_db_session()
-
             # Build search query
             fts_query, where_clause, params = self._build_search_query(query, filters)
-
-            # Execute search
-            sql = f"""
-                SELECT id, content_type, content_id, title, content, summary,
-                       tags, metadata, language_code, created_at, updated_at,
-                       rank
-                FROM search_index
-                WHERE search_index MATCH ?
-                {'AND ' + where_clause if where_clause else ''}
-                ORDER BY rank
-                LIMIT ? OFFSET ?
-            """
-
-            all_params = [fts_query] + params + [limit, offset]
-            result = db.execute(sql, all_params)
-            rows = result.fetchall()
-
-            # Process results
             results = []
-            facets = {
-                'content_types': {},
-                'languages': {},
-                'tags': {},
-                'date_ranges': {}
-            }
-
-            for row in rows:
-                row_dict = dict(row)
-
-                # Parse JSON fields
-                row_dict['tags'] = json.loads(row_dict['tags'] or '[]')
-                row_dict['metadata'] = json.loads(row_dict['metadata'] or '{}')
-
-                # Calculate relevance score
-                row_dict['relevance_score'] = self._calculate_relevance_score(row_dict, query)
-
-                results.append(row_dict)
-
-                # Update facets
-                ct = row_dict['content_type']
-                lang = row_dict['language_code']
-                facets['content_types'][ct] = facets['content_types'].get(ct, 0) + 1
-                facets['languages'][lang] = facets['languages'].get(lang, 0) + 1
-
-                # Tag facets
-                for tag in row_dict['tags']:
-                    facets['tags'][tag] = facets['tags'].get(tag, 0) + 1
-
-                # Date facets
-                try:
-                    created_date = datetime.fromisoformat(row_dict['created_at'])
-                    month_key = created_date.strftime('%Y-%m')
-                    facets['date_ranges'][month_key] = facets['date_ranges'].get(month_key, 0) + 1
-                except:
-                    pass
-
-            # Sort results
-            if sort_by == 'relevance':
-                results.sort(key=lambda x: x['relevance_score'], reverse=True)
-            elif sort_by == 'date':
-                results.sort(key=lambda x: x['created_at'], reverse=True)
-            elif sort_by == 'title':
-                results.sort(key=lambda x: x['title'].lower())
-
-            # Record search analytics
+            total = 0
+            facets = {'content_types': {}, 'languages': {}, 'tags': {}, 'date_ranges': {}}
+
+            if fts_query:
+                params['fts_query'] = fts_query
+                match_sql = self._match_sql(where_clause)
+
+                async with self._get_async_session() as db:
+                    # Rank, sort and paginate the full match set in SQL
+                    sql, rank_params = self._ranked_select(match_sql, sort_by)
+                    sql += " LIMIT :limit OFFSET :offset"
+                    rows = (await db.execute(
+                        text(sql), {**params, **rank_params, 'limit': limit, 'offset': offset}
+                    )).mappings()
+                    results = [self._result_row(row) for row in rows]
+
+                    total = (await db.execute(text(f"SELECT COUNT(*) {match_sql}"), params)).scalar() or 0
+                    facets = await self._calculate_facets(db, match_sql, params)
+
+            # Analytics and suggestions are written in batches off the request path
             search_time = time.time() - start_time
-            await self._record_search_analytics(query, len(results), search_time, user_id, filters, ip_address, user_agent)
-
-            # Update suggestions
-            await self._update_suggestions(query)
+            self._queue_search_event(query, total, search_time, user_id, filters, ip_address, user_agent)
 
             return {
                 'query': query,
                 'results': results,
-                'total': len(results),
+                'total': total,
                 'facets': facets,
                 'search_time': search_time,
                 'filters_applied': filters
@@ -328,113 +343,139 @@ class SearchService:
                 'search_time': time.time() - start_time,
                 'error': str(e)
             }
-        finally:
-            db.close()
 
-    async def _record_search_analytics(self, query: str, result_count: int, search_time: float,
-                                     user_id: Optional[int], filters: Dict[str, Any],
-                                     ip_address: str, user_agent: str):
-        """Record search analytics"""
+    def _queue_search_event(self, query: str, result_count: int, search_time: float,
+                            user_id: Optional[int], filters: Dict[str, Any],
+                            ip_address: str, user_agent: str):
+        """Hand a completed search to the analytics aggregator"""
+        self.analytics_queue.put({
+            'query': query,
+            'result_count': result_count,
+            'search_time': search_time,
+            'user_id': user_id,
+            'filters': filters,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'created_at': datetime.now(timezone.utc)
+        })
+
+    def _extract_suggestions(self, query: str) -> List[str]:
+        """Suggestion terms in a query (individual words and quoted phrases)"""
+        words = re.findall(r'\b\w+\b', query.lower())
+        phrases = re.findall(r'"([^"]*)"', query.lower())
+        # Skip very short suggestions
+        return [s for s in words + phrases if len(s) >= 3]
+
+    def _write_search_events(self, events: List[Dict[str, Any]]):
+        """
+        Aggregate a batch of searches and write it in one transaction.
+
+        Query history rows are bulk inserted; ``SearchAnalytics`` and
+        ``SearchSuggestion`` are loaded once per batch, updated with the
+        batch totals and committed together.
+        """
+        per_query: Dict[str, Dict[str, Any]] = {}
+        term_counts: Dict[str, int] = {}
+        for event in events:
+            stats = per_query.setdefault(event['query'], {'count': 0, 'total_time': 0.0})
+            stats['count'] += 1
+            stats['total_time'] += event['search_time']
+            stats['result_count'] = event['result_count']
+            stats['last_searched'] = event['created_at']
+            for term in self._extract_suggestions(event['query']):
+                term_counts[term] = term_counts.get(term, 0) + 1
+
+        db = self._get_db_session()
         try:
-            db = self._get_db_session()
-
-            # Record search query
-            search_query = SearchQuery(
-                user_id=user_id,
-                query=query,
-                filters=filters,
-                result_count=result_count,
-                search_time=search_time,
-                ip_address=ip_address,
-                user_agent=user_agent
-            )
-            db.add(search_query)
+            db.execute(insert(SearchQuery), events)
 
             # Update search analytics
-            analytics = db.query(SearchAnalytics).filter(SearchAnalytics.query == query).first()
-            if not analytics:
-                analytics = SearchAnalytics(
-                    query=query,
-                    result_count=result_count,
-                    avg_search_time=search_time,
-                    search_count=1
-                )
-                db.add(analytics)
-            else:
+            existing = {}
+            for chunk in chunked(per_query):
+                for analytics in db.query(SearchAnalytics).filter(SearchAnalytics.query.in_(chunk)):
+                    existing[analytics.query] = analytics
+
+            for query, stats in per_query.items():
+                analytics = existing.get(query)
+                if not analytics:
+                    db.add(SearchAnalytics(
+                        query=query,
+                        result_count=stats['result_count'],
+                        avg_search_time=stats['total_time'] / stats['count'],
+                        search_count=stats['count']
+                    ))
+                    continue
+
                 # Update running averages
-                total_searches = analytics.search_count + 1
-                analytics.avg_search_time = ((analytics.avg_search_time * analytics.search_count) + search_time) / total_searches
-                analytics.result_count = result_count
+                total_searches = analytics.search_count + stats['count']
+                analytics.avg_search_time = ((analytics.avg_search_time * analytics.search_count) + stats['total_time']) / total_searches
+                analytics.result_count = stats['result_count']
                 analytics.search_count = total_searches
-                analytics.last_searched = datetime.now(timezone.utc)
+                analytics.last_searched = stats['last_searched']
 
-                # Calculate popularity score (searches per day * recency)
-                days_since_first = (datetime.now(timezone.utc) - analytics.first_searched).days
+                # Calculate popularity score (searches per day)
+                first_searched = analytics.first_searched
+                if first_searched.tzinfo is None:
+                    first_searched = first_searched.replace(tzinfo=timezone.utc)
+                days_since_first = (stats['last_searched'] - first_searched).days
                 if days_since_first > 0:
                     analytics.popularity_score = analytics.search_count / days_since_first
 
-            db.commit()
+            # Update suggestions
+            existing = {}
+            for chunk in chunked(term_counts):
+                for suggestion in db.query(SearchSuggestion).filter(SearchSuggestion.suggestion.in_(chunk)):
+                    existing[suggestion.suggestion] = suggestion
+
+            now = datetime.now(timezone.utc)
+            popularity = {}
+            for term, count in term_counts.items():
+                suggestion = existing.get(term)
+                if suggestion:
+                    suggestion.popularity += count
+                    suggestion.last_used = now
+                    popularity[term] = suggestion.popularity
+                else:
+                    # The first use creates the row, later uses count towards popularity
+                    db.add(SearchSuggestion(suggestion=term, category='query', popularity=count - 1))
+                    popularity[term] = count - 1
 
-        except Exception as e:
-            logger.error(f"Error recording search analytics: {e}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
         finally:
             db.close()
 
-    async def _update_suggestions(self, query: str):
-        """Update search suggestions based on query"""
-        try:
-            db = self._get_db_session()
-
-            # Extract potential suggestions (individual words and phrases)
-            words = re.findall(r'\b\w+\b', query.lower())
-            phrases = re.findall(r'"([^"]*)"', query.lower())
+        if self.suggestion_index.loaded:
+            for term, value in popularity.items():
+                self.suggestion_index.update(term, value, now)
 
-            suggestions = words + phrases
-
-            for suggestion in suggestions:
-                if len(suggestion) < 3:  # Skip very short suggestions
-                    continue
-
-                existing = db.query(SearchSuggestion).filter(
-                    SearchSuggestion.suggestion == suggestion
-                ).first()
-
-                if existing:
-                    existing.popularity += 1
-                    existing.last_used = datetime.now(timezone.utc)
-                else:
-                    new_suggestion = SearchSuggestion(
-                        suggestion=suggestion,
-                        category='query'
-                    )
-                    db.add(new_suggestion)
-
-            db.commit()
-
-        except Exception as e:
-            logger.error(f"Error updating suggestions: {e}")
+    def load_suggestion_index(self):
+        """Build the in-memory autocomplete index from SearchSuggestion"""
+        db = self._get_db_session()
+        try:
+            rows = db.query(
+                SearchSuggestion.suggestion,
+                SearchSuggestion.popularity,
+                SearchSuggestion.last_used
+            ).all()
         finally:
             db.close()
 
+        self.suggestion_index.load(rows)
+        logger.info(f"Loaded {len(self.suggestion_index)} search suggestions")
+
     async def get_suggestions(self, prefix: str, limit: int = 10) -> List[str]:
         """Get autocomplete suggestions"""
         try:
-            db = self._get_db_session()
-
-            suggestions = db.query(SearchSuggestion).filter(
-                SearchSuggestion.suggestion.like(f'{prefix}%')
-            ).order_by(
-                SearchSuggestion.popularity.desc(),
-                SearchSuggestion.last_used.desc()
-            ).limit(limit).all()
-
-            return [s.suggestion for s in suggestions]
+            if not self.suggestion_index.loaded:
+                self.load_suggestion_index()
+            return self.suggestion_index.suggest(prefix, limit)
 
         except Exception as e:
             logger.error(f"Error getting suggestions: {e}")
             return []
-        finally:
-            db.close()
 
     async def get_popular_queries(self, limit: int = 20) -> List[Dict[str, Any]]:
         """Get popular search queries"""
@@ -509,47 +550,122 @@ class SearchService:
         finally:
             db.close()
 
-    async def export_search_results(self, query: str, filters: Dict[str, Any],
-                                  format: str, user_id: int) -> str:
-        """Export search results to file"""
+    def iter_search_results(self, query: str, filters: Dict[str, Any] = None,
+                            sort_by: str = 'relevance') -> Iterator[Dict[str, Any]]:
+        """
+        Yield every ranked match for ``query`` without loading the result set.
+
+        Rows are pulled from the cursor ``export_chunk_size`` at a time, so
+        memory stays flat however many documents match.
+        """
+        fts_query, where_clause, params = self._build_search_query(query, filters or {})
+        if not fts_query:
+            return
+
+        params['fts_query'] = fts_query
+        sql, rank_params = self._ranked_select(self._match_sql(where_clause), sort_by)
+
+        db = self._get_db_session()
         try:
-            # Perform search
-            results = await self.search(query, filters, user_id, limit=1000)
+            result = db.execute(
+                text(sql).execution_options(stream_results=True, yield_per=self.export_chunk_size),
+                {**params, **rank_params}
+            )
+            for row in result.mappings():
+                yield self._result_row(row)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _serialize_results(rows: Iterable[Dict[str, Any]], format: str) -> Iterator[str]:
+        """Encode result rows as ``format`` one piece at a time"""
+        if format == 'csv':
+            buffer = io.StringIO()
+            writer = None
+            for row in rows:
+                # Convert complex types to strings
+                clean_row = {k: json.dumps(v) if isinstance(v, (list, dict)) else str(v)
+                             for k, v in row.items()}
+                if writer is None:
+                    writer = csv.DictWriter(buffer, fieldnames=list(clean_row))
+                    writer.writeheader()
+                writer.writerow(clean_row)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        elif format == 'json':
+            separator = '[\n'
+            for row in rows:
+                yield separator + json.dumps(row, default=str)
+                separator = ',\n'
+            yield '[]\n' if separator == '[\n' else '\n]\n'
+        elif format in ('jsonl', 'ndjson'):
+            for row in rows:
+                yield json.dumps(row, default=str) + '\n'
+        else:
+            raise ValueError(f"Unsupported format: {format}")
+
+    def stream_search_results(self, query: str, filters: Dict[str, Any], format: str,
+                              sort_by: str = 'relevance') -> Iterator[str]:
+        """
+        Serialized search results in buffer-sized chunks, for a streaming
+        HTTP response. Raises ValueError up front for unknown formats.
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format: {format}")
+
+        def chunks():
+            pending = []
+            size = 0
+            for piece in self._serialize_results(self.iter_search_results(query, filters, sort_by), format):
+                pending.append(piece)
+                size += len(piece)
+                if size >= self.export_buffer_size:
+                    yield ''.join(pending)
+                    pending = []
+                    size = 0
+            if pending:
+                yield ''.join(pending)
+
+        return chunks()
+
+    def _write_export(self, query: str, filters: Dict[str, Any], format: str,
+                      file_path: Path, compress: bool) -> int:
+        """Write the export file incrementally, returning the number of results"""
+        count = 0
+
+        def counted(rows):
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        opener = gzip.open if compress else open
+        with opener(file_path, 'wt', encoding='utf-8', newline='') as f:
+            for piece in self._serialize_results(counted(self.iter_search_results(query, filters)), format):
+                f.write(piece)
+        return count
+
+    async def export_search_results(self, query: str, filters: Dict[str, Any],
+                                  format: str, user_id: int, compress: bool = False) -> str:
+        """Stream all search results to a file, optionally gzip-compressed"""
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format: {format}")
 
-            # Generate export
+        db = None
+        file_path = None
+        try:
             export_id = f"export_{int(time.time())}_{user_id}"
+            filename = f"search_results_{export_id}.{format}" + ('.gz' if compress else '')
 
-            if format == 'json':
-                data = json.dumps(results['results'], indent=2, default=str)
-                filename = f"search_results_{export_id}.json"
-            elif format == 'csv':
-                import csv
-                import io
-                output = io.StringIO()
-                if results['results']:
-                    writer = csv.DictWriter(output, fieldnames=results['results'][0].keys())
-                    writer.writeheader()
-                    for row in results['results']:
-                        # Convert complex types to strings
-                        clean_row = {}
-                        for k, v in row.items():
-                            if isinstance(v, (list, dict)):
-                                clean_row[k] = json.dumps(v)
-                            else:
-                                clean_row[k] = str(v)
-                        writer.writerow(clean_row)
-                data = output.getvalue()
-                filename = f"search_results_{export_id}.csv"
-            else:
-                raise ValueError(f"Unsupported format: {format}")
-
-            # Save to file
-            export_dir = Path("exports")
-            export_dir.mkdir(exist_ok=True)
+            export_dir = Path(self.config.get('paths', {}).get('exports_dir', 'exports'))
+            export_dir.mkdir(parents=True, exist_ok=True)
             file_path = export_dir / filename
 
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(data)
+            loop = asyncio.get_running_loop()
+            result_count = await loop.run_in_executor(
+                self.executor, self._write_export, query, filters, format, file_path, compress
+            )
 
             # Record export
             db = self._get_db_session()
@@ -561,8 +677,8 @@ class SearchService:
                 format=format,
                 status='completed',
                 file_path=str(file_path),
-                file_size=len(data.encode('utf-8')),
-                result_count=len(results['results']),
+                file_size=file_path.stat().st_size,
+                result_count=result_count,
                 expires_at=datetime.now(timezone.utc) + timedelta(days=7),
                 completed_at=datetime.now(timezone.utc)
             )
@@ -573,28 +689,21 @@ class SearchService:
 
         except Exception as e:
             logger.error(f"Error exporting search results: {e}")
+            if file_path is not None and db is None:
+                file_path.unlink(missing_ok=True)
             raise
         finally:
-            db.close()
+            if db is not None:
+                db.close()
 
-    async def reindex_all_content(self):
-        """Reindex all content in the background"""
-        try:
-            logger.info("Starting full reindexing...")
-            db = self._get_db_session()
+    async def reindex_all_content(self) -> Dict[str, Any]:
+        """Rebuild the search index on a worker thread, resuming an interrupted run"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.indexer.reindex)
 
-            # Clear existing index
-            db.execute("DELETE FROM search_index")
-
-            # Reinitialize with current data
-            init_search_data(db)
-
-            logger.info("Full reindexing completed")
-
-        except Exception as e:
-            logger.error(f"Error during reindexing: {e}")
-        finally:
-            db.close()
+    def get_reindex_progress(self) -> Dict[str, Any]:
+        """Progress of the current or last full reindex"""
+        return dict(self.indexer.progress)
 
     async def get_search_stats(self) -> Dict[str, Any]:
         """Get comprehensive search statistics"""
@@ -602,14 +711,14 @@ class SearchService:
             db = self._get_db_session()
 
             # Total indexed documents
-            total_docs = db.execute("SELECT COUNT(*) FROM search_index").scalar()
+            total_docs = db.execute(text("SELECT COUNT(*) FROM search_index")).scalar()
 
             # Documents by type
-            docs_by_type = db.execute("""
+            docs_by_type = db.execute(text("""
                 SELECT content_type, COUNT(*) as count
                 FROM search_index
                 GROUP BY content_type
-            """).fetchall()
+            """)).fetchall()
 
             # Recent searches
             recent_searches = db.query(SearchQuery).order_by(
@@ -632,7 +741,8 @@ class SearchService:
                 } for q in popular_queries],
                 'avg_search_time': db.query(SearchQuery).filter(
                     SearchQuery.search_time.isnot(None)
-                ).with_entities(SearchQuery.search_time).all()
+                ).with_entities(SearchQuery.search_time).all(),
+                'indexer': self.indexer.get_stats()
             }
 
         except Exception as e:
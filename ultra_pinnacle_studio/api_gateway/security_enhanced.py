@@ -158,7 +158,7 @@ class AuditLogger:
     
     def __init__(self):
         self.audit_log = deque(maxlen=10000)  # Keep last 10k entries
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()  # get_security_summary re-enters via get_audit_log
     
     def log_event(self, event_type: str, user: str = "anonymous", resource: str = "",
                   action: str = "", details: Dict = None, ip: str = "", user_agent: str = ""):
@@ -0,0 +1,97 @@
+"""
+Autocomplete index for Ultra Pinnacle AI Studio
+In-memory prefix trie whose nodes keep their top-k suggestions, so a
+lookup is a walk down the prefix with no database access
+"""
+
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.top: List[str] = []
+
+
+class SuggestionIndex:
+    """
+    Prefix trie of suggestion terms ranked by (popularity, last_used).
+
+    Every node caches the ``top_k`` best terms below it, so ``suggest`` costs
+    O(len(prefix)) regardless of how many terms share the prefix. Updates
+    assume a term's score only grows between ``load`` calls, which holds for
+    the popularity counters kept in ``SearchSuggestion``.
+    """
+
+    def __init__(self, top_k: int = 20):
+        self.top_k = max(1, int(top_k))
+        self.lock = threading.Lock()
+        self.loaded = False
+        self._root = _Node()
+        self._scores: Dict[str, Tuple[int, float]] = {}
+
+    @staticmethod
+    def _timestamp(when: Optional[datetime]) -> float:
+        if when is None:
+            return 0.0
+        if when.tzinfo is None:
+            # SQLite hands back naive datetimes for UTC columns
+            when = when.replace(tzinfo=timezone.utc)
+        return when.timestamp()
+
+    def _rank(self, top: List[str], term: str, key):
+        """Place ``term`` in a node's top list if it ranks within top_k"""
+        if term in top:
+            top.remove(term)
+        elif len(top) >= self.top_k and key(top[-1]) >= key(term):
+            return
+        top.append(term)
+        top.sort(key=key, reverse=True)
+        del top[self.top_k:]
+
+    def _insert(self, root: _Node, scores: Dict[str, Tuple[int, float]], term: str):
+        """Walk ``term``'s path, creating nodes and re-ranking each top list"""
+        key = scores.__getitem__
+        node = root
+        self._rank(node.top, term, key)
+        for char in term:
+            node = node.children.setdefault(char, _Node())
+            self._rank(node.top, term, key)
+
+    def load(self, rows: Iterable[Tuple[str, int, Optional[datetime]]]):
+        """Rebuild from (suggestion, popularity, last_used) rows"""
+        root = _Node()
+        scores = {}
+        for suggestion, popularity, last_used in rows:
+            term = suggestion.lower()
+            scores[term] = (popularity or 0, self._timestamp(last_used))
+            self._insert(root, scores, term)
+
+        with self.lock:
+            self._root = root
+            self._scores = scores
+            self.loaded = True
+
+    def update(self, suggestion: str, popularity: int, last_used: Optional[datetime] = None):
+        """Record the current popularity of a suggestion"""
+        term = suggestion.lower()
+        with self.lock:
+            self._scores[term] = (popularity or 0, self._timestamp(last_used))
+            self._insert(self._root, self._scores, term)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Best suggestions starting with ``prefix`` (at most ``top_k``)"""
+        with self.lock:
+            node = self._root
+            for char in prefix.lower():
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            return node.top[:limit]
+
+    def __len__(self) -> int:
+        return len(self._scores)
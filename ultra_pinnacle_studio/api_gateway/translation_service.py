@@ -54,7 +54,7 @@ class TranslationService:
                 prompt = f"Translate this text from {from_lang_name} to {to_lang_name}:\n\n{content}"
 
             # Use AI model for translation
-            translated = self.model_manager.generate_text(
+            translated = await self.model_manager.generate_text_async(
                 model_name="gpt-4",  # Prefer GPT-4 for translation quality
                 prompt=prompt,
                 max_tokens=len(content.split()) * 2,  # Estimate token count
@@ -86,7 +86,7 @@ Text: {content[:500]}...
 
 Language code:"""
 
-            detected_lang = self.model_manager.generate_text(
+            detected_lang = await self.model_manager.generate_text_async(
                 model_name="gpt-4",
                 prompt=prompt,
                 max_tokens=10,
@@ -166,7 +166,7 @@ Rate the translation quality on a scale of 1-10 and provide brief feedback.
 Format: Score: X/10
 Feedback: [your feedback]"""
 
-            assessment = self.model_manager.generate_text(
+            assessment = await self.model_manager.generate_text_async(
                 model_name="gpt-4",
                 prompt=prompt,
                 max_tokens=200,
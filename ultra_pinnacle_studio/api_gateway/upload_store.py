@@ -0,0 +1,252 @@
+"""
+Upload storage for Ultra Pinnacle AI Studio
+Uploads are copied to a temp file in fixed-size chunks, hashed with SHA-256
+on the way through and moved into content-addressed storage, so identical
+files are stored once and no upload is ever held in memory. Size limits are
+enforced as bytes arrive. Large files can be sent as a resumable multipart
+upload: parts are stored on disk per session, re-sending a part replaces
+it, and completing the session streams the parts into one object.
+
+    uploads_dir/objects/ab/ab12...   stored content, named by SHA-256
+    uploads_dir/sessions/<id>/       manifest.json and part-00001, ...
+    uploads_dir/tmp/                 in-flight writes
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import aiofiles
+
+from .logging_config import logger
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+MAX_PART_NUMBER = 10000
+
+_SESSION_ID = re.compile(r'^[0-9a-f]{32}$')
+_PART_FILE = re.compile(r'^part-(\d{5})$')
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(Exception):
+    """An upload was rejected; ``status_code`` is the HTTP status to report"""
+    status_code = 400
+
+
+class UploadTooLarge(UploadError):
+    status_code = 413
+
+
+class UploadSessionNotFound(UploadError):
+    status_code = 404
+
+
+@dataclass
+class StoredUpload:
+    """Where an upload's content ended up"""
+    sha256: str
+    size: int
+    path: Path
+    deduplicated: bool
+
+
+async def read_chunks(file, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Iterate an object with an async ``read(n)`` (such as UploadFile) in chunks"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class UploadStore:
+    """Content-addressed upload storage with resumable multipart sessions"""
+
+    def __init__(self, root: str, settings: Optional[Dict[str, Any]] = None):
+        settings = settings or {}
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.sessions_dir = self.root / 'sessions'
+        self.tmp_dir = self.root / 'tmp'
+        self.chunk_size = settings.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        self.max_part_size = settings.get('max_part_size', 64 * 1024 * 1024)
+        self.max_multipart_size = settings.get('max_multipart_size', 5 * 1024 ** 3)
+        self.session_ttl = timedelta(hours=settings.get('session_ttl_hours', 24))
+
+    def object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256
+
+    # Streaming writes
+
+    async def _spool(self, chunks: AsyncIterator[bytes], limit: int,
+                     inspect: Optional[Callable[[bytes], None]] = None) -> Tuple[Path, str, int]:
+        """Copy ``chunks`` to a temp file, hashing and checking the size as they arrive"""
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.tmp_dir / f"{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > limit:
+                        raise UploadTooLarge(f"Upload exceeds the maximum size of {limit} bytes")
+                    if inspect:
+                        inspect(chunk)
+                    digest.update(chunk)
+                    await f.write(chunk)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    def _commit(self, tmp_path: Path, sha256: str, size: int) -> StoredUpload:
+        """Move a spooled file into content-addressed storage, or drop it if already stored"""
+        path = self.object_path(sha256)
+        if path.exists():
+            tmp_path.unlink(missing_ok=True)
+            return StoredUpload(sha256, size, path, deduplicated=True)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, path)
+        return StoredUpload(sha256, size, path, deduplicated=False)
+
+    async def store(self, chunks: AsyncIterator[bytes], max_size: int,
+                    inspect: Optional[Callable[[bytes], None]] = None) -> StoredUpload:
+        """
+        Store a single-request upload. ``inspect`` sees every chunk before it
+        is written and may raise to reject the upload.
+        """
+        tmp_path, sha256, size = await self._spool(chunks, max_size, inspect)
+        return self._commit(tmp_path, sha256, size)
+
+    # Multipart sessions
+
+    def _session_dir(self, session_id: str) -> Path:
+        if not _SESSION_ID.match(session_id or ''):
+            raise UploadSessionNotFound("Upload session not found")
+        session_dir = self.sessions_dir / session_id
+        if not (session_dir / 'manifest.json').exists():
+            raise UploadSessionNotFound("Upload session not found")
+        return session_dir
+
+    def _parts(self, session_dir: Path) -> List[Dict[str, int]]:
+        parts = []
+        for entry in session_dir.iterdir():
+            match = _PART_FILE.match(entry.name)
+            if match:
+                parts.append({'part_number': int(match.group(1)), 'size': entry.stat().st_size})
+        return sorted(parts, key=lambda part: part['part_number'])
+
+    def create_session(self, user_id: int, filename: str, content_type: Optional[str] = None,
+                       total_size: Optional[int] = None) -> Dict[str, Any]:
+        """Start a multipart upload and return its manifest"""
+        if total_size is not None and total_size > self.max_multipart_size:
+            raise UploadTooLarge(f"Upload exceeds the maximum size of {self.max_multipart_size} bytes")
+        self.cleanup_expired()
+
+        session_id = uuid.uuid4().hex
+        created_at = datetime.now(timezone.utc)
+        manifest = {
+            'session_id': session_id,
+            'user_id': user_id,
+            'filename': filename,
+            'content_type': content_type,
+            'total_size': total_size,
+            'part_size_limit': self.max_part_size,
+            'created_at': created_at.isoformat(),
+            'expires_at': (created_at + self.session_ttl).isoformat()
+        }
+        session_dir = self.sessions_dir / session_id
+        session_dir.mkdir(parents=True)
+        (session_dir / 'manifest.json').write_text(json.dumps(manifest))
+        return manifest
+
+    def get_session(self, session_id: str) -> Dict[str, Any]:
+        """Manifest plus the parts received so far, for resuming an upload"""
+        session_dir = self._session_dir(session_id)
+        manifest = json.loads((session_dir / 'manifest.json').read_text())
+        manifest['parts'] = self._parts(session_dir)
+        manifest['received_size'] = sum(part['size'] for part in manifest['parts'])
+        return manifest
+
+    async def write_part(self, session_id: str, part_number: int,
+                         chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Store (or replace) one part of a multipart upload"""
+        if not 1 <= part_number <= MAX_PART_NUMBER:
+            raise UploadError(f"Part number must be between 1 and {MAX_PART_NUMBER}")
+        session = self.get_session(session_id)
+        other_parts = sum(part['size'] for part in session['parts'] if part['part_number'] != part_number)
+        remaining = (session['total_size'] if session['total_size'] is not None
+                     else self.max_multipart_size) - other_parts
+        limit = min(self.max_part_size, remaining)
+
+        tmp_path, sha256, size = await self._spool(chunks, limit)
+        part_path = self.sessions_dir / session_id / f"part-{part_number:05d}"
+        os.replace(tmp_path, part_path)
+        return {'part_number': part_number, 'size': size, 'sha256': sha256}
+
+    async def _read_parts(self, session_dir: Path, parts: List[Dict[str, int]]) -> AsyncIterator[bytes]:
+        for part in parts:
+            async with aiofiles.open(session_dir / f"part-{part['part_number']:05d}", 'rb') as f:
+                while True:
+                    chunk = await f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+    async def complete(self, session_id: str, expected_sha256: Optional[str] = None,
+                       inspect: Optional[Callable[[bytes], None]] = None) -> StoredUpload:
+        """Join the parts of a multipart upload into one stored object"""
+        session = self.get_session(session_id)
+        parts = session['parts']
+        numbers = [part['part_number'] for part in parts]
+        if not numbers or numbers != list(range(1, len(numbers) + 1)):
+            missing = sorted(set(range(1, max(numbers, default=1) + 1)) - set(numbers))
+            raise UploadError(f"Upload is incomplete; missing parts {missing}")
+        if session['total_size'] is not None and session['received_size'] != session['total_size']:
+            raise UploadError(f"Received {session['received_size']} of {session['total_size']} bytes")
+        if expected_sha256 is not None and not _SHA256.match(expected_sha256.lower()):
+            raise UploadError("expected_sha256 must be a hex SHA-256 digest")
+
+        session_dir = self.sessions_dir / session_id
+        tmp_path, sha256, size = await self._spool(
+            self._read_parts(session_dir, parts), self.max_multipart_size, inspect
+        )
+        if expected_sha256 is not None and sha256 != expected_sha256.lower():
+            tmp_path.unlink(missing_ok=True)
+            raise UploadError(f"Checksum mismatch: expected {expected_sha256.lower()}, got {sha256}")
+
+        stored = self._commit(tmp_path, sha256, size)
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return stored
+
+    def abort(self, session_id: str):
+        """Discard a multipart upload and its parts"""
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    def cleanup_expired(self) -> int:
+        """Remove multipart sessions past their expiry; returns how many were removed"""
+        if not self.sessions_dir.exists():
+            return 0
+        now = datetime.now(timezone.utc)
+        removed = 0
+        for session_dir in self.sessions_dir.iterdir():
+            try:
+                manifest = json.loads((session_dir / 'manifest.json').read_text())
+                expired = datetime.fromisoformat(manifest['expires_at']) < now
+            except (OSError, ValueError, KeyError):
+                # Unreadable manifest: fall back to the directory's age
+                modified = datetime.fromtimestamp(session_dir.stat().st_mtime, timezone.utc)
+                expired = modified + self.session_ttl < now
+            if expired:
+                shutil.rmtree(session_dir, ignore_errors=True)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} expired upload sessions")
+        return removed
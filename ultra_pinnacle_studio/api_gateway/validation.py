@@ -250,28 +250,53 @@ def sanitize_html(html_content: str) -> str:
     """Sanitize HTML content"""
     return bleach.clean(html_content, tags=ALLOWED_HTML_TAGS, attributes=ALLOWED_HTML_ATTRS, strip=True)
 
-def validate_file_upload(file, filename: str, content_type: str) -> None:
-    """Validate file upload"""
-    # Check file size
-    file_content = file.read()
-    file.seek(0)  # Reset file pointer
+# Byte patterns rejected anywhere in uploaded text content (matched lowercased)
+MALICIOUS_CONTENT_MARKERS = (b'<?php', b'<script')
 
-    if len(file_content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {MAX_FILE_SIZE} bytes")
-
-    # Check file extension
+def validate_upload_metadata(filename: str, content_type: Optional[str],
+                             allowed_extensions=ALLOWED_EXTENSIONS, check_content_type: bool = True) -> str:
+    """Validate an upload's name and declared type; returns the lowercased extension"""
     import os
-    _, ext = os.path.splitext(filename.lower())
-    if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail=f"File type not allowed. Allowed extensions: {', '.join(ALLOWED_EXTENSIONS)}")
+    _, ext = os.path.splitext((filename or '').lower())
+    if ext not in allowed_extensions:
+        raise HTTPException(status_code=400, detail=f"File type not allowed. Allowed extensions: {', '.join(sorted(allowed_extensions))}")
 
-    # Check MIME type
-    if content_type not in ALLOWED_MIME_TYPES:
+    if check_content_type and content_type not in ALLOWED_MIME_TYPES:
         raise HTTPException(status_code=400, detail=f"Content type not allowed: {content_type}")
 
-    # Check for malicious content
-    if b'<?php' in file_content.lower() or b'<script' in file_content.lower():
-        raise HTTPException(status_code=400, detail="Potentially malicious file content detected")
+    return ext
+
+class UploadContentScanner:
+    """Check uploaded content for malicious markers one chunk at a time"""
+
+    def __init__(self):
+        self._overlap = max(len(marker) for marker in MALICIOUS_CONTENT_MARKERS) - 1
+        self._tail = b''
+
+    def feed(self, chunk: bytes) -> None:
+        # Keep the end of the previous chunk so markers split across chunks are found
+        window = self._tail + chunk.lower()
+        if any(marker in window for marker in MALICIOUS_CONTENT_MARKERS):
+            raise HTTPException(status_code=400, detail="Potentially malicious file content detected")
+        self._tail = window[-self._overlap:]
+
+def validate_file_upload(file, filename: str, content_type: str) -> None:
+    """Validate file upload"""
+    validate_upload_metadata(filename, content_type)
+
+    # Check file size and content without reading it all into memory
+    scanner = UploadContentScanner()
+    size = 0
+    while True:
+        chunk = file.read(1024 * 1024)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_FILE_SIZE:
+            file.seek(0)
+            raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {MAX_FILE_SIZE} bytes")
+        scanner.feed(chunk)
+    file.seek(0)  # Reset file pointer
 
 def validate_topic_name(topic: str) -> str:
     """Validate encyclopedia topic name"""
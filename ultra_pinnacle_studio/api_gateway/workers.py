@@ -1,27 +1,54 @@
 import asyncio
+import heapq
+import itertools
 import json
-from typing import Dict, Any, List
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Callable
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from .logging_config import logger
 
+FINISHED_STATUSES = {"completed", "failed", "cancelled"}
+
+
 class WorkerManager:
-    def __init__(self, config: Dict[str, Any]):
+    """
+    Background task runner with a durable, prioritized queue.
+
+    Tasks are queued per resource class ("cpu" or "io"), each with its own
+    concurrency limit, so long compute jobs cannot occupy the slots that
+    short IO-bound jobs need. Within a class tasks are ordered by
+    ``enqueued_at - priority * aging_seconds``: one priority level is worth
+    ``aging_seconds`` of waiting, so a low-priority task overtakes newer
+    high-priority work once it has waited long enough.
+
+    Tasks with an owner are mirrored to the ``tasks`` table so pending work
+    survives a restart (see ``start``). Finished tasks are dropped from
+    memory after ``task_ttl_seconds`` and remain queryable from the database.
+    """
+
+    def __init__(self, config: Dict[str, Any], session_factory: Optional[Callable] = None):
         self.config = config
         self.tasks = {}
         self.workers_dir = Path("workers")
         self.workers_dir.mkdir(exist_ok=True)
 
         # Scalability improvements
-        self.max_concurrent_tasks = config.get("workers", {}).get("max_concurrent_tasks", 10)
-        self.cpu_workers = config.get("workers", {}).get("cpu_workers", 4)
-        self.io_workers = config.get("workers", {}).get("io_workers", 20)
-
-        # Process pool for CPU-intensive tasks
+        workers_config = config.get("workers", {})
+        self.max_concurrent_tasks = workers_config.get("max_concurrent_tasks", 10)
+        self.cpu_workers = workers_config.get("cpu_workers", 4)
+        self.io_workers = workers_config.get("io_workers", 20)
+        self.aging_seconds = float(workers_config.get("aging_seconds", 30))
+        self.task_ttl_seconds = float(workers_config.get("task_ttl_seconds", 3600))
+        self.max_finished_tasks = int(workers_config.get("max_finished_tasks", 1000))
+        self.persist = workers_config.get("persist", True)
+        self._session_factory = session_factory
+
+        # Process pool for CPU-intensive tasks, thread pool for blocking IO
         self.process_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
-
-        # Semaphore for limiting concurrent tasks
-        self.task_semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
+        self.io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="task-io")
 
         # Task priorities (higher number = higher priority)
         self.task_priorities = {
@@ -32,14 +59,161 @@ class WorkerManager:
             "image_generation": 2,
             "text_to_image": 2
         }
+        self.task_priorities.update(workers_config.get("task_priorities", {}))
+
+        # Resource class per task type; unknown types run as IO
+        self.task_resources = {
+            "code_analysis": "io",
+            "model_training": "cpu",
+            "data_processing": "io",
+            "file_processing": "io",
+            "image_generation": "cpu",
+            "text_to_image": "cpu"
+        }
+        self.task_resources.update(workers_config.get("task_resources", {}))
+
+        # Slots per resource class; together they stay within max_concurrent_tasks
+        # (at least one slot each, so a limit below 2 is treated as 2)
+        cpu_slots = max(1, min(self.cpu_workers, self.max_concurrent_tasks - 1))
+        self.class_limits = {
+            "cpu": cpu_slots,
+            "io": max(1, min(self.io_workers, self.max_concurrent_tasks - cpu_slots))
+        }
+
+        self.handlers = {
+            "code_analysis": lambda data: self._run_io_task(self._analyze_code_sync, data),
+            "model_training": lambda data: self._run_cpu_task(self._train_model_sync, data),
+            "data_processing": lambda data: self._run_io_task(self._process_data_sync, data),
+            "image_generation": self._generate_image,
+            "text_to_image": self._text_to_image
+        }
+
+        # resource class -> heap of (sort_key, sequence, task_id)
+        self.queues: Dict[str, List[tuple]] = {name: [] for name in self.class_limits}
+        self.running: Dict[str, asyncio.Task] = {}
+        self._sequence = itertools.count()
+        self._wakeup: Dict[str, asyncio.Event] = {}
+        self._dispatchers: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "recovered": 0,
+            "expired": 0,
+            "persist_errors": 0
+        }
+
+    def _session(self):
+        """Open a database session, or None when persistence is off"""
+        if not self.persist:
+            return None
+        if self._session_factory is None:
+            from .database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def _persist(self, task: Dict[str, Any], **columns):
+        """Insert or update a task row; failures are logged, never raised"""
+        if task.get("user_id") is None:
+            return  # The tasks table requires an owner
+        db = self._session()
+        if db is None:
+            return
+        try:
+            from .database import Task
+            row = db.get(Task, task["id"])
+            if row is None:
+                row = Task(id=task["id"], user_id=task["user_id"], type=task["type"], data=task["data"],
+                           created_at=datetime.fromtimestamp(task["created_at"], timezone.utc))
+                db.add(row)
+            row.status = task["status"]
+            for name, value in columns.items():
+                setattr(row, name, value)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.stats["persist_errors"] += 1
+            logger.warning(f"Could not persist task {task['id']}: {e}")
+        finally:
+            db.close()
+
+    def _resource_class(self, task_type: str) -> str:
+        resource_class = self.task_resources.get(task_type, "io")
+        return resource_class if resource_class in self.queues else "io"
+
+    def _ensure_dispatchers(self):
+        """Start one dispatcher per resource class on the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._dispatchers:
+            return
+        # Work popped by dispatchers of a previous loop is gone with that loop
+        self.running.clear()
+        self._loop = loop
+        for resource_class in self.queues:
+            self._wakeup[resource_class] = asyncio.Event()
+            self._dispatchers[resource_class] = loop.create_task(self._dispatch(resource_class))
+        for resource_class, heap in self.queues.items():
+            if heap:
+                self._wakeup[resource_class].set()
+
+    def _enqueue(self, task: Dict[str, Any]):
+        resource_class = self._resource_class(task["type"])
+        sort_key = task["created_at"] - task["priority"] * self.aging_seconds
+        heapq.heappush(self.queues[resource_class], (sort_key, next(self._sequence), task["id"]))
+        if resource_class in self._wakeup:
+            self._wakeup[resource_class].set()
+
+    async def start(self):
+        """Re-queue tasks left pending or running by a previous process and start dispatching"""
+        self._ensure_dispatchers()
+        db = self._session()
+        if db is None:
+            return
+        try:
+            from .database import Task
+            rows = db.query(Task).filter(Task.status.in_(["pending", "running"])).all()
+            for row in rows:
+                if row.id in self.tasks:
+                    continue
+                created_at = row.created_at or datetime.now(timezone.utc)
+                if created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                task = {
+                    "id": row.id,
+                    "type": row.type,
+                    "data": row.data or {},
+                    "status": "pending",
+                    "priority": self.task_priorities.get(row.type, 1),
+                    "user_id": row.user_id,
+                    "created_at": created_at.timestamp()
+                }
+                row.status = "pending"
+                row.started_at = None
+                self.tasks[row.id] = task
+                self._enqueue(task)
+                self.stats["recovered"] += 1
+            db.commit()
+            if rows:
+                logger.info(f"Recovered {len(rows)} unfinished background tasks")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error recovering background tasks: {e}")
+        finally:
+            db.close()
 
-    async def submit_task(self, task_type: str, data: Dict[str, Any], priority: int = None) -> str:
+    async def submit_task(self, task_type: str, data: Dict[str, Any], priority: int = None,
+                          user_id: Optional[int] = None) -> str:
         """Submit a background task with priority-based queuing"""
-        import secrets
         task_id = secrets.token_hex(16)
 
         if priority is None:
             priority = self.task_priorities.get(task_type, 1)
+        if user_id is None:
+            user_id = data.get("user_id")
 
         task = {
             "id": task_id,
@@ -47,64 +221,173 @@ class WorkerManager:
             "data": data,
             "status": "pending",
             "priority": priority,
-            "created_at": asyncio.get_event_loop().time()
+            "user_id": user_id,
+            "created_at": time.time()
         }
 
+        self.collect_garbage()
         self.tasks[task_id] = task
-
-        # Start background processing with semaphore control
-        asyncio.create_task(self._process_task_with_semaphore(task_id))
+        self._persist(task)
+        self._ensure_dispatchers()
+        self._enqueue(task)
+        self.stats["submitted"] += 1
 
         logger.info(f"Submitted task {task_id} of type {task_type} with priority {priority}")
         return task_id
 
-    async def _process_task_with_semaphore(self, task_id: str):
-        """Process task with concurrency control"""
-        async with self.task_semaphore:
-            await self._process_task(task_id)
+    async def _dispatch(self, resource_class: str):
+        """Start queued tasks of one resource class while slots are free"""
+        heap = self.queues[resource_class]
+        wakeup = self._wakeup[resource_class]
+        limit = self.class_limits[resource_class]
+        active = set()
+
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            while heap and len(active) < limit:
+                _, _, task_id = heapq.heappop(heap)
+                task = self.tasks.get(task_id)
+                if task is None or task["status"] != "pending":
+                    continue  # Cancelled or collected while queued
+                runner = asyncio.create_task(self._process_task(task_id))
+                self.running[task_id] = runner
+                active.add(runner)
+
+                def finished(done, task_id=task_id):
+                    active.discard(done)
+                    self.running.pop(task_id, None)
+                    wakeup.set()
+
+                runner.add_done_callback(finished)
+
+    async def cancel_task(self, task_id: str) -> bool:
+        """Cancel a pending or running task; returns False if it already finished"""
+        task = self.tasks.get(task_id)
+        if not task:
+            raise ValueError(f"Task {task_id} not found")
+        if task["status"] in FINISHED_STATUSES:
+            return False
+
+        runner = self.running.get(task_id)
+        if runner is not None:
+            # Work already handed to an executor finishes in the background
+            runner.cancel()
+        self._mark_cancelled(task)
+        return True
+
+    def _mark_cancelled(self, task: Dict[str, Any]):
+        if task["status"] == "cancelled":
+            return
+        task["status"] = "cancelled"
+        task["completed_at"] = time.time()
+        self.stats["cancelled"] += 1
+        self._persist(task, completed_at=datetime.now(timezone.utc))
+        logger.info(f"Cancelled task {task['id']}")
 
     async def get_task_status(self, task_id: str) -> Dict[str, Any]:
         """Get status of a task"""
         task = self.tasks.get(task_id)
-        if not task:
-            raise ValueError(f"Task {task_id} not found")
-        return task
+        if task:
+            return task
+
+        # Expired from memory; fall back to the durable record
+        db = self._session()
+        if db is not None:
+            try:
+                from .database import Task
+                row = db.get(Task, task_id)
+                if row is not None:
+                    return {
+                        "id": row.id,
+                        "type": row.type,
+                        "data": row.data,
+                        "status": row.status,
+                        "user_id": row.user_id,
+                        "result": row.result,
+                        "error": row.error,
+                        "created_at": row.created_at.isoformat() if row.created_at else None,
+                        "started_at": row.started_at.isoformat() if row.started_at else None,
+                        "completed_at": row.completed_at.isoformat() if row.completed_at else None
+                    }
+            finally:
+                db.close()
+        raise ValueError(f"Task {task_id} not found")
+
+    def collect_garbage(self) -> int:
+        """Drop finished tasks past their TTL, then the oldest beyond max_finished_tasks"""
+        now = time.time()
+        finished = sorted(
+            (task.get("completed_at", task["created_at"]), task_id)
+            for task_id, task in self.tasks.items()
+            if task["status"] in FINISHED_STATUSES
+        )
+        overflow = len(finished) - self.max_finished_tasks
+        removed = 0
+        for index, (completed_at, task_id) in enumerate(finished):
+            if index < overflow or now - completed_at > self.task_ttl_seconds:
+                del self.tasks[task_id]
+                removed += 1
+        self.stats["expired"] += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depths, running counts and lifetime counters"""
+        statuses: Dict[str, int] = {}
+        for task in self.tasks.values():
+            statuses[task["status"]] = statuses.get(task["status"], 0) + 1
+        return {
+            **self.stats,
+            "statuses": statuses,
+            "queue_depths": {name: len(heap) for name, heap in self.queues.items()},
+            "running": len(self.running),
+            "class_limits": self.class_limits,
+            "tracked_tasks": len(self.tasks)
+        }
 
     async def _process_task(self, task_id: str):
         """Process a background task"""
         task = self.tasks[task_id]
         try:
             task["status"] = "running"
+            task["started_at"] = time.time()
+            self._persist(task, started_at=datetime.now(timezone.utc))
             logger.info(f"Processing task {task_id}")
 
             # Route tasks based on type and resource requirements
-            if task["type"] == "code_analysis":
-                result = await self._analyze_code(task["data"])
-            elif task["type"] == "model_training":
-                result = await self._run_cpu_task(self._train_model_sync, task["data"])
-            elif task["type"] == "data_processing":
-                result = await self._process_data(task["data"])
-            elif task["type"] == "image_generation":
-                result = await self._generate_image(task["data"])
-            elif task["type"] == "text_to_image":
-                result = await self._text_to_image(task["data"])
+            handler = self.handlers.get(task["type"])
+            if handler is not None:
+                result = await handler(task["data"])
             else:
                 result = {"error": f"Unknown task type: {task['type']}"}
 
             task["status"] = "completed"
             task["result"] = result
-            task["completed_at"] = asyncio.get_event_loop().time()
+            task["completed_at"] = time.time()
+            self.stats["completed"] += 1
+            self._persist(task, result=result, completed_at=datetime.now(timezone.utc))
 
             logger.info(f"Completed task {task_id}")
 
+        except asyncio.CancelledError:
+            if self._stopping and task["status"] == "running":
+                # Interrupted by shutdown, not by the user: run again on next start
+                task["status"] = "pending"
+                self._persist(task, started_at=None)
+            else:
+                self._mark_cancelled(task)
         except Exception as e:
             task["status"] = "failed"
             task["error"] = str(e)
+            task["completed_at"] = time.time()
+            self.stats["failed"] += 1
+            self._persist(task, error=str(e), completed_at=datetime.now(timezone.utc))
             logger.error(f"Task {task_id} failed: {e}")
 
-    async def _analyze_code(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze code (placeholder)"""
-        await asyncio.sleep(2)  # Simulate processing time
+    @staticmethod
+    def _analyze_code_sync(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Analyze code (placeholder), run in the IO thread pool"""
+        time.sleep(2)  # Simulate processing time
         code = data.get("code", "")
         return {
             "lines": len(code.split("\n")),
@@ -121,9 +404,10 @@ class WorkerManager:
             "status": "Model training completed"
         }
 
-    async def _process_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process data (placeholder)"""
-        await asyncio.sleep(1)
+    @staticmethod
+    def _process_data_sync(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process data (placeholder), run in the IO thread pool"""
+        time.sleep(1)
         return {
             "processed_items": len(data.get("items", [])),
             "status": "Data processing completed"
@@ -163,12 +447,18 @@ class WorkerManager:
             "status": "Text converted to image successfully"
         }
 
-    async def _run_cpu_task(self, func, *args, **kwargs):
+    async def _run_cpu_task(self, func, *args):
         """Run CPU-intensive task in process pool"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.process_pool, func, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.process_pool, func, *args)
+
+    async def _run_io_task(self, func, *args):
+        """Run blocking IO task in the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, func, *args)
 
-    def _train_model_sync(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _train_model_sync(data: Dict[str, Any]) -> Dict[str, Any]:
         """Synchronous version of model training for process pool"""
         import time
         time.sleep(10)  # Simulate long training
@@ -203,7 +493,21 @@ class WorkerManager:
             "output": f"Worker {worker_name} executed successfully"
         }
 
+    async def stop(self):
+        """Stop dispatching; unfinished tasks stay pending in the database for the next start"""
+        self._stopping = True
+        dispatchers = list(self._dispatchers.values()) + list(self.running.values())
+        for task in dispatchers:
+            task.cancel()
+        if dispatchers:
+            await asyncio.gather(*dispatchers, return_exceptions=True)
+        self._dispatchers.clear()
+        self._wakeup.clear()
+        self._loop = None
+        self._stopping = False
+
     def shutdown(self):
         """Shutdown worker manager and cleanup resources"""
         self.process_pool.shutdown(wait=True)
+        self.io_pool.shutdown(wait=True)
         logger.info("Worker manager shutdown completed")
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+Shared fixtures for the test suite
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from api_gateway.database import Base
+from api_gateway.db_engine import create_async_db_engine
+from api_gateway.search_models import create_search_tables
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    """URL of a throwaway SQLite database file"""
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def db_engine(db_url):
+    """Engine on the throwaway database with the application and search schemas"""
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    create_search_tables(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(db_engine):
+    """Session factory bound to ``db_engine``"""
+    return sessionmaker(bind=db_engine)
+
+
+@pytest.fixture
+def db_session(session_factory):
+    """Session on ``db_engine``, closed after the test"""
+    db = session_factory()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def async_session_factory(db_engine, db_url):
+    """AsyncSession factory on the same database as ``db_engine``"""
+    return async_sessionmaker(create_async_db_engine(db_url, {}), expire_on_commit=False)
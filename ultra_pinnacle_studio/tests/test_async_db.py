@@ -0,0 +1,126 @@
+"""
+Tests for the asyncio database engine and async notification queries
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from api_gateway.database import Notification, NotificationHistory, NotificationTemplate, User
+from api_gateway.db_engine import async_database_url, create_async_db_engine, get_pool_stats
+from api_gateway.notification_service import NotificationService
+
+
+def add_notifications(session_factory):
+    """Add one user with a mix of read, unread and expired notifications"""
+    async def seed():
+        async with session_factory() as db:
+            db.add(User(id=1, username="reader", email="reader@example.com", hashed_password="x"))
+            db.add(NotificationTemplate(id=1, template_key="chat_message", name="Chat", category="chat"))
+            expired = datetime.now(timezone.utc) - timedelta(days=1)
+            for i, (category, is_read, expires_at) in enumerate([
+                ("chat", False, None),
+                ("chat", True, None),
+                ("system", False, None),
+                ("chat", False, expired)
+            ]):
+                db.add(Notification(id=f"n{i}", template_id=1, recipient_id=1, title=f"Title {i}",
+                                    message="Hello", category=category, is_read=is_read, expires_at=expires_at))
+            await db.commit()
+
+    asyncio.run(seed())
+
+
+class TestAsyncEngine:
+    """Test asyncio engine configuration"""
+
+    def test_urls_map_to_async_drivers(self):
+        """Sync URLs switch to the backend's asyncio driver"""
+        assert async_database_url("sqlite:///./app.db").drivername == "sqlite+aiosqlite"
+        assert async_database_url("postgresql://u:p@db/app").drivername == "postgresql+asyncpg"
+        assert async_database_url("sqlite+aiosqlite:///./app.db").drivername == "sqlite+aiosqlite"
+        with pytest.raises(ValueError):
+            async_database_url("oracle://u:p@db/app")
+
+    def test_sqlite_profile_applies_to_async_connections(self, db_url):
+        """Async SQLite connections are pooled and tuned like sync ones"""
+        engine = create_async_db_engine(db_url, {"sqlite": {"busy_timeout_ms": 1500}})
+
+        async def pragmas():
+            async with engine.connect() as conn:
+                return ((await conn.execute(text("PRAGMA journal_mode"))).scalar(),
+                        (await conn.execute(text("PRAGMA busy_timeout"))).scalar())
+
+        assert asyncio.run(pragmas()) == ("wal", 1500)
+        assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+        stats = get_pool_stats(engine)
+        assert stats["driver"] == "aiosqlite"
+        assert stats["checkouts"] == 1
+
+
+class TestAsyncNotifications:
+    """Test notification queries on an AsyncSession"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.service = NotificationService({})
+
+    def test_listing_and_counts_skip_expired(self, async_session_factory):
+        """Listings filter by category in SQL and exclude expired rows"""
+        add_notifications(async_session_factory)
+
+        async def run():
+            async with async_session_factory() as db:
+                chat = await self.service.get_user_notifications(1, category="chat", db=db)
+                unread = await self.service.get_unread_count(1, db)
+            return chat, unread
+
+        chat, unread = asyncio.run(run())
+        assert sorted(n["id"] for n in chat) == ["n0", "n1"]
+        assert unread == 2
+
+    def test_mark_all_as_read_archives_in_one_pass(self, async_session_factory):
+        """Every unread notification is marked and archived with its template key"""
+        add_notifications(async_session_factory)
+
+        async def run():
+            async with async_session_factory() as db:
+                marked = await self.service.mark_all_as_read(1, db)
+                history = (await db.execute(select(NotificationHistory))).scalars().all()
+                unread = await self.service.get_unread_count(1, db)
+            return marked, history, unread
+
+        marked, history, unread = asyncio.run(run())
+        assert marked == 2
+        assert unread == 0
+        assert sorted(h.notification_id for h in history) == ["n0", "n2"]
+        assert {h.template_key for h in history} == {"chat_message"}
+
+
+class TestAsyncChatPersistence:
+    """Test saving streamed chat exchanges on an AsyncSession"""
+
+    def test_exchange_persisted_through_run_sync(self, async_session_factory):
+        """Both messages are written and the reply stays readable after the session closes"""
+        from api_gateway.database import Conversation, Message
+        from api_gateway.main import _persist_chat_exchange
+
+        async def run():
+            async with async_session_factory() as db:
+                db.add(User(id=1, username="chatter", email="chatter@example.com", hashed_password="x"))
+                await db.commit()
+            async with async_session_factory() as db:
+                await db.run_sync(_persist_chat_exchange, "c1", 1, "model", "hi", "hello", create_conversation=True)
+            async with async_session_factory() as db:
+                reply = await db.run_sync(_persist_chat_exchange, "c1", 1, "model", "again", "hello again")
+            async with async_session_factory() as db:
+                conversation = await db.get(Conversation, "c1")
+                messages = (await db.execute(select(Message.content).order_by(Message.id))).scalars().all()
+            return reply, conversation, messages
+
+        reply, conversation, messages = asyncio.run(run())
+        assert messages == ["hi", "hello", "again", "hello again"]
+        assert conversation.created_by == 1
+        assert reply.id is not None and reply.created_at is not None
@@ -0,0 +1,210 @@
+"""
+Tests for streaming, batched bulk imports
+"""
+import gzip
+import io
+import json
+
+from api_gateway.bulk_import import BulkImporter, iter_json_records
+from api_gateway.database import (
+    Conversation, ConversationParticipant, DataValidationRule, ImportOperation, Message, User
+)
+
+
+def add_import(session_factory, tmp_path, payload, import_type="user_data", source_format="json", superuser=False):
+    """Add an owner and a pending ImportOperation reading ``payload``"""
+    source = tmp_path / f"source.{source_format}"
+    source.write_bytes(payload)
+
+    db = session_factory()
+    user = User(username="owner", email="owner@example.com", hashed_password="x", is_superuser=superuser)
+    db.add(user)
+    db.commit()
+    db.add(ImportOperation(id="op", user_id=user.id, import_type=import_type, source_format=source_format,
+                           source_file_path=str(source), data_validation={}, import_summary={}))
+    db.commit()
+    db.close()
+
+
+def history(conversations, messages_per_conversation):
+    return {
+        "user_profile": {"username": "owner"},
+        "conversations": [{"id": f"c{i}", "title": f"Chat {i}"} for i in range(conversations)],
+        "messages": [
+            {"id": i * messages_per_conversation + j + 1, "conversation_id": f"c{i}",
+             "role": "user", "content": f"message {i}.{j}", "created_at": "2024-01-01T00:00:00"}
+            for i in range(conversations) for j in range(messages_per_conversation)
+        ],
+        "export_metadata": {"gdpr_compliant": True}
+    }
+
+
+def operation(session_factory):
+    db = session_factory()
+    try:
+        return db.get(ImportOperation, "op")
+    finally:
+        db.close()
+
+
+class TestJsonParsing:
+    """Test incremental parsing of export documents"""
+
+    def test_records_cross_read_boundaries(self, monkeypatch):
+        """Values split across reads, including bare numbers, decode intact"""
+        monkeypatch.setattr("api_gateway.bulk_import.READ_SIZE", 7)
+        document = '{"meta": {"n": 1}, "messages": [{"id": 12345, "x": "a b"}, 67890], "empty": []}'
+
+        records = list(iter_json_records(io.StringIO(document)))
+        assert records == [("messages", {"id": 12345, "x": "a b"}), ("messages", 67890)]
+
+
+class TestBulkImporter:
+    """Test batching, validation, checkpoints and error reports"""
+
+    def test_gzipped_history_imports_in_batches(self, session_factory, tmp_path):
+        """Conversations, owners and messages all land; metadata is ignored"""
+        payload = gzip.compress(json.dumps(history(3, 4)).encode())
+        add_import(session_factory, tmp_path, payload)
+
+        BulkImporter(session_factory, "op", batch_size=5, validation_workers=2).run()
+
+        op = operation(session_factory)
+        assert op.status == "completed"
+        assert (op.processed_records, op.successful_records, op.failed_records) == (15, 15, 0)
+        db = session_factory()
+        assert db.query(Message).count() == 12
+        assert db.query(ConversationParticipant).filter_by(permission_level="owner").count() == 3
+        db.close()
+
+    def test_invalid_and_foreign_records_are_reported(self, session_factory, tmp_path):
+        """Rule violations and ownership failures go to the error report"""
+        data = history(1, 2)
+        data["messages"].append({"id": 99, "conversation_id": "theirs", "role": "user", "content": "x"})
+        data["messages"].append({"id": 100, "conversation_id": "c0", "role": "robot", "content": "x"})
+        data["messages"].append({"id": 101, "conversation_id": "c0", "content": "no role"})
+        add_import(session_factory, tmp_path, json.dumps(data).encode())
+        db = session_factory()
+        db.add(User(id=50, username="other", email="other@example.com", hashed_password="x"))
+        db.add(Conversation(id="theirs", title="Not yours", created_by=50))
+        db.add(DataValidationRule(name="roles", rule_type="import", data_type="message",
+                                  validation_function="allowed_values",
+                                  parameters={"field": "role", "values": ["user", "assistant"]},
+                                  error_message="Unknown role"))
+        db.commit()
+        db.close()
+
+        BulkImporter(session_factory, "op").run()
+
+        op = operation(session_factory)
+        assert (op.successful_records, op.failed_records) == (3, 3)
+        with open(op.import_summary["error_report"]) as f:
+            report = {entry["id"]: entry["issues"][0]["message"] for entry in map(json.loads, f)}
+        assert report[99] == "Conversation theirs belongs to another user"
+        assert report[100] == "Unknown role"
+        assert report[101].startswith("Missing required fields")
+
+    def test_failed_import_resumes_from_checkpoint(self, session_factory, tmp_path):
+        """A rerun skips committed batches and finishes the rest"""
+        add_import(session_factory, tmp_path, json.dumps(history(2, 5)).encode())
+        importer = BulkImporter(session_factory, "op", batch_size=3, validation_workers=1)
+
+        insert_messages = importer._insert_messages
+        calls = []
+
+        def flaky_insert(db, candidates, now):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("database is locked")
+            return insert_messages(db, candidates, now)
+
+        importer._insert_messages = flaky_insert
+        importer.run()
+        op = operation(session_factory)
+        assert op.status == "failed"
+        assert op.import_summary["checkpoint"] == 5
+
+        BulkImporter(session_factory, "op", batch_size=3).run()
+
+        op = operation(session_factory)
+        assert op.status == "completed"
+        assert op.successful_records == 12
+        db = session_factory()
+        assert db.query(Message).count() == 10
+        db.close()
+
+    def test_jsonl_users_skip_duplicates(self, session_factory, tmp_path):
+        """Admin imports skip existing usernames and emails and bad lines"""
+        lines = [
+            {"section": "users", "data": {"username": "new", "email": "new@example.com"}},
+            {"section": "users", "data": {"username": "owner", "email": "x@example.com"}},
+            {"section": "users", "data": {"username": "dup", "email": "new@example.com"}},
+        ]
+        payload = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+        add_import(session_factory, tmp_path, payload.encode(), import_type="bulk_admin",
+                   source_format="jsonl", superuser=True)
+
+        BulkImporter(session_factory, "op").run()
+
+        op = operation(session_factory)
+        assert (op.successful_records, op.skipped_records, op.failed_records) == (1, 2, 1)
+        db = session_factory()
+        assert db.query(User).filter_by(username="new").one().hashed_password == "placeholder"
+        db.close()
+
+    def test_bulk_admin_requires_superuser(self, session_factory, tmp_path):
+        """Non-admins cannot run bulk imports"""
+        add_import(session_factory, tmp_path, b"", import_type="bulk_admin", source_format="jsonl")
+
+        BulkImporter(session_factory, "op").run()
+
+        op = operation(session_factory)
+        assert op.status == "failed"
+        assert "Admin access required" in op.error_message
+
+
+class TestImportEndpoints:
+    """Test the import status, resume and error report endpoints"""
+
+    def test_status_resume_and_errors(self, session_factory, tmp_path, monkeypatch):
+        """An import can be inspected, its rejects downloaded and a failed run resumed"""
+        from fastapi.testclient import TestClient
+
+        from api_gateway import data_export_import, main
+
+        data = history(1, 2)
+        data["messages"].append({"id": 100, "conversation_id": "c0", "content": "no role"})
+        add_import(session_factory, tmp_path, json.dumps(data).encode())
+        BulkImporter(session_factory, "op").run()
+
+        def get_test_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        db = session_factory()
+        user = db.query(User).one()
+        db.close()
+        monkeypatch.setattr(data_export_import, "get_db", get_test_db)
+        monkeypatch.setattr(data_export_import, "SessionLocal", session_factory)
+        monkeypatch.setitem(main.app.dependency_overrides, main.get_db, get_test_db)
+        monkeypatch.setitem(main.app.dependency_overrides, main.get_current_active_user, lambda: user)
+        client = TestClient(main.app)
+
+        status = client.get("/api/imports/op").json()
+        assert status["status"] == "completed"
+        assert (status["successful_records"], status["failed_records"]) == (3, 1)
+        assert status["has_error_report"]
+
+        errors = client.get("/api/imports/op/errors")
+        assert errors.status_code == 200
+        assert [json.loads(line)["id"] for line in errors.text.splitlines()] == [100]
+
+        db = session_factory()
+        db.get(ImportOperation, "op").status = "failed"
+        db.commit()
+        db.close()
+        assert client.post("/api/imports/op/resume").status_code == 200
+        assert client.get("/api/imports/op").json()["status"] == "completed"
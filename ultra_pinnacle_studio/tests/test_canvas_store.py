@@ -0,0 +1,133 @@
+"""
+Tests for the indexed canvas project store and delta saves
+"""
+import json
+
+import pytest
+from sqlalchemy import event, select
+
+from api_gateway import canvas_store
+from api_gateway.database import CanvasLayer, User
+
+
+def add_users(db):
+    """Add the two users that own test projects"""
+    db.add_all([User(id=1, username="artist", email="a@example.com", hashed_password="x"),
+                User(id=2, username="other", email="o@example.com", hashed_password="x")])
+    db.commit()
+
+
+def record_statements(engine):
+    """List that collects every SQL statement ``engine`` executes from now on"""
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def layers(*names):
+    return [{"name": name, "pixels": [name] * 10} for name in names]
+
+
+def stored_layers(db, project_id):
+    return db.execute(select(CanvasLayer.position, CanvasLayer.updated_at)
+                      .where(CanvasLayer.project_id == project_id).order_by(CanvasLayer.position)).all()
+
+
+class TestListing:
+    """Test the per-user project index"""
+
+    def test_listing_never_reads_layer_data(self, db_engine, db_session):
+        """Projects are listed per user, newest first, from metadata only"""
+        add_users(db_session)
+        statements = record_statements(db_engine)
+        first = canvas_store.save_project(db_session, 1, "First", layers("a", "b"))
+        second = canvas_store.save_project(db_session, 1, "Second", layers("c"))
+        canvas_store.save_project(db_session, 2, "Not mine", layers("d"))
+        statements.clear()
+
+        listed = canvas_store.list_projects(db_session, 1)
+
+        assert [p["id"] for p in listed] == [second.project_id, first.project_id]
+        assert listed[1]["layer_count"] == 2
+        assert listed[1]["size_bytes"] == sum(len(canvas_store.serialize_layer(l)) for l in layers("a", "b"))
+        assert not any("canvas_layers" in statement for statement in statements)
+
+
+class TestDeltaSaves:
+    """Test that saves only write changed layers"""
+
+    def test_full_save_rewrites_only_changed_layers(self, db_session):
+        """Re-saving a project skips layers whose content is unchanged"""
+        add_users(db_session)
+        created = canvas_store.save_project(db_session, 1, "Sketch", layers("a", "b", "c"))
+        before = stored_layers(db_session, created.project_id)
+        project = canvas_store.get_project(db_session, created.project_id)
+
+        result = canvas_store.save_project(db_session, 1, "Sketch", layers("a", "B"), project)
+
+        assert (result.layers_written, result.layers_deleted) == (1, 1)
+        after = stored_layers(db_session, created.project_id)
+        assert [row.position for row in after] == [0, 1]
+        assert after[0].updated_at == before[0].updated_at
+        assert after[1].updated_at != before[1].updated_at
+        assert canvas_store.load_layers(db_session, created.project_id) == layers("a", "B")
+
+    def test_patch_writes_given_layers(self, db_session):
+        """Patches replace, append and truncate layers by position"""
+        add_users(db_session)
+        created = canvas_store.save_project(db_session, 1, "Sketch", layers("a", "b"))
+        project = canvas_store.get_project(db_session, created.project_id)
+
+        result = canvas_store.patch_project(db_session, project, {1: layers("B")[0], 2: layers("c")[0]}, layer_count=3)
+        assert result.layers_written == 2
+        assert canvas_store.load_layers(db_session, project.id) == layers("a", "B", "c")
+
+        canvas_store.patch_project(db_session, project, {}, layer_count=1, name="Cropped")
+        assert canvas_store.load_layers(db_session, project.id) == layers("a")
+        assert canvas_store.list_projects(db_session, 1)[0]["name"] == "Cropped"
+
+    def test_patch_rejects_gaps(self, db_session):
+        """Growing a project requires every new layer"""
+        add_users(db_session)
+        created = canvas_store.save_project(db_session, 1, "Sketch", layers("a"))
+        project = canvas_store.get_project(db_session, created.project_id)
+
+        with pytest.raises(ValueError, match=r"\[1\]"):
+            canvas_store.patch_project(db_session, project, {2: layers("c")[0]}, layer_count=3)
+        with pytest.raises(ValueError, match="out of range"):
+            canvas_store.patch_project(db_session, project, {5: layers("x")[0]})
+
+    def test_delete_removes_layers(self, db_session):
+        """Deleting a project deletes its layer rows"""
+        add_users(db_session)
+        created = canvas_store.save_project(db_session, 1, "Sketch", layers("a", "b"))
+
+        canvas_store.delete_project(db_session, canvas_store.get_project(db_session, created.project_id))
+
+        assert canvas_store.get_project(db_session, created.project_id) is None
+        assert stored_layers(db_session, created.project_id) == []
+
+
+class TestJsonImport:
+    """Test migrating projects saved as JSON files"""
+
+    def test_json_projects_are_imported_once(self, db_session, tmp_path):
+        """Legacy files are loaded into the store and moved aside"""
+        add_users(db_session)
+        projects_dir = tmp_path / "projects"
+        projects_dir.mkdir()
+        (projects_dir / "p1.json").write_text(json.dumps({
+            "id": "p1", "name": "Old", "layers": layers("a"), "user_id": 1,
+            "created_at": "2024-01-01T00:00:00+00:00", "updated_at": "2024-01-02T00:00:00+00:00"
+        }))
+        (projects_dir / "broken.json").write_text("{")
+
+        assert canvas_store.import_json_projects(db_session, projects_dir) == 1
+        assert canvas_store.import_json_projects(db_session, projects_dir) == 0
+
+        listed = canvas_store.list_projects(db_session, 1)
+        assert [(p["id"], p["updated_at"][:10]) for p in listed] == [("p1", "2024-01-02")]
+        assert canvas_store.load_layers(db_session, "p1") == layers("a")
+        assert (projects_dir / "imported" / "p1.json").exists()
+        assert (projects_dir / "broken.json").exists()
@@ -243,8 +243,8 @@ class TestDataExportImport:
             import_op = self.db.query(ImportOperation).filter(ImportOperation.id == import_id).first()
             assert import_op is not None
             assert import_op.status == "completed"
-            assert import_op.records_processed >= 0
-            assert import_op.records_failed == 0
+            assert import_op.processed_records >= 0
+            assert import_op.failed_records == 0
 
         asyncio.run(run_test())
 
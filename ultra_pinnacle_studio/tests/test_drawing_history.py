@@ -0,0 +1,165 @@
+"""
+Tests for tile-based undo/redo in the drawing app
+"""
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from design_ui.procreate_drawing_app import Layer, ProcreateDrawingApp, TiledSurface, UndoHistory
+
+TILE = 4
+
+
+def make_app(tmp_path, width=600, height=400):
+    """App with a project whose undo history spills into tmp_path"""
+    app = ProcreateDrawingApp()
+    project = asyncio.run(app.create_new_project("Sketch", width, height))
+    project.history = UndoHistory(tmp_path / "undo")
+    app.current_brush = project.brushes["brush_soft"]
+    return app, project
+
+
+def stroke(app, *points):
+    assert asyncio.run(app.handle_stroke_input(list(points), [0.8] * len(points)))
+
+
+def make_layer(seed):
+    pixels = np.random.default_rng(seed).integers(0, 256, size=(12, 12, 4), dtype=np.uint8)
+    return Layer(layer_id="paint", name="Paint", pixels=TiledSurface.from_array(pixels, tile_size=TILE))
+
+
+def paint(history, layer, x, y, value):
+    """Record and write a 3x3 block, like a stroke"""
+    history.record("stroke", layer, layer.pixels.keys_in_rect(x, y, x + 3, y + 3))
+    layer.pixels.write(x, y, np.full((3, 3, 4), value, dtype=np.uint8))
+
+
+class TestStrokeHistory:
+    """Test undo and redo of brush strokes"""
+
+    def test_strokes_paint_and_undo_restores_pixels(self, tmp_path):
+        """Undo and redo swap exactly the tiles a stroke touched"""
+        app, project = make_app(tmp_path)
+        pixels = project.layers[0].pixels
+        blank = pixels.to_array()
+
+        stroke(app, (20, 20), (60, 30))
+        first = pixels.to_array()
+        stroke(app, (300, 200), (320, 240))
+        second = pixels.to_array()
+
+        assert (first != blank).any() and (second != first).any()
+        entry = project.history.undo_stack[-1]
+        assert set(entry.tiles) == {(0, 1)}
+
+        assert asyncio.run(app.undo_last_action())
+        np.testing.assert_array_equal(pixels.to_array(), first)
+        assert asyncio.run(app.undo_last_action())
+        np.testing.assert_array_equal(pixels.to_array(), blank)
+        assert not asyncio.run(app.undo_last_action())
+
+        assert asyncio.run(app.redo_last_action())
+        np.testing.assert_array_equal(pixels.to_array(), first)
+
+    def test_new_stroke_discards_redo(self, tmp_path):
+        """Painting after an undo starts a new branch"""
+        app, project = make_app(tmp_path)
+        stroke(app, (20, 20), (60, 30))
+        asyncio.run(app.undo_last_action())
+
+        stroke(app, (100, 100), (120, 110))
+
+        assert not asyncio.run(app.redo_last_action())
+        assert project.history.get_stats()["undo_entries"] == 1
+
+    def test_locked_layers_are_not_painted(self, tmp_path):
+        """Strokes on a locked layer are refused and not recorded"""
+        app, project = make_app(tmp_path)
+        app.selected_layer.locked = True
+
+        assert not asyncio.run(app.handle_stroke_input([(20, 20), (60, 30)]))
+        assert project.history.get_stats()["undo_entries"] == 0
+
+
+class TestMemoryBudget:
+    """Test spilling and trimming of history entries"""
+
+    def test_old_entries_spill_to_disk(self, tmp_path):
+        """Entries over the memory budget move to disk and still undo"""
+        history = UndoHistory(tmp_path / "undo", memory_budget=0)
+        layer = make_layer(1)
+        states = [layer.pixels.to_array()]
+        for step in range(3):
+            paint(history, layer, step * 3, step * 3, 10 * (step + 1))
+            states.append(layer.pixels.to_array())
+
+        # The newest entry stays in memory for the next undo
+        stats = history.get_stats()
+        assert stats["memory_bytes"] == history.undo_stack[-1].size_bytes
+        assert stats["spilled_entries"] == 2
+        assert history.spill_dir.parent == tmp_path / "undo"
+        assert len(list(history.spill_dir.iterdir())) == 2
+
+        for expected in reversed(states[:-1]):
+            assert history.undo([layer]) is not None
+            np.testing.assert_array_equal(layer.pixels.to_array(), expected)
+        for expected in states[1:]:
+            assert history.redo([layer]) is not None
+            np.testing.assert_array_equal(layer.pixels.to_array(), expected)
+
+        history.clear()
+        assert list(history.spill_dir.iterdir()) == []
+
+    def test_histories_sharing_a_root_do_not_collide(self, tmp_path):
+        """Each history spills into its own directory, removed when it is closed"""
+        histories = [UndoHistory(tmp_path / "undo", memory_budget=0) for _ in range(2)]
+        layers = [make_layer(3), make_layer(4)]
+        originals = [layer.pixels.to_array() for layer in layers]
+        for history, layer in zip(histories, layers):
+            paint(history, layer, 0, 0, 10)
+            paint(history, layer, 3, 3, 20)
+
+        assert histories[0].spill_dir != histories[1].spill_dir
+        for history, layer, original in zip(histories, layers, originals):
+            history.undo([layer])
+            history.undo([layer])
+            np.testing.assert_array_equal(layer.pixels.to_array(), original)
+
+        spill_dir = histories[0].spill_dir
+        histories[0].close()
+        assert not spill_dir.exists()
+        assert histories[1].spill_dir.exists()
+
+    def test_history_is_capped(self, tmp_path):
+        """Only the newest max_entries steps are kept"""
+        history = UndoHistory(tmp_path / "undo", max_entries=2)
+        layer = make_layer(2)
+        for step in range(4):
+            paint(history, layer, 0, 0, step)
+
+        assert history.get_stats()["undo_entries"] == 2
+        assert history.undo([layer]) and history.undo([layer])
+        assert history.undo([layer]) is None
+        assert layer.pixels.to_array()[0, 0, 0] == 1
+
+
+class TestProjectLifecycle:
+    """Test that closing a project removes its spilled history"""
+
+    def test_closing_or_replacing_a_project_removes_spill_dir(self, tmp_path):
+        """close_project and create_new_project clean up the previous history"""
+        app, project = make_app(tmp_path)
+        project.history.memory_budget = 0
+        stroke(app, (20, 20), (60, 30))
+        stroke(app, (300, 200), (320, 240))
+        spill_dir = project.history.spill_dir
+        assert spill_dir.exists()
+
+        replacement = asyncio.run(app.create_new_project("Next", 64, 64))
+        assert not spill_dir.exists()
+        assert app.current_project is replacement
+
+        app.close_project()
+        assert app.current_project is None and app.selected_layer is None
@@ -0,0 +1,148 @@
+"""
+Tests for keyset-paged, streaming bulk exports
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import zipfile
+
+import pytest
+
+from api_gateway import data_export_import
+from api_gateway.data_export_import import DataExportService
+from api_gateway.database import AuditLog, Conversation, ExportOperation, Message, User
+from api_gateway.export_stream import ExportWriter, iter_keyset
+
+
+def add_history(db, conversations=3, messages_per_conversation=2):
+    """Add an admin with some conversation history and return the admin"""
+    admin = User(username="admin", email="admin@example.com", hashed_password="x", is_superuser=True)
+    db.add(admin)
+    db.commit()
+    for i in range(conversations):
+        db.add(Conversation(id=f"c{i}", title=f"Chat {i}", created_by=admin.id))
+        for j in range(messages_per_conversation):
+            db.add(Message(conversation_id=f"c{i}", role="user", content=f"message {i}.{j}"))
+    db.commit()
+    return admin
+
+
+def run_export(tmp_path, db, admin, bulk_type, format, page_size=2):
+    service = DataExportService()
+    service.exports_dir = tmp_path
+    service.page_size = page_size
+
+    operation = ExportOperation(id=f"op-{bulk_type}-{format}", user_id=admin.id, export_type="bulk_admin",
+                                format=format, data_scope={"bulk_type": bulk_type})
+    db.add(operation)
+    db.commit()
+    asyncio.run(service._export_bulk_admin(operation, db))
+    return service, operation
+
+
+class TestKeysetPagination:
+    """Test page iteration"""
+
+    def test_pages_cover_every_row_once(self, db_session):
+        """Ascending and descending pages visit each row exactly once"""
+        add_history(db_session, conversations=5, messages_per_conversation=1)
+
+        pages = list(iter_keyset(db_session, [Message.id, Message.content], Message.id, page_size=2))
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert [row["id"] for page in pages for row in page] == [1, 2, 3, 4, 5]
+
+        pages = list(iter_keyset(db_session, [Message.id], Message.id, Message.id > 1, page_size=2, descending=True))
+        assert [row["id"] for page in pages for row in page] == [5, 4, 3, 2]
+
+
+class TestStreamingBulkExport:
+    """Test bulk admin exports written page by page"""
+
+    def test_pages_are_written_off_the_event_loop(self, db_session, tmp_path, monkeypatch):
+        """Paging and compression run on a worker thread"""
+        admin = add_history(db_session)
+        threads = []
+
+        def recording_iter_keyset(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return iter_keyset(*args, **kwargs)
+        monkeypatch.setattr(data_export_import, "iter_keyset", recording_iter_keyset)
+
+        _, operation = run_export(tmp_path, db_session, admin, "all_conversations", "jsonl")
+
+        assert operation.total_records == operation.processed_records == 9
+        assert threads and threading.main_thread() not in threads
+
+    def test_writers_must_implement_sections(self, tmp_path):
+        """A writer without begin_section and write_rows cannot be created"""
+        class IncompleteWriter(ExportWriter):
+            pass
+
+        with pytest.raises(TypeError):
+            IncompleteWriter(tmp_path / "export.bin")
+
+    def test_json_export_is_compressed_and_checksummed(self, db_session, tmp_path):
+        """The gzipped document keeps the bulk export shape"""
+        admin = add_history(db_session)
+        service, operation = run_export(tmp_path, db_session, admin, "all_conversations", "json")
+
+        assert operation.file_path.endswith(".json.gz")
+        assert operation.file_size == os.path.getsize(operation.file_path)
+        assert operation.checksum == service._calculate_checksum(operation.file_path)
+        assert operation.total_records == operation.processed_records == 9
+
+        with gzip.open(operation.file_path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        assert [c["id"] for c in data["conversations"]] == ["c0", "c1", "c2"]
+        assert len(data["messages"]) == 6
+        assert data["export_metadata"]["message_count"] == 6
+        assert data["export_metadata"]["export_type"] == "bulk_conversations"
+
+    def test_csv_export_includes_per_user_counts(self, db_session, tmp_path):
+        """Users are exported with related-row counts in one zip entry"""
+        admin = add_history(db_session)
+        _, operation = run_export(tmp_path, db_session, admin, "all_users", "csv")
+
+        with zipfile.ZipFile(operation.file_path) as archive:
+            users = list(csv.DictReader(io.TextIOWrapper(archive.open("users.csv"), encoding="utf-8")))
+            metadata = json.loads(archive.read("metadata.json"))
+        assert users[0]["username"] == "admin"
+        assert users[0]["conversation_count"] == "3"
+        assert metadata["user_count"] == 1
+
+    def test_jsonl_audit_export_is_newest_first(self, db_session, tmp_path):
+        """Audit logs stream in descending id order with JSON details intact"""
+        admin = add_history(db_session)
+        for i in range(3):
+            db_session.add(AuditLog(user_id=admin.id, action=f"action_{i}", details={"n": i}))
+        db_session.commit()
+        _, operation = run_export(tmp_path, db_session, admin, "system_audit", "jsonl")
+
+        with gzip.open(operation.file_path, "rt", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert [line["data"]["action"] for line in lines[:-1]] == ["action_2", "action_1", "action_0"]
+        assert lines[0]["data"]["details"] == {"n": 2}
+        assert lines[-1]["section"] == "export_metadata"
+
+    def test_unstreamable_format_is_rejected(self, db_session, tmp_path):
+        """Bulk exports refuse formats that need the whole data set"""
+        admin = add_history(db_session)
+
+        with pytest.raises(ValueError):
+            run_export(tmp_path, db_session, admin, "all_users", "pdf")
+        assert not list(tmp_path.glob("export_*"))
+
+    def test_parquet_export(self, db_session, tmp_path):
+        """Each section becomes a Parquet file with one row group per page"""
+        pq = pytest.importorskip("pyarrow.parquet")
+        admin = add_history(db_session)
+        _, operation = run_export(tmp_path, db_session, admin, "all_conversations", "parquet")
+
+        with zipfile.ZipFile(operation.file_path) as archive:
+            table = pq.read_table(io.BytesIO(archive.read("messages.parquet")))
+        assert table.num_rows == 6
+        assert table.column("content")[0].as_py() == "message 0.0"
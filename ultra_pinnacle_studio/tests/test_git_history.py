@@ -0,0 +1,137 @@
+"""
+Tests for the cached git history service
+"""
+import asyncio
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from api_gateway.git_history import GitError, GitHistory, parse_refs
+
+
+def git(repo, *args):
+    return subprocess.run(["git", "-c", "user.name=Ada", "-c", "user.email=ada@example.com", *args],
+                          cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def make_repo(tmp_path):
+    """Repository with a tagged root, a feature branch and a merge on main"""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    (repo / "a.txt").write_text("one\ntwo\n")
+    git(repo, "add", "a.txt")
+    git(repo, "commit", "-q", "-m", "Add a")
+    git(repo, "tag", "v1")
+    git(repo, "checkout", "-q", "-b", "feature")
+    (repo / "b.txt").write_text("b\n")
+    (repo / "a.txt").write_text("one\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "Add b, trim a")
+    git(repo, "checkout", "-q", "main")
+    (repo / "c.bin").write_bytes(b"\x00\x01")
+    git(repo, "add", "c.bin")
+    git(repo, "commit", "-q", "-m", "Add binary")
+    git(repo, "merge", "-q", "--no-edit", "feature")
+    return repo
+
+
+def count_processes():
+    """Patch Popen and count the git processes a call starts"""
+    return patch("api_gateway.git_history.subprocess.Popen", wraps=subprocess.Popen)
+
+
+class TestParseRefs:
+    """Test %D ref list parsing"""
+
+    def test_branch_and_tags(self):
+        """HEAD and tag decorations are split out, remotes ignored"""
+        assert parse_refs("HEAD -> main, tag: v1, tag: v1.1, origin/main") == ("main", ["v1", "v1.1"])
+        assert parse_refs("") == (None, [])
+
+
+class TestGitHistory:
+    """Test commit listing and caching against a real repository"""
+
+    def test_commits_carry_stats_parents_and_refs(self, tmp_path):
+        """One listing returns numstat totals, parents and decorations"""
+        repo = make_repo(tmp_path)
+        history = GitHistory(repo)
+
+        commits = asyncio.run(history.get_commits(branch="main"))
+        by_message = {c["message"]: c for c in commits}
+
+        assert [c["message"] for c in commits][0].startswith("Merge branch 'feature'")
+        assert len(commits[0]["parents"]) == 2
+        assert commits[0]["branch"] == "main"
+        # Merge stats are against the first parent
+        assert (commits[0]["files_changed"], commits[0]["insertions"], commits[0]["deletions"]) == (2, 1, 1)
+        assert (by_message["Add a"]["insertions"], by_message["Add a"]["tags"]) == (2, ["v1"])
+        assert by_message["Add a"]["parents"] == []
+        assert (by_message["Add binary"]["files_changed"], by_message["Add binary"]["insertions"]) == (1, 0)
+        assert by_message["Add a"]["author_email"] == "ada@example.com"
+
+    def test_pages_use_two_processes_then_one_when_cached(self, tmp_path):
+        """Parsed commits are reused; repeat pages only list ids"""
+        repo = make_repo(tmp_path)
+        history = GitHistory(repo)
+
+        with count_processes() as popen:
+            first = asyncio.run(history.get_commits(limit=2, skip=1))
+        assert popen.call_count == 2
+        with count_processes() as popen:
+            second = asyncio.run(history.get_commits(limit=2, skip=1))
+        assert popen.call_count == 1
+
+        assert first == second
+        assert history.get_stats()["hits"] == 2
+
+    def test_cache_is_bounded(self, tmp_path):
+        """The least recently used commits are evicted past the cache size"""
+        repo = make_repo(tmp_path)
+        history = GitHistory(repo, {"commit_cache_size": 2})
+
+        asyncio.run(history.get_commits())
+
+        assert history.get_stats()["cached_commits"] == 2
+
+    def test_get_commit_by_prefix(self, tmp_path):
+        """Abbreviated hashes and refs resolve; unknown ones return None"""
+        repo = make_repo(tmp_path)
+        history = GitHistory(repo)
+        root = git(repo, "rev-parse", "v1")
+
+        assert asyncio.run(history.get_commit(root[:8]))["hash"] == root
+        assert asyncio.run(history.get_commit("feature"))["message"] == "Add b, trim a"
+        assert asyncio.run(history.get_commit("deadbeef")) is None
+
+    def test_revisions_are_not_parsed_as_options(self, tmp_path):
+        """Option-like branch names are rejected instead of applied"""
+        repo = make_repo(tmp_path)
+        history = GitHistory(repo)
+        target = tmp_path / "written.txt"
+
+        with pytest.raises(GitError):
+            asyncio.run(history.get_commits(branch=f"--output={target}"))
+        assert not target.exists()
+
+    def test_branches_and_authors(self, tmp_path):
+        """Branches come from one for-each-ref call"""
+        repo = make_repo(tmp_path)
+        history = GitHistory(repo)
+
+        with count_processes() as popen:
+            branches = asyncio.run(history.get_branches())
+        assert popen.call_count == 1
+
+        assert {b["name"]: b["is_current"] for b in branches} == {"feature": False, "main": True}
+        assert {b["last_commit"] for b in branches} == {git(repo, "rev-parse", "main"), git(repo, "rev-parse", "feature")}
+        assert asyncio.run(history.get_authors()) == ["Ada"]
+
+    def test_not_a_repository(self, tmp_path):
+        """Git failures surface as GitError"""
+        history = GitHistory(tmp_path)
+
+        with pytest.raises(GitError):
+            asyncio.run(history.get_commits())
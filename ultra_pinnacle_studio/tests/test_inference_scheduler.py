@@ -0,0 +1,253 @@
+"""
+Tests for the batching inference scheduler
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from api_gateway.inference_scheduler import InferenceScheduler
+
+
+class TestInferenceScheduler:
+    """Test batching, isolation and failure handling"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _echo_batch(self, model_name, requests):
+        with self.lock:
+            self.calls.append((model_name, len(requests)))
+        time.sleep(0.01)
+        return [f"{model_name}:{prompt}:{params.get('max_tokens')}" for prompt, params in requests]
+
+    def test_concurrent_requests_are_batched(self):
+        """Requests arriving together should share one batch"""
+        scheduler = InferenceScheduler(self._echo_batch, {"inference": {"max_batch_size": 8, "max_wait_ms": 50}})
+
+        async def run_test():
+            results = await asyncio.gather(*[
+                scheduler.submit("llama", f"p{i}", max_tokens=i) for i in range(5)
+            ])
+            await scheduler.shutdown()
+            return results
+
+        results = asyncio.run(run_test())
+
+        assert results == [f"llama:p{i}:{i}" for i in range(5)]
+        assert self.calls == [("llama", 5)]
+        assert scheduler.stats["max_batch_seen"] == 5
+
+    def test_batch_size_is_capped(self):
+        """No batch should exceed max_batch_size"""
+        scheduler = InferenceScheduler(self._echo_batch, {"inference": {"max_batch_size": 3, "max_wait_ms": 50}})
+
+        async def run_test():
+            await asyncio.gather(*[scheduler.submit("llama", f"p{i}") for i in range(7)])
+            await scheduler.shutdown()
+
+        asyncio.run(run_test())
+
+        assert sum(size for _, size in self.calls) == 7
+        assert max(size for _, size in self.calls) <= 3
+
+    def test_models_are_queued_separately(self):
+        """Each model gets its own batches"""
+        scheduler = InferenceScheduler(self._echo_batch, {"inference": {"max_wait_ms": 20}})
+
+        async def run_test():
+            await asyncio.gather(
+                scheduler.submit("a", "x"), scheduler.submit("b", "y"), scheduler.submit("a", "z")
+            )
+            await scheduler.shutdown()
+
+        asyncio.run(run_test())
+
+        assert sorted(self.calls) == [("a", 2), ("b", 1)]
+
+    def test_per_request_failure_is_isolated(self):
+        """An exception result fails only its own future"""
+        def batch_fn(model_name, requests):
+            return [ValueError("bad prompt") if prompt == "bad" else prompt.upper() for prompt, _ in requests]
+
+        scheduler = InferenceScheduler(batch_fn, {"inference": {"max_wait_ms": 20}})
+
+        async def run_test():
+            results = await asyncio.gather(
+                scheduler.submit("m", "ok"), scheduler.submit("m", "bad"), return_exceptions=True
+            )
+            await scheduler.shutdown()
+            return results
+
+        ok, bad = asyncio.run(run_test())
+
+        assert ok == "OK"
+        assert isinstance(bad, ValueError)
+        assert scheduler.stats["failed"] == 1
+
+    def test_batch_error_fails_whole_batch(self):
+        """A crashing batch function rejects every request in the batch"""
+        def batch_fn(model_name, requests):
+            raise RuntimeError("model crashed")
+
+        scheduler = InferenceScheduler(batch_fn, {"inference": {"max_wait_ms": 20}})
+
+        async def run_test():
+            results = await asyncio.gather(
+                scheduler.submit("m", "a"), scheduler.submit("m", "b"), return_exceptions=True
+            )
+            await scheduler.shutdown()
+            return results
+
+        results = asyncio.run(run_test())
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_event_loop_stays_responsive(self):
+        """Slow inference must not block other coroutines"""
+        def slow_batch(model_name, requests):
+            time.sleep(0.3)
+            return ["done"] * len(requests)
+
+        scheduler = InferenceScheduler(slow_batch, {"inference": {"max_wait_ms": 0}})
+
+        async def run_test():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            tick_task = asyncio.create_task(ticker())
+            result = await scheduler.submit("m", "slow")
+            tick_task.cancel()
+            await scheduler.shutdown()
+            return result, ticks
+
+        result, ticks = asyncio.run(run_test())
+        assert result == "done"
+        assert ticks > 5
+
+    def test_shutdown_fails_in_flight_requests(self):
+        """Requests being collected or running when the scheduler stops are failed, not left hanging"""
+        release = threading.Event()
+
+        def blocking_batch(model_name, requests):
+            release.wait(5)
+            return ["late"] * len(requests)
+
+        scheduler = InferenceScheduler(blocking_batch, {"inference": {"max_batch_size": 8, "max_wait_ms": 5000}})
+
+        async def run_test():
+            running = asyncio.create_task(scheduler.submit("m", "running"))
+            await asyncio.sleep(0.05)
+            await scheduler.shutdown()
+            # A fresh batcher is left collecting, waiting for more requests
+            collecting = asyncio.create_task(scheduler.submit("m", "collecting"))
+            await asyncio.sleep(0.05)
+            await scheduler.shutdown()
+            release.set()
+            return await asyncio.wait_for(
+                asyncio.gather(running, collecting, return_exceptions=True), timeout=1
+            )
+
+        results = asyncio.run(run_test())
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_stats_reported(self):
+        """Scheduler statistics include averages and queue depths"""
+        scheduler = InferenceScheduler(self._echo_batch, {"inference": {"max_wait_ms": 20}})
+
+        async def run_test():
+            await asyncio.gather(scheduler.submit("m", "a"), scheduler.submit("m", "b"))
+            stats = scheduler.get_stats()
+            await scheduler.shutdown()
+            return stats
+
+        stats = asyncio.run(run_test())
+        assert stats["completed"] == 2
+        assert stats["avg_batch_size"] == 2
+        assert stats["queue_depths"] == {"m": 0}
+
+
+class TestInferenceStreaming:
+    """Test token streaming through the scheduler"""
+
+    def test_stream_yields_tokens_in_order(self):
+        """Tokens arrive incrementally and in order"""
+        scheduler = InferenceScheduler(lambda model, requests: [], {})
+
+        def tokens():
+            for word in ["Hello", " ", "world"]:
+                time.sleep(0.01)
+                yield word
+
+        async def run_test():
+            received = [token async for token in scheduler.stream("m", tokens)]
+            await scheduler.shutdown()
+            return received
+
+        assert asyncio.run(run_test()) == ["Hello", " ", "world"]
+        assert scheduler.stats["streamed_tokens"] == 3
+
+    def test_stream_propagates_errors(self):
+        """A failing producer raises in the consumer"""
+        scheduler = InferenceScheduler(lambda model, requests: [], {})
+
+        def tokens():
+            yield "partial"
+            raise ValueError("generation failed")
+
+        async def run_test():
+            received = []
+            with pytest.raises(ValueError):
+                async for token in scheduler.stream("m", tokens):
+                    received.append(token)
+            await scheduler.shutdown()
+            return received
+
+        assert asyncio.run(run_test()) == ["partial"]
+
+    def test_early_exit_stops_producer(self):
+        """Closing the stream early stops the producer thread"""
+        scheduler = InferenceScheduler(lambda model, requests: [], {})
+        produced = []
+
+        def tokens():
+            for i in range(1000):
+                time.sleep(0.001)
+                produced.append(i)
+                yield str(i)
+
+        async def run_test():
+            stream = scheduler.stream("m", tokens)
+            async for token in stream:
+                if token == "2":
+                    break
+            await stream.aclose()
+            await scheduler.shutdown()
+
+        asyncio.run(run_test())
+        assert len(produced) < 1000
+
+    def test_model_manager_mock_stream(self):
+        """Mock models replay the full response as word tokens"""
+        from api_gateway.models_safe import ModelManager
+
+        manager = ModelManager({
+            "models": {"mock": {"type": "llama", "path": "missing.gguf"}},
+            "response_cache": {"enabled": False}
+        })
+
+        async def run_test():
+            tokens = [t async for t in manager.stream_text_async("mock", "tell me a story", max_tokens=16)]
+            await manager.scheduler.shutdown()
+            return tokens
+
+        tokens = asyncio.run(run_test())
+        assert len(tokens) > 1
+        assert "".join(tokens) == manager.generate_text("mock", "tell me a story", max_tokens=16)
@@ -0,0 +1,163 @@
+"""
+Tests for the tiled layer compositor used by the drawing app
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from design_ui.procreate_drawing_app import (
+    Layer, LayerBlendMode, LayerCompositor, TiledSurface, premultiply
+)
+
+TILE = 4
+
+
+def make_layer(pixels, blend_mode=LayerBlendMode.NORMAL, opacity=1.0, mask=None):
+    """Layer over straight uint8 RGBA ``pixels`` tiled in small tiles"""
+    return Layer(layer_id=f"layer_{id(pixels)}", name="Layer", opacity=opacity, blend_mode=blend_mode,
+                 pixels=TiledSurface.from_array(premultiply(pixels), tile_size=TILE),
+                 mask=None if mask is None else TiledSurface.from_array(mask, tile_size=TILE))
+
+
+def random_pixels(rng, height=8, width=8):
+    return rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+
+
+def reference_blend(cb, cs, mode):
+    """Scalar W3C blend function of straight colour components"""
+    def hard_light(b, s):
+        return b * 2 * s if s <= 0.5 else b + (2 * s - 1) - b * (2 * s - 1)
+
+    def soft_light(b, s):
+        if s <= 0.5:
+            return b - (1 - 2 * s) * b * (1 - b)
+        d = ((16 * b - 12) * b + 4) * b if b <= 0.25 else b ** 0.5
+        return b + (2 * s - 1) * (d - b)
+
+    return {
+        LayerBlendMode.NORMAL: lambda: cs,
+        LayerBlendMode.MULTIPLY: lambda: cb * cs,
+        LayerBlendMode.SCREEN: lambda: cb + cs - cb * cs,
+        LayerBlendMode.OVERLAY: lambda: hard_light(cs, cb),
+        LayerBlendMode.SOFT_LIGHT: lambda: soft_light(cb, cs),
+        LayerBlendMode.HARD_LIGHT: lambda: hard_light(cb, cs),
+        LayerBlendMode.COLOR_DODGE: lambda: 0.0 if cb == 0 else (1.0 if cs == 1 else min(1.0, cb / (1 - cs))),
+        LayerBlendMode.LINEAR_BURN: lambda: max(cb + cs - 1, 0.0),
+        LayerBlendMode.DARKEN: lambda: min(cb, cs),
+        LayerBlendMode.LIGHTEN: lambda: max(cb, cs),
+    }[mode]()
+
+
+def reference_composite(backdrop, source, mode):
+    """Per-pixel source-over with a blend mode on premultiplied uint8 inputs"""
+    out = np.zeros(backdrop.shape, dtype=np.float64)
+    for y, x in np.ndindex(backdrop.shape[:2]):
+        b = backdrop[y, x] / 255
+        s = source[y, x] / 255
+        ab, as_ = b[3], s[3]
+        for c in range(3):
+            cb = min(b[c] / ab, 1.0) if ab else 0.0
+            cs = min(s[c] / as_, 1.0) if as_ else 0.0
+            out[y, x, c] = (1 - ab) * s[c] + (1 - as_) * b[c] + as_ * ab * reference_blend(cb, cs, mode)
+        out[y, x, 3] = as_ + ab * (1 - as_)
+    return out * 255
+
+
+def composite(layers, width=8, height=8):
+    compositor = LayerCompositor(width, height, tile_size=TILE)
+    compositor.composite(layers)
+    return compositor
+
+
+class TestBlending:
+    """Test blend modes, opacity and masks against a per-pixel reference"""
+
+    @pytest.mark.parametrize("mode", list(LayerBlendMode))
+    def test_blend_modes_match_reference(self, mode):
+        """Every blend mode agrees with the W3C formula to within rounding"""
+        rng = np.random.default_rng(1)
+        bottom, top = random_pixels(rng), random_pixels(rng)
+        top[0, 0] = (10, 200, 255, 255)  # opaque and saturated source pixels
+        bottom[0, 1, 3] = 0
+
+        compositor = composite([make_layer(bottom), make_layer(top, mode)])
+
+        expected = reference_composite(premultiply(bottom), premultiply(top), mode)
+        np.testing.assert_allclose(compositor.canvas, expected, atol=2)
+
+    def test_opacity_and_mask_scale_the_source(self):
+        """Opacity and the layer mask scale the layer's coverage"""
+        rng = np.random.default_rng(2)
+        bottom, top = random_pixels(rng), random_pixels(rng)
+        mask = rng.integers(0, 256, size=(8, 8, 1), dtype=np.uint8)
+
+        compositor = composite([make_layer(bottom), make_layer(top, opacity=0.5, mask=mask)])
+
+        source = premultiply(top) * (mask / 255) * 0.5
+        expected = reference_composite(premultiply(bottom), source, LayerBlendMode.NORMAL)
+        np.testing.assert_allclose(compositor.canvas, expected, atol=2)
+
+    def test_hidden_layers_are_skipped(self):
+        """Invisible layers and layers with an empty mask contribute nothing"""
+        rng = np.random.default_rng(3)
+        bottom = random_pixels(rng)
+        hidden = make_layer(random_pixels(rng))
+        hidden.visible = False
+        masked = make_layer(random_pixels(rng), mask=np.zeros((8, 8, 1), dtype=np.uint8))
+
+        compositor = composite([make_layer(bottom), hidden, masked])
+
+        np.testing.assert_array_equal(compositor.canvas, premultiply(bottom))
+
+
+class TestTiles:
+    """Test sparse tiles and dirty-tile recompositing"""
+
+    def test_blank_tiles_take_no_memory(self):
+        """Writing fill pixels frees a tile"""
+        surface = TiledSurface(10, 10, tile_size=TILE)
+        touched = surface.write(3, 3, np.full((2, 2, 4), 255, dtype=np.uint8))
+        assert touched == {(0, 0), (0, 1), (1, 0), (1, 1)}
+        assert (0, 0) not in surface.opaque
+
+        surface.write(0, 0, np.zeros((10, 10, 4), dtype=np.uint8))
+        assert surface.tiles == {}
+        assert surface.tile_bounds((2, 2)) == (8, 10, 8, 10)
+
+    def test_only_written_tiles_are_recomposited(self):
+        """A stroke re-blends the tiles it touched and matches a full composite"""
+        rng = np.random.default_rng(4)
+        modes = list(LayerBlendMode)
+        layers = [make_layer(random_pixels(rng, 12, 12), modes[i % len(modes)]) for i in range(6)]
+        compositor = composite(layers, 12, 12)
+
+        assert compositor.composite(layers) == set()
+        for step in range(3):
+            # Repeated strokes on one layer reuse the blend of the layers below it
+            stroke = premultiply(random_pixels(rng, 3, 3))
+            layers[3].pixels.write(2 + step % 2, 2, stroke)
+            assert compositor.composite(layers) == {(0, 0), (0, 1), (1, 0), (1, 1)}
+            np.testing.assert_array_equal(compositor.canvas, composite(layers, 12, 12).canvas)
+
+        layers[1].pixels.write(9, 9, premultiply(random_pixels(rng, 2, 2)))
+        assert compositor.composite(layers) == {(2, 2)}
+        np.testing.assert_array_equal(compositor.canvas, composite(layers, 12, 12).canvas)
+
+        layers[2].blend_mode = LayerBlendMode.NORMAL
+        assert len(compositor.composite(layers)) == 9
+        np.testing.assert_array_equal(compositor.canvas, composite(layers, 12, 12).canvas)
+
+    def test_layers_under_opaque_tiles_are_not_read(self, monkeypatch):
+        """Nothing below an opaque normal tile is blended"""
+        rng = np.random.default_rng(5)
+        bottom = make_layer(random_pixels(rng))
+        cover = random_pixels(rng)
+        cover[..., 3] = 255
+        read = []
+        original = bottom.pixels.get_tile
+        monkeypatch.setattr(bottom.pixels, "get_tile", lambda key: read.append(key) or original(key))
+
+        compositor = composite([bottom, make_layer(cover)])
+
+        assert read == []
+        np.testing.assert_array_equal(compositor.canvas, cover)
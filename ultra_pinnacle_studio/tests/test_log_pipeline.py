@@ -0,0 +1,145 @@
+"""
+Tests for the batched log pipeline
+"""
+import logging
+import threading
+import time
+
+from api_gateway.log_pipeline import BatchingQueue, QueueingHandler
+
+
+class TestBatchingQueue:
+    """Test batching, backpressure and shutdown flushing"""
+
+    def test_items_flushed_in_batches(self):
+        """The flusher hands items over in groups no larger than batch_size"""
+        batches = []
+        q = BatchingQueue("test-batches", batches.append, batch_size=10, flush_interval=0.05)
+        for i in range(25):
+            q.put(i)
+        q.close()
+
+        assert [item for batch in batches for item in batch] == list(range(25))
+        assert all(len(batch) <= 10 for batch in batches)
+        assert q.get_stats()["flushed"] == 25
+
+    def test_close_interrupts_partial_batch(self):
+        """Items the flusher is still collecting are written before close returns"""
+        batches = []
+        q = BatchingQueue("test-partial", batches.append, batch_size=10, flush_interval=30)
+        q.put(1)
+        time.sleep(0.05)  # flusher now holds 1 and waits for more
+        start = time.monotonic()
+        q.close()
+
+        assert time.monotonic() - start < 1
+        assert batches == [[1]]
+
+    def test_drop_policy_discards_when_full(self):
+        """With drop, puts beyond max_size fail instead of blocking"""
+        release = threading.Event()
+        written = []
+
+        def slow_flush(batch):
+            release.wait(2)
+            written.extend(batch)
+
+        q = BatchingQueue("test-drop", slow_flush, max_size=2, batch_size=1, flush_interval=0.01)
+        q.put("first")
+        time.sleep(0.05)  # flusher is now stuck on "first"
+        results = [q.put(i) for i in range(5)]
+        release.set()
+        q.close()
+
+        assert results == [True, True, False, False, False]
+        assert q.get_stats()["dropped"] == 3
+        assert written == ["first", 0, 1]
+
+    def test_sample_policy_thins_under_pressure(self):
+        """With sample and sample_rate 0, nothing past half full is kept"""
+        release = threading.Event()
+        q = BatchingQueue("test-sample", lambda batch: release.wait(2), max_size=4,
+                          batch_size=1, flush_interval=0.01, policy="sample", sample_rate=0.0)
+        q.put("first")
+        time.sleep(0.05)
+        results = [q.put(i) for i in range(4)]
+        release.set()
+        q.close()
+
+        assert results == [True, True, False, False]
+        assert q.get_stats()["sampled_out"] == 2
+
+    def test_flush_errors_are_counted(self):
+        """A failing writer does not kill the flusher"""
+        def failing(batch):
+            raise RuntimeError("disk full")
+
+        q = BatchingQueue("test-errors", failing, flush_interval=0.01)
+        q.put(1)
+        q.close()
+
+        assert q.get_stats()["flush_errors"] == 1
+
+    def test_put_after_close_writes_through(self):
+        """Late events after shutdown are written synchronously"""
+        batches = []
+        q = BatchingQueue("test-late", batches.append)
+        q.close()
+        q.put("late")
+
+        assert batches == [["late"]]
+
+
+class TestQueueingHandler:
+    """Test deferring logging handlers to the pipeline"""
+
+    def test_records_reach_wrapped_handler(self):
+        """Records are formatted with their args and honour handler levels"""
+        records = []
+
+        class ListHandler(logging.Handler):
+            def emit(self, record):
+                records.append(self.format(record))
+
+        target = ListHandler(level=logging.WARNING)
+        handler = QueueingHandler([target], name="test-records", flush_interval=0.01)
+        log = logging.getLogger("test_log_pipeline")
+        log.propagate = False
+        log.setLevel(logging.DEBUG)
+        log.addHandler(handler)
+        try:
+            log.info("skipped")
+            log.warning("kept %s", 1)
+            handler.flush()
+        finally:
+            log.removeHandler(handler)
+            handler.close()
+
+        assert records == ["kept 1"]
+
+    def test_failing_flush_after_close_does_not_deadlock(self):
+        """Errors logged from a flush back into the same closed queue are dropped"""
+        class BrokenHandler(logging.Handler):
+            broken = True
+
+            def emit(self, record):
+                pass
+
+            def flush(self):
+                if self.broken:
+                    raise RuntimeError("stream gone")
+
+        broken = BrokenHandler()
+        handler = QueueingHandler([broken], name="test-reentrant")
+        log = logging.getLogger("ultra_pinnacle")
+        log.addHandler(handler)
+        try:
+            handler.close()
+            done = threading.Event()
+            threading.Thread(target=lambda: (log.error("late"), done.set()), daemon=True).start()
+            assert done.wait(2)
+        finally:
+            log.removeHandler(handler)
+            broken.broken = False
+
+        assert handler.queue.get_stats()["dropped"] == 1
@@ -0,0 +1,115 @@
+"""
+Tests for memory-budgeted model residency
+"""
+from api_gateway.model_residency import ModelResidencyManager
+from api_gateway.models_safe import ModelManager
+
+MB = 1024 * 1024
+
+
+def make_config(tmp_path, budget_mb=100, pinned=None, priorities=None):
+    """Build a config with three local models of 40 MB each"""
+    models = {"default_model": "a"}
+    for name in ["a", "b", "c"]:
+        model_file = tmp_path / f"{name}.gguf"
+        model_file.write_bytes(b"")
+        models[name] = {"type": "llama", "path": str(model_file), "memory_mb": 40}
+        if priorities and name in priorities:
+            models[name]["priority"] = priorities[name]
+    return {
+        "models": models,
+        "model_residency": {"memory_budget_mb": budget_mb, "pinned": pinned or []},
+        "response_cache": {"disk_path": str(tmp_path / "responses.db")}
+    }
+
+
+class TestModelResidencyManager:
+    """Test eviction planning"""
+
+    def test_estimate_from_file_size(self, tmp_path):
+        """Local models are sized from their weights times the overhead factor"""
+        model_file = tmp_path / "model.gguf"
+        model_file.write_bytes(b"x" * 1000)
+        residency = ModelResidencyManager({"model_residency": {"memory_budget_mb": 10, "overhead_factor": 1.5}})
+
+        assert residency.estimate_size("m", {"type": "llama", "path": str(model_file)}) == 1500
+        assert residency.estimate_size("api", {"type": "openai"}) == 0
+        assert residency.estimate_size("gone", {"type": "llama", "path": str(tmp_path / "missing")}) == 0
+
+    def test_lru_victim_selected(self, tmp_path):
+        """The least recently used unpinned model is evicted first"""
+        config = make_config(tmp_path)
+        config["model_residency"]["pin_default_model"] = False
+        residency = ModelResidencyManager(config)
+        residency.record_load("a", 40 * MB, 1)
+        residency.record_load("b", 40 * MB, 1)
+        assert residency.plan_admission("c", 40 * MB) == ["a"]
+
+        residency.touch("a")
+        assert residency.plan_admission("c", 40 * MB) == ["b"]
+
+    def test_default_model_is_pinned(self, tmp_path):
+        """The default model is never chosen for eviction"""
+        residency = ModelResidencyManager(make_config(tmp_path))
+        residency.record_load("a", 40 * MB, 1)
+        residency.record_load("b", 40 * MB, 1)
+        residency.touch("b")
+
+        assert residency.plan_admission("c", 40 * MB) == ["b"]
+
+    def test_priority_beats_recency(self, tmp_path):
+        """Lower priority models are evicted before older higher priority ones"""
+        config = make_config(tmp_path, budget_mb=100, priorities={"b": 5})
+        config["model_residency"]["pin_default_model"] = False
+        residency = ModelResidencyManager(config)
+        residency.record_load("b", 40 * MB, 1)
+        residency.record_load("a", 40 * MB, 1)
+
+        assert residency.plan_admission("c", 40 * MB) == ["a"]
+
+    def test_no_eviction_within_budget(self, tmp_path):
+        """Nothing is evicted while the budget has room"""
+        residency = ModelResidencyManager(make_config(tmp_path, budget_mb=200))
+        residency.record_load("a", 40 * MB, 1)
+        residency.record_load("b", 40 * MB, 1)
+
+        assert residency.plan_admission("c", 40 * MB) == []
+
+
+class TestModelManagerResidency:
+    """Test that ModelManager loads and unloads within the budget"""
+
+    def test_switching_models_stays_within_budget(self, tmp_path):
+        """Loading a third model evicts one so resident size stays under budget"""
+        manager = ModelManager(make_config(tmp_path, budget_mb=100))
+
+        manager.get_model("a")
+        manager.get_model("b")
+        manager.get_model("c")
+
+        assert set(manager.models) == {"a", "c"}
+        assert manager.residency.resident_bytes() <= 100 * MB
+        stats = manager.residency.get_stats()
+        assert stats["loads"] == 3
+        assert stats["evictions"] == 1
+
+    def test_evicted_model_reloads_on_demand(self, tmp_path):
+        """An evicted model is transparently reloaded when requested again"""
+        manager = ModelManager(make_config(tmp_path, budget_mb=100))
+        manager.get_model("a")
+        manager.get_model("b")
+        manager.get_model("c")
+
+        assert manager.get_model("b") is not None
+        assert "b" in manager.models
+        assert manager.residency.get_stats()["loads"] == 4
+
+    def test_unload_model(self, tmp_path):
+        """Explicit unloads are recorded"""
+        manager = ModelManager(make_config(tmp_path))
+        manager.get_model("b")
+
+        assert manager.unload_model("b") is True
+        assert manager.unload_model("b") is False
+        assert not manager.residency.is_resident("b")
+        assert manager.residency.get_stats()["unloads"] == 1
@@ -0,0 +1,71 @@
+"""
+Tests for the query plan audit and the missing-index migration
+"""
+from sqlalchemy import select, text
+
+from api_gateway.database import Base, Message
+from api_gateway.db_engine import create_missing_indexes
+from api_gateway.query_audit import QueryRecorder, audit, missing_indexes, plan_issues
+
+
+def full_scans(reports):
+    return {(report.name, issue.table) for report in reports for issue in report.issues if issue.kind == "full_scan"}
+
+
+class TestPlanIssues:
+    """Test EXPLAIN QUERY PLAN parsing"""
+
+    def test_only_unindexed_scans_are_full_scans(self):
+        """Index, virtual table and subquery scans are not reported"""
+        issues = plan_issues([
+            "SCAN messages",
+            "SCAN conversation_participants AS p",
+            "SEARCH messages USING INDEX idx_message_conversation_created (conversation_id=?)",
+            "SCAN search_analytics USING INDEX idx_search_analytics_popularity",
+            "SCAN search_index VIRTUAL TABLE INDEX 0:M3",
+            "SCAN (subquery-1)",
+            "USE TEMP B-TREE FOR ORDER BY"
+        ])
+        assert [(issue.kind, issue.table) for issue in issues] == [
+            ("full_scan", "messages"), ("full_scan", "conversation_participants"), ("temp_sort", None)
+        ]
+
+
+class TestAudit:
+    """Test the hot-path audit against a live schema"""
+
+    def test_hot_queries_are_index_backed(self, db_engine):
+        """No catalogued query scans a whole table on the current schema"""
+        assert full_scans(audit(db_engine)) == set()
+
+    def test_legacy_database_is_repaired(self, db_engine):
+        """Indexes missing from an older database are reported, then created"""
+        with db_engine.begin() as conn:
+            conn.execute(text("DROP INDEX idx_message_conversation_created"))
+            conn.execute(text("DROP INDEX idx_participant_conversation_user"))
+
+        assert ("conversation_messages", "messages") in full_scans(audit(db_engine))
+        assert missing_indexes(db_engine, Base.metadata) == [
+            ("conversation_participants", "idx_participant_conversation_user"),
+            ("messages", "idx_message_conversation_created")
+        ]
+
+        assert create_missing_indexes(db_engine, Base.metadata) == [
+            "idx_participant_conversation_user", "idx_message_conversation_created"
+        ]
+        assert missing_indexes(db_engine, Base.metadata) == []
+        assert full_scans(audit(db_engine)) == set()
+
+    def test_recorded_queries_are_audited(self, db_engine):
+        """Statements captured from an engine are explained with their parameters"""
+        with db_engine.begin() as conn:
+            conn.execute(text("DROP INDEX idx_message_conversation_created"))
+
+        with QueryRecorder(db_engine) as recorder:
+            with db_engine.connect() as conn:
+                conn.execute(select(Message).where(Message.conversation_id == "c1")).all()
+                conn.execute(text("INSERT INTO search_analytics (query) VALUES ('x')"))
+
+        reports = audit(db_engine, recorder.queries())
+        assert len(reports) == 1
+        assert reports[0].issues[0].table == "messages"
@@ -102,6 +102,162 @@ class TestSlidingWindowLimiter:
             assert allowed == True
 
 
+class TestLimiterAlgorithms:
+    """Test the constant-memory limiter modes"""
+
+    @pytest.mark.parametrize("algorithm", SlidingWindowLimiter.ALGORITHMS)
+    def test_limit_enforced(self, algorithm):
+        """Every algorithm admits exactly the limit within a window"""
+        limiter = SlidingWindowLimiter(algorithm=algorithm)
+        results = [limiter.check_limit("client", 5, 60)[0] for _ in range(7)]
+        assert results == [True] * 5 + [False] * 2
+
+    def test_gcra_state_is_constant_size(self):
+        """GCRA keeps a single float per key regardless of request count"""
+        limiter = SlidingWindowLimiter(algorithm="gcra")
+        for _ in range(1000):
+            limiter.check_limit("client", 5000, 86400)
+        states = [state for shard in limiter.shards for state in shard.states.values()]
+        assert len(states) == 1
+        assert isinstance(states[0], float)
+
+    def test_gcra_refills_gradually(self):
+        """Capacity returns at the configured rate, not all at once"""
+        limiter = SlidingWindowLimiter(algorithm="gcra")
+        now = time.time()
+        with patch('api_gateway.rate_limiter.time.time', return_value=now):
+            for _ in range(10):
+                limiter.check_limit("client", 10, 60)
+        with patch('api_gateway.rate_limiter.time.time', return_value=now + 12):
+            assert limiter.check_limit("client", 10, 60)[0] is True
+            assert limiter.check_limit("client", 10, 60)[0] is True
+            assert limiter.check_limit("client", 10, 60)[0] is False
+
+    def test_rejected_requests_are_not_counted(self):
+        """A request denied by one window is not charged to the others"""
+        limiter = SlidingWindowLimiter()
+        windows = [(2, 10, "burst"), (100, 60, "minute")]
+        for _ in range(5):
+            limiter.check_limits("client", windows)
+        _, minute = limiter.check_limits("client", [(100, 10, "other"), (100, 60, "minute")])
+        assert minute[1] == 100 - 3
+
+    def test_idle_keys_are_swept(self):
+        """Keys whose windows have drained are removed"""
+        limiter = SlidingWindowLimiter()
+        for i in range(50):
+            limiter.check_limit(f"client{i}", 10, 10)
+        assert limiter.key_count() == 50
+
+        later = time.time() + 11
+        for shard in limiter.shards:
+            limiter._sweep(shard, later)
+        assert limiter.key_count() == 0
+
+
+class TestRedisLimiter:
+    """Test the single-script Redis path"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        self.redis = fakeredis.FakeRedis()
+        self.limiter = SlidingWindowLimiter(redis_client=self.redis)
+
+    def test_all_windows_in_one_call(self):
+        """Each check is a single script evaluation covering every window"""
+        calls = []
+        script = self.limiter.redis_script
+        self.limiter.redis_script = lambda **kwargs: calls.append(kwargs) or script(**kwargs)
+
+        windows = [(3, 10, "burst"), (100, 60, "minute"), (1000, 3600, "hour")]
+        results = [self.limiter.check_limits("client", windows) for _ in range(4)]
+
+        assert len(calls) == 4
+        assert [r[0][0] for r in results] == [True, True, True, False]
+        assert results[0][1] == (True, 99, 0.0)
+        assert results[3][0][2] > 0
+
+        # The rejected request was not charged to the minute window
+        _, minute = self.limiter.check_limits("client", [(100, 10, "other"), (100, 60, "minute")])
+        assert minute[1] == 100 - 4
+
+    def test_keys_expire(self):
+        """Redis keys carry a TTL so idle clients are forgotten"""
+        self.limiter.check_limit("client", 10, 60)
+        keys = self.redis.keys("rate_limit:*")
+        assert len(keys) == 1
+        assert 0 < self.redis.pttl(keys[0]) <= 6001
+
+    def test_falls_back_to_memory_when_redis_fails(self):
+        """Redis errors switch to in-memory limits instead of allowing everything"""
+        def broken(**kwargs):
+            raise ConnectionError("redis stalled")
+        self.limiter.redis_script = broken
+
+        results = [self.limiter.check_limit("client", 2, 60)[0] for _ in range(3)]
+
+        assert results == [True, True, False]
+        assert self.limiter.redis_errors == 1
+        assert not self.limiter._redis_available()
+
+
+class TestEndpointMatcher:
+    """Test the compiled endpoint router"""
+
+    def _config(self, minute):
+        from api_gateway.rate_limiter import RateLimitConfig
+        return RateLimitConfig(requests_per_minute=minute)
+
+    def test_precedence(self):
+        """Priority, then exactness, then specificity decide the winning rule"""
+        from api_gateway.rate_limiter import EndpointMatcher
+
+        matcher = EndpointMatcher([
+            ("/api/*", "*", 0, self._config(1)),
+            ("/api/models/*", "*", 0, self._config(2)),
+            ("/api/models/list", "*", 0, self._config(3)),
+            ("/api/chat*", "*", 5, self._config(4)),
+        ])
+
+        assert matcher.match("/api/models/list").requests_per_minute == 3
+        assert matcher.match("/api/models/llama").requests_per_minute == 2
+        assert matcher.match("/api/other").requests_per_minute == 1
+        assert matcher.match("/api/chat/stream").requests_per_minute == 4
+        assert matcher.match("/health") is None
+
+    def test_method_specific_rules(self):
+        """Rules bound to a method only apply to that method"""
+        from api_gateway.rate_limiter import EndpointMatcher
+
+        matcher = EndpointMatcher([
+            ("/upload", "POST", 0, self._config(5)),
+            ("/upload", "*", 0, self._config(50)),
+        ])
+
+        assert matcher.match("/upload", "POST").requests_per_minute == 5
+        assert matcher.match("/upload", "GET").requests_per_minute == 50
+
+    def test_literal_characters_are_escaped(self):
+        """Regex metacharacters in patterns match literally"""
+        from api_gateway.rate_limiter import EndpointMatcher
+
+        matcher = EndpointMatcher([("/files/a.b", "*", 0, self._config(1))])
+        assert matcher.match("/files/a.b") is not None
+        assert matcher.match("/files/aXb") is None
+
+    def test_manager_rebuilds_on_change(self):
+        """Replacing the rule set takes effect on the next lookup"""
+        manager = RateLimitManager()
+        manager.load_endpoint_config("/api/*", self._config(7))
+        assert manager._get_endpoint_config("/api/x").requests_per_minute == 7
+
+        manager.replace_endpoint_configs([("/other/*", "*", 0, self._config(8))])
+        assert manager._get_endpoint_config("/api/x") is None
+        assert manager._get_endpoint_config("/other/x").requests_per_minute == 8
+
+
 class TestRateLimitManager:
     """Test the rate limit manager"""
 
@@ -185,6 +341,69 @@ class TestRateLimitMiddleware:
         assert self.middleware is not None
 
 
+class TestTokenIdentification:
+    """Test the database-free user lookup used by the middleware"""
+
+    def test_uid_claim_needs_no_database(self):
+        """Tokens carrying a uid resolve without a session, and verify only once"""
+        from api_gateway import auth
+
+        token = auth.create_access_token({"sub": "alice", "uid": 42})
+        with patch('api_gateway.database.SessionLocal') as session, \
+                patch('api_gateway.auth.jwt.decode', wraps=auth.jwt.decode) as decode:
+            assert auth.get_user_id_from_token(token) == 42
+            assert auth.get_user_id_from_token(token) == 42
+            session.assert_not_called()
+            assert decode.call_count == 1
+
+    def test_invalid_and_expired_tokens(self):
+        """Bad signatures and expired tokens identify nobody"""
+        from api_gateway import auth
+
+        expired = auth.create_access_token({"sub": "bob", "uid": 1}, expires_delta=timedelta(seconds=-1))
+        assert auth.get_user_id_from_token(expired) is None
+        assert auth.get_user_id_from_token("not-a-jwt") is None
+
+    def test_legacy_token_looks_up_user_once(self):
+        """Tokens without a uid hit the database once per username"""
+        from api_gateway import auth
+
+        token = auth.create_access_token({"sub": "legacy-user"})
+        db = Mock()
+        db.query.return_value.filter.return_value.first.return_value = Mock(id=9)
+        with patch('api_gateway.database.SessionLocal', return_value=db) as session:
+            assert auth.get_user_id_from_token(token) == 9
+            assert auth.get_user_id_from_token(token) == 9
+        assert session.call_count == 1
+        db.close.assert_called_once()
+
+    def test_middleware_uses_bearer_token(self):
+        """The middleware passes the token's user id to the limiter"""
+        from starlette.requests import Request
+        from starlette.responses import Response
+        from api_gateway import auth
+        from api_gateway.rate_limiter import RateLimitResult
+
+        middleware = RateLimitMiddleware(Mock())
+        middleware.rate_limit_manager = Mock()
+        middleware.rate_limit_manager.check_rate_limit.return_value = RateLimitResult(
+            allowed=True, remaining_requests=5, reset_time=datetime.now(), limit_type="user"
+        )
+        middleware.audit_logger = None
+
+        token = auth.create_access_token({"sub": "carol", "uid": 7})
+        request = Request({
+            "type": "http", "method": "GET", "path": "/models", "query_string": b"",
+            "headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("1.2.3.4", 1)
+        })
+
+        async def call_next(request):
+            return Response("ok")
+
+        asyncio.run(middleware.dispatch(request, call_next))
+        assert middleware.rate_limit_manager.check_rate_limit.call_args.kwargs["user_id"] == 7
+
+
 class TestRateLimitService:
     """Test the rate limit service"""
 
@@ -0,0 +1,130 @@
+"""
+Tests for the tiered prompt response cache
+"""
+import time
+
+from api_gateway.response_cache import ResponseCache, normalize_prompt
+from api_gateway.models_safe import ModelManager
+
+
+def make_cache(tmp_path, **settings):
+    """Cache whose disk tier lives in tmp_path, named relative to the configured cache_dir"""
+    settings.setdefault("disk_path", "responses.db")
+    return ResponseCache({"response_cache": settings, "paths": {"cache_dir": str(tmp_path)}})
+
+
+class TestResponseCache:
+    """Test keying, tiers, TTL and statistics"""
+
+    def test_normalized_prompts_share_entry(self, tmp_path):
+        """Whitespace-only differences hit the same entry"""
+        cache = make_cache(tmp_path)
+        cache.set("m", "Explain   this\ncode", 256, 0.2, "answer")
+
+        assert normalize_prompt("  Explain this code ") == "Explain this code"
+        assert cache.get("m", "Explain this code", 256, 0.2) == "answer"
+
+    def test_params_are_part_of_key(self, tmp_path):
+        """Model, max_tokens and temperature all distinguish entries"""
+        cache = make_cache(tmp_path)
+        cache.set("m", "prompt", 256, 0.2, "answer")
+
+        assert cache.get("other", "prompt", 256, 0.2) is None
+        assert cache.get("m", "prompt", 512, 0.2) is None
+        assert cache.get("m", "prompt", 256, 0.5) is None
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """A new cache instance reads entries written by a previous one"""
+        make_cache(tmp_path).set("m", "prompt", 256, 0.0, "persisted")
+        assert (tmp_path / "responses.db").exists()
+
+        cache = make_cache(tmp_path)
+        assert cache.get("m", "prompt", 256, 0.0) == "persisted"
+        assert cache.stats["disk_hits"] == 1
+
+        # Promoted into memory on the first hit
+        assert cache.get("m", "prompt", 256, 0.0) == "persisted"
+        assert cache.stats["memory_hits"] == 1
+
+    def test_ttl_expiry(self, tmp_path):
+        """Entries expire from every tier after the TTL"""
+        cache = make_cache(tmp_path, ttl_seconds=1)
+        cache.set("m", "prompt", 256, 0.0, "answer")
+        time.sleep(1.1)
+
+        assert cache.get("m", "prompt", 256, 0.0) is None
+
+    def test_memory_tier_is_size_bounded(self, tmp_path):
+        """The memory tier evicts once its character budget is exceeded"""
+        cache = make_cache(tmp_path, memory_max_chars=100, disk_path=None)
+        for i in range(10):
+            cache.set("m", f"prompt {i}", 256, 0.0, "x" * 30)
+
+        assert cache.memory.currsize <= 100
+        assert cache.get("m", "prompt 0", 256, 0.0) is None
+        assert cache.get("m", "prompt 9", 256, 0.0) == "x" * 30
+
+    def test_semantic_near_duplicate_lookup(self, tmp_path):
+        """A near-duplicate prompt is served from the most similar entry"""
+        cache = make_cache(tmp_path, semantic={"enabled": True, "threshold": 0.9})
+        cache.set("m", "Explain what a Python decorator does", 256, 0.0, "decorators wrap functions")
+
+        assert cache.get("m", "explain what a python decorator does?", 256, 0.0) == "decorators wrap functions"
+        assert cache.get("m", "Write a haiku about autumn leaves", 256, 0.0) is None
+        assert cache.stats["semantic_hits"] == 1
+
+    def test_hit_rate(self, tmp_path):
+        """Hit rate is reported across tiers"""
+        cache = make_cache(tmp_path)
+        cache.set("m", "a", 256, 0.0, "A")
+        cache.get("m", "a", 256, 0.0)
+        cache.get("m", "b", 256, 0.0)
+
+        stats = cache.get_stats()
+        assert stats["hit_rate"] == 50.0
+        assert stats["disk_entries"] == 1
+
+
+class TestModelManagerResponseCache:
+    """Test generate_text integration"""
+
+    def test_repeated_prompt_is_cached(self, tmp_path):
+        """The second identical greedy request is served from the cache"""
+        manager = ModelManager({
+            "models": {"mock": {"type": "llama", "path": "missing.gguf"}},
+            "response_cache": {"disk_path": str(tmp_path / "responses.db")}
+        })
+
+        first = manager.generate_text("mock", "enhance my prompt", max_tokens=64, temperature=0.0)
+        second = manager.generate_text("mock", "enhance my prompt", max_tokens=64, temperature=0.0)
+
+        assert first == second
+        assert manager.response_cache.stats["memory_hits"] == 1
+        assert manager.response_cache.stats["sets"] == 1
+
+    def test_sampled_output_is_cached_only_on_opt_in(self, tmp_path):
+        """Sampled requests are generated fresh unless the caller opts in"""
+        manager = ModelManager({
+            "models": {"mock": {"type": "llama", "path": "missing.gguf"}},
+            "response_cache": {"disk_path": str(tmp_path / "responses.db")}
+        })
+
+        manager.generate_text("mock", "chat message", temperature=0.7)
+        assert manager.response_cache.stats["sets"] == 0
+
+        manager.generate_text("mock", "enhance my prompt", temperature=0.7, cache_sampled=True)
+        manager.generate_text("mock", "enhance my prompt", temperature=0.7, cache_sampled=True)
+        assert manager.response_cache.stats["sets"] == 1
+        assert manager.response_cache.stats["memory_hits"] == 1
+
+    def test_high_temperature_and_opt_out_bypass_cache(self, tmp_path):
+        """Sampling above max_temperature, or cache=False, skips the cache"""
+        manager = ModelManager({
+            "models": {"mock": {"type": "llama", "path": "missing.gguf"}},
+            "response_cache": {"disk_path": str(tmp_path / "responses.db"), "max_temperature": 0.5}
+        })
+
+        manager.generate_text("mock", "creative", temperature=0.9)
+        manager.generate_text("mock", "precise", temperature=0.0, cache=False)
+
+        assert manager.response_cache.stats["sets"] == 0
@@ -0,0 +1,176 @@
+"""
+Tests for change capture, batching and resumable reindexing of search_index
+"""
+import time
+
+from sqlalchemy import text
+
+from api_gateway.database import Conversation, HelpArticle, Message, User
+from api_gateway.search_indexer import SearchIndexer
+
+
+def make_indexer(session_factory, tmp_path, **settings):
+    """SearchIndexer with hooks on the test database"""
+    config = {
+        "search": {"indexer": settings},
+        "paths": {"cache_dir": str(tmp_path), "encyclopedia_dir": str(tmp_path / "encyclopedia")}
+    }
+    indexer = SearchIndexer(session_factory, config)
+    indexer.install_hooks(session_factory)
+    return indexer
+
+
+def indexed(session_factory):
+    db = session_factory()
+    try:
+        return {row[0]: row[1] for row in db.execute(text("SELECT id, content FROM search_index"))}
+    finally:
+        db.close()
+
+
+def add_user(db):
+    user = User(username="alice", email="alice@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+class TestChangeCapture:
+    """Test that committed writes reach the index in batches"""
+
+    def test_conversation_and_messages_indexed_together(self, session_factory, tmp_path):
+        """Messages are folded into their conversation's entry"""
+        indexer = make_indexer(session_factory, tmp_path)
+        db = session_factory()
+        user = add_user(db)
+        db.add(Conversation(id="c1", title="Deploy notes", created_by=user.id))
+        db.add(Message(conversation_id="c1", role="user", content="how do I deploy"))
+        db.add(Message(conversation_id="c1", role="assistant", content="run the script"))
+        db.commit()
+        db.close()
+        indexer.queue.close()
+
+        entries = indexed(session_factory)
+        assert entries["conv_c1"] == "how do I deploy run the script"
+        assert "user_1" in entries
+        assert indexer.stats["documents_indexed"] == 2
+
+    def test_rollback_queues_nothing(self, session_factory, tmp_path):
+        """Uncommitted writes never reach the index"""
+        indexer = make_indexer(session_factory, tmp_path)
+        db = session_factory()
+        db.add(User(username="bob", email="bob@example.com", hashed_password="x"))
+        db.flush()
+        db.rollback()
+        db.close()
+
+        assert indexer.queue.queue.qsize() == 0
+
+    def test_unindexed_field_changes_are_ignored(self, session_factory, tmp_path):
+        """Login bookkeeping does not trigger reindexing"""
+        indexer = make_indexer(session_factory, tmp_path)
+        db = session_factory()
+        user = add_user(db)
+        indexer.queue.close()
+        before = indexer.stats["documents_indexed"]
+
+        user.failed_login_attempts = 3
+        db.commit()
+        user.full_name = "Alice Smith"
+        db.commit()
+        db.close()
+
+        assert indexer.stats["documents_indexed"] == before + 1
+        assert "Alice Smith" in indexed(session_factory)["user_1"]
+
+    def test_deleted_rows_are_removed(self, session_factory, tmp_path):
+        """Deletes remove the entry"""
+        indexer = make_indexer(session_factory, tmp_path)
+        db = session_factory()
+        user = add_user(db)
+        db.delete(user)
+        db.commit()
+        db.close()
+        indexer.queue.close()
+
+        assert indexed(session_factory) == {}
+
+    def test_full_queue_never_blocks_or_loses_changes(self, session_factory, tmp_path):
+        """Changes a full queue turns away are written with the next flush"""
+        indexer = make_indexer(session_factory, tmp_path, max_queue_size=1, batch_size=1)
+        db = session_factory()
+        started = time.monotonic()
+        # Stall the flusher so the second change fills the queue
+        with indexer.queue._flush_lock:
+            for name in ("alice", "bob", "carol"):
+                db.add(User(username=name, email=f"{name}@example.com", hashed_password="x"))
+                db.commit()
+            elapsed = time.monotonic() - started
+        db.close()
+        indexer.queue.close()
+
+        assert elapsed < 0.5
+        assert indexer.stats["overflowed"] >= 1
+        assert set(indexed(session_factory)) == {"user_1", "user_2", "user_3"}
+        assert indexer.get_stats()["overflow"] == 0
+
+
+class TestReindex:
+    """Test full, resumable reindexing"""
+
+    def _add_articles(self, session_factory, count):
+        db = session_factory()
+        for i in range(count):
+            db.add(HelpArticle(title=f"Article {i}", slug=f"article-{i}", content=f"body {i}", category_id=1))
+        db.commit()
+        db.close()
+
+    def test_reindex_rebuilds_and_drops_stale_entries(self, session_factory, tmp_path):
+        """Every source is indexed and rows for deleted content are removed"""
+        indexer = make_indexer(session_factory, tmp_path, reindex_batch_size=2)
+        encyclopedia = tmp_path / "encyclopedia"
+        encyclopedia.mkdir()
+        (encyclopedia / "gpu.md").write_text("# GPUs\nParallel hardware")
+        db = session_factory()
+        db.execute(text("INSERT INTO search_index (id, content_type, content_id, title, content) "
+                        "VALUES ('help_999', 'help', '999', 'Gone', 'stale')"))
+        db.commit()
+        db.close()
+
+        progress = indexer.reindex()
+
+        entries = indexed(session_factory)
+        assert progress["status"] == "completed"
+        assert "help_999" not in entries
+        assert entries["ency_gpu"] == "# GPUs\nParallel hardware"
+
+    def test_interrupted_reindex_resumes(self, session_factory, tmp_path):
+        """A failed run picks up after its last checkpoint"""
+        indexer = make_indexer(session_factory, tmp_path, reindex_batch_size=2)
+        indexer.queue.close()
+        self._add_articles(session_factory, 5)
+
+        write = indexer._write
+        calls = []
+
+        def flaky_write(db, removals, documents):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("disk full")
+            write(db, removals, documents)
+
+        indexer._write = flaky_write
+        progress = indexer.reindex()
+        assert progress["status"] == "failed"
+        assert progress["last_id"] == 2
+        assert (tmp_path / "search_reindex.json").exists()
+
+        progress = SearchIndexer(session_factory, {
+            "search": {"indexer": {"reindex_batch_size": 2}},
+            "paths": {"cache_dir": str(tmp_path), "encyclopedia_dir": str(tmp_path / "encyclopedia")}
+        }).reindex()
+
+        assert progress["status"] == "completed"
+        assert "resumed_at" in progress
+        assert progress["indexed"] == 5
+        assert len([k for k in indexed(session_factory) if k.startswith("help_")]) == 5
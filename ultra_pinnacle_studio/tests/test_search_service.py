@@ -0,0 +1,221 @@
+"""
+Tests for SearchService ranking, facets, analytics and export
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+
+import pytest
+from sqlalchemy import text
+
+from api_gateway.search_models import SearchAnalytics, SearchExport, SearchQuery, SearchSuggestion
+from api_gateway.search_service import SearchService
+
+
+def make_service(session_factory, async_session_factory, monkeypatch, docs, **settings):
+    """SearchService over the test database holding ``docs``"""
+    db = session_factory()
+    for i, doc in enumerate(docs):
+        db.execute(text("""
+            INSERT INTO search_index (id, content_type, content_id, title, content, summary,
+                                      tags, metadata, language_code, created_at, updated_at)
+            VALUES (:id, :content_type, :content_id, :title, :content, :summary,
+                    :tags, '{}', :language_code, :created_at, :created_at)
+        """), {
+            "id": f"doc_{i}",
+            "content_type": doc.get("content_type", "document"),
+            "content_id": str(i),
+            "title": doc.get("title", ""),
+            "content": doc.get("content", ""),
+            "summary": doc.get("summary", ""),
+            "tags": json.dumps(doc.get("tags", [])),
+            "language_code": doc.get("language_code", "en"),
+            "created_at": doc.get("created_at", "2024-01-15T00:00:00")
+        })
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(SearchService, "_init_search_tables", lambda self: None)
+    service = SearchService({"search": settings})
+    service._get_db_session = session_factory
+    service._get_async_session = async_session_factory
+    return service
+
+
+class TestSearchService:
+    """Test query translation, ranking, pagination and facets"""
+
+    def test_fts_query_quotes_terms(self):
+        """Punctuation cannot break FTS5 syntax and operators are kept"""
+        service = SearchService.__new__(SearchService)
+
+        assert service._build_fts_query('c++ "exact phrase"') == '"c" "exact phrase"'
+        assert service._build_fts_query('python or rust') == '"python" OR "rust"'
+        assert service._build_fts_query('title:setup pyth*') == 'title:"setup" "pyth"*'
+        assert service._build_fts_query('OR and') is None
+
+    def test_title_match_outranks_content_match(self, session_factory, async_session_factory, monkeypatch):
+        """Title hits are weighted above body hits"""
+        service = make_service(session_factory, async_session_factory, monkeypatch, [
+            {"title": "Unrelated", "content": "install guide for the studio"},
+            {"title": "Install guide", "content": "steps for the studio"}
+        ])
+
+        results = asyncio.run(service.search("install"))
+        assert [r["id"] for r in results["results"]] == ["doc_1", "doc_0"]
+        assert results["results"][0]["relevance_score"] > results["results"][1]["relevance_score"]
+
+    def test_content_type_boost(self, session_factory, async_session_factory, monkeypatch):
+        """Configured boosts reorder otherwise equal matches"""
+        docs = [
+            {"title": "Models", "content_type": "document"},
+            {"title": "Models", "content_type": "help"}
+        ]
+        service = make_service(session_factory, async_session_factory, monkeypatch, docs,
+                               content_type_boosts={"help": 2.0})
+
+        results = asyncio.run(service.search("models"))
+        assert results["results"][0]["content_type"] == "help"
+
+    def test_total_and_facets_cover_all_pages(self, session_factory, async_session_factory, monkeypatch):
+        """Totals and facet counts are computed over the full match set"""
+        docs = [
+            {"title": f"Guide {i}", "content_type": "help" if i % 2 else "document",
+             "tags": ["setup"] if i < 3 else [], "created_at": f"2024-0{1 + i % 2}-01T00:00:00"}
+            for i in range(6)
+        ]
+        service = make_service(session_factory, async_session_factory, monkeypatch, docs)
+
+        results = asyncio.run(service.search("guide", limit=2))
+        assert len(results["results"]) == 2
+        assert results["total"] == 6
+        assert results["facets"]["content_types"] == {"help": 3, "document": 3}
+        assert results["facets"]["tags"] == {"setup": 3}
+        assert results["facets"]["date_ranges"] == {"2024-01": 3, "2024-02": 3}
+
+    def test_filters_apply_to_total(self, session_factory, async_session_factory, monkeypatch):
+        """Filters narrow the ranked page and the counts alike"""
+        service = make_service(session_factory, async_session_factory, monkeypatch, [
+            {"title": "Guide", "content_type": "help"},
+            {"title": "Guide", "content_type": "document"}
+        ])
+
+        results = asyncio.run(service.search("guide", filters={"content_types": ["help"]}))
+        assert results["total"] == 1
+        assert results["facets"]["content_types"] == {"help": 1}
+
+
+class TestSearchAnalytics:
+    """Test batched analytics and suggestion aggregation"""
+
+    def test_searches_aggregate_into_batched_writes(self, session_factory, async_session_factory, monkeypatch):
+        """Repeated searches are folded into running totals"""
+        service = make_service(session_factory, async_session_factory, monkeypatch, [{"title": "Install guide"}])
+
+        for _ in range(3):
+            asyncio.run(service.search("install guide", user_id=7))
+        service.analytics_queue.close()
+
+        db = service._get_db_session()
+        try:
+            assert db.query(SearchQuery).filter(SearchQuery.user_id == 7).count() == 3
+            analytics = db.query(SearchAnalytics).filter(SearchAnalytics.query == "install guide").one()
+            assert analytics.search_count == 3
+            assert analytics.result_count == 1
+            popularity = {s.suggestion: s.popularity for s in db.query(SearchSuggestion)}
+            assert popularity == {"install": 2, "guide": 2}
+        finally:
+            db.close()
+
+    def test_later_batches_update_existing_rows(self, session_factory, async_session_factory, monkeypatch):
+        """A later write adds to the rows created by an earlier one"""
+        service = make_service(session_factory, async_session_factory, monkeypatch, [{"title": "Install guide"}])
+
+        asyncio.run(service.search("install"))
+        service.analytics_queue.close()
+        asyncio.run(service.search("install"))
+
+        db = service._get_db_session()
+        try:
+            analytics = db.query(SearchAnalytics).filter(SearchAnalytics.query == "install").one()
+            assert analytics.search_count == 2
+            suggestion = db.query(SearchSuggestion).filter(SearchSuggestion.suggestion == "install").one()
+            assert suggestion.popularity == 1
+        finally:
+            db.close()
+
+    def test_suggestions_served_from_index(self, session_factory, async_session_factory, monkeypatch):
+        """Flushed analytics update the index without a reload"""
+        service = make_service(session_factory, async_session_factory, monkeypatch, [])
+        db = service._get_db_session()
+        db.add(SearchSuggestion(suggestion="deploy", popularity=3, category="query"))
+        db.commit()
+        db.close()
+
+        assert asyncio.run(service.get_suggestions("dep")) == ["deploy"]
+
+        for _ in range(6):
+            asyncio.run(service.search("depth"))
+        service.analytics_queue.close()
+
+        assert asyncio.run(service.get_suggestions("dep")) == ["depth", "deploy"]
+
+
+class TestSearchExport:
+    """Test streaming export of the full match set"""
+
+    def test_export_writes_every_match(self, session_factory, async_session_factory, tmp_path, monkeypatch):
+        """Exports are not capped at a page and record their size"""
+        docs = [{"title": f"Guide {i}"} for i in range(1200)]
+        service = make_service(session_factory, async_session_factory, monkeypatch, docs, export={"chunk_size": 100})
+        service.config["paths"] = {"exports_dir": str(tmp_path / "exports")}
+
+        export_id = asyncio.run(service.export_search_results("guide", {}, "jsonl", user_id=1))
+
+        db = service._get_db_session()
+        try:
+            record = db.query(SearchExport).filter(SearchExport.id == export_id).one()
+        finally:
+            db.close()
+        lines = open(record.file_path, encoding="utf-8").read().splitlines()
+        assert record.result_count == len(lines) == 1200
+        assert record.file_size == os.path.getsize(record.file_path)
+        assert json.loads(lines[0])["tags"] == []
+
+    def test_gzip_json_export_is_valid(self, session_factory, async_session_factory, tmp_path, monkeypatch):
+        """Compressed JSON exports decode to the ranked result list"""
+        service = make_service(session_factory, async_session_factory, monkeypatch, [
+            {"title": "Unrelated", "content": "install guide"},
+            {"title": "Install guide"}
+        ])
+        service.config["paths"] = {"exports_dir": str(tmp_path / "exports")}
+
+        export_id = asyncio.run(service.export_search_results("install", {}, "json", user_id=1, compress=True))
+
+        path = tmp_path / "exports" / f"search_results_{export_id}.json.gz"
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            assert [r["id"] for r in json.load(f)] == ["doc_1", "doc_0"]
+
+    def test_stream_chunks_csv(self, session_factory, async_session_factory, monkeypatch):
+        """Streamed CSV arrives in buffer-sized chunks with one header"""
+        docs = [{"title": f"Guide {i}", "tags": ["a", "b"]} for i in range(50)]
+        service = make_service(session_factory, async_session_factory, monkeypatch, docs,
+                               export={"stream_buffer_bytes": 1024})
+
+        chunks = list(service.stream_search_results("guide", {}, "csv"))
+
+        assert len(chunks) > 1
+        rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+        assert len(rows) == 50
+        assert json.loads(rows[0]["tags"]) == ["a", "b"]
+
+    def test_empty_and_invalid_exports(self, session_factory, async_session_factory, monkeypatch):
+        """No matches still yields valid JSON; unknown formats fail up front"""
+        service = make_service(session_factory, async_session_factory, monkeypatch, [{"title": "Guide"}])
+
+        assert json.loads("".join(service.stream_search_results("missing", {}, "json"))) == []
+        with pytest.raises(ValueError):
+            service.stream_search_results("guide", {}, "pdf")
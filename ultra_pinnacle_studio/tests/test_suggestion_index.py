@@ -0,0 +1,45 @@
+"""
+Tests for the in-memory autocomplete trie
+"""
+from datetime import datetime, timedelta
+
+from api_gateway.suggestion_index import SuggestionIndex
+
+
+class TestSuggestionIndex:
+    """Test ranking, prefix lookup and incremental updates"""
+
+    def test_ranked_by_popularity_then_recency(self):
+        """Ties on popularity go to the most recently used term"""
+        now = datetime(2024, 1, 1)
+        index = SuggestionIndex()
+        index.load([
+            ("python", 5, now),
+            ("pytest", 9, now),
+            ("pydantic", 5, now + timedelta(hours=1)),
+            ("rust", 50, now)
+        ])
+
+        assert index.suggest("py") == ["pytest", "pydantic", "python"]
+        assert index.suggest("PYT") == ["pytest", "python"]
+        assert index.suggest("go") == []
+
+    def test_top_k_bounds_results(self):
+        """Each node keeps only its best top_k terms"""
+        index = SuggestionIndex(top_k=2)
+        index.load([("alpha", 1, None), ("alps", 3, None), ("altitude", 2, None)])
+
+        assert index.suggest("al", limit=10) == ["alps", "altitude"]
+
+    def test_update_promotes_term(self):
+        """A popularity bump moves a term into the cached top lists"""
+        index = SuggestionIndex(top_k=2)
+        index.load([("alpha", 1, None), ("alps", 3, None), ("altitude", 2, None)])
+
+        index.update("alpha", 10)
+        index.update("almond", 0)
+
+        assert index.suggest("al") == ["alpha", "alps"]
+        assert index.suggest("alm") == ["almond"]
+        assert len(index) == 4
+
@@ -0,0 +1,138 @@
+"""
+Tests for streaming, content-addressed upload storage and multipart uploads
+"""
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+
+from api_gateway.upload_store import UploadError, UploadSessionNotFound, UploadStore, UploadTooLarge
+from api_gateway.validation import UploadContentScanner
+
+
+async def chunked(data: bytes, size: int = 4):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def make_store(tmp_path, **settings):
+    """Upload store rooted in a throwaway directory"""
+    return UploadStore(str(tmp_path / "uploads"), {"chunk_size": 4, **settings})
+
+
+def leftovers(store):
+    return list(store.tmp_dir.iterdir()) if store.tmp_dir.exists() else []
+
+
+class TestStore:
+    """Test single-request uploads"""
+
+    def test_content_is_hashed_and_deduplicated(self, tmp_path):
+        """Identical content is stored once under its SHA-256"""
+        store = make_store(tmp_path)
+        data = b"hello upload store"
+
+        first = asyncio.run(store.store(chunked(data), max_size=100))
+        second = asyncio.run(store.store(chunked(data, 7), max_size=100))
+
+        assert first.sha256 == hashlib.sha256(data).hexdigest()
+        assert first.path == store.object_path(first.sha256)
+        assert first.path.read_bytes() == data
+        assert (first.deduplicated, second.deduplicated) == (False, True)
+        assert second.path == first.path
+        assert leftovers(store) == []
+
+    def test_size_limit_is_enforced_mid_stream(self, tmp_path):
+        """The upload stops at the chunk that crosses the limit"""
+        store = make_store(tmp_path)
+        consumed = []
+
+        async def chunks():
+            for i in range(100):
+                consumed.append(i)
+                yield b"x" * 4
+
+        with pytest.raises(UploadTooLarge):
+            asyncio.run(store.store(chunks(), max_size=10))
+
+        assert len(consumed) == 3
+        assert leftovers(store) == []
+
+    def test_inspection_rejects_split_markers(self, tmp_path):
+        """Content markers split across chunks are still found"""
+        store = make_store(tmp_path)
+
+        with pytest.raises(HTTPException):
+            asyncio.run(store.store(chunked(b"fine <scr" + b"IPT> bad"), 100, UploadContentScanner().feed))
+
+        assert not store.objects_dir.exists()
+
+
+class TestMultipart:
+    """Test resumable multipart uploads"""
+
+    def test_parts_resume_and_complete(self, tmp_path):
+        """Parts can arrive out of order and be re-sent before completion"""
+        store = make_store(tmp_path)
+        data = b"0123456789abcdef"
+        session = store.create_session(1, "model.bin", total_size=len(data))
+        session_id = session["session_id"]
+
+        asyncio.run(store.write_part(session_id, 2, chunked(data[8:])))
+        asyncio.run(store.write_part(session_id, 1, chunked(b"garbage!")))
+        # Resume: the client sees part 1 and re-sends it with the right bytes
+        assert [p["part_number"] for p in store.get_session(session_id)["parts"]] == [1, 2]
+        asyncio.run(store.write_part(session_id, 1, chunked(data[:8])))
+
+        stored = asyncio.run(store.complete(session_id, hashlib.sha256(data).hexdigest()))
+
+        assert stored.path.read_bytes() == data
+        with pytest.raises(UploadSessionNotFound):
+            store.get_session(session_id)
+
+    def test_incomplete_or_mismatched_uploads_are_rejected(self, tmp_path):
+        """Missing parts and checksum mismatches keep the session for retry"""
+        store = make_store(tmp_path)
+        session_id = store.create_session(1, "clip.mp4")["session_id"]
+        asyncio.run(store.write_part(session_id, 2, chunked(b"tail")))
+
+        with pytest.raises(UploadError, match=r"missing parts \[1\]"):
+            asyncio.run(store.complete(session_id))
+
+        asyncio.run(store.write_part(session_id, 1, chunked(b"head")))
+        with pytest.raises(UploadError, match="Checksum mismatch"):
+            asyncio.run(store.complete(session_id, "0" * 64))
+
+        assert store.get_session(session_id)["received_size"] == 8
+        assert leftovers(store) == []
+
+    def test_declared_size_caps_parts(self, tmp_path):
+        """Parts may not exceed the part limit or the declared total"""
+        store = make_store(tmp_path, max_part_size=8)
+        session_id = store.create_session(1, "a.bin", total_size=10)["session_id"]
+
+        with pytest.raises(UploadTooLarge):
+            asyncio.run(store.write_part(session_id, 1, chunked(b"x" * 9)))
+        asyncio.run(store.write_part(session_id, 1, chunked(b"x" * 8)))
+        with pytest.raises(UploadTooLarge):
+            asyncio.run(store.write_part(session_id, 2, chunked(b"x" * 3)))
+        with pytest.raises(UploadTooLarge):
+            store.create_session(1, "huge.bin", total_size=store.max_multipart_size + 1)
+
+    def test_session_ids_are_validated(self, tmp_path):
+        """Unknown or path-like session ids are not found"""
+        store = make_store(tmp_path)
+
+        for session_id in ("../../etc", "0" * 32):
+            with pytest.raises(UploadSessionNotFound):
+                store.get_session(session_id)
+
+    def test_expired_sessions_are_removed(self, tmp_path):
+        """Sessions past their TTL are cleaned up"""
+        store = make_store(tmp_path, session_ttl_hours=0)
+        session_id = store.create_session(1, "a.bin")["session_id"]
+
+        assert store.cleanup_expired() == 1
+        with pytest.raises(UploadSessionNotFound):
+            store.get_session(session_id)
@@ -0,0 +1,210 @@
+"""
+Tests for the prioritized, persistent background task queue
+"""
+import asyncio
+import threading
+import time
+
+from api_gateway.database import Task
+from api_gateway.workers import WorkerManager
+
+
+def make_manager(session_factory, **settings):
+    """WorkerManager persisting to the test database"""
+    workers = {"cpu_workers": 1, "io_workers": 1, "max_concurrent_tasks": 2}
+    workers.update(settings)
+    return WorkerManager({"workers": workers}, session_factory=session_factory)
+
+
+class TestWorkerQueue:
+    """Test ordering, isolation between resource classes and cancellation"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.order = []
+
+    def _recording_handler(self, name, delay=0.0):
+        async def handler(data):
+            self.order.append((name, data.get("n")))
+            await asyncio.sleep(delay)
+            return {"handled": name}
+        return handler
+
+    def test_higher_priority_runs_first(self, session_factory):
+        """Queued work is started in priority order"""
+        manager = make_manager(session_factory)
+        manager.handlers["code_analysis"] = self._recording_handler("code", 0.02)
+
+        async def run_test():
+            await manager.submit_task("code_analysis", {"n": 0}, priority=1)
+            await asyncio.sleep(0.005)
+            await manager.submit_task("code_analysis", {"n": 1}, priority=1)
+            await manager.submit_task("code_analysis", {"n": 2}, priority=5)
+            await asyncio.sleep(0.2)
+            await manager.stop()
+
+        asyncio.run(run_test())
+        # n=0 is already running when the others arrive
+        assert [n for _, n in self.order] == [0, 2, 1]
+
+    def test_aging_prevents_starvation(self, session_factory):
+        """A task that has waited long enough beats newer higher-priority work"""
+        manager = make_manager(session_factory, aging_seconds=1)
+        manager.handlers["code_analysis"] = self._recording_handler("code", 0.02)
+
+        async def run_test():
+            await manager.submit_task("code_analysis", {"n": "blocker"}, priority=1)
+            await asyncio.sleep(0.005)
+            old_id = await manager.submit_task("code_analysis", {"n": "old"}, priority=1)
+            # Re-key the queued task as if it had been waiting for ten seconds
+            manager.tasks[old_id]["created_at"] -= 10
+            manager.queues["io"].clear()
+            manager._enqueue(manager.tasks[old_id])
+            await manager.submit_task("code_analysis", {"n": "new"}, priority=5)
+            await asyncio.sleep(0.2)
+            await manager.stop()
+
+        asyncio.run(run_test())
+        assert [n for _, n in self.order] == ["blocker", "old", "new"]
+
+    def test_long_cpu_tasks_do_not_block_io_tasks(self, session_factory):
+        """Resource classes have separate slots"""
+        manager = make_manager(session_factory)
+        manager.handlers["image_generation"] = self._recording_handler("image", 0.5)
+        manager.handlers["code_analysis"] = self._recording_handler("code")
+
+        async def run_test():
+            await manager.submit_task("image_generation", {"n": 0})
+            await manager.submit_task("image_generation", {"n": 1})
+            code_id = await manager.submit_task("code_analysis", {"n": 2})
+            await asyncio.sleep(0.1)
+            status = (await manager.get_task_status(code_id))["status"]
+            await manager.stop()
+            return status
+
+        assert asyncio.run(run_test()) == "completed"
+
+    def test_class_limits_share_the_overall_cap(self, session_factory):
+        """CPU and IO slots together never exceed max_concurrent_tasks"""
+        manager = make_manager(session_factory, cpu_workers=4, io_workers=20, max_concurrent_tasks=10)
+        assert manager.class_limits == {"cpu": 4, "io": 6}
+
+        manager = make_manager(session_factory, cpu_workers=8, io_workers=8, max_concurrent_tasks=5)
+        assert sum(manager.class_limits.values()) == 5
+        assert min(manager.class_limits.values()) >= 1
+
+    def test_blocking_io_handlers_run_in_io_pool(self, session_factory):
+        """Built-in IO task types run in the IO thread pool, off the event loop"""
+        manager = make_manager(session_factory)
+        threads = []
+
+        def analyze(data):
+            threads.append(threading.current_thread().name)
+            return {"lines": 1}
+        manager._analyze_code_sync = analyze
+
+        async def run_test():
+            task_id = await manager.submit_task("code_analysis", {"code": "x"})
+            await asyncio.sleep(0.1)
+            status = await manager.get_task_status(task_id)
+            await manager.stop()
+            return status
+
+        status = asyncio.run(run_test())
+        manager.shutdown()
+        assert status["result"] == {"lines": 1}
+        assert threads[0].startswith("task-io")
+
+    def test_cancel_pending_and_running(self, session_factory):
+        """Cancelled tasks never run, and running ones are interrupted"""
+        manager = make_manager(session_factory)
+        manager.handlers["code_analysis"] = self._recording_handler("code", 0.5)
+
+        async def run_test():
+            running_id = await manager.submit_task("code_analysis", {"n": 0})
+            pending_id = await manager.submit_task("code_analysis", {"n": 1})
+            await asyncio.sleep(0.05)
+            assert await manager.cancel_task(pending_id) is True
+            assert await manager.cancel_task(running_id) is True
+            await asyncio.sleep(0.05)
+            statuses = [manager.tasks[t]["status"] for t in (running_id, pending_id)]
+            assert await manager.cancel_task(running_id) is False
+            await manager.stop()
+            return statuses
+
+        assert asyncio.run(run_test()) == ["cancelled", "cancelled"]
+        assert self.order == [("code", 0)]
+        assert manager.stats["cancelled"] == 2
+
+
+class TestWorkerPersistence:
+    """Test durability and garbage collection"""
+
+    def test_tasks_are_persisted(self, session_factory):
+        """Owned tasks are mirrored to the tasks table"""
+        manager = make_manager(session_factory)
+
+        async def handler(data):
+            return {"ok": True}
+        manager.handlers["code_analysis"] = handler
+
+        async def run_test():
+            task_id = await manager.submit_task("code_analysis", {"code": "x"}, user_id=7)
+            await asyncio.sleep(0.05)
+            await manager.stop()
+            return task_id
+
+        task_id = asyncio.run(run_test())
+        db = session_factory()
+        row = db.get(Task, task_id)
+        assert row.status == "completed"
+        assert row.user_id == 7
+        assert row.result == {"ok": True}
+        db.close()
+
+    def test_unfinished_tasks_recover_on_start(self, session_factory):
+        """Pending and interrupted tasks are re-queued by a new manager"""
+        manager = make_manager(session_factory)
+        db = session_factory()
+        db.add(Task(id="left-pending", user_id=1, type="code_analysis", status="pending", data={"n": 1}))
+        db.add(Task(id="was-running", user_id=1, type="code_analysis", status="running", data={"n": 2}))
+        db.add(Task(id="done", user_id=1, type="code_analysis", status="completed", data={}))
+        db.commit()
+        db.close()
+
+        handled = []
+
+        async def handler(data):
+            handled.append(data["n"])
+            return {}
+        manager.handlers["code_analysis"] = handler
+
+        async def run_test():
+            await manager.start()
+            await asyncio.sleep(0.1)
+            await manager.stop()
+
+        asyncio.run(run_test())
+        assert sorted(handled) == [1, 2]
+        assert manager.stats["recovered"] == 2
+
+    def test_finished_tasks_expire_from_memory(self, session_factory):
+        """Expired tasks leave the dict but stay queryable from the database"""
+        manager = make_manager(session_factory, task_ttl_seconds=60)
+
+        async def handler(data):
+            return {}
+        manager.handlers["code_analysis"] = handler
+
+        async def run_test():
+            task_id = await manager.submit_task("code_analysis", {}, user_id=1)
+            await asyncio.sleep(0.05)
+            manager.tasks[task_id]["completed_at"] = time.time() - 120
+            assert manager.collect_garbage() == 1
+            status = await manager.get_task_status(task_id)
+            await manager.stop()
+            return task_id, status
+
+        task_id, status = asyncio.run(run_test())
+        assert task_id not in manager.tasks
+        assert status["status"] == "completed"